@@ -8,6 +8,7 @@ from abc import ABCMeta, abstractmethod
 
 from outwiker.core.attachment import Attachment
 from .exceptions import FileAlreadyExists, FolderNotExists
+from .exportmanifest import getSignature
 
 
 class BaseExporter (object):
@@ -19,6 +20,21 @@ class BaseExporter (object):
     def __init__ (self, page):
         self._page = page
 
+        # Функции, через которые пропускается HTML-содержимое перед записью в файл.
+        # Функции принимают страницу и текст, а возвращают новый текст
+        self.contentFilters = []
+
+        # Создавать ли жесткие ссылки на вложения вместо копирования
+        self.hardLinks = False
+
+        # Сигнатуры вложений, скопированных при предыдущем экспорте (ключ - имя файла).
+        # Если не None, то копируются только изменившиеся вложения,
+        # а оставшиеся от удаленных вложений файлы удаляются
+        self.previousFiles = None
+
+        # Сигнатуры вложений, скопированных при последнем экспорте
+        self.exportedFiles = {}
+
         from .i18n import _
         global _
 
@@ -33,6 +49,13 @@ class BaseExporter (object):
         pass
 
 
+    def getSources (self):
+        """
+        Возвращает список файлов, из которых получается HTML-файл страницы
+        """
+        return []
+
+
     def _exportContent (self, 
             page, 
             content, 
@@ -52,27 +75,40 @@ class BaseExporter (object):
         if not os.path.exists (outdir):
             raise FolderNotExists (_(u"Folder {0} not exists").format (outdir))
 
+        for contentFilter in self.contentFilters:
+            content = contentFilter (page, content)
+
         with open (exportfile, "wb") as fp:
             fp.write (content.encode ("utf8"))
 
-        self.__exportAttaches (page, exportdir, imagesonly, alwaisOverwrite)
-        self.__exportIcon (page, exportdir, alwaisOverwrite)
+        self.exportFiles (exportname, outdir, imagesonly, alwaisOverwrite)
 
 
-    def __exportAttaches (self, page, exportdir, imagesonly, alwaisOverwrite):
+    def exportFiles (self, exportname, outdir, imagesonly, alwaisOverwrite):
         """
-        Экспортировать вложения
+        Экспортировать вложения и иконку страницы (без HTML-файла)
         """
+        exportdir = os.path.join (outdir, exportname)
+
         if not os.path.exists (exportdir):
             os.mkdir (exportdir)
 
+        self.exportedFiles = {}
+
+        self.__exportAttaches (self._page, exportdir, imagesonly, alwaisOverwrite)
+        self.__exportIcon (self._page, exportdir, alwaisOverwrite)
+        self.__removeOldFiles (exportdir)
+
+
+    def __exportAttaches (self, page, exportdir, imagesonly, alwaisOverwrite):
+        """
+        Экспортировать вложения
+        """
         attach = Attachment (page)
 
         for fname in attach.attachmentFull:
             if not imagesonly or self.__isImage (fname):
-                newpath = os.path.join (exportdir, os.path.basename (fname) )
-                self.__checkForExists (newpath, alwaisOverwrite)
-                self.__copy (fname, newpath)
+                self.__exportFile (fname, exportdir, alwaisOverwrite)
 
 
     def __exportIcon (self, page, exportdir, alwaisOverwrite):
@@ -81,9 +117,39 @@ class BaseExporter (object):
         if page.icon == None:
             return
 
-        newIconPath = os.path.join (exportdir, os.path.basename (page.icon))
-        self.__checkForExists (newIconPath, alwaisOverwrite)
-        self.__copy (page.icon, newIconPath)
+        self.__exportFile (page.icon, exportdir, alwaisOverwrite)
+
+
+    def __exportFile (self, src, exportdir, alwaisOverwrite):
+        """
+        Скопировать файл или папку src в папку exportdir, если они изменились с предыдущего экспорта
+        """
+        fname = os.path.basename (src)
+        newpath = os.path.join (exportdir, fname)
+
+        signature = getSignature (src)
+        self.exportedFiles[fname] = signature
+
+        if (self.previousFiles != None and
+                self.previousFiles.get (fname) == signature and
+                os.path.exists (newpath)):
+            return
+
+        self.__checkForExists (newpath, alwaisOverwrite)
+        self.__copy (src, newpath)
+
+
+    def __removeOldFiles (self, exportdir):
+        """
+        Удалить файлы, скопированные при предыдущем экспорте, которых больше нет среди вложений
+        """
+        if self.previousFiles == None:
+            return
+
+        for fname in self.previousFiles:
+            path = os.path.join (exportdir, fname)
+            if fname not in self.exportedFiles and os.path.exists (path):
+                self.__delete (path)
 
 
     def __delete (self, path):
@@ -100,9 +166,29 @@ class BaseExporter (object):
         """
         Скопировать файл или директорию
         """
+        if not self.hardLinks:
+            if os.path.isdir (src):
+                shutil.copytree (src, dsc)
+            else:
+                shutil.copy (src, dsc)
+
+            return
+
         if os.path.isdir (src):
-            shutil.copytree (src, dsc)
+            os.mkdir (dsc)
+            for fname in os.listdir (src):
+                self.__copy (os.path.join (src, fname), os.path.join (dsc, fname))
         else:
+            self.__link (src, dsc)
+
+
+    def __link (self, src, dsc):
+        """
+        Создать жесткую ссылку на файл, а если это невозможно (например, файлы на разных дисках), то скопировать его
+        """
+        try:
+            os.link (src, dsc)
+        except (AttributeError, OSError):
             shutil.copy (src, dsc)
 
 
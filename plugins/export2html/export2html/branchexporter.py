@@ -1,17 +1,35 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
 
+import hashlib
+import json
+import os
 import os.path
 import re
+import shutil
+import time
+from multiprocessing.pool import ThreadPool
 
 from .exporterfactory import ExporterFactory
+from .exportmanifest import ExportManifest, getSignature
 from .indexgenerator import IndexGenerator
+from outwiker.core.attachment import Attachment
 from outwiker.core.tree import WikiDocument
+from outwiker.core.event import Event
 
 
 class BranchExporter (object):
-    def __init__ (self, startpage, nameGenerator):
+    def __init__ (self, startpage, nameGenerator, threads=None, hardLinks=False):
+        """
+        startpage - страница, с которой начинается экспорт ветки
+        nameGenerator - генератор имен файлов для экспортируемых страниц
+        threads - количество потоков для экспорта. Если None, то по количеству процессоров
+        hardLinks - создавать ли жесткие ссылки на вложения вместо копирования (там, где это возможно).
+            Файлы по жестким ссылкам общие с вики, поэтому их нельзя изменять после экспорта
+        """
         self.__startpage = startpage
+        self.__threads = threads
+        self.__hardLinks = hardLinks
 
         self.__indexfname = u"__index.html"
         self.__contentfname = u"__content.html"
@@ -34,27 +52,237 @@ class BranchExporter (object):
         # Ключ - страница, значение - имя ее директории или файла (без расширения) после экспорта
         self.__renames = {}
 
+        # То же самое для поиска страниц по ссылкам.
+        # Ключ - путь до страницы относительно корня в нижнем регистре, значение - имя файла без расширения
+        self.__links = {}
+
+        # Пути до файлов, которые копируются в папки экспортируемых страниц (вложения и иконки),
+        # относительно папки, куда производится экспорт
+        self.__files = set()
+
+        # Ссылки, найденные в тексте каждой страницы при экспорте.
+        # Ключ - страница, значение - словарь (ключ - ссылка,
+        # значение - имя файла страницы, на которую она ведет, или None)
+        self.__pageLinks = {}
+
+        # Статистика последнего экспорта
+        self.__statistics = {}
+
+        # Событие, которое вызывается после экспорта каждой страницы.
+        # Параметры: количество экспортированных страниц, общее количество страниц
+        self.onProgress = Event()
+
 
     @property
     def log (self):
         return self.__log
 
 
-    def export (self, outdir, imagesonly, alwaysOverwrite):
+    @property
+    def statistics (self):
+        """
+        Статистика последнего экспорта: словарь с количеством страниц (pages),
+        количеством страниц, HTML-файлы которых не изменились (skipped),
+        затраченным временем в секундах (seconds) и количеством страниц в секунду (pagesPerSecond)
+        """
+        return self.__statistics
+
+
+    def export (self, outdir, imagesonly, alwaysOverwrite, incremental=False):
+        """
+        Экспорт ветки. Сначала для всех страниц выбираются имена файлов,
+        после чего страницы экспортируются параллельно,
+        а ссылки на страницы исправляются до записи файлов.
+
+        incremental - инкрементальный экспорт. Файлы, оставшиеся от предыдущего экспорта в ту же папку,
+            перезаписываются, только если изменились данные, из которых они получены,
+            а файлы страниц, которых больше нет, удаляются
+        """
+        starttime = time.time()
+
         self.__log = []
         self.__renames = {}
+        self.__links = {}
+        self.__files = set()
+        self.__pageLinks = {}
+
+        manifest = ExportManifest (outdir)
+        if incremental:
+            manifest.load()
+            self.__nameGenerator.ignoreExisting (manifest.pages.keys())
+
+        tasks = []
+        self.__prepare (self.__startpage, tasks)
 
-        self.__export (self.__startpage, 
-                self.__startpage, 
-                outdir, 
-                imagesonly, 
-                alwaysOverwrite)
+        results = self.__exportPages (tasks, manifest.pages, outdir, imagesonly, alwaysOverwrite)
+
+        pages = {}
+        skipped = 0
+        for (exporter, exportname), (error, record, skip) in zip (tasks, results):
+            if error != None:
+                self.__log.append (error)
+
+            if record != None:
+                pages[exportname] = record
+
+            if skip:
+                skipped += 1
+
+        if incremental:
+            self.__removeOrphans (outdir, set (manifest.pages.keys()) - set (self.__renames.values()))
+
+        manifest.pages = pages
+        manifest.save()
 
-        self.__replacePageLinks (outdir)
         self.__createIndex (outdir, alwaysOverwrite)
+
+        seconds = time.time() - starttime
+        self.__statistics = {u"pages": len (tasks),
+                u"skipped": skipped,
+                u"seconds": seconds,
+                u"pagesPerSecond": len (tasks) / seconds if seconds > 0 else 0.0}
+
         return self.log
 
 
+    def __prepare (self, page, tasks):
+        """
+        Выбрать имена файлов для страницы page и всех ее подстраниц.
+        В tasks добавляются кортежи (экспортер, имя файла без расширения)
+        """
+        if page.getTypeString() != WikiDocument.getTypeString():
+            try:
+                exporter = ExporterFactory.getExporter (page)
+                exportname = self.__nameGenerator.getName (page)
+                self.__renames[page] = exportname
+                self.__links[page.subpath.lower()] = exportname
+                self.__addPageFiles (page, exportname)
+                self.__pageLinks[page] = {}
+
+                exporter.hardLinks = self.__hardLinks
+                exporter.contentFilters.append (self.__replacePageLinks)
+                tasks.append ((exporter, exportname))
+            except BaseException, error:
+                self.__log.append (u"{0}: {1}".format (page.title, unicode (error) ) )
+
+        for child in page.children:
+            self.__prepare (child, tasks)
+
+
+    def __addPageFiles (self, page, exportname):
+        """
+        Запомнить файлы, которые будут скопированы в папку страницы page при экспорте.
+        Ссылки на них не исправляются как ссылки на страницы
+        """
+        names = [os.path.basename (fname) for fname in Attachment (page).attachmentFull]
+        if page.icon != None:
+            names.append (os.path.basename (page.icon))
+
+        self.__files.update ([exportname + u"/" + name for name in names])
+
+
+    def __exportPages (self, tasks, previous, outdir, imagesonly, alwaysOverwrite):
+        """
+        Экспортировать страницы в пуле потоков.
+        previous - сведения о страницах из предыдущего экспорта (словарь из ExportManifest.pages)
+        Возвращает список кортежей (сообщение об ошибке или None,
+        сведения о странице для ExportManifest или None, пропущена ли запись HTML-файла)
+        в порядке tasks
+        """
+        def exportPage (task):
+            exporter, exportname = task
+            key = self.__getPageKey (exporter, exportname)
+            record = previous.get (exportname)
+            skip = False
+
+            try:
+                if record == None:
+                    exporter.export (outdir, exportname, imagesonly, alwaysOverwrite)
+                else:
+                    # Файлы остались от предыдущего экспорта, их можно перезаписывать
+                    exporter.previousFiles = record.get (u"files", {})
+                    links = record.get (u"links", {})
+                    skip = (record.get (u"key") == key and
+                            not self.__linksChanged (exporter.page, links) and
+                            os.path.exists (os.path.join (outdir, exportname + u".html")))
+
+                    if skip:
+                        exporter.exportFiles (exportname, outdir, imagesonly, True)
+                        self.__pageLinks[exporter.page] = links
+                    else:
+                        exporter.export (outdir, exportname, imagesonly, True)
+            except BaseException, error:
+                return (u"{0}: {1}".format (exporter.page.title, unicode (error) ), None, False)
+
+            return (None,
+                    {u"key": key,
+                        u"files": exporter.exportedFiles,
+                        u"links": self.__pageLinks[exporter.page]},
+                    skip)
+
+        results = []
+        if len (tasks) == 0:
+            return results
+
+        pool = ThreadPool (self.__threads)
+        try:
+            for result in pool.imap (exportPage, tasks):
+                results.append (result)
+                self.onProgress (len (results), len (tasks))
+        finally:
+            pool.close()
+            pool.join()
+
+        return results
+
+
+    def __linksChanged (self, page, links):
+        """
+        Проверить, ведут ли ссылки из текста страницы page на те же страницы, что и при предыдущем экспорте.
+        links - словарь ссылок, сохраненный при предыдущем экспорте
+        """
+        if not isinstance (links, dict):
+            return True
+
+        for url, exportname in links.iteritems():
+            if self.__getLinkExportName (page, url) != exportname:
+                return True
+
+        return False
+
+
+    def __getPageKey (self, exporter, exportname):
+        """
+        Контрольная сумма данных, из которых получается HTML-файл страницы.
+        Ссылки на другие страницы в нее не входят, они проверяются отдельно (см. __linksChanged)
+        """
+        page = exporter.page
+        data = [page.getTypeString(), page.title, exportname]
+
+        for path in exporter.getSources():
+            data.append ([path, getSignature (path)])
+
+        return hashlib.md5 (json.dumps (data)).hexdigest()
+
+
+    def __removeOrphans (self, outdir, names):
+        """
+        Удалить файлы, оставшиеся от экспорта страниц, которых больше нет
+        """
+        for name in names:
+            htmlpath = os.path.join (outdir, name + u".html")
+            dirpath = os.path.join (outdir, name)
+
+            try:
+                if os.path.isfile (htmlpath):
+                    os.remove (htmlpath)
+
+                if os.path.isdir (dirpath):
+                    shutil.rmtree (dirpath)
+            except EnvironmentError, error:
+                self.__log.append (u"{0}: {1}".format (name, unicode (error) ) )
+
+
     def __createIndex (self, outdir, alwaysOverwrite):
         """
         Создать оглавление
@@ -66,66 +294,59 @@ class BranchExporter (object):
         indexgenerator.generatefiles (indexpath, contentpath)
 
 
-    def __replacePageLinks (self, outdir):
+    def __replacePageLinks (self, page, text):
         """
-        Скорректировать ссылки на страницы
+        Скорректировать ссылки на страницы в тексте страницы page.
+        Вызывается из экспортера перед записью файла.
+        Найденные ссылки запоминаются, чтобы при инкрементальном экспорте
+        проверить, не изменились ли страницы, на которые они ведут
         """
-        for page in self.__renames.keys():
-            fullname = os.path.join (outdir, self.__renames[page] + u".html")
-
-            try:
-                with open (fullname) as fp:
-                    text = unicode (fp.read (), "utf8")
-
-                newtext = self.__replacePageLinksInText (text, page, outdir)
-
-                with open (fullname, "wb") as fp:
-                    fp.write (newtext.encode ("utf8"))
-            except BaseException, error:
-                self.__log.append (u"{0}: {1}".format (page.title, unicode (error) ) )
+        links = {}
+        self.__pageLinks[page] = links
 
+        def replace (match):
+            tag = match.group (1)
+            url = match.group (3)
 
+            exportname = self.__getLinkExportName (page, url)
+            links[url] = exportname
 
-    def __replacePageLinksInText (self, text, page, outdir):
-        matches = self.__a_tag_regex.findall (text)
-        hrefMatchIndex = 2
-        fullMatchIndex = 0
+            if exportname == None:
+                return tag
 
-        result = text
+            return tag.replace (url, exportname + ".html")
 
-        for match in matches:
-            url = match[hrefMatchIndex]
+        return self.__a_tag_regex.sub (replace, text)
 
-            # Проверить, что это не ссылка на сайт
-            if self.__isInternetUrl (url):
-                continue
 
-            # Проверить, что это не ссылка на файл
-            if self.__isFileLink (url, outdir):
-                continue
+    def __getLinkExportName (self, page, url):
+        """
+        Возвращает имя файла (без расширения) для страницы, на которую ведет ссылка url,
+        или None, если ссылка ведет не на экспортируемую страницу
+        """
+        if len (url) == 0:
+            return None
 
-            # Это ссылка на подстраницу?
-            linkToPage = page[url]
+        # Проверить, что это не ссылка на сайт
+        if self.__isInternetUrl (url):
+            return None
 
-            if linkToPage == None:
-                # Это ссылка на страницу из корня?
-                correcturl = url[1:] if url[0] == "/" else url
-                linkToPage = page.root[correcturl]
+        # Проверить, что это не ссылка на файл
+        if self.__isFileLink (url):
+            return None
 
-            if linkToPage == None:
-                continue
+        if url[0] == "/":
+            # Это ссылка на страницу из корня
+            return self.__links.get (url[1:].lower())
 
-            if linkToPage not in self.__renames.keys():
-                continue
+        # Это ссылка на подстраницу?
+        exportname = self.__links.get ((page.subpath + u"/" + url).lower())
 
-            # Эта страница нам подходит
-            # Новая ссылка
-            newhref = self.__renames[linkToPage] + ".html"
-            newFullLink = match[fullMatchIndex].replace (url, newhref)
-    
-            result = result.replace (match[fullMatchIndex], newFullLink)
+        if exportname == None:
+            # Это ссылка на страницу из корня?
+            exportname = self.__links.get (url.lower())
 
-        return result
+        return exportname
 
 
     def __isInternetUrl (self, url):
@@ -135,38 +356,11 @@ class BranchExporter (object):
                     url.startswith ("mailto:")
 
 
-    def __isFileLink (self, url, outdir):
-        fname = os.path.join (outdir, url)
-        return os.path.exists (fname) and os.path.isfile (fname)
-
-
-    def __export (self, 
-            page, 
-            root, 
-            outdir, 
-            imagesonly, 
-            alwaysOverwrite):
+    def __isFileLink (self, url):
         """
-        page - страница, начиная с которой надо начать экспортирование
-        root - корневая страница, откуда началось общее экспортирование (для определения имени файлов)
-        outdir - директория для экспорта
-        imagesonly - из вложений оставлять только картинки?
-        alwaysOverwrite - перезаписывать существующие файлы?
+        Проверить, ведет ли ссылка на файл из папки экспортируемой страницы.
+        Проверяется по списку вложений, а не по файлам в папке экспорта,
+        потому что страницы экспортируются параллельно и файлы могут быть еще не скопированы
         """
-        if page.getTypeString() != WikiDocument.getTypeString():
-            try:
-                exporter = ExporterFactory.getExporter (page)
-                exportname = self.__nameGenerator.getName (page)
-                self.__renames[page] = exportname
-
-                exporter.export (outdir, exportname, imagesonly, alwaysOverwrite)
-            except BaseException, error:
-                self.__log.append (u"{0}: {1}".format (page.title, unicode (error) ) )
-
-        for child in page.children:
-            self.__export (
-                    child,
-                    root, 
-                    outdir,
-                    imagesonly,
-                    alwaysOverwrite)
+        parts = url.split (u"/")
+        return len (parts) > 1 and u"/".join (parts[:2]) in self.__files
@@ -23,10 +23,12 @@ class ExportBranchDialog (ExportDialog):
         global _
 
         self.__addNameFormatCheckBox ()
+        self.__addIncrementalCheckBox ()
         self.Fit()
         self.Layout()
 
         self.longNames = self._config.longNames
+        self.incremental = self._config.incremental
 
 
     @property
@@ -42,6 +44,19 @@ class ExportBranchDialog (ExportDialog):
         self.__longNameFormatCheckBox.SetValue (value)
 
 
+    @property
+    def incremental (self):
+        """
+        Инкрементальный экспорт (перезаписывать только изменившиеся страницы)
+        """
+        return self.__incrementalCheckBox.GetValue()
+
+
+    @incremental.setter
+    def incremental (self, value):
+        self.__incrementalCheckBox.SetValue (value)
+
+
     def __addNameFormatCheckBox (self):
         """
         Добавить чекбокс "Создавать файлы с длинными именами (включать заголовки родителей)"
@@ -56,6 +71,20 @@ class ExportBranchDialog (ExportDialog):
                 border=2)
 
 
+    def __addIncrementalCheckBox (self):
+        """
+        Добавить чекбокс "Обновлять только изменившиеся страницы"
+        """
+        self.__incrementalCheckBox = wx.CheckBox (self, 
+                -1, 
+                _(u"Update changed pages only"))
+
+        self._mainSizer.Insert (5, 
+                self.__incrementalCheckBox, 
+                flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL, 
+                border=2)
+
+
     def __getNameGenerator (self):
         """
         Возвращает генератор имен для создаваемых страниц (длинные имена или короткие)
@@ -63,17 +92,18 @@ class ExportBranchDialog (ExportDialog):
         return LongNameGenerator (self.__rootpage) if self.longNames else TitleNameGenerator (self.path)
 
 
-    def _threadExport (self, exporter, path, imagesOnly, overwrite):
+    def _threadExport (self, exporter, path, imagesOnly, overwrite, incremental):
         """
         Экспорт, выполняемый в отдельном потоке
         """
-        return exporter.export (path, imagesOnly, overwrite)
+        return exporter.export (path, imagesOnly, overwrite, incremental)
 
 
     def _onOk (self):
         self._config.longNames = self.longNames
         self._config.imagesOnly = self.imagesOnly
         self._config.overwrite = self.overwrite
+        self._config.incremental = self.incremental
 
         namegenerator = self.__getNameGenerator()
         exporter = BranchExporter (self.__rootpage, namegenerator)
@@ -86,7 +116,8 @@ class ExportBranchDialog (ExportDialog):
         result = runner.run (exporter, 
                 self.path,
                 self.imagesOnly,
-                self.overwrite)
+                self.overwrite,
+                self.incremental)
 
         if len (result) != 0:
             logdlg = LogDialog (self, result)
@@ -38,6 +38,15 @@ class ExportConfig (object):
                 False)
 
 
+        # Инкрементальный экспорт ветки (перезаписывать только изменившиеся страницы)
+        incrementalOption = u"Incremental"
+
+        self.__incremental = BooleanOption (self.__config, 
+                self.section, 
+                incrementalOption, 
+                False)
+
+
     @property
     def overwrite (self):
         """
@@ -72,3 +81,16 @@ class ExportConfig (object):
     @longNames.setter
     def longNames (self, value):
         self.__longNames.value = value
+
+
+    @property
+    def incremental (self):
+        """
+        Инкрементальный экспорт ветки (перезаписывать только изменившиеся страницы)
+        """
+        return self.__incremental.value
+
+
+    @incremental.setter
+    def incremental (self, value):
+        self.__incremental.value = value
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import json
+import os
+import os.path
+
+
+def getSignature (path):
+    """
+    Возвращает сигнатуру файла или папки, по которой определяется, изменились ли они.
+    Для файла - список [время изменения, размер],
+    для папки - отсортированный список [относительный путь, время изменения, размер] всех вложенных файлов,
+    None, если файла не существует
+    """
+    if os.path.isdir (path):
+        result = []
+        for dirpath, dirnames, filenames in os.walk (path):
+            for fname in filenames:
+                fullpath = os.path.join (dirpath, fname)
+                signature = getSignature (fullpath)
+                if signature != None:
+                    result.append ([os.path.relpath (fullpath, path)] + signature)
+
+        result.sort()
+        return result
+
+    try:
+        stat = os.stat (path)
+    except OSError:
+        return None
+
+    return [stat.st_mtime, stat.st_size]
+
+
+class ExportManifest (object):
+    """
+    Сведения о страницах, экспортированных в папку. Используются при инкрементальном экспорте
+    """
+    fileName = u"__export.json"
+
+    def __init__ (self, outdir):
+        self.path = os.path.join (outdir, self.fileName)
+
+        # Экспортированные страницы.
+        # Ключ - имя файла страницы без расширения, значение - словарь с ключами:
+        # key - контрольная сумма данных, из которых получается HTML-файл страницы,
+        # files - словарь с сигнатурами вложений (ключ - имя файла в папке страницы),
+        # links - словарь ссылок из текста страницы (ключ - ссылка,
+        # значение - имя файла страницы, на которую она ведет, или None)
+        self.pages = {}
+
+
+    def load (self):
+        """
+        Прочитать файл со сведениями. Если файл отсутствует или испорчен, то сведений нет
+        """
+        self.pages = {}
+
+        try:
+            with open (self.path) as fp:
+                data = json.load (fp)
+        except (IOError, ValueError):
+            return
+
+        if isinstance (data, dict) and isinstance (data.get (u"pages"), dict):
+            self.pages = data[u"pages"]
+
+
+    def save (self):
+        with open (self.path, "w") as fp:
+            json.dump ({u"pages": self.pages}, fp)
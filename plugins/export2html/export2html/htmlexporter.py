@@ -17,6 +17,8 @@ class HtmlExporter (BaseExporter):
     def __init__ (self, page):
         BaseExporter.__init__ (self, page)
 
+        self.__htmlFileName = u"__content.html"
+
         from .i18n import _
         global _
 
@@ -28,8 +30,6 @@ class HtmlExporter (BaseExporter):
         assert (self._page.getTypeString() == "html" or 
                 self._page.getTypeString() == "wiki" )
 
-        self.__htmlFileName = u"__content.html"
-
         # Чтение файла с содержимым
         try:
             with open (os.path.join (self._page.path, self.__htmlFileName) ) as fp:
@@ -48,6 +48,10 @@ class HtmlExporter (BaseExporter):
                 alwaysOverwrite)
 
 
+    def getSources (self):
+        return [os.path.join (self._page.path, self.__htmlFileName)]
+
+
     def __replaceAttaches (self, content, tag, attrib, exportname):
         """
         Заменить ссылки на папку __attach на новую папку с вложениями
@@ -4,7 +4,7 @@
 import cgi
 import os.path
 
-from .template import loadTemplate
+from .template import loadTemplate, writeIfChanged
 
 
 class IndexContentGenerator (object):
@@ -25,7 +25,8 @@ class IndexContentGenerator (object):
 
     def generate (self, fname):
         """
-        Создать файл (с имемени fname), содержащий список страниц
+        Создать файл (с имемени fname), содержащий список страниц.
+        Если файл уже существует и не изменился, то он не перезаписывается
         """
         resultList = []
 
@@ -33,10 +34,9 @@ class IndexContentGenerator (object):
         result = self.__addpage (resultList, self.__rootpage, 1)
         resultList.append ("</ul>")
 
-        finalresult = self.__prepareResult (u"\n".join (resultList) )
+        finalresult = self.__prepareResult (u"\n".join (resultList) ).encode ("utf8")
 
-        with open (fname, "w") as fp:
-            fp.write (finalresult.encode ("utf8"))
+        writeIfChanged (fname, finalresult)
 
 
     def __prepareResult (self, result):
@@ -94,8 +94,8 @@ class IndexContentGenerator (object):
 
 
     def __addpage (self, resultList, page, level):
-        if page in self.__renames.keys():
-            if "title" in dir (page):
+        if page in self.__renames:
+            if hasattr (page, "title"):
                 itemstring = self.__getPageLink (page, level)
                 resultList.append (itemstring)
 
@@ -4,7 +4,7 @@
 import os.path
 
 from .indexcontentgenerator import IndexContentGenerator
-from .template import loadTemplate
+from .template import loadTemplate, writeIfChanged
 
 
 class IndexGenerator (object):
@@ -37,5 +37,4 @@ class IndexGenerator (object):
         indextemplate = loadTemplate (self.__templatename)
         indexresult = indextemplate.substitute (contentfname=os.path.basename (contentfname) )
 
-        with open (indexfname, "w") as fp:
-            fp.write (indexresult)
+        writeIfChanged (indexfname, indexresult.encode ("utf8"))
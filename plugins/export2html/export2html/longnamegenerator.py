@@ -17,6 +17,13 @@ class LongNameGenerator (object):
         self._root = rootpage
 
 
+    def ignoreExisting (self, names):
+        """
+        Имена не зависят от существующих файлов, поэтому ничего не делаем
+        """
+        pass
+
+
     def getName (self, page):
         """
         Получить имя файла и директории для экспортируемой страницы page
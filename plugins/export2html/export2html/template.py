@@ -5,17 +5,39 @@ from string import Template
 import os.path
 
 
-def loadTemplate (fname):
+def getTemplatePath (fname):
     """
-    Загрузить шаблон.
+    Возвращает полный путь до файла шаблона
     """
     templatedir = u"templates"
 
-    templateFileName = os.path.join (os.path.dirname (__file__), 
+    return os.path.join (os.path.dirname (__file__), 
             templatedir, 
             fname)
 
+
+def loadTemplate (fname):
+    """
+    Загрузить шаблон.
+    """
+    templateFileName = getTemplatePath (fname)
+
     with open (templateFileName) as fp:
         template = unicode (fp.read(), "utf8")
 
     return Template (template)
+
+
+def writeIfChanged (fname, data):
+    """
+    Записать строку data в файл fname, если содержимое файла отличается
+    """
+    try:
+        with open (fname, "rb") as fp:
+            if fp.read() == data:
+                return
+    except IOError:
+        pass
+
+    with open (fname, "wb") as fp:
+        fp.write (data)
@@ -4,7 +4,9 @@
 import cgi
 import os.path
 
-from .template import loadTemplate
+from outwiker.core.tree import RootWikiPage
+
+from .template import loadTemplate, getTemplatePath
 from .baseexporter import BaseExporter
 
 class TextExporter (BaseExporter):
@@ -14,6 +16,8 @@ class TextExporter (BaseExporter):
     def __init__ (self, page):
         BaseExporter.__init__ (self, page)
 
+        self.__singleTemplate = u"single.html"
+
         from .i18n import _
         global _
 
@@ -24,11 +28,9 @@ class TextExporter (BaseExporter):
         Может бросить исключение IOError, если не найден файл с шаблоном
         Используется для экспорта текстовых страниц
         """
-        singleTemplate = u"single.html"
-
         assert self._page.getTypeString() == "text"
 
-        template = loadTemplate(singleTemplate)
+        template = loadTemplate(self.__singleTemplate)
         content = self.__prepareTextContent (self._page.content)
         resultcontent = template.substitute (content=content, title=self._page.title)
 
@@ -40,6 +42,11 @@ class TextExporter (BaseExporter):
                 alwaysOverwrite)
 
 
+    def getSources (self):
+        return [os.path.join (self._page.path, RootWikiPage.contentFile),
+                getTemplatePath (self.__singleTemplate)]
+
+
     def __prepareTextContent (self, content):
         result = u"<pre>{0}</pre>".format (cgi.escape (content))
         return result
@@ -8,13 +8,31 @@ class TitleNameGenerator (object):
     def __init__ (self, outdir):
         self.__outdir = outdir
 
+        # Уже выданные имена. Имена выбираются до записи файлов,
+        # поэтому проверки существования файлов недостаточно
+        self.__names = set()
+
+        # Имена, файлы с которыми остались от предыдущего экспорта и могут быть перезаписаны
+        self.__ignored = set()
+
+
+    def ignoreExisting (self, names):
+        """
+        Не учитывать при выборе имен файлы с именами names (без расширения),
+        оставшиеся от предыдущего экспорта
+        """
+        self.__ignored.update (names)
+
     
     def getName (self, page):
         name = os.path.join (page.title)
 
         index = 1
-        while os.path.exists (os.path.join (self.__outdir, name + ".html") ):
+        while (name in self.__names or
+                (name not in self.__ignored and
+                    os.path.exists (os.path.join (self.__outdir, name + ".html") ) ) ):
             name = page.title + " ({0})".format (index)
             index += 1
 
+        self.__names.add (name)
         return name
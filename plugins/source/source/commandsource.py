@@ -2,8 +2,10 @@
 # -*- coding: UTF-8 -*-
 
 from outwiker.pages.wiki.parser.command import Command
+from outwiker.pages.wiki.rendercache import RenderCache
 from outwiker.core.attachment import Attachment
 
+import pygments
 from pygments import highlight
 from pygments.formatters import HtmlFormatter
 from pygments.styles import STYLE_MAP
@@ -29,13 +31,19 @@ class CommandSource (Command):
     lang - язык программирования (пока не используется)
     file - имя прикрепленного файла (с приставкой Attach: или без нее)
     encoding - кодировка для прикрепленного файла (используется вместе с параметром file). Если кодирвока не указана, используется UTF-8
+
+    Раскрашенные исходники сохраняются в кеше и используются, пока не изменится текст, файл или параметры
     """
-    def __init__ (self, parser, config):
+    configSections = [SourceConfig.section]
+
+    def __init__ (self, parser, config, version=u""):
         """
         parser - экземпляр парсера
+        version - версия плагина. Входит в ключи кеша результатов
         """
         Command.__init__ (self, parser)
         self.__config = SourceConfig (config)
+        self.__version = version
 
         # Стили CSS, добавленные в заголовок
         self.__appendCssClasses = []
@@ -59,6 +67,20 @@ class CommandSource (Command):
         """
         params_dict = Command.parseParams (params)
 
+        tabwidth = self.__getTabWidth (params_dict)
+        style = self.__getStyle (params_dict)
+
+        cache = RenderCache (self.parser.page)
+        key = self.__getCacheKey (params_dict, content, tabwidth, style)
+
+        if key != None:
+            cached = cache.get (key)
+            if cached != None:
+                parentbg = PARENT_BACKGROUND_PARAM_NAME in params_dict
+                linenum = LINE_NUM_PARAM_NAME in params_dict
+                self.__appendStyles (style, self.__getCssClass (style, parentbg), parentbg, linenum)
+                return cached
+
         try:
             sourceText = self.__getContentFromFile (params_dict)
 
@@ -74,14 +96,29 @@ class CommandSource (Command):
         except LookupError:
             return _(u"<B>Source plugin: Unknown encoding</B>")
 
-        tabwidth = self.__getTabWidth (params_dict)
-
         newcontent = sourceText.replace ("\t", " " * tabwidth)
-        colortext = self.__colorize (params_dict, newcontent)
+        colortext = self.__colorize (params_dict, newcontent, style)
+
+        if key != None:
+            cache.set (key, colortext)
 
         return colortext
 
 
+    def __getCacheKey (self, params_dict, content, tabwidth, style):
+        """
+        Возвращает ключ для кеша результатов или None, если прикрепленного файла не существует
+        """
+        version = [self.__version, pygments.__version__]
+        params = [sorted (params_dict.items()), tabwidth, style]
+
+        if FILE_PARAM_NAME in params_dict:
+            path = Attachment (self.parser.page).getFullPath (getFileName (params_dict[FILE_PARAM_NAME]))
+            return RenderCache.getKey (self.name, version, params, path=path)
+
+        return RenderCache.getKey (self.name, version, params, content=content)
+
+
     def __getTabWidth (self, params_dict):
         """
         Получить размер табуляции в зависимости от параметров
@@ -145,7 +182,7 @@ class CommandSource (Command):
         return result
 
 
-    def __colorize (self, params_dict, content):
+    def __colorize (self, params_dict, content, style):
         """
         Раскраска исходников. Возвращает получившийся HTML и добавляет нужные стили в заголовок страницы
         """
@@ -155,9 +192,23 @@ class CommandSource (Command):
         linenum = LINE_NUM_PARAM_NAME in params_dict
         parentbg = PARENT_BACKGROUND_PARAM_NAME in params_dict
 
-        style = self.__getStyle (params_dict)
         cssclass = self.__getCssClass (style, parentbg)
 
+        formatter = self.__appendStyles (style, cssclass, parentbg, linenum)
+
+        content = highlight(content, lexer, formatter)
+
+        result = u"".join ([u'<div class="source-block">', content.strip(), u'</div>'])
+        result = result.replace ("\n</td>", "</td>")
+
+        return result
+
+
+    def __appendStyles (self, style, cssclass, parentbg, linenum):
+        """
+        Добавить стили для раскраски в заголовок страницы, если их там еще нет.
+        Возвращает форматтер для раскраски
+        """
         formatter = HtmlFormatter(linenos=linenum, cssclass=cssclass, style=style)
 
         if cssclass not in self.__appendCssClasses:
@@ -175,10 +226,5 @@ class CommandSource (Command):
 
             self.__appendCssClasses.append (cssclass)
 
-        content = highlight(content, lexer, formatter)
-
-        result = u"".join ([u'<div class="source-block">', content.strip(), u'</div>'])
-        result = result.replace ("\n</td>", "</td>")
-
-        return result
+        return formatter
         
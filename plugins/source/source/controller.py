@@ -62,7 +62,7 @@ class Controller (object):
         Вызывается до разбора викитекста. Добавление команды (:source:)
         """
         from .commandsource import CommandSource
-        parser.addCommand (CommandSource (parser, self._application.config))
+        parser.addCommand (CommandSource (parser, self._application.config, self._plugin.version))
 
 
     def __onPreferencesDialogCreate (self, dialog):
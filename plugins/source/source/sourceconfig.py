@@ -7,11 +7,12 @@ from .params import LANGUAGE_DEFAULT, TAB_WIDTH_DEFAULT, STYLE_DEFAULT, LANGUAGE
 
 
 class SourceConfig (object):
+    # Секция конфига с настройками плагина
+    section = u"SourcePlugin"
+
     def __init__ (self, config):
         self.__config = config
 
-        self.section = u"SourcePlugin"
-
         # Размер табуляции по умолчанию
         tabWidthOption = u"TabWidth"
 
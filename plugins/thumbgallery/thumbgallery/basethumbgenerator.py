@@ -18,17 +18,26 @@ class BaseThumbGenerator (object):
         self._items = items
         self._parser = parser
         self._thumbsize = self._parseThumbSize (thumbsize)
+        self._thumbmaker = PageThumbmaker()
 
 
     def _getThumbnail (self, page, fname):
         """
-        Метод создает превьюшку и возвращает относительный путь до нее (относительно корня страницы)
+        Метод ставит в очередь создание превьюшки и возвращает относительный путь до нее (относительно корня страницы).
+        Превьюшки создаются параллельно, дождаться их нужно с помощью метода _waitThumbnails()
         """
-        thumbmaker = PageThumbmaker()
-
-        return thumbmaker.createThumbByMaxSize (page, 
+        return self._thumbmaker.createThumbByMaxSize (page, 
                 fname, 
-                self._thumbsize).replace ("\\", "/")
+                self._thumbsize,
+                wait=False).replace ("\\", "/")
+
+
+    def _waitThumbnails (self):
+        """
+        Дождаться создания превьюшек галереи.
+        Если какую-то превьюшку создать не удалось, бросается исключение
+        """
+        self._thumbmaker.wait()
 
 
     def _parseThumbSize (self, thumbsize):
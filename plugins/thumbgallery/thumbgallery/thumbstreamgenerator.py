@@ -53,6 +53,8 @@ class ThumbStreamGenerator (BaseThumbGenerator):
             thumbpath=self._getThumbnail (self._parser.page, item[0]))
                 for item in self._items])
 
+        self._waitThumbnails()
+
         if self._style not in self._parser.head:
             self._parser.appendToHead (self._style)
 
@@ -62,6 +62,7 @@ class ThumbTableGenerator (BaseThumbGenerator):
             self._parser.appendToHead (self._style)
 
         resultContent = self._generateRows (self._items)
+        self._waitThumbnails()
 
         return self._fullTemplate.format (content = resultContent)
 
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Замеры производительности OutWiker на синтетической вики.
+Результаты сохраняются в формате JSON, чтобы их можно было сравнивать между версиями.
+
+Пример запуска:
+    python benchmark.py --pages 500 --depth 4 --output ../profiles/benchmark.json
+"""
+
+import argparse
+
+import wx
+
+from outwiker.core.application import Application
+from profiles.wikigenerator import WikiGenerator
+from profiles.benchmark import Benchmark, saveResults
+
+
+def parseArgs ():
+    parser = argparse.ArgumentParser (description=u"OutWiker benchmark")
+    parser.add_argument ("--pages", type=int, default=100, help=u"Number of pages")
+    parser.add_argument ("--depth", type=int, default=3, help=u"Max depth of the pages tree")
+    parser.add_argument ("--tags", type=int, default=3, help=u"Number of tags for every page")
+    parser.add_argument ("--tagscount", type=int, default=20, help=u"Number of different tags")
+    parser.add_argument ("--attaches", type=int, default=2, help=u"Number of attached files for every page")
+    parser.add_argument ("--size", type=int, default=4000, help=u"Size of page content (chars)")
+    parser.add_argument ("--seed", type=int, default=0, help=u"Random seed")
+    parser.add_argument ("--repeat", type=int, default=3, help=u"Number of measurement repeats")
+    parser.add_argument ("--output", default="../profiles/benchmark.json", help=u"JSON file for results")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+
+    Application.init ("../profiles/testconfig.ini")
+
+    class testApp(wx.App):
+        def __init__(self, *args, **kwds):
+            wx.App.__init__ (self, *args, **kwds)
+
+    app = testApp(redirect=False)
+
+    generator = WikiGenerator (pages=args.pages,
+            depth=args.depth,
+            tags=args.tags,
+            tagsCount=args.tagscount,
+            attaches=args.attaches,
+            contentSize=args.size,
+            seed=args.seed)
+
+    results = Benchmark (generator, repeat=args.repeat).run()
+    saveResults (results, args.output)
+
+    for name in sorted (results[u"results"].keys()):
+        result = results[u"results"][name]
+        if u"error" in result:
+            print u"{0}: error".format (name)
+        else:
+            print u"{0}: {1:.6f} s".format (name, result[u"min"])
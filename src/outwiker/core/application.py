@@ -6,6 +6,9 @@ from .config import Config
 from .event import Event
 from .recent import RecentWiki
 from .pluginsloader import PluginsLoader
+from .htmlcache import HtmlCache
+from .iconscache import IconsCache
+from outwiker.pages.wiki.wikiconfig import WikiConfig
 
 
 class ApplicationParams (object):
@@ -58,10 +61,18 @@ class ApplicationParams (object):
         # Параметр - удаленная страница
         self.onPageRemove = Event()
 
+        # Изменение тегов у группы страниц
+        # Параметр: pages - список страниц, у которых изменились теги
+        self.onTagsChanged = Event()
+
         # Переименование страницы.
         # Параметры: page - переименованная страница, oldSubpath - старый относительный путь до страницы
         self.onPageRename = Event()
 
+        # Перемещение страницы к другому родителю.
+        # Параметры: page - перемещенная страница, oldParent - прежний родитель
+        self.onPageMove = Event()
+
         # Начало сложного обновления дерева
         # Параметры: root - корень дерева
         self.onStartTreeUpdate = Event()
@@ -121,6 +132,38 @@ class ApplicationParams (object):
         # tray - экземпля класса OutwikerTrayIcon
         self.onTrayPopupMenu = Event()
 
+        # Кеш HTML-представлений страниц
+        self.htmlCache = HtmlCache()
+        self.onPageUpdate += self.__invalidateHtmlCache
+        self.onPageRemove += self.__invalidateHtmlCache
+        self.onWikiOpen += self.__clearHtmlCache
+        self.onPreferencesDialogClose += self.__onPreferencesDialogClose
+
+        # Картинки для иконок страниц
+        self.iconsCache = IconsCache()
+
+
+    def __invalidateHtmlCache (self, page):
+        self.htmlCache.invalidate (page.path)
+
+
+    def __clearHtmlCache (self, root):
+        self.htmlCache.clear()
+        self.iconsCache.clear()
+
+
+    def __onPreferencesDialogClose (self, prefDialog):
+        self.__updateHtmlCacheSize()
+
+
+    def __updateHtmlCacheSize (self):
+        """
+        Установить размер кеша HTML-представлений страниц из настроек.
+        Вызывается при запуске и после изменения настроек
+        """
+        size = WikiConfig (self.config).htmlCacheSizeOptions.value
+        self.htmlCache.maxSize = size * WikiConfig.HTML_CACHE_SIZE_UNIT
+
     
     def init (self, configFilename):
         """
@@ -129,6 +172,7 @@ class ApplicationParams (object):
         self.config = Config (configFilename)
         self.recentWiki = RecentWiki (self.config)
         self.__initLocale()
+        self.__updateHtmlCacheSize()
 
 
     @property
@@ -184,8 +228,10 @@ class ApplicationParams (object):
         wiki.onEndTreeUpdate += self.onEndTreeUpdate
         wiki.onPageOrderChange += self.onPageOrderChange
         wiki.onPageRename += self.onPageRename
+        wiki.onPageMove += self.onPageMove
         wiki.onPageCreate += self.onPageCreate
         wiki.onPageRemove += self.onPageRemove
+        wiki.onTagsChanged += self.onTagsChanged
         wiki.bookmarks.onBookmarksChanged += self.onBookmarksChanged
 
 
@@ -200,8 +246,10 @@ class ApplicationParams (object):
         wiki.onEndTreeUpdate -= self.onEndTreeUpdate
         wiki.onPageOrderChange -= self.onPageOrderChange
         wiki.onPageRename -= self.onPageRename
+        wiki.onPageMove -= self.onPageMove
         wiki.onPageCreate -= self.onPageCreate
         wiki.onPageRemove -= self.onPageRemove
+        wiki.onTagsChanged -= self.onTagsChanged
         wiki.bookmarks.onBookmarksChanged -= self.onBookmarksChanged
 
 
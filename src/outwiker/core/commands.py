@@ -19,6 +19,7 @@ from outwiker.core.attachment import Attachment
 from outwiker.core.pagetitletester import PageTitleError, PageTitleWarning
 from outwiker.core.tagscommands import tagBranch, removeTagsFromBranch, renameTag
 from outwiker.core.tagslist import TagsList
+from outwiker.core.treeprefetcher import TreePrefetcher
 
 from outwiker.gui.overwritedialog import OverwriteDialog
 from outwiker.gui.about import AboutDialog
@@ -156,6 +157,34 @@ def openWikiWithDialog (parent, readonly=False):
     return wikiroot
 
 
+# Фоновая подгрузка дерева открытой вики
+_treePrefetcher = None
+
+
+def _startTreePrefetch (wikiroot):
+    """
+    Запустить фоновую подгрузку страниц, которые еще не были загружены
+    """
+    global _treePrefetcher
+
+    stopTreePrefetch()
+
+    if wikiroot != None:
+        _treePrefetcher = TreePrefetcher (wikiroot)
+        _treePrefetcher.start()
+
+
+def stopTreePrefetch ():
+    """
+    Остановить фоновую подгрузку страниц (например, при закрытии вики)
+    """
+    global _treePrefetcher
+
+    if _treePrefetcher != None:
+        _treePrefetcher.stop()
+        _treePrefetcher = None
+
+
 def openWiki (path, readonly=False):
     wikiroot = None
 
@@ -183,6 +212,7 @@ def openWiki (path, readonly=False):
         Application.wikiroot = result
 
     Application.onEndTreeUpdate(wikiroot)
+    _startTreePrefetch (Application.wikiroot)
 
     return Application.wikiroot
 
@@ -553,12 +583,7 @@ def addTagsToBranchGui (page, parent):
     dlg.SetTitle (_(u"Add Tags to Branch"))
 
     if dlg.ShowModal() == wx.ID_OK:
-        Application.onStartTreeUpdate(page.root)
-
-        try:
-            tagBranch (page, dlg.tags)
-        finally:
-            Application.onEndTreeUpdate(page.root)
+        tagBranch (page, dlg.tags)
 
     dlg.Destroy()
 
@@ -572,12 +597,7 @@ def removeTagsFromBranchGui (page, parent):
     dlg.SetTitle (_(u"Remove Tags from Branch"))
 
     if dlg.ShowModal() == wx.ID_OK:
-        Application.onStartTreeUpdate(page.root)
-
-        try:
-            removeTagsFromBranch (page, dlg.tags)
-        finally:
-            Application.onEndTreeUpdate(page.root)
+        removeTagsFromBranch (page, dlg.tags)
 
     dlg.Destroy()
         
@@ -588,12 +608,7 @@ def renameTagGui (wikiroot, parent):
 
     dlg = RenameTagDialog (parent, tagslist)
     if dlg.ShowModal() == wx.ID_OK:
-        Application.onStartTreeUpdate(wikiroot)
-
-        try:
-            renameTag (wikiroot, dlg.oldTagName, dlg.newTagName)
-        finally:
-            Application.onEndTreeUpdate(wikiroot)
+        renameTag (wikiroot, dlg.oldTagName, dlg.newTagName)
 
     dlg.Destroy()
 
@@ -615,6 +630,7 @@ def addNewTab (application):
 
 
 def closeWiki (application):
+    stopTreePrefetch()
     application.wikiroot = None
 
 
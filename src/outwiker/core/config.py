@@ -4,21 +4,66 @@
 from abc import ABCMeta, abstractmethod
 import ConfigParser
 import datetime
+import os
+import os.path
+import sys
+import threading
 
 
 class Config (object):
     """
     Оболочка над ConfigParser
     """
-    def __init__ (self, fname, readonly=False):
+    def __init__ (self, fname, readonly=False, values=None):
         """
         fname -- имя файла конфига
+        values -- заранее прочитанные значения в том виде, 
+            в каком их возвращает метод getValues().
+            Если values != None, то файл fname не читается
         """
         self.readonly = readonly
         self.fname = fname
         self.__config = ConfigParser.ConfigParser()
 
-        self.__config.read (self.fname)
+        # Счетчик изменений. Увеличивается при каждом изменении значений конфига,
+        # чтобы можно было быстро проверить, менялся ли конфиг
+        self.generation = 0
+
+        # Конфиг может изменяться из разных потоков (например, при создании HTML в фоне)
+        self._lock = threading.RLock()
+
+        # True, если есть изменения, которые еще не записаны в файл
+        self._dirty = False
+
+        # Функция, которая вызывается после записи файла: onWrite (dirMtime),
+        # где dirMtime - время изменения папки с файлом до записи.
+        # Запись через временный файл изменяет время изменения папки
+        self.onWrite = None
+
+        if values == None:
+            self.__config.read (self.fname)
+        else:
+            self.__setValues (values)
+
+
+    def getValues (self):
+        """
+        Возвращает все значения конфига в виде списка кортежей (секция, [(параметр, значение), ...]).
+        Значения возвращаются без преобразований в том виде, как они хранятся в файле
+        """
+        with self._lock:
+            return [(section, 
+                [(option, self.__config.get (section, option, raw=True)) 
+                    for option in self.__config.options (section)])
+                for section in self.__config.sections()]
+
+
+    def __setValues (self, values):
+        for section, options in values:
+            self.__config.add_section (section)
+
+            for option, value in options:
+                self.__config.set (section, option, value)
 
 
     def set (self, section, param, value):
@@ -32,30 +77,88 @@ class Config (object):
             return False
 
         section_encoded = section.encode ("utf8")
-        if not self.__config.has_section (section_encoded):
-            self.__config.add_section (section_encoded)
+        param_encoded = param.encode ("utf8")
+        value_encoded = unicode (value).encode ("utf8")
+
+        with self._lock:
+            if not self.__config.has_section (section_encoded):
+                self.__config.add_section (section_encoded)
+            elif (self.__config.has_option (section_encoded, param_encoded) and
+                    self.__config.get (section_encoded, param_encoded, raw=True) == value_encoded):
+                # Значение не изменилось, файл перезаписывать не нужно
+                return True
 
-        self.__config.set (section_encoded, 
-                param.encode ("utf8"), 
-                unicode (value).encode ("utf8"))
+            self.__config.set (section_encoded, param_encoded, value_encoded)
+            self.generation += 1
 
-        return self.save()
+            return self.save()
 
 
     def save (self):
         """
-        Сохранить изменения
+        Сохранить изменения.
+        Внутри ConfigTransaction запись в файл откладывается до конца транзакции
+        Возвращает True, если сохранение прошло успешно (или отложено) и False в противном случае
+        """
+        if self.readonly:
+            return False
+
+        with self._lock:
+            self._dirty = True
+
+            if ConfigTransaction.register (self):
+                return True
+
+            return self.flush()
+
+
+    @property
+    def dirty (self):
+        """
+        Возвращает True, если есть изменения, которые еще не записаны в файл
+        """
+        return self._dirty
+
+
+    def flush (self):
+        """
+        Записать отложенные изменения в файл
         Возвращает True, если сохранение прошло успешно и False в противном случае
         """
         if self.readonly:
             return False
 
-        with open (self.fname, "wb") as fp:
-            self.__config.write (fp)
+        with self._lock:
+            if self._dirty:
+                self.__write()
+                self._dirty = False
 
         return True
 
 
+    def __write (self):
+        """
+        Записать конфиг сначала во временный файл, а затем переименовать его,
+        чтобы при сбое во время записи не остался наполовину записанный файл
+        """
+        tempname = self.fname + u".tmp"
+        onWrite = self.onWrite
+
+        if onWrite != None:
+            try:
+                dirMtime = os.stat (os.path.dirname (os.path.abspath (self.fname))).st_mtime
+            except OSError:
+                onWrite = None
+
+        with open (tempname, "wb") as fp:
+            self.__config.write (fp)
+
+        replaceFile (tempname, self.fname)
+
+        if onWrite != None:
+            onWrite (dirMtime)
+
+
     def get (self, section, param):
         """
         Получить значение из конфига
@@ -100,6 +203,7 @@ class Config (object):
         """
         section_encoded = section.encode ("utf8")
         result1 = self.__config.remove_section (section_encoded)
+        self.generation += 1
         result2 = self.save()
 
         return result1 and result2
@@ -116,6 +220,7 @@ class Config (object):
 
         result1 = self.__config.remove_option (section_encoded, 
                 option_encoded)
+        self.generation += 1
 
         result2 = self.save()
 
@@ -130,6 +235,103 @@ class Config (object):
         return self.__config.has_section (section_encoded)
 
 
+def replaceFile (src, dst):
+    """
+    Переименовать файл src в dst, заменив существующий файл dst за одну операцию
+    """
+    if os.name != "nt":
+        os.rename (src, dst)
+        return
+
+    # В Windows os.rename не заменяет существующий файл
+    import ctypes
+
+    MOVEFILE_REPLACE_EXISTING = 0x1
+    MOVEFILE_WRITE_THROUGH = 0x8
+
+    if not isinstance (src, unicode):
+        src = src.decode (sys.getfilesystemencoding())
+
+    if not isinstance (dst, unicode):
+        dst = dst.decode (sys.getfilesystemencoding())
+
+    if not ctypes.windll.kernel32.MoveFileExW (src, dst,
+            MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+        raise ctypes.WinError()
+
+
+
+class ConfigTransaction (object):
+    """
+    Групповое изменение конфигов.
+    Внутри блока with ConfigTransaction(): изменения конфигов не записываются в файлы сразу,
+    а каждый измененный конфиг записывается один раз при выходе из самого внешнего блока.
+    Транзакции действуют только в том потоке, в котором они начаты
+    """
+    _local = threading.local()
+
+    def __enter__ (self):
+        state = ConfigTransaction._getState()
+        state.level += 1
+        return self
+
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        state = ConfigTransaction._getState()
+        state.level -= 1
+
+        if state.level == 0:
+            configs = state.configs
+            state.configs = {}
+
+            error = None
+            for config in configs.values():
+                try:
+                    config.flush()
+                except EnvironmentError as e:
+                    if error == None:
+                        error = e
+
+            if error != None and exc_type == None:
+                raise error
+
+        return False
+
+
+    @staticmethod
+    def active ():
+        """
+        Возвращает True, если в текущем потоке начата транзакция
+        """
+        return ConfigTransaction._getState().level > 0
+
+
+    @staticmethod
+    def register (config):
+        """
+        Запомнить конфиг для записи в конце транзакции.
+        Возвращает False, если в текущем потоке нет транзакции
+        """
+        state = ConfigTransaction._getState()
+        if state.level == 0:
+            return False
+
+        state.configs[id (config)] = config
+        return True
+
+
+    @staticmethod
+    def _getState ():
+        local = ConfigTransaction._local
+        if not hasattr (local, "level"):
+            local.level = 0
+
+            # Конфиги, которые нужно записать в конце транзакции. Ключ - id конфига
+            local.configs = {}
+
+        return local
+
+
 class BaseOption (object):
     """
     Базовый класс для работы с отдельными записями конфига
@@ -153,6 +355,11 @@ class BaseOption (object):
         # поэтому это поле используется для отладки
         self.error = None
 
+        # Закешированное значение параметра и значение счетчика изменений конфига,
+        # при котором оно было прочитано
+        self._cachedValue = None
+        self._cachedGeneration = None
+
 
     def remove_option (self):
         """
@@ -195,14 +402,22 @@ class BaseOption (object):
 
     def _loadParam (self):
         """
-        Возващает прочитанное из конфига значение или значение по умолчанию
+        Возващает прочитанное из конфига значение или значение по умолчанию.
+        Значение перечитывается, только если конфиг изменился после предыдущего чтения
         """
+        generation = getattr (self.config, "generation", None)
+        if generation != None and generation == self._cachedGeneration:
+            return self._cachedValue
+
         try:
             val = self._loadValue()
         except Exception as e:
             self.error = e
             val = self.defaultValue
 
+        self._cachedValue = val
+        self._cachedGeneration = generation
+
         return val
 
 
@@ -274,6 +489,12 @@ class ListOption (BaseOption):
         return items
 
 
+    def _loadParam (self):
+        # Возвращаем копию списка, чтобы его изменение не испортило закешированное значение
+        val = super (ListOption, self)._loadParam()
+        return val[:] if val != None else val
+
+
     def _prepareToWrite (self, value):
         return self.__separator.join (value)
 
@@ -340,11 +561,12 @@ class StringListSection (object):
         """
         Устанавливает значение параметра
         """
-        self._config.remove_section (self._section)
+        with ConfigTransaction():
+            self._config.remove_section (self._section)
 
-        for index in range (len (val)):
-            option = self._paramname.format (number=index)
-            self._config.set (self._section, option, val[index])
+            for index in range (len (val)):
+                option = self._paramname.format (number=index)
+                self._config.set (self._section, option, val[index])
 
 
 class FontOption (object):
@@ -372,8 +594,8 @@ class PageConfig (Config):
     orderParamName = u"order"
     datetimeParamName = u"datetime"
 
-    def __init__ (self, fname, readonly=False):
-        Config.__init__ (self, fname, readonly)
+    def __init__ (self, fname, readonly=False, values=None):
+        Config.__init__ (self, fname, readonly, values)
 
         self.typeOption = StringOption (self, 
                 PageConfig.sectionName, 
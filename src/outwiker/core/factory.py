@@ -20,6 +20,12 @@ class PageFactory (object):
         path = os.path.join (parent.path, title)
 
         page = pageType (path, title, parent)
+
+        # Параметры страницы читаются при первом обращении к ним. 
+        # Прочитаем их до добавления страницы в дерево, 
+        # чтобы ошибки в пути до страницы обнаружились здесь
+        page.params
+
         parent.addToChildren (page)
 
         try:
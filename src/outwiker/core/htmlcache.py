@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import threading
+from collections import OrderedDict
+
+
+class HtmlCache (object):
+    """
+    Кеш HTML-представлений страниц в памяти, ограниченный по размеру.
+    При переполнении удаляются страницы, к которым дольше всего не обращались.
+
+    Для каждой страницы хранится одна запись: версия (например, контрольная сумма страницы)
+    и полученный HTML. Запись используется, только если версия совпадает с текущей.
+    """
+    # Размер кеша по умолчанию (в символах)
+    defaultMaxSize = 20 * 1024 * 1024
+
+    def __init__ (self, maxSize=defaultMaxSize):
+        """
+        maxSize - максимальный суммарный размер хранимого HTML в символах
+        """
+        self._maxSize = maxSize
+
+        # Ключ - ключ страницы (путь до нее), значение - кортеж (версия, HTML)
+        self._items = OrderedDict()
+
+        # Суммарный размер хранимого HTML
+        self._size = 0
+
+        # Количество удачных и неудачных обращений к кешу
+        self.hits = 0
+        self.misses = 0
+
+        # HTML может создаваться не в основном потоке
+        self._lock = threading.RLock()
+
+
+    @property
+    def maxSize (self):
+        return self._maxSize
+
+
+    @maxSize.setter
+    def maxSize (self, value):
+        with self._lock:
+            self._maxSize = value
+            self._shrink()
+
+
+    @property
+    def size (self):
+        return self._size
+
+
+    def __len__ (self):
+        return len (self._items)
+
+
+    def get (self, key, version):
+        """
+        Получить HTML для страницы с ключом key, если он создан для версии version.
+        Иначе возвращает None
+        """
+        with self._lock:
+            item = self._items.get (key)
+
+            if item == None or item[0] != version:
+                self.misses += 1
+                return None
+
+            # Перенесем запись в конец, как самую свежую
+            del self._items[key]
+            self._items[key] = item
+
+            self.hits += 1
+            return item[1]
+
+
+    def set (self, key, version, html):
+        """
+        Сохранить HTML для страницы с ключом key, созданный для версии version
+        """
+        with self._lock:
+            self.invalidate (key)
+
+            if len (html) > self._maxSize:
+                return
+
+            self._items[key] = (version, html)
+            self._size += len (html)
+            self._shrink()
+
+
+    def invalidate (self, key):
+        """
+        Удалить из кеша запись для страницы с ключом key
+        """
+        with self._lock:
+            item = self._items.pop (key, None)
+            if item != None:
+                self._size -= len (item[1])
+
+
+    def clear (self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+    def _shrink (self):
+        """
+        Удалить самые старые записи, чтобы размер кеша не превышал максимальный
+        """
+        while self._size > self._maxSize and len (self._items) != 0:
+            key, item = self._items.popitem (last=False)
+            self._size -= len (item[1])
@@ -1,10 +1,43 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import re
+
+
 class HtmlImprover (object):
     """
     Класс, который делает HTML более читаемым (где надо, расставляет переводы строк)
     """
+    # Теги, перед которыми добавляется перевод строки.
+    # Теги заменяются, только если они записаны целиком строчными или целиком заглавными буквами
+    _newlineTags = [u"BR", u"BR/", u"LI", u"UL", u"/UL", u"OL", u"/OL",
+            u"H1", u"H2", u"H3", u"H4", u"H5", u"H6", u"PRE"]
+
+    # Теги, перед которыми убирается предшествующий им <BR> (или перевод строки)
+    _noBreakTags = u"<LI>|<H[1-6]>"
+
+    _tagsPattern = u"<(?:{0})>|<(?:{1})>".format (
+            u"|".join ([u"P"] + _newlineTags),
+            u"|".join ([u"p"] + _newlineTags).lower())
+
+    # Разбор текста вне <PRE>...</PRE>.
+    # Первая группа - <BR> или перевод строки, которые надо убрать
+    _textRegex = re.compile (u"(\n|<BR>)(?={0})|\n\n|\n|{1}".format (_noBreakTags, _tagsPattern))
+
+    # Разбор текста внутри <PRE>...</PRE>
+    _preRegex = re.compile (_tagsPattern)
+
+    _preStartRegex = re.compile (u"<pre>|</pre>", re.IGNORECASE)
+
+    # Замены для найденных фрагментов
+    _replacements = dict ([(u"<{0}>".format (tag), u"\n<{0}>".format (tag)) for tag in _newlineTags] +
+            [(u"<{0}>".format (tag.lower()), u"\n<{0}>".format (tag.lower())) for tag in _newlineTags] +
+            [(u"<P>", u"</P>\n\n<P>"),
+                (u"<p>", u"</p>\n\n<p>"),
+                (u"\n\n", u"</P>\n\n<P>"),
+                (u"\n", u"\n<BR>")])
+
+
     @staticmethod
     def run (text):
         """
@@ -15,76 +48,62 @@ class HtmlImprover (object):
 
     @staticmethod
     def __improveText (text):
-        result = text.replace ("\r\n", "\n")
-        result = HtmlImprover.__replaceEndlines (result)
-
-        result = HtmlImprover.ireplace (result, "<P>", "</P>\n\n<P>")
-        result = HtmlImprover.ireplace (result, "<BR>", "\n<BR>")
-        result = HtmlImprover.ireplace (result, "<BR/>", "\n<BR/>")
-
-        result = HtmlImprover.ireplace (result, "<LI>", "\n<LI>")
-        result = HtmlImprover.ireplace (result, "<UL>", "\n<UL>")
-        result = HtmlImprover.ireplace (result, "</UL>", "\n</UL>")
-        result = HtmlImprover.ireplace (result, "<OL>", "\n<OL>")
-        result = HtmlImprover.ireplace (result, "</OL>", "\n</OL>")
-
-        result = HtmlImprover.ireplace (result, "<H1>", "\n<H1>")
-        result = HtmlImprover.ireplace (result, "<H2>", "\n<H2>")
-        result = HtmlImprover.ireplace (result, "<H3>", "\n<H3>")
-        result = HtmlImprover.ireplace (result, "<H4>", "\n<H4>")
-        result = HtmlImprover.ireplace (result, "<H5>", "\n<H5>")
-        result = HtmlImprover.ireplace (result, "<H6>", "\n<H6>")
-        
-        result = HtmlImprover.ireplace (result, "<PRE>", "\n<PRE>")
+        """
+        Текст обрабатывается за один проход: переводы строк вне <PRE>...</PRE> заменяются на <P> и <BR>,
+        а перед тегами блоков добавляются переводы строк
+        """
+        text = text.replace ("\r\n", "\n")
+        result = []
+
+        # Части текста между тегами <PRE> и </PRE>. Четные части находятся вне <PRE>...</PRE>,
+        # нечетные - внутри. После четной части пропускается длина тега <PRE>, после нечетной - </PRE>
+        starttag = "<pre>"
+        endtag = "</pre>"
+
+        n = 0
+        index = 0
+        partstart = 0
+
+        for match in HtmlImprover._preStartRegex.finditer (text):
+            index = HtmlImprover.__appendPart (result, text, n, index, match.start() - partstart)
+            index += len (starttag) if n % 2 == 0 else len (endtag)
+            partstart = match.end()
+            n += 1
+
+        HtmlImprover.__appendPart (result, text, n, index, len (text) - partstart)
+
+        return u"".join (result)
 
-        return result
 
-    
     @staticmethod
-    def __replaceEndlines (text):
+    def __appendPart (result, text, n, index, length):
         """
-        Заменить переводы строк, но не трогать текст внутри <PRE>...</PRE>
+        Добавить в список result обработанную часть текста длиной length, начинающуюся с позиции index.
+        n - номер части. Возвращает позицию после части
         """
-        text_lower = text.lower()
+        item = text[index: index + length]
 
-        starttag = "<pre>"
-        endtag = "</pre>"
+        if n % 2 == 0:
+            result.append (HtmlImprover._textRegex.sub (HtmlImprover.__replaceText, item))
+        else:
+            result.append (u"\n<PRE>")
+            result.append (HtmlImprover._preRegex.sub (HtmlImprover.__replaceTag, item))
+            result.append (u"</PRE>")
 
-        # Разобьем строку по <pre>
-        part1 = text_lower.split (starttag)
+        return index + length
 
-        # Подстроки разобьем по </pre>
-        parts2 = [item.split (endtag) for item in part1]
 
-        # Склеим части в один массив
-        parts = reduce (lambda x, y: x + y, parts2, [])
+    @staticmethod
+    def __replaceText (match):
+        if match.group (1) != None:
+            return u""
 
-        # В четных элементах массива заменим переводы строк, а нечетные оставим как есть
-        # Строки берем из исходного текста с учетом пропущенных в массиве тегов <pre> и </pre>
-        result = u""
-        index = 0
+        return HtmlImprover._replacements[match.group (0)]
 
-        for n in range (len (parts)):
-            item = text[index: index + len (parts[n]) ]
-            if n % 2 == 0:
-                item = item.replace ("\n\n", "<P>")
-                item = item.replace ("\n", "<BR>")
-                item = item.replace ("<BR><LI>", "<LI>")
-
-                item = item.replace ("<BR><H1>", "<H1>")
-                item = item.replace ("<BR><H2>", "<H2>")
-                item = item.replace ("<BR><H3>", "<H3>")
-                item = item.replace ("<BR><H4>", "<H4>")
-                item = item.replace ("<BR><H5>", "<H5>")
-                item = item.replace ("<BR><H6>", "<H6>")
-                index += len (parts[n]) + len (starttag)
-            else:
-                item = "<PRE>" + item + "</PRE>"
-                index += len (parts[n]) + len (endtag)
-
-            result += item
 
-        return result
+    @staticmethod
+    def __replaceTag (match):
+        return HtmlImprover._replacements[match.group (0)]
 
 
     @staticmethod
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import hashlib
+import os
+import threading
+
+import wx
+
+
+class IconsCache (object):
+    """
+    Реестр картинок для иконок страниц.
+    Картинки с одинаковым содержимым загружаются один раз, даже если они лежат в разных файлах
+    """
+    def __init__ (self, height=16):
+        """
+        height - высота создаваемых картинок
+        """
+        self._height = height
+
+        # Ключ - путь до файла, значение - кортеж ((время изменения, размер) файла, контрольная сумма)
+        self._files = {}
+
+        # Ключ - контрольная сумма файла, значение - картинка
+        self._bitmaps = {}
+
+        self._lock = threading.RLock()
+
+
+    def getKey (self, fname):
+        """
+        Возвращает ключ картинки (контрольную сумму содержимого файла fname)
+        или None, если файл прочитать не удалось
+        """
+        try:
+            stat = os.stat (fname)
+        except OSError:
+            return None
+
+        filestat = (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            record = self._files.get (fname)
+            if record != None and record[0] == filestat:
+                return record[1]
+
+        try:
+            with open (fname, "rb") as fp:
+                key = hashlib.md5 (fp.read()).hexdigest()
+        except IOError:
+            return None
+
+        with self._lock:
+            self._files[fname] = (filestat, key)
+
+        return key
+
+
+    def getBitmap (self, fname):
+        """
+        Возвращает кортеж (ключ, картинка) для файла fname или (None, None),
+        если файл не удалось прочитать или картинка не загрузилась
+        """
+        key = self.getKey (fname)
+        if key == None:
+            return (None, None)
+
+        with self._lock:
+            bitmap = self._bitmaps.get (key)
+            if bitmap == None:
+                bitmap = self._loadBitmap (fname)
+                if bitmap == None:
+                    return (None, None)
+
+                self._bitmaps[key] = bitmap
+
+        return (key, bitmap)
+
+
+    def clear (self):
+        with self._lock:
+            self._files = {}
+            self._bitmaps = {}
+
+
+    def _loadBitmap (self, fname):
+        bitmap = wx.Bitmap (fname)
+        if not bitmap.IsOk():
+            return None
+
+        bitmap.SetHeight (self._height)
+        return bitmap
+
+
+
+class IconsImageList (object):
+    """
+    Обертка над wx.ImageList, в которой иконки с одинаковым содержимым занимают один элемент
+    """
+    def __init__ (self, iconsCache, imagelist):
+        """
+        iconsCache - экземпляр класса IconsCache
+        imagelist - список картинок (wx.ImageList)
+        """
+        self._iconsCache = iconsCache
+        self._imagelist = imagelist
+
+        # Ключ - ключ картинки в IconsCache, значение - номер картинки в списке
+        self._ids = {}
+
+
+    def clear (self):
+        """
+        Очистить список картинок
+        """
+        self._imagelist.RemoveAll()
+        self._ids = {}
+
+
+    def add (self, fname):
+        """
+        Возвращает номер картинки из файла fname в списке, добавляя ее при необходимости,
+        или None, если картинку загрузить не удалось
+        """
+        key, bitmap = self._iconsCache.getBitmap (fname)
+        if key == None:
+            return None
+
+        imageId = self._ids.get (key)
+        if imageId == None:
+            imageId = self._imagelist.Add (bitmap)
+            self._ids[key] = imageId
+
+        return imageId
@@ -7,6 +7,7 @@
 import os.path
 
 from outwiker.core.attachment import Attachment
+from outwiker.core.searchindex import SearchQuery
 
 
 class AllTagsSearchStrategy (object):
@@ -64,6 +65,38 @@ class Searcher (object):
         """
         Найти подходящие по условию поиска страницы
         """
+        index = getattr (root, "searchIndex", None)
+
+        if index != None:
+            if SearchQuery.isQuery (self.phrase):
+                subpaths = index.query (SearchQuery (self.phrase))
+            else:
+                subpaths = index.find (self.phrase)
+
+            if subpaths != None:
+                return self.__getPages (root, subpaths)
+
+        return self.__findInTree (root)
+
+
+    def __getPages (self, root, subpaths):
+        """
+        Получить страницы по найденным в индексе путям и отфильтровать их по тегам
+        """
+        result = []
+
+        for subpath in sorted (subpaths):
+            page = root[subpath]
+            if page != None and self.tagsStrategy.testTags (self.tags, page):
+                result.append (page)
+
+        return result
+
+
+    def __findInTree (self, root):
+        """
+        Найти страницы, просматривая все дерево (если индекс недоступен)
+        """
         result = []
 
         for page in root.children:
@@ -71,7 +104,7 @@ class Searcher (object):
                     self.__testFullContent(page) ):
                 result.append (page)
 
-            result += self.find (page)
+            result += self.__findInTree (page)
 
         return result
 
@@ -0,0 +1,1165 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Полнотекстовый индекс для глобального поиска по вики
+"""
+
+import os
+import os.path
+import json
+import math
+import re
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from .attachment import Attachment
+
+
+class SearchIndex (object):
+    """
+    Инвертированный индекс: для каждого слова хранится список страниц,
+    в которых оно встречается, с номерами позиций слова, смещениями в тексте
+    и символами между ним и соседними словами.
+    Поиск подстроки выполняется только по индексу, текст страниц не читается.
+    Индексируются заголовки, содержимое, теги и имена прикрепленных файлов страниц.
+
+    Индекс хранится в файле базы данных SQLite в корне вики
+    и обновляется по событиям изменения страниц в фоновом потоке.
+    При первом поиске после открытия вики индекс сверяется с файлами страниц
+    по времени изменения и размеру, изменившиеся страницы индексируются заново.
+    """
+    fileName = u"__search.index"
+
+    # Версия формата индекса. При изменении формата индекс будет создан заново
+    version = 3
+
+    # Номера полей страницы, по которым строится индекс
+    FIELD_TITLE = 0
+    FIELD_CONTENT = 1
+    FIELD_TAGS = 2
+    FIELD_ATTACH = 3
+
+    # Для каждого вхождения слова хранятся символы между ним и соседними словами,
+    # но не больше separatorLength символов (по ним проверяется совпадение фразы с текстом)
+    separatorLength = 16
+
+    # Для поиска по части слова хранятся все окончания слов, обрезанные до suffixLength символов
+    suffixLength = 16
+
+    wordsRegex = re.compile (r"\w+", re.UNICODE)
+
+    # Параметры формулы BM25
+    bm25_k1 = 1.2
+    bm25_b = 0.75
+
+    # Вес слова в зависимости от поля, в котором оно встретилось
+    fieldWeights = {FIELD_TITLE: 3.0,
+            FIELD_CONTENT: 1.0,
+            FIELD_TAGS: 2.0,
+            FIELD_ATTACH: 1.0}
+
+    # Сколько секунд ждать следующих изменений страниц, чтобы обновить индекс вместе с ними
+    updateDelay = 0.5
+
+    # Дольше этого времени (в секундах) обновление индекса не откладывается
+    maxUpdateDelay = 5.0
+
+    def __init__ (self, root):
+        """
+        root - корень вики (экземпляр класса WikiDocument)
+        """
+        self._root = root
+        self._readonly = root.readonly
+
+        # Если вики открыта только для чтения, индекс строится в памяти
+        self._fname = (u":memory:" if self._readonly
+                else os.path.join (root.path, self.fileName))
+
+        # Соединение с базой, если индекс хранится в памяти
+        self._memoryConnection = None
+
+        self._lock = threading.RLock()
+
+        # True, если индекс сверен с файлами страниц в текущей сессии
+        # и дальше поддерживается в актуальном состоянии по событиям
+        self._valid = False
+
+        self._enabled = sqlite3 != None
+
+        # Идентификаторы слов, прочитанные из базы. Ключ - слово, значение - идентификатор
+        self._termIds = {}
+
+        # Отложенные изменения индекса. Элементы списка - кортежи (функция, аргументы)
+        self._queue = []
+        self._queueLock = threading.Condition()
+
+        # Время последнего изменения очереди
+        self._queueTime = 0
+
+        # Поток, который выполняет отложенные изменения
+        self._worker = None
+
+        root.onPageCreate += self.__onPageUpdate
+        root.onPageUpdate += self.__onPageUpdate
+        root.onPageRemove += self.__onPageRemove
+        root.onPageRename += self.__onPageRename
+        root.onPageMove += self.__onPageMove
+        root.onTreeUpdate += self.__onTreeUpdate
+        root.onTagsChanged += self.__onTagsChanged
+
+
+    @property
+    def enabled (self):
+        return self._enabled
+
+
+    @staticmethod
+    def tokenize (text):
+        """
+        Разбить текст на слова.
+        Возвращает список кортежей (слово в нижнем регистре, смещение слова в тексте)
+        """
+        return [(match.group(0), match.start())
+                for match in SearchIndex.wordsRegex.finditer (text.lower())]
+
+
+    def update (self):
+        """
+        Сверить индекс с файлами страниц и проиндексировать изменившиеся страницы
+        """
+        if not self._enabled:
+            return
+
+        with self._lock:
+            self.flush()
+
+            if not self._enabled:
+                return
+
+            try:
+                connection = self._connect()
+                try:
+                    self._update (connection)
+                    connection.commit()
+                finally:
+                    self._close (connection)
+            except sqlite3.Error:
+                self._enabled = False
+                return
+
+            self._valid = True
+
+
+    def flush (self):
+        """
+        Выполнить отложенные изменения индекса, не дожидаясь фонового потока
+        """
+        with self._lock:
+            with self._queueLock:
+                tasks = self._queue
+                self._queue = []
+
+            if len (tasks) == 0 or not self._enabled:
+                return
+
+            try:
+                connection = self._connect()
+                try:
+                    for func, args in tasks:
+                        func (connection, *args)
+
+                    connection.commit()
+                finally:
+                    self._close (connection)
+            except sqlite3.Error:
+                self._enabled = False
+
+
+    def find (self, phrase):
+        """
+        Найти страницы, в заголовке, тексте, тегах или именах прикрепленных файлов
+        которых встречается фраза phrase (без учета регистра).
+        Возвращает множество относительных путей до найденных страниц
+        или None, если индекс использовать нельзя
+        """
+        return self._read (self._find, phrase)
+
+
+    def query (self, query):
+        """
+        Выполнить поисковый запрос (экземпляр класса SearchQuery).
+        Возвращает множество относительных путей до найденных страниц
+        или None, если индекс использовать нельзя
+        """
+        return self._read (lambda connection: self._getSubpaths (connection,
+            query.evaluate (_IndexReader (connection))))
+
+
+    def getScores (self, phrase):
+        """
+        Оценить релевантность страниц для поисковой фразы phrase по формуле BM25.
+        Возвращает словарь: ключ - относительный путь до страницы, значение - оценка.
+        Страниц, в которых не встречается ни одно слово из фразы, в словаре нет.
+        Если индекс использовать нельзя, возвращает None
+        """
+        return self._read (self._getScores, SearchIndex.getQueryTerms (phrase))
+
+
+    def getSnippet (self, page, phrase, width=200):
+        """
+        Получить фрагмент текста страницы page вокруг первого вхождения слов из фразы phrase.
+        width - примерная длина фрагмента в символах.
+        Возвращает список кортежей (текст, выделять ли текст)
+        или None, если индекс использовать нельзя
+        """
+        snippets = self.getSnippets ([page], phrase, width)
+        return snippets[0] if snippets != None else None
+
+
+    def getSnippets (self, pages, phrase, width=200):
+        """
+        Получить фрагменты текста для списка страниц pages (см. getSnippet).
+        Вхождения слов для всех страниц читаются из индекса за одно обращение к базе.
+        Возвращает список фрагментов в том же порядке, что и pages,
+        или None, если индекс использовать нельзя
+        """
+        allOccurrences = self._read (self._getOccurrences,
+                [page.subpath for page in pages],
+                SearchIndex.getQueryTerms (phrase))
+
+        if allOccurrences == None:
+            return None
+
+        result = []
+
+        for page in pages:
+            occurrences = allOccurrences.get (page.subpath, [])
+
+            try:
+                text = page.textContent
+            except EnvironmentError:
+                result.append ([])
+                continue
+
+            if len (occurrences) == 0 and len (phrase.strip()) != 0:
+                # Фраза может начинаться с середины слова, тогда она не найдется по словам
+                start = text.lower().find (phrase.lower())
+                if start != -1:
+                    occurrences = [(start, len (phrase))]
+
+            result.append (self._buildSnippet (text, sorted (occurrences), width))
+
+        return result
+
+
+    @staticmethod
+    def getQueryTerms (phrase):
+        """
+        Получить слова из поисковой фразы для ранжирования и выделения.
+        Возвращает список кортежей (слово, искать ли слова, начинающиеся с него)
+        """
+        if SearchQuery.isQuery (phrase):
+            return SearchQuery (phrase).terms
+
+        # Фраза ищется как подстрока, поэтому слова могут быть началами слов текста
+        return [(word, True) for word, offset in SearchIndex.tokenize (phrase)]
+
+
+    def _read (self, func, *args):
+        """
+        Выполнить функцию чтения индекса func (connection, *args).
+        Перед первым чтением индекс сверяется с файлами страниц.
+        Возвращает результат func или None, если индекс использовать нельзя
+        """
+        if not self._enabled:
+            return None
+
+        # Изменения страниц, которые еще ждут в очереди, должны попасть в результат
+        self.flush()
+
+        if not self._valid:
+            self.update()
+
+            if not self._valid:
+                return None
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                try:
+                    return func (connection, *args)
+                finally:
+                    self._close (connection)
+            except sqlite3.Error:
+                self._enabled = False
+                return None
+
+
+    def _update (self, connection):
+        records = {}
+        for row in connection.execute (u"""SELECT subpath, id, contentmtime, contentsize,
+                optmtime, attachmtime FROM pages"""):
+            records[row[0]] = (row[1], row[2:])
+
+        # Страницы, которые есть в дереве
+        found = set()
+
+        pages = [(child, child.title) for child in self._root.children]
+
+        while len (pages) != 0:
+            page, subpath = pages.pop()
+            found.add (subpath)
+
+            record = records.get (subpath)
+            if record == None or record[1] != self._getPageStat (page):
+                self._indexPage (connection, page, subpath)
+
+            try:
+                children = page.children
+            except EnvironmentError:
+                # Папку страницы прочитать не удалось, ее подстраницы в индексе не изменяются
+                found.update ([record for record in records
+                    if record.startswith (subpath + u"/")])
+                continue
+
+            pages.extend ([(child, subpath + u"/" + child.title) for child in children])
+
+        # Удалим страницы, которых уже нет
+        for subpath, record in records.iteritems():
+            if subpath not in found:
+                self._removePageById (connection, record[0])
+
+
+    def _getPageStat (self, page):
+        """
+        Возвращает кортеж с временами изменения и размерами файлов,
+        по которым проверяется актуальность индекса для страницы
+        """
+        contentStat = self._stat (os.path.join (page.path, u"__page.text"))
+        optStat = self._stat (os.path.join (page.path, u"__page.opt"))
+        attachStat = self._stat (Attachment (page).getAttachPath())
+
+        return (contentStat[0], contentStat[1], optStat[0], attachStat[0])
+
+
+    def _stat (self, path):
+        try:
+            stat = os.stat (path)
+        except OSError:
+            return (None, None)
+
+        return (stat.st_mtime, stat.st_size)
+
+
+    def _getAttachNames (self, page):
+        """
+        Получить имена всех прикрепленных файлов и папок (с учетом вложенных папок)
+        """
+        names = []
+        for root, subfolders, files in os.walk (Attachment (page).getAttachPath()):
+            names += subfolders
+            names += files
+
+        return names
+
+
+    def _indexPage (self, connection, page, subpath):
+        """
+        Проиндексировать страницу
+        """
+        stat = self._getPageStat (page)
+
+        title = page.title
+        tags = page.tags
+        attach = self._getAttachNames (page)
+
+        try:
+            content = page.textContent
+        except EnvironmentError:
+            content = u""
+
+        fields = [(SearchIndex.FIELD_TITLE, [title]),
+                (SearchIndex.FIELD_CONTENT, [content]),
+                (SearchIndex.FIELD_TAGS, tags),
+                (SearchIndex.FIELD_ATTACH, attach)]
+
+        # Позиции слов в полях страницы. Элементы списка - кортежи (поле, словарь позиций)
+        fieldsPositions = []
+
+        # Количество слов на странице (для ранжирования)
+        length = 0
+
+        for field, texts in fields:
+            # Позиции слов. Ключ - слово, значение - список
+            # [номер слова, смещение, символы перед словом, символы после слова, номер слова, ...]
+            positions = {}
+            number = 0
+
+            # Элементы списков (теги, имена файлов) разделяются в позициях одним словом,
+            # чтобы фраза не могла найтись на стыке двух элементов
+            for text in texts:
+                lowerText = text.lower()
+                words = SearchIndex.tokenize (text)
+
+                for index, (word, offset) in enumerate (words):
+                    end = offset + len (word)
+                    prevEnd = words[index - 1][1] + len (words[index - 1][0]) if index != 0 else 0
+                    nextStart = words[index + 1][1] if index != len (words) - 1 else len (lowerText)
+
+                    positions.setdefault (word, []).extend ((number,
+                        offset,
+                        lowerText[max (prevEnd, offset - self.separatorLength - 1): offset],
+                        lowerText[end: min (nextStart, end + self.separatorLength + 1)]))
+                    number += 1
+                    length += 1
+
+                number += 1
+
+            fieldsPositions.append ((field, positions))
+
+        row = connection.execute (u"SELECT id FROM pages WHERE subpath = ?", (subpath,)).fetchone()
+        values = (subpath, stat[0], stat[1], stat[2], stat[3], length)
+
+        if row == None:
+            cursor = connection.execute (u"""INSERT INTO pages (subpath,
+                contentmtime, contentsize, optmtime, attachmtime, length)
+                VALUES (?, ?, ?, ?, ?, ?)""", values)
+            pageid = cursor.lastrowid
+        else:
+            pageid = row[0]
+            connection.execute (u"""UPDATE pages SET subpath = ?,
+                contentmtime = ?, contentsize = ?, optmtime = ?, attachmtime = ?, length = ?
+                WHERE id = ?""", values + (pageid,))
+            self._removePostings (connection, pageid)
+
+        postings = []
+        termids = set()
+
+        for field, positions in fieldsPositions:
+            for word, wordPositions in positions.iteritems():
+                termid = self._getTermId (connection, word)
+                termids.add (termid)
+
+                postings.append ((termid,
+                    pageid,
+                    field,
+                    len (wordPositions) / 2,
+                    json.dumps (wordPositions)))
+
+        connection.executemany (u"INSERT INTO postings VALUES (?, ?, ?, ?, ?)", postings)
+        connection.executemany (u"UPDATE terms SET df = df + 1 WHERE id = ?",
+                [(termid,) for termid in termids])
+
+
+    def _getTermId (self, connection, term):
+        termid = self._termIds.get (term)
+        if termid != None:
+            return termid
+
+        row = connection.execute (u"SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+        if row != None:
+            termid = row[0]
+        else:
+            termid = connection.execute (u"INSERT INTO terms (term, df) VALUES (?, 0)", (term,)).lastrowid
+
+            suffixes = set ([term[n: n + self.suffixLength] for n in range (len (term))])
+            connection.executemany (u"INSERT INTO suffixes VALUES (?, ?)",
+                    [(suffix, termid) for suffix in suffixes])
+
+        self._termIds[term] = termid
+        return termid
+
+
+    def _removePageById (self, connection, pageid):
+        self._removePostings (connection, pageid)
+        connection.execute (u"DELETE FROM pages WHERE id = ?", (pageid,))
+
+
+    def _removePostings (self, connection, pageid):
+        """
+        Удалить из индекса слова страницы с идентификатором pageid
+        """
+        connection.execute (u"""UPDATE terms SET df = df - 1
+            WHERE id IN (SELECT DISTINCT termid FROM postings WHERE pageid = ?)""", (pageid,))
+        connection.execute (u"DELETE FROM postings WHERE pageid = ?", (pageid,))
+
+
+    def _find (self, connection, phrase):
+        """
+        Найти страницы, в одном из полей которых фраза phrase встречается как подстрока.
+        Фраза проверяется только по индексу: слова фразы должны идти подряд,
+        а символы между ними должны совпадать с символами между словами текста.
+        Возвращает None, если по индексу проверить фразу нельзя
+        (в ней нет слов или слишком длинные промежутки между словами)
+        """
+        lowerPhrase = phrase.lower()
+
+        if len (lowerPhrase) == 0:
+            return set ([row[0] for row in connection.execute (u"SELECT subpath FROM pages")])
+
+        words = SearchIndex.tokenize (lowerPhrase)
+        if len (words) == 0:
+            return None
+
+        # Символы перед первым словом, между словами и после последнего слова
+        separators = ([lowerPhrase[: words[0][1]]] +
+                [lowerPhrase[words[n][1] + len (words[n][0]): words[n + 1][1]]
+                    for n in range (len (words) - 1)] +
+                [lowerPhrase[words[-1][1] + len (words[-1][0]):]])
+
+        if max ([len (separator) for separator in separators]) > self.separatorLength:
+            return None
+
+        # Найденные начала фразы. Элементы - кортежи (страница, поле, номер первого слова)
+        found = None
+
+        for index, (word, offset) in enumerate (words):
+            # Первое слово фразы может быть окончанием слова текста, а последнее - его началом
+            matchStart = index != 0 or len (separators[0]) != 0
+            matchEnd = index != len (words) - 1 or len (separators[-1]) != 0
+
+            termids = self._findTerms (connection, word, matchStart, matchEnd)
+            before = separators[index]
+            after = separators[index + 1]
+
+            current = set()
+
+            for pageid, field, positions in self._selectPostings (connection, termids):
+                positions = json.loads (positions)
+
+                for n in range (0, len (positions), 4):
+                    number, wordOffset, textBefore, textAfter = positions[n: n + 4]
+                    start = (pageid, field, number - index)
+
+                    if found != None and start not in found:
+                        continue
+
+                    if index == 0 and not textBefore.endswith (before):
+                        continue
+
+                    if (textAfter != after if index != len (words) - 1
+                            else not textAfter.startswith (after)):
+                        continue
+
+                    current.add (start)
+
+            found = current
+
+            if len (found) == 0:
+                break
+
+        return self._getSubpaths (connection, set ([pageid for pageid, field, number in found]))
+
+
+    def _findTerms (self, connection, word, matchStart, matchEnd):
+        """
+        Найти идентификаторы слов из индекса, содержащих word.
+        matchStart - слово должно начинаться с word,
+        matchEnd - слово должно заканчиваться на word
+        """
+        if matchStart and matchEnd:
+            return [row[0] for row in connection.execute (u"SELECT id FROM terms WHERE term = ?", (word,))]
+
+        if matchStart:
+            return [row[0] for row in connection.execute (
+                u"SELECT id FROM terms WHERE term >= ? AND term < ?", SearchIndex._prefixRange (word))]
+
+        rows = connection.execute (u"""SELECT DISTINCT terms.id, terms.term
+            FROM suffixes JOIN terms ON terms.id = suffixes.termid
+            WHERE suffixes.suffix >= ? AND suffixes.suffix < ?""",
+            SearchIndex._prefixRange (word[: self.suffixLength]))
+
+        return [termid for termid, term in rows
+                if (term.endswith (word) if matchEnd else word in term)]
+
+
+    def _selectPostings (self, connection, termids):
+        """
+        Выбрать вхождения слов с идентификаторами termids.
+        Возвращает список кортежей (страница, поле, позиции)
+        """
+        result = []
+
+        # Ограничение SQLite на количество параметров в запросе
+        step = 500
+
+        for n in range (0, len (termids), step):
+            part = termids[n: n + step]
+            result += connection.execute (u"""SELECT pageid, field, positions FROM postings
+                WHERE termid IN ({0})""".format (u", ".join ([u"?"] * len (part))), part).fetchall()
+
+        return result
+
+
+    @staticmethod
+    def _prefixRange (prefix):
+        """
+        Возвращает границы диапазона строк, начинающихся с prefix (для сравнения в SQLite)
+        """
+        return (prefix, prefix + u"\U0010ffff")
+
+
+    def _selectTerm (self, connection, columns, word, prefix, condition=u"1", params=()):
+        """
+        Выбрать вхождения слова word (или слов, которые с него начинаются, если prefix == True).
+        columns - список выбираемых столбцов таблиц terms, postings и pages,
+        condition - дополнительное условие со значениями параметров params
+        """
+        if prefix:
+            termCondition = u"terms.term >= ? AND terms.term < ?"
+            values = SearchIndex._prefixRange (word)
+        else:
+            termCondition = u"terms.term = ?"
+            values = (word,)
+
+        return connection.execute (u"""SELECT {columns}
+            FROM terms
+            JOIN postings ON postings.termid = terms.id
+            JOIN pages ON pages.id = postings.pageid
+            WHERE {term} AND {condition}""".format (columns=u", ".join (columns),
+                term=termCondition,
+                condition=condition),
+            values + tuple (params))
+
+
+    def _getScores (self, connection, terms):
+        count, avgLength = connection.execute (u"SELECT COUNT(*), AVG(length) FROM pages").fetchone()
+        if count == 0:
+            return {}
+
+        avgLength = max (avgLength, 1.0)
+
+        # Взвешенное количество вхождений слов в поля страниц.
+        # Ключ - (идентификатор слова, путь до страницы, поле), значение - количество.
+        # Одно и то же слово может найтись по нескольким словам запроса, но учитывается один раз
+        fieldFrequencies = {}
+
+        # Количество страниц, содержащих слово. Ключ - идентификатор слова
+        documentFrequencies = {}
+
+        # Количество слов на странице. Ключ - путь до страницы
+        lengths = {}
+
+        for word, prefix in terms:
+            for termid, df, field, termCount, subpath, length in self._selectTerm (connection,
+                    [u"terms.id", u"terms.df", u"postings.field", u"postings.count",
+                        u"pages.subpath", u"pages.length"],
+                    word, prefix):
+                fieldFrequencies[(termid, subpath, field)] = self.fieldWeights.get (field, 1.0) * termCount
+                documentFrequencies[termid] = df
+                lengths[subpath] = length
+
+        # Ключ - (идентификатор слова, путь до страницы), значение - количество
+        frequencies = {}
+        for (termid, subpath, field), frequency in fieldFrequencies.iteritems():
+            frequencies[(termid, subpath)] = frequencies.get ((termid, subpath), 0.0) + frequency
+
+        k1 = self.bm25_k1
+        b = self.bm25_b
+
+        scores = {}
+        for (termid, subpath), frequency in frequencies.iteritems():
+            df = documentFrequencies[termid]
+            idf = math.log (1.0 + (count - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[subpath] / avgLength)
+
+            scores[subpath] = scores.get (subpath, 0.0) + idf * frequency * (k1 + 1.0) / (frequency + norm)
+
+        return scores
+
+
+    def _getOccurrences (self, connection, subpaths, terms):
+        """
+        Получить вхождения слов terms в текст страниц subpaths.
+        Возвращает словарь: ключ - относительный путь до страницы,
+        значение - список кортежей (смещение, длина слова)
+        """
+        occurrences = {}
+
+        # Ограничение SQLite на количество параметров в запросе
+        step = 500
+
+        for n in range (0, len (subpaths), step):
+            part = subpaths[n: n + step]
+            condition = u"pages.subpath IN ({0}) AND postings.field = ?".format (
+                    u", ".join ([u"?"] * len (part)))
+
+            for word, prefix in terms:
+                for subpath, term, positions in self._selectTerm (connection,
+                        [u"pages.subpath", u"terms.term", u"postings.positions"],
+                        word, prefix,
+                        condition,
+                        tuple (part) + (SearchIndex.FIELD_CONTENT,)):
+                    pageOccurrences = occurrences.setdefault (subpath, set())
+
+                    for offset in json.loads (positions)[1::4]:
+                        pageOccurrences.add ((offset, len (term)))
+
+        return dict ([(subpath, list (pageOccurrences))
+            for subpath, pageOccurrences in occurrences.iteritems()])
+
+
+    def _buildSnippet (self, text, occurrences, width):
+        """
+        Вырезать фрагмент текста вокруг первого вхождения.
+        occurrences - отсортированный список кортежей (смещение, длина)
+        """
+        if len (occurrences) == 0:
+            start = 0
+        else:
+            # Перед найденным словом оставим четверть фрагмента
+            start = max (0, occurrences[0][0] - width / 4)
+
+            # Начнем фрагмент с начала слова
+            if start != 0:
+                space = text.rfind (u" ", 0, start)
+                start = space + 1 if space != -1 and occurrences[0][0] - space < width / 2 else start
+
+        end = min (len (text), start + width)
+        if end != len (text):
+            space = text.find (u" ", end)
+            end = space if space != -1 and space - end < width / 4 else end
+
+        result = []
+        if start != 0:
+            result.append (u"...")
+
+        current = start
+        for offset, length in occurrences:
+            if offset < current or offset >= end:
+                continue
+
+            if offset != current:
+                result.append (text[current: offset])
+
+            current = min (offset + length, end)
+            result.append ((text[offset: current], True))
+
+        if current < end:
+            result.append (text[current: end])
+
+        if end != len (text):
+            result.append (u"...")
+
+        return [item if isinstance (item, tuple) else (item, False) for item in result]
+
+
+    def _getSubpaths (self, connection, pageids):
+        result = set()
+        pageids = list (pageids)
+
+        # Ограничение SQLite на количество параметров в запросе
+        step = 500
+
+        for n in range (0, len (pageids), step):
+            part = pageids[n: n + step]
+            result.update ([row[0] for row in connection.execute (
+                u"SELECT subpath FROM pages WHERE id IN ({0})".format (u", ".join ([u"?"] * len (part))),
+                part)])
+
+        return result
+
+
+    def _connect (self):
+        if self._memoryConnection != None:
+            return self._memoryConnection
+
+        try:
+            connection = self._openDatabase()
+        except sqlite3.DatabaseError:
+            # Файл индекса испорчен, создадим его заново
+            try:
+                os.remove (self._fname)
+            except OSError:
+                raise sqlite3.DatabaseError
+
+            connection = self._openDatabase()
+
+        if self._fname == u":memory:":
+            self._memoryConnection = connection
+
+        return connection
+
+
+    def _openDatabase (self):
+        connection = sqlite3.connect (self._fname, check_same_thread=False)
+
+        try:
+            # Индекс всегда можно построить заново, поэтому не будем ждать сброса данных на диск
+            connection.execute (u"PRAGMA synchronous = OFF")
+
+            # Журнал хранится в памяти, чтобы не изменялось время изменения папки корня вики
+            connection.execute (u"PRAGMA journal_mode = MEMORY")
+
+            userVersion = connection.execute (u"PRAGMA user_version").fetchone()[0]
+            if userVersion != self.version:
+                self._createTables (connection)
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+
+        return connection
+
+
+    def _close (self, connection):
+        if connection != self._memoryConnection:
+            connection.close()
+
+
+    def _createTables (self, connection):
+        connection.execute (u"DROP TABLE IF EXISTS pages")
+        connection.execute (u"DROP TABLE IF EXISTS terms")
+        connection.execute (u"DROP TABLE IF EXISTS postings")
+        connection.execute (u"DROP TABLE IF EXISTS suffixes")
+        self._termIds = {}
+
+        connection.execute (u"""CREATE TABLE pages (id INTEGER PRIMARY KEY,
+            subpath TEXT UNIQUE,
+            contentmtime REAL, contentsize INTEGER, optmtime REAL, attachmtime REAL,
+            length INTEGER)""")
+
+        # df - количество страниц, на которых встречается слово
+        connection.execute (u"CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE, df INTEGER)")
+
+        # count - количество вхождений слова в поле страницы
+        connection.execute (u"""CREATE TABLE postings (termid INTEGER, pageid INTEGER,
+            field INTEGER, count INTEGER, positions TEXT)""")
+        connection.execute (u"CREATE INDEX postings_term ON postings (termid)")
+        connection.execute (u"CREATE INDEX postings_page ON postings (pageid)")
+
+        # Окончания слов (обрезанные до suffixLength символов) для поиска по части слова
+        connection.execute (u"CREATE TABLE suffixes (suffix TEXT, termid INTEGER)")
+        connection.execute (u"CREATE INDEX suffixes_suffix ON suffixes (suffix)")
+
+        connection.execute (u"PRAGMA user_version = {0}".format (self.version))
+        connection.commit()
+
+
+    def _runUpdate (self, func, *args):
+        """
+        Поставить в очередь изменение индекса по событию func (connection, *args).
+        Изменения выполняются по порядку в фоновом потоке, когда события перестают
+        поступать (см. updateDelay), или перед чтением индекса.
+        Пока индекс не сверен с файлами, события можно не обрабатывать
+        """
+        if not self._valid or not self._enabled:
+            return
+
+        task = (func, args)
+
+        with self._queueLock:
+            if not self._isQueued (task):
+                self._queue.append (task)
+
+            self._queueTime = time.time()
+            self._queueLock.notify()
+
+            if self._worker == None:
+                self._worker = threading.Thread (None, self._runWorker)
+                self._worker.daemon = True
+                self._worker.start()
+
+
+    def _isQueued (self, task):
+        """
+        Возвращает True, если такая же индексация страницы уже стоит в очереди
+        и после нее страница не перемещалась и не удалялась.
+        Вызывается при захваченном _queueLock
+        """
+        for queued in reversed (self._queue):
+            if queued == task:
+                return True
+
+            if queued[0] != self._indexChangedPage:
+                return False
+
+        return False
+
+
+    def _runWorker (self):
+        while True:
+            with self._queueLock:
+                start = time.time()
+
+                # Дождемся паузы в изменениях страниц
+                while len (self._queue) != 0:
+                    delay = min (self._queueTime + self.updateDelay,
+                            start + self.maxUpdateDelay) - time.time()
+
+                    if delay <= 0:
+                        break
+
+                    self._queueLock.wait (delay)
+
+                if len (self._queue) == 0:
+                    self._worker = None
+                    return
+
+            self.flush()
+
+
+    def __onPageUpdate (self, page):
+        if page.parent != None:
+            self._runUpdate (self._indexChangedPage, page, page.subpath)
+
+
+    def _indexChangedPage (self, connection, page, subpath):
+        # Пока изменение ждало в очереди, страница могла быть удалена
+        if not page.isRemoved:
+            self._indexPage (connection, page, subpath)
+
+
+    def __onPageRemove (self, page):
+        self._runUpdate (self._removePage, page.subpath)
+
+
+    def __onTagsChanged (self, pages):
+        self._runUpdate (self._indexPages, pages)
+
+
+    def _indexPages (self, connection, pages):
+        for page in pages:
+            if not page.isRemoved:
+                self._indexPage (connection, page, page.subpath)
+
+
+    def _removePage (self, connection, subpath):
+        row = connection.execute (u"SELECT id FROM pages WHERE subpath = ?", (subpath,)).fetchone()
+        if row != None:
+            self._removePageById (connection, row[0])
+
+
+    def __onPageRename (self, page, oldSubpath):
+        self._runUpdate (self._renamePage, page, oldSubpath)
+
+
+    def _renamePage (self, connection, page, oldSubpath):
+        self._moveBranch (connection, oldSubpath, page.subpath)
+
+        # Изменился заголовок
+        self._indexPage (connection, page, page.subpath)
+
+
+    def __onPageMove (self, page, oldParent):
+        oldSubpath = (page.title if oldParent.parent == None
+                else oldParent.subpath + u"/" + page.title)
+
+        self._runUpdate (self._moveBranch, oldSubpath, page.subpath)
+
+
+    def _moveBranch (self, connection, oldSubpath, newSubpath):
+        """
+        Изменить пути до страницы и всех ее подстраниц
+        """
+        rows = connection.execute (u"""SELECT id, subpath FROM pages
+            WHERE subpath = ? OR substr (subpath, 1, ?) = ?""",
+            (oldSubpath, len (oldSubpath) + 1, oldSubpath + u"/")).fetchall()
+
+        for pageid, subpath in rows:
+            connection.execute (u"UPDATE pages SET subpath = ? WHERE id = ?",
+                    (newSubpath + subpath[len (oldSubpath):], pageid))
+
+
+    def __onTreeUpdate (self, sender):
+        if sender.parent != None:
+            self._runUpdate (self._checkPage, sender.subpath)
+
+
+    def _checkPage (self, connection, subpath):
+        row = connection.execute (u"SELECT id FROM pages WHERE subpath = ?", (subpath,)).fetchone()
+
+        if row == None:
+            # Страницы нет в индексе. Индекс будет сверен с файлами при следующем поиске
+            self._valid = False
+
+
+class _IndexReader (object):
+    """
+    Доступ к индексу при выполнении поисковых запросов
+    """
+    def __init__ (self, connection):
+        self._connection = connection
+
+
+    def getAllPages (self):
+        return set ([row[0] for row in self._connection.execute (u"SELECT id FROM pages")])
+
+
+    def findWord (self, word):
+        """
+        Найти страницы, в которых встречается слово word
+        """
+        return set ([row[0] for row in self._connection.execute (u"""SELECT DISTINCT postings.pageid
+            FROM terms JOIN postings ON postings.termid = terms.id
+            WHERE terms.term = ?""", (word,))])
+
+
+    def findPrefix (self, prefix):
+        """
+        Найти страницы, в которых встречаются слова, начинающиеся с prefix
+        """
+        return set ([row[0] for row in self._connection.execute (u"""SELECT DISTINCT postings.pageid
+            FROM terms JOIN postings ON postings.termid = terms.id
+            WHERE terms.term >= ? AND terms.term < ?""", SearchIndex._prefixRange (prefix))])
+
+
+    def findPhrase (self, words):
+        """
+        Найти страницы, в одном из полей которых слова words идут подряд
+        """
+        if len (words) == 0:
+            return set()
+
+        candidates = None
+        for word in words:
+            pages = self.findWord (word)
+            candidates = pages if candidates == None else candidates & pages
+
+        if len (words) == 1 or len (candidates) == 0:
+            return candidates
+
+        # Позиции слов. Ключ - (страница, поле, номер слова во фразе), значение - множество номеров слов в поле
+        positions = {}
+
+        for index, word in enumerate (words):
+            for pageid, field, wordPositions in self._connection.execute (u"""SELECT postings.pageid,
+                    postings.field, postings.positions
+                    FROM terms JOIN postings ON postings.termid = terms.id
+                    WHERE terms.term = ?""", (word,)):
+                if pageid in candidates:
+                    positions[(pageid, field, index)] = set (json.loads (wordPositions)[::4])
+
+        result = set()
+        for (pageid, field, index), firstPositions in positions.iteritems():
+            if index != 0 or pageid in result:
+                continue
+
+            for position in firstPositions:
+                if all ([position + n in positions.get ((pageid, field, n), ())
+                    for n in range (1, len (words))]):
+                    result.add (pageid)
+                    break
+
+        return result
+
+
+class SearchQuery (object):
+    """
+    Поисковый запрос с поддержкой операторов.
+
+    Синтаксис:
+        слово - страницы, содержащие слово целиком;
+        нача* - страницы, содержащие слова, начинающиеся с "нача";
+        "несколько слов" - страницы, в которых слова идут подряд;
+        A B или A AND B - страницы, удовлетворяющие обоим условиям;
+        A OR B - страницы, удовлетворяющие хотя бы одному из условий.
+    Оператор AND имеет более высокий приоритет, чем OR.
+    """
+    operatorAnd = u"AND"
+    operatorOr = u"OR"
+
+    itemsRegex = re.compile (r'"[^"]*"?|\S+', re.UNICODE)
+
+    def __init__ (self, query):
+        # Запрос хранится в виде списка вариантов (объединяются через OR),
+        # каждый вариант - список условий (объединяются через AND).
+        # Условие - кортеж (тип условия, значение)
+        self._variants = self._parse (query)
+
+
+    @staticmethod
+    def isQuery (phrase):
+        """
+        Проверить, использует ли фраза синтаксис запросов
+        (кавычки, операторы AND и OR или поиск по началу слова).
+        Остальные фразы ищутся как подстроки
+        """
+        if u'"' in phrase:
+            return True
+
+        for item in phrase.split():
+            if (item in [SearchQuery.operatorAnd, SearchQuery.operatorOr] or
+                    (item.endswith (u"*") and len (SearchIndex.tokenize (item)) == 1)):
+                return True
+
+        return False
+
+
+    def _parse (self, query):
+        variants = [[]]
+
+        for item in SearchQuery.itemsRegex.findall (query):
+            if item == SearchQuery.operatorOr:
+                variants.append ([])
+            elif item == SearchQuery.operatorAnd:
+                continue
+            elif item.startswith (u'"'):
+                words = [word for word, offset in SearchIndex.tokenize (item)]
+                if len (words) != 0:
+                    variants[-1].append ((u"phrase", words))
+            elif item.endswith (u"*"):
+                words = [word for word, offset in SearchIndex.tokenize (item)]
+                if len (words) != 0:
+                    variants[-1].append ((u"phrase", words[:-1]) if len (words) > 1 else (u"prefix", words[0]))
+                    if len (words) > 1:
+                        variants[-1].append ((u"prefix", words[-1]))
+            else:
+                words = [word for word, offset in SearchIndex.tokenize (item)]
+                if len (words) == 1:
+                    variants[-1].append ((u"word", words[0]))
+                elif len (words) > 1:
+                    variants[-1].append ((u"phrase", words))
+
+        return [variant for variant in variants if len (variant) != 0]
+
+
+    @property
+    def terms (self):
+        """
+        Слова из запроса для ранжирования и выделения.
+        Возвращает список кортежей (слово, искать ли слова, начинающиеся с него)
+        """
+        result = []
+
+        for variant in self._variants:
+            for condition, value in variant:
+                if condition == u"phrase":
+                    result += [(word, False) for word in value]
+                else:
+                    result.append ((value, condition == u"prefix"))
+
+        return result
+
+
+    def evaluate (self, reader):
+        """
+        Выполнить запрос.
+        reader - объект для доступа к индексу.
+        Возвращает множество идентификаторов найденных страниц
+        """
+        result = set()
+
+        for variant in self._variants:
+            pages = None
+
+            for condition, value in variant:
+                if condition == u"word":
+                    found = reader.findWord (value)
+                elif condition == u"prefix":
+                    found = reader.findPrefix (value)
+                else:
+                    found = reader.findPhrase (value)
+
+                pages = found if pages == None else pages & found
+
+                if len (pages) == 0:
+                    break
+
+            result |= pages
+
+        return result
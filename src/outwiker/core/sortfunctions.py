@@ -4,6 +4,9 @@
 Модуль с функциями сортировки страниц
 """
 
+import bisect
+
+
 def sortOrderFunction (page1, page2):
     """
     Функция для сортировки страниц с учетом order
@@ -24,6 +27,51 @@ def sortOrderFunction (page1, page2):
     return sortAlphabeticalFunction (page1, page2)
 
 
+def sortOrderKey (page):
+    """
+    Ключ для сортировки страниц с учетом order
+    """
+    return (page.params.orderOption.value, page.title.lower())
+
+
+def sortAlphabeticalKey (page):
+    """
+    Ключ для сортировки страниц по алфавиту
+    """
+    return page.title.lower()
+
+
+def sortPagesByOrder (pages):
+    """
+    Отсортировать список страниц pages на месте с учетом order.
+    Страницы, для которых порядок еще не установлен (order == -1), 
+    вставляются между остальными страницами по алфавиту так же, 
+    как это происходит при сортировке с помощью sortOrderFunction
+    """
+    ordered = []
+    unordered = []
+
+    for page in pages:
+        key = sortOrderKey (page)
+        if key[0] == -1:
+            unordered.append ((key[1], page))
+        else:
+            ordered.append ((key, page))
+
+    ordered.sort (key=lambda item: item[0])
+    unordered.sort (key=lambda item: item[0])
+
+    titles = [key[1] for key, page in ordered]
+    result = [page for key, page in ordered]
+
+    for title, page in unordered:
+        index = bisect.bisect_right (titles, title)
+        titles.insert (index, title)
+        result.insert (index, page)
+
+    pages[:] = result
+
+
 def sortAlphabeticalFunction (page1, page2):
     """
     Функция для сортировки страниц по алфавиту
@@ -31,6 +31,14 @@ class Style (object):
         return style
 
 
+    def getOwnStylePath (self, page):
+        """
+        Возвращает путь до файла собственного стиля страницы page.
+        Файл может не существовать
+        """
+        return os.path.join (page.path, self._styleFname)
+
+
     def getDefaultStyle (self):
         """
         Возвращает путь до стиля по умолчанию
@@ -3,6 +3,7 @@
 
 
 from .tagslist import TagsList
+from .config import ConfigTransaction
 
 
 def parseTagsList (tagsString):
@@ -55,6 +56,59 @@ def appendTagsList (page, tagslist):
     page.tags = pageTags
 
 
+def changeTags (pages, func):
+    """
+    Изменить теги у группы страниц за один проход.
+
+    pages - список страниц
+    func - функция, которая принимает список тегов страницы 
+        и возвращает новый список тегов
+
+    Параметры каждой страницы записываются в файл один раз.
+    Вместо события onPageUpdate для каждой страницы изменение обрамляется 
+    событиями onStartTreeUpdate / onEndTreeUpdate, а в конце вызывается 
+    одно событие onTagsChanged со списком страниц, у которых изменились теги.
+    Возвращает этот список
+    """
+    # У корня вики тегов нет
+    pages = [page for page in pages if page.parent != None]
+    if len (pages) == 0:
+        return []
+
+    root = pages[0].root
+    changed = []
+
+    root.onStartTreeUpdate (root)
+
+    try:
+        with ConfigTransaction():
+            for page in pages:
+                if page._setTags (func (page.tags)):
+                    changed.append (page)
+
+        if len (changed) != 0:
+            root.onTagsChanged (changed)
+    finally:
+        root.onEndTreeUpdate (root)
+
+    return changed
+
+
+def getBranchPages (parentPage):
+    """
+    Возвращает список страниц ветки, начиная с parentPage (включая ее саму)
+    """
+    result = []
+    stack = [parentPage]
+
+    while len (stack) != 0:
+        page = stack.pop()
+        result.append (page)
+        stack.extend (reversed (page.children))
+
+    return result
+
+
 def tagBranch (parentPage, tags):
     """
     Добавить теги к ветке, начиная с родительской страницы
@@ -62,9 +116,7 @@ def tagBranch (parentPage, tags):
     parentPage - страница, с которой начинается ветка
     tags - список тегов для добавления
     """
-    if "tags" in dir (parentPage):
-        appendTagsList (parentPage, tags)
-    map (lambda child: tagBranch (child, tags), parentPage.children)
+    changeTags (getBranchPages (parentPage), lambda pageTags: pageTags + tags)
 
 
 def removeTagsFromBranch (parentPage, tags):
@@ -74,18 +126,19 @@ def removeTagsFromBranch (parentPage, tags):
     parentPage - страницы, с которой начинается ветка
     tags - список тегов, которые надо удалить
     """
-    if "tags" in dir (parentPage):
-        map (lambda tag: removeTag (parentPage, tag), tags)
+    removedTags = set ([tag.lower() for tag in tags])
 
-    map (lambda child: removeTagsFromBranch (child, tags), parentPage.children)
+    changeTags (getBranchPages (parentPage), 
+            lambda pageTags: [tag for tag in pageTags if tag not in removedTags])
     
 
 def renameTag (wikiroot, oldName, newName):
     """
     Переименовать тег
     """
-    tags = TagsList (wikiroot)
-    for page in tags[oldName]:
-        removeTag (page, oldName)
-        appendTag (page, newName)
+    oldNameLower = oldName.lower()
+    pages = TagsList (wikiroot)[oldName]
+
+    changeTags (pages, 
+            lambda pageTags: [tag for tag in pageTags if tag != oldNameLower] + [newName])
 
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Индекс тегов вики
+"""
+
+import threading
+
+
+class TagsIndex (object):
+    """
+    Индекс тегов: для каждого тега хранится множество страниц с этим тегом.
+    Индекс строится при первом обращении к нему, 
+    дальше страницы сами сообщают индексу об изменении своих тегов, 
+    о создании и удалении (до вызова соответствующих событий, 
+    чтобы обработчики событий видели уже обновленный индекс)
+    """
+    def __init__ (self, root):
+        """
+        root - корень вики (экземпляр класса WikiDocument)
+        """
+        self._root = root
+        self._lock = threading.RLock()
+
+        # Словарь тегов. Ключ - тег в нижнем регистре, значение - множество страниц с этим тегом.
+        # None, если индекс еще не построен
+        self._tags = None
+
+        # Теги, под которыми проиндексирована страница.
+        # Ключ - страница, значение - frozenset тегов
+        self._pageTags = None
+
+        # Счетчик изменений. Увеличивается при каждом изменении индекса,
+        # чтобы можно было быстро проверить, менялись ли теги в вики
+        self.generation = 0
+
+        root.onTreeUpdate += self.__onTreeUpdate
+
+
+    @property
+    def tags (self):
+        """
+        Возвращает список тегов
+        """
+        return self._getTags().keys()
+
+
+    def getPages (self, tag):
+        """
+        Возвращает множество страниц с тегом tag
+        """
+        return set (self._getTags().get (tag.lower(), ()))
+
+
+    def getCount (self, tag):
+        """
+        Возвращает количество страниц с тегом tag
+        """
+        return len (self._getTags().get (tag.lower(), ()))
+
+
+    def getTagsDict (self):
+        """
+        Возвращает словарь: ключ - тег, значение - список страниц с этим тегом
+        """
+        with self._lock:
+            return dict ([(tag, list (pages)) for tag, pages in self._getTags().iteritems()])
+
+
+    def __len__ (self):
+        return len (self._getTags())
+
+
+    def __contains__ (self, tag):
+        return tag.lower() in self._getTags()
+
+
+    def __iter__ (self):
+        tags = self._getTags().keys()
+        tags.sort()
+
+        return iter (tags)
+
+
+    def invalidate (self):
+        """
+        Сбросить индекс. Он будет построен заново при следующем обращении
+        """
+        with self._lock:
+            self._tags = None
+            self._pageTags = None
+            self.generation += 1
+
+
+    def _getTags (self):
+        tags = self._tags
+        if tags != None:
+            return tags
+
+        with self._lock:
+            if self._tags == None:
+                self._build()
+
+            return self._tags
+
+
+    def _build (self):
+        self._tags = {}
+        self._pageTags = {}
+
+        self._root._loadAllChildren()
+        self._addBranch (self._root)
+        self.generation += 1
+
+
+    def _addBranch (self, page):
+        try:
+            children = page.children
+        except EnvironmentError:
+            # Папку страницы прочитать не удалось, дочерние страницы будут загружены при следующем обращении
+            return
+
+        for child in children:
+            self._setPageTags (child, frozenset (child.tags))
+            self._addBranch (child)
+
+
+    def _setPageTags (self, page, newtags):
+        """
+        Обновить теги страницы в индексе.
+        Возвращает True, если индекс изменился
+        """
+        oldtags = self._pageTags.get (page, frozenset())
+        self._pageTags[page] = newtags
+
+        if oldtags == newtags:
+            return False
+
+        for tag in oldtags - newtags:
+            pages = self._tags[tag]
+            pages.discard (page)
+            if len (pages) == 0:
+                del self._tags[tag]
+
+        for tag in newtags - oldtags:
+            self._tags.setdefault (tag, set()).add (page)
+
+        return True
+
+
+    def updatePage (self, page):
+        """
+        Обновить теги страницы page в индексе (после создания страницы или изменения ее тегов)
+        """
+        with self._lock:
+            if self._tags == None or page.parent == None:
+                return
+
+            if self._setPageTags (page, frozenset (page.tags)):
+                self.generation += 1
+
+
+    def removePage (self, page):
+        """
+        Удалить страницу page из индекса
+        """
+        with self._lock:
+            if self._tags == None or page not in self._pageTags:
+                return
+
+            if self._setPageTags (page, frozenset()):
+                self.generation += 1
+
+            del self._pageTags[page]
+
+
+    def __onTreeUpdate (self, sender):
+        # Обновление всего дерева (например, после загрузки вики)
+        if sender.parent == None:
+            self.invalidate()
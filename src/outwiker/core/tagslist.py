@@ -11,7 +11,12 @@ class TagsList (object):
         # Словарь тегов. Ключ - тег, значение - список страниц с этим тегом
         self._tags = {}
 
-        self._findTags (root)
+        # Для всей вики теги берутся из индекса, чтобы не обходить дерево
+        index = getattr (root, "tagsIndex", None)
+        if index != None:
+            self._tags = index.getTagsDict()
+        else:
+            self._findTags (root)
 
 
     @property
@@ -30,17 +35,17 @@ class TagsList (object):
             for tag in page.tags:
                 tag_lower = tag.lower()
 
-                if tag_lower in self._tags.keys():
+                if tag_lower in self._tags:
                     self._tags[tag_lower].append (page)
                 else:
                     self._tags[tag_lower] = [page]
 
-        for child in page.children:
+        for child in page.iterChildren():
             self._findTags (child)
     
 
     def __len__ (self):
-        return len (self._tags.keys())
+        return len (self._tags)
 
 
     def __getitem__ (self, tag):
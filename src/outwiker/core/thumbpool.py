@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Пул потоков для создания превьюшек
+"""
+
+import multiprocessing
+import Queue
+import sys
+import threading
+
+
+class ThumbJob (object):
+    """
+    Задание на создание одной превьюшки
+    """
+    def __init__ (self, key, group, func):
+        """
+        key - путь до создаваемого файла превьюшки
+        group - группа заданий (например, папка с превьюшками страницы)
+        func - функция без параметров, которая создает превьюшку
+        """
+        self.key = key
+        self.group = group
+        self.func = func
+
+        # Исключение, возникшее при создании превьюшки, в виде кортежа из sys.exc_info()
+        self.error = None
+
+        self._done = threading.Event()
+
+
+    @property
+    def done (self):
+        return self._done.is_set()
+
+
+    def wait (self):
+        """
+        Дождаться завершения задания
+        """
+        self._done.wait()
+
+
+class ThumbPool (object):
+    """
+    Пул потоков для создания превьюшек.
+    Задания для одного и того же файла превьюшки, пока они не выполнены, объединяются
+    """
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__ (self, workers=None):
+        """
+        workers - количество рабочих потоков. Если None, то по количеству процессоров
+        """
+        self.workers = workers if workers != None else self._getCpuCount()
+
+        self._queue = Queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Невыполненные задания. Ключ - путь до файла превьюшки, значение - экземпляр ThumbJob
+        self._jobs = {}
+
+
+    @staticmethod
+    def get ():
+        """
+        Возвращает общий для всей программы пул
+        """
+        if ThumbPool._instance == None:
+            with ThumbPool._instanceLock:
+                if ThumbPool._instance == None:
+                    ThumbPool._instance = ThumbPool()
+
+        return ThumbPool._instance
+
+
+    @staticmethod
+    def _getCpuCount ():
+        try:
+            return multiprocessing.cpu_count()
+        except NotImplementedError:
+            return 2
+
+
+    def submit (self, key, group, func):
+        """
+        Поставить в очередь создание превьюшки.
+        key - путь до создаваемого файла превьюшки
+        group - группа заданий (например, папка с превьюшками страницы)
+        func - функция без параметров, которая создает превьюшку
+        Возвращает экземпляр ThumbJob
+        """
+        with self._lock:
+            job = self._jobs.get (key)
+            if job != None:
+                return job
+
+            job = ThumbJob (key, group, func)
+            self._jobs[key] = job
+            self._startThreads()
+
+        self._queue.put (job)
+        return job
+
+
+    def wait (self, jobs):
+        """
+        Дождаться выполнения заданий jobs.
+        Если при выполнении задания возникло исключение, оно бросается заново
+        """
+        for job in jobs:
+            job.wait()
+
+        for job in jobs:
+            if job.error != None:
+                raise job.error[0], job.error[1], job.error[2]
+
+
+    def waitGroup (self, group):
+        """
+        Дождаться выполнения всех заданий группы group. Исключения в заданиях игнорируются
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.group == group]
+
+        for job in jobs:
+            job.wait()
+
+
+    def _startThreads (self):
+        while len (self._threads) < self.workers:
+            thread = threading.Thread (target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append (thread)
+
+
+    def _work (self):
+        while True:
+            job = self._queue.get()
+
+            # Задание удаляется из списка невыполненных до того, как станет завершенным,
+            # чтобы ожидающие его могли сразу поставить новое задание для того же файла
+            try:
+                job.func()
+            except Exception:
+                job.error = sys.exc_info()
+
+            with self._lock:
+                if self._jobs.get (job.key) is job:
+                    del self._jobs[job.key]
+
+            job._done.set()
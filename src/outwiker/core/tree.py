@@ -5,14 +5,19 @@ import os.path
 import ConfigParser
 import shutil
 import datetime
+import threading
+import time
 
-from .config import PageConfig
+from .config import PageConfig, ConfigTransaction
+from .treecache import TreeCache
+from .searchindex import SearchIndex
 from .bookmarks import Bookmarks
-from .tagslist import TagsList
+from .tagsindex import TagsIndex
+from .treewatcher import TreeWatcher
 from .event import Event
 from .exceptions import ClearConfigError, RootFormatError, DublicateTitle, ReadonlyException, TreeException
 from .tagscommands import parseTagsList
-from .sortfunctions import sortOrderFunction, sortAlphabeticalFunction
+from .sortfunctions import sortPagesByOrder, sortAlphabeticalKey
 
 
 class RootWikiPage (object):
@@ -26,6 +31,16 @@ class RootWikiPage (object):
 
     sectionGeneral = u"General"
 
+    # Блокировка для ленивой загрузки дочерних страниц и параметров страниц.
+    # Дочерние страницы могут подгружаться из фонового потока (см. TreePrefetcher)
+    _loadLock = threading.RLock()
+
+    # Маркер, который хранится в _children, пока идет загрузка дочерних страниц
+    _childrenLoading = object()
+
+    # Кеш параметров страниц. Создается только для корня вики
+    _treeCache = None
+
     def __init__(self, path, readonly=False):
         """
         path -- путь до страницы относительно корня дерева
@@ -34,10 +49,20 @@ class RootWikiPage (object):
         # Путь до страницы
         self._path = path
         self._parent = None
+
+        # Список дочерних страниц.
+        # None, если дочерние страницы еще не загружались
         self._children = []
         self.readonly = readonly
 
-        self._params = RootWikiPage._readParams(self.path, self.readonly)
+        # Индексы дочерних страниц. Создаются при первом обращении к ним (см. _getChildrenIndex)
+        self._resetChildrenIndex()
+
+        # Параметры страницы читаются при первом обращении к ним
+        self._params = None
+
+        # Имя файла иконки (без пути), u"", если иконки нет, или None, если папка страницы еще не читалась
+        self._iconName = None
 
     
     @staticmethod
@@ -47,9 +72,33 @@ class RootWikiPage (object):
 
     @property
     def params (self):
+        if self._params == None:
+            with RootWikiPage._loadLock:
+                if self._params == None:
+                    self._setParams (RootWikiPage._readParams(self.path, self.readonly))
+
         return self._params
 
 
+    def _setParams (self, params):
+        """
+        Установить загруженные параметры страницы
+        """
+        cache = self.treeCache
+        if cache != None:
+            cache.watchParams (params)
+
+        self._params = params
+
+
+    @property
+    def treeCache (self):
+        """
+        Кеш параметров страниц (экземпляр класса TreeCache) или None, если кеш не используется
+        """
+        return self.root._treeCache
+
+
     @property
     def path (self):
         return self._path
@@ -62,7 +111,141 @@ class RootWikiPage (object):
 
     @property
     def children (self):
-        return self._children[:]
+        return self._getChildrenList()[:]
+
+
+    def iterChildren (self):
+        """
+        Итератор по дочерним страницам без копирования их списка.
+        Во время обхода дерево не должно изменяться
+        """
+        return iter (self._getChildrenList())
+
+
+    @property
+    def childrenLoaded (self):
+        """
+        Возвращает True, если дочерние страницы уже загружены
+        """
+        return isinstance (self._children, list)
+
+
+    def _getChildrenList (self):
+        """
+        Возвращает список дочерних страниц (без копирования).
+        Если дочерние страницы еще не загружены, то загружает их
+        """
+        children = self._children
+        if isinstance (children, list):
+            return children
+
+        with RootWikiPage._loadLock:
+            if self._children is None:
+                # Пока идет загрузка, обращения к дочерним страницам из этого же потока 
+                # (например, проверка на дубликаты в конструкторе WikiPage) 
+                # должны видеть пустой список
+                self._children = RootWikiPage._childrenLoading
+                try:
+                    self._children = self._loadChildrenList()
+                except:
+                    self._children = None
+                    raise
+
+            if self._children is RootWikiPage._childrenLoading:
+                return []
+
+            return self._children
+
+
+    def _resetChildrenIndex (self):
+        """
+        Сбросить индексы дочерних страниц
+        """
+        # Словарь: заголовок страницы в нижнем регистре - дочерняя страница
+        self._titlesIndex = None
+
+        # True, если у нескольких дочерних страниц заголовки отличаются только регистром
+        # (такие папки могли быть созданы вне программы)
+        self._dublicateTitles = False
+
+        # Словарь: дочерняя страница - ее порядковый номер
+        self._ordersIndex = None
+
+
+    def _getChildrenIndex (self):
+        """
+        Возвращает словарь, в котором ключ - заголовок дочерней страницы в нижнем регистре,
+        а значение - сама страница. Если заголовки нескольких страниц отличаются только регистром,
+        то в словаре хранится последняя из них
+        """
+        index = self._titlesIndex
+        if index != None:
+            return index
+
+        children = self._getChildrenList()
+        index = {}
+        for child in children:
+            index[child.title.lower()] = child
+
+        # Пока идут загрузка дочерних страниц, индекс не сохраняется
+        if self.childrenLoaded:
+            self._titlesIndex = index
+            self._dublicateTitles = len (index) != len (children)
+
+        return index
+
+
+    def _getChildOrder (self, page):
+        """
+        Возвращает порядковый номер дочерней страницы page.
+        Если page не является дочерней страницей, бросается исключение ValueError
+        """
+        index = self._ordersIndex
+        if index == None:
+            index = dict ([(child, n) for n, child in enumerate (self._getChildrenList())])
+
+            if self.childrenLoaded:
+                self._ordersIndex = index
+
+        try:
+            return index[page]
+        except KeyError:
+            raise ValueError
+
+
+    def _onChildrenReordered (self):
+        """
+        Вызывается после изменения порядка дочерних страниц
+        """
+        self._ordersIndex = None
+
+        # От порядка страниц зависит, какая из страниц с одинаковыми заголовками попадет в индекс
+        if self._dublicateTitles:
+            self._titlesIndex = None
+
+
+    def _onChildRenamed (self, page, oldtitle):
+        """
+        Вызывается после переименования дочерней страницы page
+        """
+        index = self._titlesIndex
+        if index == None:
+            return
+
+        if self._dublicateTitles or page.title.lower() in index:
+            self._titlesIndex = None
+        else:
+            index.pop (oldtitle.lower(), None)
+            index[page.title.lower()] = page
+
+
+    def _loadChildrenList (self):
+        """
+        Загрузить дочерние страницы при первом обращении к ним.
+        Если папку страницы прочитать не удалось, бросает исключение IOError,
+        а список дочерних страниц остается незагруженным, чтобы при следующем обращении попытаться еще раз
+        """
+        return self.getChildren()
 
 
     @property
@@ -84,11 +267,25 @@ class RootWikiPage (object):
         if not os.path.exists (self.path):
             os.mkdir (self.path)
 
-        self._params.save()
+        self.params.save()
+
+
+    def _loadAllChildren (self):
+        """
+        Загрузить все поддерево, начиная с текущей страницы.
+        Ветки, папки которых прочитать не удалось, пропускаются
+        """
+        try:
+            children = self._getChildrenList()
+        except EnvironmentError:
+            return
+
+        for child in children:
+            child._loadAllChildren()
 
 
     def __len__ (self):
-        return len (self._children)
+        return len (self._getChildrenList())
 
 
     def __getitem__ (self, path):
@@ -102,19 +299,20 @@ class RootWikiPage (object):
         if path[0] == "/":
             return self.root[path[1:]]
 
+        return self._findPage (path)
+
+
+    def _findPage (self, path):
+        """
+        Найти страницу по относительному пути, проходя по дереву
+        """
         # Разделим путь по составным частям
         titles = path.split ("/")
         page = self
 
         for title in titles:
-            found = False
-            for child in page.children:
-                if child.title.lower() == title.lower():
-                    page = child
-                    found = True
-
-            if not found:
-                page = None
+            page = page._getChildrenIndex().get (title.lower())
+            if page == None:
                 break
 
         return page
@@ -124,34 +322,71 @@ class RootWikiPage (object):
         """
         Загрузить дочерние узлы
         """
-        try:
-            entries = os.listdir (self.path)
-        except OSError:
-            raise IOError
+        cache = self.treeCache
+        names = cache.getChildrenNames (self) if cache != None else None
+
+        if names == None:
+            names, icon = self._listDir()
+            self._iconName = icon
+
+            if cache != None:
+                cache.setDirInfo (self, names, icon)
 
         result = []
 
-        for name in entries:
+        for name in names:
             fullpath = os.path.join (self.path, name)
 
-            if not name.startswith ("__") and os.path.isdir (fullpath):
-                try:
-                    page = WikiPage.load (fullpath, self, self.readonly)
-                except Exception as e:
-                    continue
+            try:
+                page = WikiPage.load (fullpath, self, self.readonly)
+            except Exception as e:
+                continue
+
+            result.append (page)
 
-                result.append (page)
+        sortPagesByOrder (result)
 
-        result.sort (sortOrderFunction)
+        if cache != None:
+            cache.flush()
 
         return result
 
 
+    def _listDir (self):
+        """
+        Прочитать содержимое папки страницы.
+        Возвращает кортеж (список папок, которые могут быть дочерними страницами, имя файла иконки).
+        Если иконки нет, то вместо имени файла возвращается пустая строка.
+        Если папку прочитать не удалось, бросает исключение IOError с кодом исходной ошибки
+        """
+        try:
+            entries = os.listdir (self.path)
+        except OSError as e:
+            raise IOError (e.errno, e.strerror, e.filename)
+
+        names = []
+        icon = u""
+
+        for name in entries:
+            fullpath = os.path.join (self.path, name)
+
+            if name.startswith ("__"):
+                if (len (icon) == 0 and 
+                        name.startswith (RootWikiPage.iconName) and
+                        not os.path.isdir (fullpath)):
+                    icon = name
+            elif os.path.isdir (fullpath):
+                names.append (name)
+
+        return (names, icon)
+
+
     def sortChildrenAlphabetical(self):
         """
         Отсортировать дочерние страницы по алфавиту
         """
-        self._children.sort (sortAlphabeticalFunction)
+        self._getChildrenList().sort (key=sortAlphabeticalKey)
+        self._onChildrenReordered()
 
         self.root.onStartTreeUpdate (self.root)
         self.saveChildrenParams()
@@ -172,31 +407,53 @@ class RootWikiPage (object):
         Изменить порядок дочерних элементов
         Дочернюю страницу page переместить на уровень neworder
         """
-        oldorder = self._children.index (page)
+        children = self._getChildrenList()
+        oldorder = self._getChildOrder (page)
         if oldorder != neworder:
-            self.removeFromChildren (page)
-            self._children.insert (neworder, page)
+            del children[oldorder]
+            children.insert (neworder, page)
+            self._onChildrenReordered()
             self.saveChildrenParams()
 
 
     def saveChildrenParams (self):
-        for child in self._children:
-            child.save()
+        # Параметры каждой страницы записываются в файл один раз
+        with ConfigTransaction():
+            for child in self._getChildrenList():
+                child.save()
     
 
     def addToChildren (self, page):
         """
         Добавить страницу к дочерним страницам
         """
-        self._children.append (page)
-        self._children.sort (sortOrderFunction)
+        children = self._getChildrenList()
+        children.append (page)
+        sortPagesByOrder (children)
+        self._onChildrenReordered()
+
+        index = self._titlesIndex
+        if index != None:
+            title = page.title.lower()
+            if title in index:
+                self._dublicateTitles = True
+            index[title] = page
 
 
     def removeFromChildren (self, page):
         """
         Удалить страницу из дочерних страниц
         """
-        self._children.remove (page)
+        children = self._getChildrenList()
+        del children[self._getChildOrder (page)]
+        self._onChildrenReordered()
+
+        index = self._titlesIndex
+        if index != None:
+            if self._dublicateTitles:
+                self._titlesIndex = None
+            else:
+                del index[page.title.lower()]
 
 
     def isChild (self, page):
@@ -247,7 +504,23 @@ class WikiDocument (RootWikiPage):
         RootWikiPage.__init__ (self, path, readonly)
         self._selectedPage = None
         self.__createEvents()
-        self.bookmarks = Bookmarks (self, self._params)
+        self.bookmarks = Bookmarks (self, self.params)
+
+        self._treeCache = TreeCache (self)
+        self.__bindTreeCacheEvents()
+
+        # Словарь: относительный путь до страницы в нижнем регистре - страница.
+        # Заполняется при поиске страниц по пути и очищается при изменении структуры дерева
+        self._subpathsIndex = {}
+
+        # Полнотекстовый индекс для поиска. Строится при первом поиске
+        self.searchIndex = SearchIndex (self)
+
+        # Индекс тегов. Строится при первом обращении
+        self.tagsIndex = TagsIndex (self)
+
+        # Отслеживание изменений, сделанных сторонними программами. Запускается методом watcher.start()
+        self.watcher = TreeWatcher (self)
 
 
     def __createEvents (self):
@@ -279,6 +552,11 @@ class WikiDocument (RootWikiPage):
         # Параметры: page - переименованная страница, oldSubpath - старый относительный путь до страницы
         self.onPageRename = Event()
 
+        # Перемещение страницы к другому родителю.
+        # Вызывается перед событием onTreeUpdate
+        # Параметры: page - перемещенная страница, oldParent - прежний родитель
+        self.onPageMove = Event()
+
         # Создание страницы
         # Параметры: sender
         self.onPageCreate = Event()
@@ -287,6 +565,73 @@ class WikiDocument (RootWikiPage):
         # Параметр - удаленная страница
         self.onPageRemove = Event()
 
+        # Изменение тегов у группы страниц (см. tagscommands.changeTags).
+        # Для каждой из этих страниц событие onPageUpdate не вызывается
+        # Параметр: pages - список страниц, у которых изменились теги
+        self.onTagsChanged = Event()
+
+
+    def __bindTreeCacheEvents (self):
+        """
+        Подписка на события, после которых нужно обновить кеш параметров страниц
+        """
+        self.onPageCreate += self.__onPageCreate
+        self.onPageUpdate += self.__onPageUpdate
+        self.onPageRemove += self.__onPageRemove
+        self.onPageRename += self.__onPageRename
+        self.onPageOrderChange += self.__onPageOrderChange
+        self.onTreeUpdate += self.__onTreeUpdate
+        self.onTagsChanged += self.__onTagsChanged
+
+
+    def __onPageCreate (self, page):
+        # При создании страницы перезаписываются параметры всех соседних страниц
+        self.__updateSiblings (page)
+        self._treeCache.flush()
+
+
+    def __onPageUpdate (self, page):
+        self._treeCache.updatePage (page)
+        self._treeCache.flush()
+
+
+    def __onPageRemove (self, page):
+        self._treeCache.removeBranch (page.subpath)
+        self._treeCache.updateChildrenList (page.parent)
+        self._treeCache.flush()
+
+
+    def __onPageRename (self, page, oldSubpath):
+        self._treeCache.renameBranch (oldSubpath, page.subpath)
+        self._treeCache.updatePage (page)
+        self._treeCache.flush()
+
+
+    def __onPageOrderChange (self, page):
+        self.__updateSiblings (page)
+        self._treeCache.flush()
+
+
+    def __onTreeUpdate (self, sender):
+        if sender.parent != None:
+            self._treeCache.updatePage (sender)
+            self._treeCache.flush()
+
+
+    def __onTagsChanged (self, pages):
+        # Список дочерних страниц при изменении тегов не меняется
+        for page in pages:
+            self._treeCache.setParams (page.path, page.params)
+
+        self._treeCache.flush()
+
+
+    def __updateSiblings (self, page):
+        for child in page.parent.iterChildren():
+            self._treeCache.setParams (child.path, child.params)
+
+        self._treeCache.updateChildrenList (page.parent)
+
 
     @staticmethod
     def clearConfigFile (path):
@@ -326,9 +671,32 @@ class WikiDocument (RootWikiPage):
 
     def loadChildren (self):
         """
-        Интерфейс для загрузки дочерних страниц
+        Интерфейс для загрузки дочерних страниц.
+        Загружается только первый уровень дерева, 
+        более глубокие уровни загружаются при первом обращении к ним
         """
         self._children = self.getChildren()
+        self._resetChildrenIndex()
+        self._resetSubpathsIndex()
+
+
+    def _findPage (self, path):
+        key = path.lower()
+        page = self._subpathsIndex.get (key)
+
+        if page == None:
+            page = RootWikiPage._findPage (self, path)
+            if page != None:
+                self._subpathsIndex[key] = page
+
+        return page
+
+
+    def _resetSubpathsIndex (self):
+        """
+        Очистить индекс путей до страниц. Вызывается при переименовании, перемещении и удалении страниц
+        """
+        self._subpathsIndex = {}
 
 
     @staticmethod
@@ -401,6 +769,13 @@ class WikiPage (RootWikiPage):
         RootWikiPage.__init__ (self, path, readonly)
         self._title = title
         self._parent = parent
+        self.__tags = []
+
+        # Относительный путь до страницы. Вычисляется при первом обращении к нему
+        self._subpath = None
+
+        # Прочитанное содержимое страницы: кортеж (contentStat, текст) или None
+        self._contentCache = None
 
 
     @property
@@ -408,7 +783,7 @@ class WikiPage (RootWikiPage):
         """
         Вернуть индекс страницы в списке дочерних страниц
         """
-        return self.parent.children.index (self)
+        return self.parent._getChildOrder (self)
 
 
     @order.setter
@@ -454,10 +829,16 @@ class WikiPage (RootWikiPage):
             raise DublicateTitle
 
         newpath = os.path.join (os.path.dirname (oldpath), newtitle)
-        os.renames (oldpath, newpath)
-        self._title = newtitle
 
-        WikiPage.__renamePaths (self, newpath)
+        # Пока переименовывается папка и исправляются пути, 
+        # фоновый поток не должен загружать страницы по старым путям
+        with RootWikiPage._loadLock:
+            os.renames (oldpath, newpath)
+            self._title = newtitle
+            self.parent._onChildRenamed (self, oldtitle)
+
+            WikiPage.__renamePaths (self, newpath)
+            self.root._resetSubpathsIndex()
 
         self.root.onPageRename (self, oldsubpath)
         self.root.onTreeUpdate (self)
@@ -471,13 +852,19 @@ class WikiPage (RootWikiPage):
     @staticmethod
     def __renamePaths (page, newPath):
         """
-        Скорректировать пути после переименования страницы
+        Скорректировать пути после переименования страницы.
+        Вызывается с захваченной блокировкой RootWikiPage._loadLock
         """
         oldPath = page.path
         page._path = newPath
-        page._params = RootWikiPage._readParams(page.path)
+        page._params = None
+        page._subpath = None
 
-        for child in page.children:
+        # Незагруженные дочерние страницы будут загружены уже по новому пути
+        if not page.childrenLoaded:
+            return
+
+        for child in page.iterChildren():
             newChildPath = child.path.replace (oldPath, newPath, 1)
             WikiPage.__renamePaths (child, newChildPath)
 
@@ -511,20 +898,23 @@ class WikiPage (RootWikiPage):
         # а потом уже ее переместим в нужное место с нужным именем
         tempname = self._getTempName (oldpath)
 
-        try:
-            os.renames (oldpath, tempname)
-            shutil.move (tempname, newpath)
-        except shutil.Error:
-            raise TreeException
-        except OSError:
-            raise TreeException
-
-        self._parent = newparent
-        oldparent.removeFromChildren (self)
-        newparent.addToChildren (self)
-        
-        WikiPage.__renamePaths (self, newpath)
-
+        with RootWikiPage._loadLock:
+            try:
+                os.renames (oldpath, tempname)
+                shutil.move (tempname, newpath)
+            except shutil.Error:
+                raise TreeException
+            except OSError:
+                raise TreeException
+
+            self._parent = newparent
+            oldparent.removeFromChildren (self)
+            newparent.addToChildren (self)
+            
+            WikiPage.__renamePaths (self, newpath)
+            self.root._resetSubpathsIndex()
+
+        self.root.onPageMove (self, oldparent)
         self.root.onTreeUpdate (self)
 
     
@@ -550,8 +940,14 @@ class WikiPage (RootWikiPage):
 
     @property
     def icon (self):
-        icons = self._getIconFiles()
-        return icons[0] if len (icons) > 0 else None
+        if self._iconName == None:
+            with RootWikiPage._loadLock:
+                if self._iconName == None:
+                    cache = self.treeCache
+                    icon = cache.getIconName (self) if cache != None else None
+                    self._iconName = icon if icon != None else self._listDir()[1]
+
+        return os.path.join (self.path, self._iconName) if len (self._iconName) != 0 else None
 
 
     @icon.setter
@@ -575,6 +971,8 @@ class WikiPage (RootWikiPage):
             shutil.copyfile (iconpath, newpath)
             self.updateDateTime()
 
+        self._iconName = newname
+
         self.root.onPageUpdate (self)
         self.root.onTreeUpdate (self)
 
@@ -585,6 +983,8 @@ class WikiPage (RootWikiPage):
         for fname in self._getIconFiles():
             os.remove (fname)
 
+        self._iconName = u""
+
 
     @property
     def tags (self):
@@ -602,6 +1002,15 @@ class WikiPage (RootWikiPage):
         Установить теги для страницы
         tags - список тегов (список строк)
         """
+        if self._setTags (tags):
+            self.root.onPageUpdate(self)
+
+
+    def _setTags (self, tags):
+        """
+        Установить теги для страницы без вызова события onPageUpdate.
+        Возвращает True, если теги изменились
+        """
         if self.readonly:
             raise ReadonlyException
 
@@ -610,11 +1019,42 @@ class WikiPage (RootWikiPage):
         newtagset = set (lowertags)
         newtags = list (newtagset)
 
-        if newtagset != set (self._tags):
-            self._tags = newtags
+        if newtagset == set ([tag.lower() for tag in self._tags]):
+            return False
+
+        self._tags = newtags
+
+        with ConfigTransaction():
             self.save()
             self.updateDateTime()
-            self.root.onPageUpdate(self)
+
+        self._updateTagsIndex()
+        return True
+
+
+    def _updateTagsIndex (self):
+        index = getattr (self.root, "tagsIndex", None)
+        if index != None:
+            index.updatePage (self)
+
+
+    @property
+    def _tags (self):
+        """
+        Список тегов страницы в том виде, как они хранятся в настройках.
+        Теги читаются из настроек при первом обращении к ним
+        """
+        if self.__tags is None:
+            with RootWikiPage._loadLock:
+                if self.__tags is None:
+                    self.__tags = self._getTags (self.params)
+
+        return self.__tags
+
+
+    @_tags.setter
+    def _tags (self, tags):
+        self.__tags = tags
 
 
     def _getIconFiles (self):
@@ -629,12 +1069,12 @@ class WikiPage (RootWikiPage):
 
     def initAfterLoading (self):
         """
-        Инициализировать после загрузки (загрузить параметры страницы)
+        Инициализировать после загрузки (загрузить параметры страницы).
+        Теги и дочерние страницы будут загружены при первом обращении к ним
         """
-        # Теги страницы
-        self._tags = self._getTags (self._params)
-
-        self._children = self.getChildren ()
+        self._tags = None
+        self._children = None
+        self._resetChildrenIndex()
     
 
     @staticmethod
@@ -646,12 +1086,25 @@ class WikiPage (RootWikiPage):
         from .factoryselector import FactorySelector
 
         title = os.path.basename(path)
-        params = RootWikiPage._readParams(path, readonly)
+
+        cache = parent.treeCache
+        params = cache.getParams (path, readonly) if cache != None else None
+
+        if params == None:
+            params = RootWikiPage._readParams(path, readonly)
+
+            # Папки, в __page.opt которых нет секции General, страницами не считаются
+            if not params.has_section (RootWikiPage.sectionGeneral):
+                raise ConfigParser.NoSectionError (RootWikiPage.sectionGeneral)
+
+            if cache != None:
+                cache.setParams (path, params)
 
         # Получим тип страницы по параметрам
         pageType = FactorySelector.getFactory(params.typeOption.value).getPageType()
 
         page = pageType (path, title, parent, readonly)
+        page._setParams (params)
         page.initAfterLoading ()
 
         return page
@@ -683,14 +1136,15 @@ class WikiPage (RootWikiPage):
         """
         Сохранить настройки
         """
-        # Тип
-        self._params.typeOption.value = self.getTypeString()
+        with ConfigTransaction():
+            # Тип
+            self.params.typeOption.value = self.getTypeString()
 
-        #Теги
-        self._saveTags()
+            #Теги
+            self._saveTags()
 
-        # Порядок страницы
-        self._params.orderOption.value = self.order
+            # Порядок страницы
+            self.params.orderOption.value = self.order
 
 
 
@@ -699,7 +1153,7 @@ class WikiPage (RootWikiPage):
 
         # Удалим начальные ", "
         tags = tags[2: ]
-        self._params.set (RootWikiPage.sectionGeneral, WikiPage.paramTags, tags)
+        self.params.set (RootWikiPage.sectionGeneral, WikiPage.paramTags, tags)
 
 
     def initAfterCreating (self, tags):
@@ -707,9 +1161,13 @@ class WikiPage (RootWikiPage):
         Инициализация после создания
         """
         self._tags = tags[:]
-        self.save()
-        self.updateDateTime()
-        self.parent.saveChildrenParams()
+
+        with ConfigTransaction():
+            self.save()
+            self.updateDateTime()
+            self.parent.saveChildrenParams()
+
+        self._updateTagsIndex()
         self.root.onPageCreate(self)
     
 
@@ -727,11 +1185,36 @@ class WikiPage (RootWikiPage):
         return tags
 
     
+    @property
+    def contentStat (self):
+        """
+        Возвращает кортеж (время изменения, размер, inode) файла с содержимым страницы
+        или None, если файла нет или по этим данным нельзя надежно заметить следующее изменение файла
+        (время изменения хранится с точностью до секунды, и файл изменялся только что)
+        """
+        try:
+            stat = os.stat (os.path.join (self.path, RootWikiPage.contentFile))
+        except OSError:
+            return None
+
+        mtime = stat.st_mtime
+        if mtime == int (mtime) and time.time() - mtime < TreeCache.racyInterval:
+            return None
+
+        return (mtime, stat.st_size, stat.st_ino)
+
+
     @property
     def content(self):
         """
-        Прочитать файл-содержимое страницы
+        Прочитать файл-содержимое страницы.
+        Файл перечитывается, только если он изменился с момента последнего чтения
         """
+        stat = self.contentStat
+        cache = self._contentCache
+        if stat != None and cache != None and cache[0] == stat:
+            return cache[1]
+
         text = ""
 
         try:
@@ -739,8 +1222,11 @@ class WikiPage (RootWikiPage):
                 text = fp.read()
         except IOError:
             pass
-        
-        return unicode (text, "utf8")
+
+        text = unicode (text, "utf8")
+        self._contentCache = (stat, text) if stat != None else None
+
+        return text
 
 
     @content.setter
@@ -754,6 +1240,9 @@ class WikiPage (RootWikiPage):
             with open (path, "wb") as fp:
                 fp.write (text.encode ("utf8"))
 
+            stat = self.contentStat
+            self._contentCache = (stat, text) if stat != None else None
+
             self.updateDateTime()
             self.root.onPageUpdate(self)
     
@@ -770,15 +1259,22 @@ class WikiPage (RootWikiPage):
 
     @property
     def subpath (self):
-        result = self.title
-        page = self.parent
+        if self._subpath == None:
+            parent = self.parent
 
-        while page.parent != None:
-            # Пока не дойдем до корня, у которого нет заголовка, и родитель - None
-            result = page.title + "/" + result
-            page = page.parent
+            # У корня путь "/", а пути остальных страниц начинаются без "/"
+            self._subpath = (self.title if parent.parent == None
+                    else parent.subpath + u"/" + self.title)
 
-        return result
+        return self._subpath
+
+
+    def _findPage (self, path):
+        # У страниц, удаленных из дерева, путь может совпадать с путем другой страницы
+        if self.isRemoved:
+            return RootWikiPage._findPage (self, path)
+
+        return self.root._findPage (self.subpath + u"/" + path)
 
 
     def remove (self):
@@ -792,6 +1288,10 @@ class WikiPage (RootWikiPage):
         tempname = self._getTempName (oldpath)
         oldSelectedPage = self.root.selectedPage
 
+        # Страницы удаляемой ветки нужно загрузить до удаления файлов, 
+        # чтобы для каждой из них было вызвано событие onPageRemove
+        self._loadAllChildren()
+
         try:
             os.renames (oldpath, tempname)
             shutil.rmtree (tempname)
@@ -822,10 +1322,15 @@ class WikiPage (RootWikiPage):
 
     def _removePageFromTree (self, page):
         page.parent.removeFromChildren (page)
+        self.root._resetSubpathsIndex()
 
         for child in page.children:
             page._removePageFromTree (child)
 
+        index = getattr (self.root, "tagsIndex", None)
+        if index != None:
+            index.removePage (page)
+
         self.root.onPageRemove (page)
 
 
@@ -834,6 +1339,11 @@ class WikiPage (RootWikiPage):
         """
         Проверить, что страница удалена
         """
-        return self not in self.parent.children
+        try:
+            self.parent._getChildOrder (self)
+        except ValueError:
+            return True
+
+        return False
     
 
@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Кеш параметров всех страниц дерева, хранящийся в одном файле в корне вики
+"""
+
+import os
+import os.path
+import json
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from .config import PageConfig
+
+
+class TreeCache (object):
+    """
+    Снимок содержимого файлов __page.opt всех страниц вики.
+
+    Вместо того, чтобы при загрузке дерева читать по одному файлу __page.opt на каждую страницу,
+    параметры страниц читаются из одного файла базы данных SQLite.
+    Запись о странице считается действительной, пока не изменились время изменения и размер
+    ее файла __page.opt. Список дочерних страниц и иконка страницы действительны,
+    пока не изменилось время изменения папки страницы.
+    """
+    fileName = u"__tree.cache"
+
+    # Версия формата файла кеша. При изменении формата кеш будет создан заново
+    version = 1
+
+    # Если время изменения файла кратно секунде (файловая система с низкой точностью времени)
+    # и файл изменялся меньше, чем racyInterval секунд назад, то запись в кеш не сохраняется,
+    # потому что следующее изменение в ту же секунду не будет замечено
+    racyInterval = 2.0
+
+    def __init__ (self, root):
+        """
+        root - корень вики (экземпляр класса WikiDocument)
+        """
+        self._root = root
+        self._fname = os.path.join (root.path, self.fileName)
+        self._readonly = root.readonly
+
+        # Блокировка, поскольку страницы могут загружаться из разных потоков
+        self._lock = threading.RLock()
+
+        # Записи о параметрах страниц.
+        # Ключ - путь до страницы относительно корня вики,
+        # значение - кортеж (optmtime, optsize, options, title, type, order, tags, datetime)
+        self._pages = {}
+
+        # Записи о содержимом папок страниц.
+        # Ключ - путь до страницы относительно корня вики,
+        # значение - кортеж (dirmtime, children, icon)
+        self._dirs = {}
+
+        # Изменения, которые еще не записаны в файл.
+        # Ключ - (имя таблицы, путь до страницы), значение - кортеж с записью или None, если запись надо удалить
+        self._pending = {}
+
+        self._enabled = sqlite3 != None
+        self._load()
+
+
+    @property
+    def enabled (self):
+        return self._enabled
+
+
+    def getKey (self, path):
+        """
+        Получить ключ для страницы, расположенной по пути path
+        """
+        relpath = os.path.relpath (path, self._root.path)
+        if relpath == os.curdir:
+            return u""
+
+        return relpath.replace (os.sep, u"/")
+
+
+    def getChildrenNames (self, page):
+        """
+        Возвращает список имен папок дочерних страниц или None, если в кеше нет действительных данных
+        """
+        dirinfo = self._getDirInfo (page.path)
+        return dirinfo[1] if dirinfo != None else None
+
+
+    def getIconName (self, page):
+        """
+        Возвращает имя файла иконки страницы (без пути), u"", если иконки нет,
+        или None, если в кеше нет действительных данных
+        """
+        dirinfo = self._getDirInfo (page.path)
+        return dirinfo[2] if dirinfo != None else None
+
+
+    def setDirInfo (self, page, children, icon):
+        """
+        Сохранить содержимое папки страницы
+        children - список имен папок дочерних страниц
+        icon - имя файла иконки или u"", если иконки нет
+        """
+        if not self._enabled:
+            return
+
+        try:
+            mtime = os.stat (page.path).st_mtime
+        except OSError:
+            return
+
+        key = self.getKey (page.path)
+
+        with self._lock:
+            if self._isRacy (mtime):
+                self._setPending (u"dirs", key, None)
+                self._dirs.pop (key, None)
+            else:
+                record = (mtime, children[:], icon)
+                self._dirs[key] = record
+                self._setPending (u"dirs", key, record)
+
+
+    def getParams (self, path, readonly=False):
+        """
+        Возвращает экземпляр класса PageConfig для страницы по пути path,
+        созданный по данным из кеша, без чтения файла __page.opt.
+        Если в кеше нет действительной записи, возвращает None
+        """
+        if not self._enabled:
+            return None
+
+        key = self.getKey (path)
+
+        with self._lock:
+            record = self._pages.get (key)
+
+        if record == None:
+            return None
+
+        fname = self._getConfigPath (path)
+
+        try:
+            stat = os.stat (fname)
+        except OSError:
+            return None
+
+        if stat.st_mtime != record[0] or stat.st_size != record[1]:
+            return None
+
+        return PageConfig (fname, readonly, record[2])
+
+
+    def setParams (self, path, params):
+        """
+        Сохранить в кеш параметры страницы
+        path - путь до страницы
+        params - экземпляр класса PageConfig
+        """
+        if not self._enabled:
+            return
+
+        key = self.getKey (path)
+
+        try:
+            stat = os.stat (self._getConfigPath (path))
+        except OSError:
+            return
+
+        with self._lock:
+            if self._isRacy (stat.st_mtime):
+                self._pages.pop (key, None)
+                self._setPending (u"pages", key, None)
+                return
+
+            values = params.getValues()
+            general = {}
+            for section, options in values:
+                if section == PageConfig.sectionName:
+                    general = dict (options)
+
+            record = (stat.st_mtime,
+                    stat.st_size,
+                    values,
+                    os.path.basename (path),
+                    self._decode (general.get (u"type", u"")),
+                    self._decode (general.get (PageConfig.orderParamName, u"")),
+                    self._decode (general.get (u"tags", u"")),
+                    self._decode (general.get (PageConfig.datetimeParamName, u"")) )
+
+            self._pages[key] = record
+            self._setPending (u"pages", key, record)
+
+
+    def updatePage (self, page):
+        """
+        Обновить в кеше данные о странице после ее изменения
+        """
+        if page.parent == None:
+            return
+
+        self.setParams (page.path, page.params)
+        self.updateChildrenList (page.parent)
+
+
+    def updateChildrenList (self, page):
+        """
+        Обновить в кеше список дочерних страниц для page
+        """
+        if not page.childrenLoaded:
+            return
+
+        try:
+            icon = page.icon if page.parent != None else None
+        except EnvironmentError:
+            self.removeDirInfo (page)
+            return
+
+        children = [os.path.basename (child.path) for child in page.children]
+        self.setDirInfo (page, children, os.path.basename (icon) if icon != None else u"")
+
+
+    def watchParams (self, params):
+        """
+        Следить за записью параметров страницы params (экземпляр класса PageConfig).
+        Файл __page.opt записывается через временный файл, что изменяет время изменения папки страницы.
+        Если до записи содержимое папки в кеше было действительным, то оно остается действительным и после нее
+        """
+        if self._enabled:
+            params.onWrite = lambda dirMtime: self._onParamsWrite (os.path.dirname (params.fname), dirMtime)
+
+
+    def _onParamsWrite (self, path, oldMtime):
+        key = self.getKey (path)
+
+        with self._lock:
+            record = self._dirs.get (key)
+            if record == None or record[0] != oldMtime:
+                return
+
+            try:
+                mtime = os.stat (path).st_mtime
+            except OSError:
+                mtime = None
+
+            if mtime == None or self._isRacy (mtime):
+                self._dirs.pop (key, None)
+                self._setPending (u"dirs", key, None)
+            else:
+                record = (mtime,) + record[1:]
+                self._dirs[key] = record
+                self._setPending (u"dirs", key, record)
+
+
+    def removeDirInfo (self, page):
+        key = self.getKey (page.path)
+
+        with self._lock:
+            self._dirs.pop (key, None)
+            self._setPending (u"dirs", key, None)
+
+
+    def removeBranch (self, key):
+        """
+        Удалить из кеша записи о странице с ключом key и всех ее дочерних страницах
+        """
+        prefix = key + u"/"
+
+        with self._lock:
+            for table, records in [(u"pages", self._pages), (u"dirs", self._dirs)]:
+                for currentKey in records.keys():
+                    if currentKey == key or currentKey.startswith (prefix):
+                        del records[currentKey]
+                        self._setPending (table, currentKey, None)
+
+
+    def renameBranch (self, oldkey, newkey):
+        """
+        Перенести записи о странице и ее дочерних страницах после переименования.
+        Время изменения файлов при переименовании не меняется, поэтому записи остаются действительными
+        """
+        prefix = oldkey + u"/"
+
+        with self._lock:
+            for table, records in [(u"pages", self._pages), (u"dirs", self._dirs)]:
+                for currentKey in records.keys():
+                    if currentKey == oldkey or currentKey.startswith (prefix):
+                        record = records.pop (currentKey)
+                        self._setPending (table, currentKey, None)
+
+                        renamedKey = newkey + currentKey[len (oldkey):]
+                        records[renamedKey] = record
+                        self._setPending (table, renamedKey, record)
+
+
+    def flush (self):
+        """
+        Записать накопившиеся изменения в файл
+        """
+        if not self._enabled or self._readonly:
+            return
+
+        with self._lock:
+            if len (self._pending) == 0:
+                return
+
+            pending = self._pending
+            self._pending = {}
+
+            try:
+                connection = self._connect()
+                try:
+                    for (table, key), record in pending.iteritems():
+                        if record == None:
+                            connection.execute (u"DELETE FROM {0} WHERE key = ?".format (table), (key,))
+                        else:
+                            connection.execute (u"INSERT OR REPLACE INTO {0} VALUES ({1})".format (
+                                table,
+                                u", ".join ([u"?"] * (len (record) + 1)) ),
+                                (key,) + self._packRecord (table, record) )
+
+                    connection.commit()
+                finally:
+                    connection.close()
+            except sqlite3.Error:
+                self._enabled = False
+
+
+    def _load (self):
+        if not self._enabled:
+            return
+
+        if not os.path.exists (self._fname):
+            # Кеш будет создан при первой записи
+            self._enabled = not self._readonly
+            return
+
+        try:
+            connection = self._connect()
+            try:
+                for row in connection.execute (u"SELECT * FROM pages"):
+                    self._pages[row[0]] = self._unpackRecord (u"pages", row[1:])
+
+                for row in connection.execute (u"SELECT * FROM dirs"):
+                    self._dirs[row[0]] = self._unpackRecord (u"dirs", row[1:])
+            finally:
+                connection.close()
+        except (sqlite3.Error, ValueError, TypeError):
+            # Файл кеша испорчен, создадим его заново
+            self._pages = {}
+            self._dirs = {}
+            self._enabled = False
+
+            if not self._readonly:
+                try:
+                    os.remove (self._fname)
+                    self._enabled = True
+                except OSError:
+                    pass
+
+
+    def _connect (self):
+        connection = sqlite3.connect (self._fname, check_same_thread=False)
+
+        # Кеш всегда можно восстановить по файлам __page.opt, 
+        # поэтому не будем ждать сброса данных на диск
+        connection.execute (u"PRAGMA synchronous = OFF")
+
+        # Журнал хранится в памяти, чтобы не изменялось время изменения папки корня вики
+        connection.execute (u"PRAGMA journal_mode = MEMORY")
+
+        userVersion = connection.execute (u"PRAGMA user_version").fetchone()[0]
+        if userVersion != self.version:
+            if self._readonly:
+                connection.close()
+                raise sqlite3.Error
+
+            connection.execute (u"DROP TABLE IF EXISTS pages")
+            connection.execute (u"DROP TABLE IF EXISTS dirs")
+            connection.execute (u"""CREATE TABLE pages (key TEXT PRIMARY KEY,
+                optmtime REAL, optsize INTEGER, options BLOB,
+                title TEXT, type TEXT, ordernum TEXT, tags TEXT, datetime TEXT)""")
+            connection.execute (u"""CREATE TABLE dirs (key TEXT PRIMARY KEY,
+                dirmtime REAL, children TEXT, icon TEXT)""")
+            connection.execute (u"PRAGMA user_version = {0}".format (self.version))
+            connection.commit()
+
+        return connection
+
+
+    def _packRecord (self, table, record):
+        if table == u"pages":
+            # Значения параметров хранятся в виде JSON, чтобы чтение кеша из чужой вики было безопасным
+            options = [(self._decode (section), 
+                [(self._decode (name), self._decode (value)) for name, value in items])
+                for section, items in record[2]]
+
+            return record[:2] + (json.dumps (options),) + record[3:]
+
+        # Имена папок не могут содержать символ "/", поэтому он используется как разделитель
+        return (record[0], u"/".join (record[1]), record[2])
+
+
+    def _unpackRecord (self, table, row):
+        if table == u"pages":
+            # ConfigParser внутри Config хранит строки в кодировке UTF-8
+            options = [(section.encode ("utf8"), 
+                [(name.encode ("utf8"), value.encode ("utf8")) for name, value in items])
+                for section, items in json.loads (row[2])]
+
+            return (row[0], row[1], options) + tuple (row[3:])
+
+        children = row[1].split (u"/") if len (row[1]) != 0 else []
+        return (row[0], children, row[2])
+
+
+    def _decode (self, value):
+        return value if isinstance (value, unicode) else unicode (value, "utf8", "replace")
+
+
+    def _setPending (self, table, key, record):
+        if not self._readonly:
+            self._pending[(table, key)] = record
+
+
+    def _getDirInfo (self, path):
+        if not self._enabled:
+            return None
+
+        with self._lock:
+            record = self._dirs.get (self.getKey (path))
+
+        if record == None:
+            return None
+
+        try:
+            mtime = os.stat (path).st_mtime
+        except OSError:
+            return None
+
+        return record if mtime == record[0] else None
+
+
+    def _getConfigPath (self, path):
+        return os.path.join (path, u"__page.opt")
+
+
+    def _isRacy (self, mtime):
+        return mtime == int (mtime) and time.time() - mtime < self.racyInterval
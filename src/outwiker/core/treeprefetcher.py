@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import threading
+from collections import deque
+
+
+class TreePrefetcher (object):
+    """
+    Класс для фоновой подгрузки дерева заметок.
+    Дочерние страницы загружаются лениво при первом обращении к ним,
+    а этот класс в отдельном потоке постепенно загружает оставшиеся страницы и их теги,
+    чтобы к моменту обращения к ним все уже было прочитано.
+    """
+    def __init__ (self, root):
+        """
+        root - корень вики, дерево которой нужно загрузить
+        """
+        self._root = root
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+
+    def start (self):
+        """
+        Запустить фоновую загрузку
+        """
+        if self._thread != None:
+            return
+
+        self._thread = threading.Thread (None, self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop (self):
+        """
+        Остановить фоновую загрузку (например, при закрытии вики)
+        """
+        self._stopEvent.set()
+
+
+    def join (self, timeout=None):
+        """
+        Дождаться окончания загрузки
+        """
+        if self._thread != None:
+            self._thread.join (timeout)
+
+
+    @property
+    def isAlive (self):
+        return self._thread != None and self._thread.isAlive()
+
+
+    def _run (self):
+        # Обходим дерево в ширину, чтобы в первую очередь загружались верхние уровни,
+        # которые скорее всего пользователь развернет раньше
+        queue = deque ([self._root])
+
+        while len (queue) != 0 and not self._stopEvent.isSet():
+            page = queue.popleft()
+
+            try:
+                children = page.children
+
+                for child in children:
+                    if self._stopEvent.isSet():
+                        return
+
+                    # Прочитаем теги
+                    child.tags
+            except EnvironmentError:
+                # Страница могла быть удалена или перемещена во время загрузки
+                continue
+
+            queue.extend (children)
@@ -0,0 +1,632 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+Отслеживание изменений в папке вики, сделанных сторонними программами
+"""
+
+import ConfigParser
+import ctypes
+import ctypes.util
+import errno
+import os
+import os.path
+import select
+import struct
+import sys
+import threading
+
+from .sortfunctions import sortPagesByOrder
+
+
+class PollingBackend (object):
+    """
+    Поиск изменений периодическим опросом папок страниц.
+    Используется, если inotify недоступен
+    """
+    def __init__ (self):
+        # Ключ - путь до папки, значение - кортеж из времени изменения папки и файлов страницы
+        self._signatures = {}
+
+
+    def wait (self, paths, timeout, stopEvent):
+        """
+        Дождаться изменений в папках paths.
+        Возвращает множество папок, в которых что-то изменилось
+        """
+        stopEvent.wait (timeout)
+
+        changed = set()
+        signatures = {}
+
+        for path in paths:
+            signature = self._getSignature (path)
+            signatures[path] = signature
+
+            old = self._signatures.get (path)
+            if old != None and old != signature:
+                changed.add (path)
+
+        self._signatures = signatures
+        return changed
+
+
+    def close (self):
+        pass
+
+
+    def _getSignature (self, path):
+        from .tree import RootWikiPage
+
+        return (self._getStat (path),
+                self._getStat (os.path.join (path, RootWikiPage.contentFile)),
+                self._getStat (os.path.join (path, RootWikiPage.pageConfig)))
+
+
+    @staticmethod
+    def _getStat (path):
+        try:
+            stat = os.stat (path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+
+
+class InotifyBackend (object):
+    """
+    Поиск изменений с помощью inotify (только Linux).
+    Если inotify недоступен, конструктор бросает исключение OSError
+    """
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_CLOEXEC = 0x00080000
+
+    watchMask = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+            IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    # Заголовок структуры inotify_event: wd, mask, cookie, len
+    _eventHeader = struct.Struct ("iIII")
+
+    # Сколько секунд ждать следующих изменений, чтобы обработать их вместе
+    batchDelay = 0.1
+
+    def __init__ (self):
+        if not sys.platform.startswith ("linux"):
+            raise OSError (errno.ENOSYS, u"inotify is not available")
+
+        libname = ctypes.util.find_library ("c")
+        if libname == None:
+            raise OSError (errno.ENOSYS, u"libc is not found")
+
+        self._libc = ctypes.CDLL (libname, use_errno=True)
+
+        try:
+            self._addWatch = self._libc.inotify_add_watch
+            self._rmWatch = self._libc.inotify_rm_watch
+            init = self._libc.inotify_init1
+        except AttributeError:
+            raise OSError (errno.ENOSYS, u"inotify is not available")
+
+        self._fd = init (self.IN_CLOEXEC)
+        if self._fd < 0:
+            self._raiseError()
+
+        # Ключ - дескриптор наблюдения, значение - путь до папки
+        self._paths = {}
+
+        # Ключ - путь до папки, значение - дескриптор наблюдения
+        self._watches = {}
+
+
+    def wait (self, paths, timeout, stopEvent):
+        """
+        Дождаться изменений в папках paths.
+        Возвращает множество папок, в которых что-то изменилось
+        """
+        self._updateWatches (paths)
+
+        changed = set()
+        ready = select.select ([self._fd], [], [], timeout)[0]
+
+        while len (ready) != 0 and not stopEvent.isSet():
+            if self._readEvents (changed):
+                # Часть событий потеряна, проверим все папки
+                changed.update (self._watches.keys())
+
+            ready = select.select ([self._fd], [], [], self.batchDelay)[0]
+
+        return changed
+
+
+    def close (self):
+        if self._fd >= 0:
+            os.close (self._fd)
+            self._fd = -1
+
+
+    def _updateWatches (self, paths):
+        paths = set (paths)
+
+        for path in set (self._watches.keys()) - paths:
+            wd = self._watches.pop (path)
+            self._paths.pop (wd, None)
+            self._rmWatch (self._fd, wd)
+
+        for path in paths:
+            if path in self._watches:
+                continue
+
+            fname = path.encode (sys.getfilesystemencoding()) if isinstance (path, unicode) else path
+            wd = self._addWatch (self._fd, fname, self.watchMask)
+
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    # Папка уже удалена или недоступна
+                    continue
+
+                self._raiseError (error)
+
+            # Одна и та же папка могла попасть в список под другим путем (например, через ссылку)
+            oldpath = self._paths.get (wd)
+            if oldpath != None:
+                self._watches.pop (oldpath, None)
+
+            self._paths[wd] = path
+            self._watches[path] = wd
+
+
+    def _readEvents (self, changed):
+        """
+        Прочитать события и добавить в множество changed папки, в которых произошли изменения.
+        Возвращает True, если очередь событий переполнилась
+        """
+        data = os.read (self._fd, 64 * 1024)
+        overflow = False
+        pos = 0
+
+        while pos + self._eventHeader.size <= len (data):
+            wd, mask, cookie, length = self._eventHeader.unpack_from (data, pos)
+            pos += self._eventHeader.size + length
+
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+                continue
+
+            path = self._paths.get (wd)
+            if path == None:
+                continue
+
+            changed.add (path)
+
+            if mask & self.IN_IGNORED:
+                # Папка удалена, наблюдение за ней снято
+                self._paths.pop (wd, None)
+                self._watches.pop (path, None)
+
+        return overflow
+
+
+    def _raiseError (self, error=None):
+        if error == None:
+            error = ctypes.get_errno()
+
+        raise OSError (error, os.strerror (error))
+
+
+
+class TreeWatcher (object):
+    """
+    Отслеживание изменений в папках загруженных страниц, сделанных сторонними программами.
+
+    Изменения ищутся в отдельном потоке с помощью inotify. Если inotify недоступен (или превышен
+    лимит наблюдаемых папок), папки опрашиваются периодически, но только если это разрешено
+    параметром pollingEnabled. При опросе проверяются только видимые в дереве страницы
+    (ветки, которые раскрыты), выбранная страница и ее предки.
+    После обнаружения изменений вызывается функция notify (из рабочего потока),
+    которая должна вызвать метод processChanges() в основном потоке.
+    processChanges() обновляет дерево и вызывает события onPageUpdate, onTreeUpdate и т.п.
+    Собственные изменения программы при этом не приводят к вызову событий,
+    поскольку загруженные данные страниц с ними уже совпадают
+    """
+    # Минимальный интервал опроса папок (в секундах)
+    interval = 2.0
+
+    # Время (в секундах), которое добавляется к интервалу опроса на каждую опрашиваемую папку,
+    # чтобы на больших деревьях опрос не нагружал диск постоянно
+    intervalPerPath = 0.002
+
+    # Секция и параметр страницы, в которых дерево страниц сохраняет, раскрыта ли ветка (см. WikiTree)
+    expandSection = u"Tree"
+    expandOption = u"Expand"
+
+    def __init__ (self, root, notify=None):
+        """
+        root - корень вики (экземпляр класса WikiDocument)
+        notify - функция без параметров, которая вызывается из рабочего потока при обнаружении изменений
+        """
+        self._root = root
+        self.notify = notify
+
+        # Разрешить опрос папок, если inotify недоступен
+        self.pollingEnabled = False
+
+        self._lock = threading.Lock()
+        self._stopEvent = None
+        self._thread = None
+
+        # Папки, в которых обнаружены изменения, но они еще не обработаны
+        self._changed = set()
+
+        # Папки, которые еще не удалось загрузить как страницы (например, в них еще не создан __page.opt)
+        self._candidates = set()
+
+
+    def start (self):
+        """
+        Запустить отслеживание изменений
+        """
+        if self._thread != None:
+            return
+
+        # У каждого запуска свое событие остановки, чтобы после перезапуска
+        # не продолжил работу поток, который еще не успел завершиться
+        self._stopEvent = threading.Event()
+        self._thread = threading.Thread (None, self._run, args=(self._stopEvent,))
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop (self):
+        """
+        Остановить отслеживание изменений (например, при закрытии вики)
+        """
+        if self._thread != None:
+            self._stopEvent.set()
+            self._thread = None
+
+        with self._lock:
+            self._changed = set()
+
+
+    @property
+    def isAlive (self):
+        return self._thread != None and self._thread.isAlive()
+
+
+    def addChanges (self, paths):
+        """
+        Пометить папки paths как измененные. Они будут проверены при следующем вызове processChanges()
+        """
+        with self._lock:
+            self._changed.update (paths)
+
+
+    def processChanges (self):
+        """
+        Обработать обнаруженные изменения. Вызывается из основного потока
+        """
+        with self._lock:
+            changed = self._changed
+            self._changed = set()
+
+        if len (changed) == 0:
+            return
+
+        pages = self._getLoadedPages()
+        root = self._root
+
+        with self._lock:
+            candidates = set (self._candidates)
+
+        # Страницы, в папках которых есть изменения. Родители обрабатываются раньше дочерних страниц
+        updated = []
+        for path in sorted (changed, key=len):
+            page = pages.get (path)
+            if page != None:
+                updated.append (page)
+            elif path in candidates:
+                # В новой папке что-то появилось, проверим, не стала ли она страницей
+                parent = pages.get (os.path.dirname (path))
+                if parent != None and parent not in updated:
+                    updated.append (parent)
+
+        # Сначала изменения структуры дерева
+        treeChanged = False
+        oldSelectedPage = root.selectedPage
+
+        for page in updated:
+            if self._isRemoved (page):
+                continue
+
+            treeChanged = self._updateChildren (page, treeChanged) or treeChanged
+
+        if treeChanged:
+            self._updateSelectedPage (oldSelectedPage)
+            root.onEndTreeUpdate (root)
+
+        # Затем изменения самих страниц
+        for page in updated:
+            if self._isRemoved (page):
+                continue
+
+            if self._updateIcon (page):
+                root.onTreeUpdate (page)
+
+            if self._updateContent (page) | self._updateParams (page):
+                root.onPageUpdate (page)
+
+
+    def _run (self, stopEvent):
+        backend = self._createBackend()
+        if backend == None:
+            return
+
+        try:
+            while not stopEvent.isSet():
+                with self._lock:
+                    candidates = list (self._candidates)
+
+                if isinstance (backend, PollingBackend):
+                    paths = self._getVisiblePages().keys() + candidates
+                    interval = max (self.interval, len (paths) * self.intervalPerPath)
+                else:
+                    paths = self._getLoadedPages().keys() + candidates
+                    interval = self.interval
+
+                try:
+                    changed = backend.wait (paths, interval, stopEvent)
+                except EnvironmentError:
+                    # Например, превышено количество наблюдаемых папок в inotify
+                    backend.close()
+                    backend = self._createPollingBackend()
+                    if backend == None:
+                        return
+
+                    continue
+
+                if len (changed) != 0 and not stopEvent.isSet():
+                    self.addChanges (changed)
+
+                    if self.notify != None:
+                        self.notify()
+        finally:
+            backend.close()
+
+
+    def _createBackend (self):
+        """
+        Возвращает объект для поиска изменений или None, если изменения искать не нужно
+        """
+        try:
+            return InotifyBackend()
+        except EnvironmentError:
+            return self._createPollingBackend()
+
+
+    def _createPollingBackend (self):
+        return PollingBackend() if self.pollingEnabled else None
+
+
+    def _getLoadedPages (self):
+        """
+        Возвращает словарь: путь до папки страницы - страница для всех загруженных страниц.
+        Может вызываться из рабочего потока, поэтому дочерние страницы не загружает
+        """
+        result = {}
+        pages = [self._root]
+
+        while len (pages) != 0:
+            page = pages.pop()
+            result[page.path] = page
+
+            children = page._children
+            if isinstance (children, list):
+                pages.extend (children[:])
+
+        return result
+
+
+    def _getVisiblePages (self):
+        """
+        Возвращает словарь: путь до папки страницы - страница для страниц,
+        которые видны в дереве (дочерние страницы корня и раскрытых веток),
+        а также для выбранной страницы и ее предков.
+        Может вызываться из рабочего потока, поэтому не загружает ни дочерние страницы, ни их параметры
+        """
+        result = {}
+        pages = [self._root]
+
+        while len (pages) != 0:
+            page = pages.pop()
+            result[page.path] = page
+
+            children = page._children
+            if isinstance (children, list) and (page.parent == None or self._isExpanded (page)):
+                pages.extend (children[:])
+
+        page = self._root.selectedPage
+        while page != None:
+            result[page.path] = page
+            page = page.parent
+
+        return result
+
+
+    def _isExpanded (self, page):
+        params = page._params
+        if params == None:
+            return False
+
+        try:
+            return params.getbool (self.expandSection, self.expandOption)
+        except ConfigParser.Error:
+            return False
+
+
+    def _isRemoved (self, page):
+        return page.parent != None and page.isRemoved
+
+
+    def _updateChildren (self, page, treeUpdateStarted):
+        """
+        Привести список загруженных дочерних страниц в соответствие с папками на диске.
+        treeUpdateStarted - True, если событие onStartTreeUpdate уже вызвано.
+        Возвращает True, если список дочерних страниц изменился
+        """
+        if not page.childrenLoaded:
+            return False
+
+        try:
+            names = page._listDir()[0]
+        except EnvironmentError:
+            return False
+
+        children = dict ([(os.path.basename (child.path), child) for child in page.iterChildren()])
+        removed = [child for name, child in children.iteritems() if name not in names]
+        added = [name for name in names if name not in children]
+
+        if len (removed) == 0 and len (added) == 0:
+            return False
+
+        from .tree import WikiPage
+
+        root = self._root
+        changed = False
+
+        for child in removed:
+            if not changed and not treeUpdateStarted:
+                root.onStartTreeUpdate (root)
+            changed = True
+
+            child._removePageFromTree (child)
+
+        for name in added:
+            path = os.path.join (page.path, name)
+
+            try:
+                child = WikiPage.load (path, page, page.readonly)
+            except Exception:
+                with self._lock:
+                    self._candidates.add (path)
+                continue
+
+            with self._lock:
+                self._candidates.discard (path)
+
+            if not changed and not treeUpdateStarted:
+                root.onStartTreeUpdate (root)
+            changed = True
+
+            page.addToChildren (child)
+            root.onPageCreate (child)
+
+        # Удалим папки, которых уже нет
+        with self._lock:
+            self._candidates = set ([path for path in self._candidates
+                if os.path.dirname (path) != page.path or os.path.basename (path) in names])
+
+        return changed
+
+
+    def _updateSelectedPage (self, oldSelectedPage):
+        """
+        Если выбранная страница была удалена, выбрать ближайшего из оставшихся предков
+        """
+        if oldSelectedPage == None or not oldSelectedPage.isRemoved:
+            return
+
+        newSelectedPage = oldSelectedPage
+        while newSelectedPage.parent != None and newSelectedPage.isRemoved:
+            newSelectedPage = newSelectedPage.parent
+
+        if newSelectedPage.parent == None:
+            newSelectedPage = None
+
+        self._root.selectedPage = newSelectedPage
+
+
+    def _updateIcon (self, page):
+        """
+        Возвращает True, если изменилась иконка страницы
+        """
+        if page.parent == None or page._iconName == None:
+            return False
+
+        try:
+            icon = page._listDir()[1]
+        except EnvironmentError:
+            return False
+
+        if icon == page._iconName:
+            return False
+
+        page._iconName = icon
+        return True
+
+
+    def _updateContent (self, page):
+        """
+        Возвращает True, если файл с содержимым страницы изменился с момента последнего чтения
+        """
+        if page.parent == None:
+            return False
+
+        cache = page._contentCache
+        if cache == None or cache[0] == page.contentStat:
+            return False
+
+        page._contentCache = None
+        return True
+
+
+    def _updateParams (self, page):
+        """
+        Перечитать параметры страницы, если файл __page.opt изменился.
+        Возвращает True, если параметры изменились
+        """
+        if page.parent == None or page._params == None or page.params.dirty:
+            return False
+
+        from .tree import RootWikiPage
+
+        try:
+            params = RootWikiPage._readParams (page.path, page.readonly)
+        except EnvironmentError:
+            return False
+
+        if (not params.has_section (RootWikiPage.sectionGeneral) or
+                self._getParamsDict (params) == self._getParamsDict (page.params)):
+            return False
+
+        oldorder = page.params.orderOption.value
+
+        page._setParams (params)
+        page._tags = None
+        page._updateTagsIndex()
+
+        if params.orderOption.value != oldorder:
+            parent = page.parent
+            sortPagesByOrder (parent._getChildrenList())
+            parent._onChildrenReordered()
+            self._root.onPageOrderChange (page)
+
+        return True
+
+
+    @staticmethod
+    def _getParamsDict (params):
+        """
+        Возвращает значения параметров в виде словаря, который не зависит от порядка параметров в файле
+        """
+        return dict ([(section, dict (options)) for section, options in params.getValues()])
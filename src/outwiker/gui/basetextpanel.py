@@ -47,6 +47,10 @@ class BaseTextPanel (BasePagePanel):
         # Используется для выявления изменения страницы внешними средствами
         self._oldContent = None
 
+        # Время изменения, размер и inode файла страницы (page.contentStat) для self._oldContent.
+        # Пока они не изменились, файл страницы не перечитывается
+        self._oldContentStat = None
+
         # Диалог, который показывается, если страница изменена сторонними программами.
         # Используется для проверки того, что диалог уже показан и еще раз его показывать не надо
         self.externalEditDialog = None
@@ -67,6 +71,8 @@ class BaseTextPanel (BasePagePanel):
 
 
     def __updateOldContent (self):
+        # Сначала получим данные о файле, чтобы не пропустить изменение, сделанное во время чтения
+        self._oldContentStat = self.page.contentStat
         self._oldContent = self.page.content
 
 
@@ -92,7 +98,7 @@ class BaseTextPanel (BasePagePanel):
         """
         Проверить, что страница не изменена внешними средствами
         """
-        if self._oldContent != None and self._oldContent != self.page.content:
+        if self.__isExternalEdit():
             # Старое содержимое не совпадает с содержимым страницы.
             # Значит содержимое страницы кто-то изменил
             self.__externalEdit()
@@ -101,6 +107,21 @@ class BaseTextPanel (BasePagePanel):
             self.__updateOldContent()
 
 
+    def __isExternalEdit (self):
+        """
+        Возвращает True, если файл страницы изменен внешними средствами.
+        Содержимое файла сравнивается, только если изменились время изменения, размер или inode файла
+        """
+        if self._oldContent == None:
+            return False
+
+        stat = self.page.contentStat
+        if stat != None and stat == self._oldContentStat:
+            return False
+
+        return self._oldContent != self.page.content
+
+
     def __externalEdit (self):
         """
         Спросить у пользователя, что делать, если страница изменилась внешними средствами
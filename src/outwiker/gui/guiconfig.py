@@ -30,6 +30,9 @@ class GeneralGuiConfig (object):
     DATETIME_FORMAT_PARAM = u"DateTimeFormat"
     DATETIME_FORMAT_DEFAULT = u"%c"
 
+    POLL_WIKI_CHANGES_PARAM = u"PollWikiChanges"
+    POLL_WIKI_CHANGES_DEFAULT = False
+
 
     def __init__ (self, config):
         self.config = config
@@ -64,6 +67,12 @@ class GeneralGuiConfig (object):
                 GeneralGuiConfig.DATETIME_FORMAT_PARAM, 
                 GeneralGuiConfig.DATETIME_FORMAT_DEFAULT)
 
+        # Опрашивать папки вики, чтобы найти изменения сторонних программ, если inotify недоступен?
+        self.pollWikiChanges = BooleanOption (self.config, 
+                GeneralGuiConfig.GENERAL_SECTION, 
+                GeneralGuiConfig.POLL_WIKI_CHANGES_PARAM, 
+                GeneralGuiConfig.POLL_WIKI_CHANGES_DEFAULT)
+
 
 class PluginsConfig (object):
     """
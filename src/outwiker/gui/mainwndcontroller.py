@@ -109,6 +109,7 @@ class MainWndController (object):
         Application.onBookmarksChanged += self.__onBookmarksChanged
         Application.onTreeUpdate += self.__onTreeUpdate
         Application.onWikiOpen += self.__onWikiOpen
+        Application.onWikiClose += self.__onWikiClose
         Application.onPageUpdate += self.__onPageUpdate
 
 
@@ -118,6 +119,7 @@ class MainWndController (object):
         Application.onBookmarksChanged -= self.__onBookmarksChanged
         Application.onTreeUpdate -= self.__onTreeUpdate
         Application.onWikiOpen -= self.__onWikiOpen
+        Application.onWikiClose -= self.__onWikiClose
         Application.onPageUpdate -= self.__onPageUpdate
 
 
@@ -156,6 +158,26 @@ class MainWndController (object):
         self.updateTitle()
         self.updatePageDateTime()
 
+        if wikiroot != None:
+            # Изменения, сделанные сторонними программами, обрабатываются в основном потоке
+            watcher = wikiroot.watcher
+            watcher.notify = lambda: wx.CallAfter (watcher.processChanges)
+            watcher.pollingEnabled = GeneralGuiConfig (Application.config).pollWikiChanges.value
+            watcher.start()
+
+
+    def __onWikiClose (self, wikiroot):
+        outwiker.core.commands.stopTreePrefetch()
+
+        if wikiroot != None:
+            wikiroot.watcher.stop()
+
+            # Отложенные изменения поискового индекса и кеша дерева
+            wikiroot.searchIndex.flush()
+
+            if wikiroot.treeCache != None:
+                wikiroot.treeCache.flush()
+
 
     def updateBookmarks (self):
         self.bookmarks.updateBookmarks()
@@ -119,6 +119,7 @@ class GeneralPanel (wx.ScrolledWindow):
         Создать элементы интерфейса, которые не попали ни в какую другую категорию
         """
         self.askBeforeExitCheckBox = wx.CheckBox(self, -1, _("Ask before exit"))
+        self.pollWikiChangesCheckBox = wx.CheckBox(self, -1, _("Check the wiki folder for changes made by other programs periodically"))
 
 
     def __createTrayGui (self):
@@ -200,6 +201,7 @@ class GeneralPanel (wx.ScrolledWindow):
         main_sizer.Add(self.alwaysInTrayCheckBox, 0, wx.ALL, 2)
         main_sizer.Add(self.minimizeOnCloseCheckBox, 0, wx.ALL, 2)
         main_sizer.Add(self.askBeforeExitCheckBox, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 2)
+        main_sizer.Add(self.pollWikiChangesCheckBox, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 2)
         main_sizer.Add (self.autosaveSizer, 1, wx.EXPAND, 0)
 
         self.__addStaticLine(main_sizer)
@@ -277,6 +279,12 @@ class GeneralPanel (wx.ScrolledWindow):
                 self.askBeforeExitCheckBox
                 )
 
+        # Опрашивать папки вики, если inotify недоступен?
+        self.pollWikiChanges = configelements.BooleanElement (
+                self.generalConfig.pollWikiChanges, 
+                self.pollWikiChangesCheckBox
+                )
+
         # Формат заголовка страницы
         self.titleFormat = configelements.StringElement (
                 self.mainWindowConfig.titleFormat, 
@@ -327,6 +335,7 @@ class GeneralPanel (wx.ScrolledWindow):
         self.minimizeToTray.save()
         self.minimizeOnClose.save()
         self.askBeforeExit.save()
+        self.pollWikiChanges.save()
         self.historyLength.save()
         self.autoopen.save()
         self.autosaveInterval.save()
@@ -7,7 +7,7 @@ from .taglabel import EVT_TAG_LEFT_CLICK, EVT_TAG_MIDDLE_CLICK
 from outwiker.core.tagslist import TagsList
 from outwiker.core.tree import RootWikiPage
 from outwiker.core.tagscommands import removeTag, appendTag
-from outwiker.core.sortfunctions import sortAlphabeticalFunction
+from outwiker.core.sortfunctions import sortAlphabeticalKey
 
 
 class TagsPanelController (object):
@@ -16,6 +16,10 @@ class TagsPanelController (object):
         self.__application = application
         self.__currentTags = None
 
+        # Корень вики и значение счетчика изменений индекса тегов,
+        # для которых было построено облако тегов
+        self.__currentState = None
+
         self.__bindAppEvents()
         self.__tagsPanel.Bind (EVT_PAGE_CLICK, self.__onPageClick)
         self.__tagsPanel.Bind (EVT_TAG_LEFT_CLICK, self.__onTagLeftClick)
@@ -41,7 +45,7 @@ class TagsPanelController (object):
         assert self.__currentTags != None
 
         pages = self.__currentTags[event.text][:]
-        pages.sort (sortAlphabeticalFunction)
+        pages.sort (key=sortAlphabeticalKey)
 
         self.__tagsPanel.showPopup(pages)
 
@@ -89,37 +93,24 @@ class TagsPanelController (object):
         self.updateTags()
 
 
-    def __isEqual (self, taglist1, taglist2):
-        """
-        Возвращает True, если списки тегов одинаковые, и False в противном случае
-        """
-        if taglist1 == None or taglist2 == None:
-            return False
-
-        keys1 = taglist1.tags
-        keys2 = taglist2.tags
-
-        if keys1 != keys2:
-            return False
-
-        for key in keys1:
-            if len (taglist2[key]) != len (taglist1[key]):
-                return False
-
-        return True
-
-
     def updateTags (self):
-        if self.__application.wikiroot == None:
+        root = self.__application.wikiroot
+
+        if root == None:
             self.__tagsPanel.clearMarks()
             self.__tagsPanel.clearTags()
+            self.__currentTags = None
+            self.__currentState = None
             return
 
-        tags = TagsList (self.__application.wikiroot)
+        # Облако перестраивается, только если индекс тегов изменился
+        state = (root, root.tagsIndex.generation)
 
-        if not self.__isEqual (tags, self.__currentTags):
+        if state != self.__currentState:
+            tags = TagsList (root)
             self.__tagsPanel.setTags (tags)
             self.__currentTags = tags
+            self.__currentState = (root, root.tagsIndex.generation)
             self.__markTags()
 
 
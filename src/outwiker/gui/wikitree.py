@@ -13,6 +13,7 @@ import outwiker.core.commands
 import outwiker.core.system
 import outwiker.gui.pagedialog
 from outwiker.core.config import BooleanOption
+from outwiker.core.iconscache import IconsImageList
 from .mainid import MainId
 from .pagepopupmenu import PagePopupMenu
 
@@ -46,17 +47,15 @@ class WikiTree(wx.Panel):
         self.defaultIcon = os.path.join (outwiker.core.system.getImagesDir(), "page.png")
         self.iconHeight = 16
 
-        self.defaultBitmap = wx.Bitmap (self.defaultIcon)
-        assert self.defaultBitmap.IsOk()
-
-        self.defaultBitmap.SetHeight (self.iconHeight)
-
         self.dragItem = None
 
         # Картинки для дерева
         self.imagelist = wx.ImageList(16, self.iconHeight)
         self.treeCtrl.AssignImageList (self.imagelist)
 
+        # Одинаковые иконки страниц занимают в списке картинок один элемент
+        self.icons = IconsImageList (Application.iconsCache, self.imagelist)
+
         # Кеш для страниц, чтобы было проще искать элемент дерева по странице
         # Словарь. Ключ - страница, значение - элемент дерева wx.TreeItemId
         self._pageCache = {}
@@ -92,6 +91,7 @@ class WikiTree(wx.Panel):
         Application.onPageOrderChange += self.__onPageOrderChange
         Application.onPageSelect += self.__onPageSelect
         Application.onPageRemove += self.__onPageRemove
+        Application.onPageMove += self.__onPageMove
 
         Application.onStartTreeUpdate += self.__onStartTreeUpdate
         Application.onEndTreeUpdate += self.__onEndTreeUpdate
@@ -107,6 +107,7 @@ class WikiTree(wx.Panel):
         Application.onPageOrderChange -= self.__onPageOrderChange
         Application.onPageSelect -= self.__onPageSelect
         Application.onPageRemove -= self.__onPageRemove
+        Application.onPageMove -= self.__onPageMove
 
         Application.onStartTreeUpdate -= self.__onStartTreeUpdate
         Application.onEndTreeUpdate -= self.__onEndTreeUpdate
@@ -205,7 +206,38 @@ class WikiTree(wx.Panel):
 
 
     def __onPageRemove (self, page):
-        self.__removePageItem (page)
+        item = self.getTreeItem (page)
+        if item == None:
+            return
+
+        self.treeCtrl.Freeze()
+        try:
+            self.__removeItem (item)
+        finally:
+            self.treeCtrl.Thaw()
+
+
+    def __onPageMove (self, page, oldParent):
+        """
+        Перемещение страницы к другому родителю. Переносится только ветвь перемещенной страницы
+        """
+        # Отпишемся от обновлений страниц, чтобы не изменять выбранную страницу
+        self.__unbindUpdateEvents()
+        self.treeCtrl.Freeze()
+
+        try:
+            item = self.getTreeItem (page)
+            if item != None:
+                self.__removeItem (item)
+
+            if self.getTreeItem (page.parent) != None:
+                self.__appendChildren (page.parent)
+
+            if page.root.selectedPage == page:
+                self.selectedPage = page
+        finally:
+            self.treeCtrl.Thaw()
+            self.__bindUpdateEvents()
 
 
     def __onTreeItemActivated (self, event):
@@ -311,12 +343,13 @@ class WikiTree(wx.Panel):
         Application.onPageCreate -= self.__onPageCreate
         Application.onPageSelect -= self.__onPageSelect
         Application.onPageOrderChange -= self.__onPageOrderChange
+        Application.onPageMove -= self.__onPageMove
         self.Unbind (wx.EVT_TREE_SEL_CHANGED, handler = self.__onSelChanged)
 
     
     def __onEndTreeUpdate (self, root):
         self.__bindUpdateEvents()
-        self.__treeUpdate (Application.wikiroot)
+        self.__syncTree (Application.wikiroot)
 
 
     def __bindUpdateEvents (self):
@@ -324,6 +357,7 @@ class WikiTree(wx.Panel):
         Application.onPageCreate += self.__onPageCreate
         Application.onPageSelect += self.__onPageSelect
         Application.onPageOrderChange += self.__onPageOrderChange
+        Application.onPageMove += self.__onPageMove
         self.Bind (wx.EVT_TREE_SEL_CHANGED, self.__onSelChanged)
 
 
@@ -351,7 +385,19 @@ class WikiTree(wx.Panel):
 
 
     def __onTreeUpdate (self, sender):
-        self.__treeUpdate (sender.root)
+        """
+        Изменения структуры дерева приходят в отдельных событиях (создание, удаление, перемещение страниц),
+        поэтому здесь обновляется только элемент страницы sender (заголовок, иконка)
+        """
+        if sender.parent == None or self.getTreeItem (sender.root) == None:
+            self.__treeUpdate (sender.root)
+            return
+
+        self.treeCtrl.Freeze()
+        try:
+            self.__updateItem (sender)
+        finally:
+            self.treeCtrl.Thaw()
 
 
     def __onPageSelect (self, page):
@@ -451,28 +497,110 @@ class WikiTree(wx.Panel):
         # self.treeCtrl.Unbind (wx.EVT_TREE_ITEM_COLLAPSED, handler = self.__onTreeStateChanged)
         # self.treeCtrl.Unbind (wx.EVT_TREE_ITEM_EXPANDED, handler = self.__onTreeStateChanged)
         
-        self.treeCtrl.DeleteAllItems()
-        self.imagelist.RemoveAll()
-        self.defaultImageId = self.imagelist.Add (self.defaultBitmap)
-        self._pageCache = {}
-
-        if rootPage != None:
-            rootname = os.path.basename (rootPage.path)
-            rootItem = self.treeCtrl.AddRoot (rootname, 
-                    data = wx.TreeItemData (rootPage),
-                    image = self.defaultImageId)
-
-            self._pageCache[rootPage] = rootItem
-            self.__mountItem (rootItem, rootPage)
-            self.__appendChildren (rootPage)
+        self.treeCtrl.Freeze()
 
-            self.selectedPage = rootPage.selectedPage
-            self.expand (rootPage)
+        try:
+            self.treeCtrl.DeleteAllItems()
+            self.icons.clear()
+            self.defaultImageId = self.icons.add (self.defaultIcon)
+            assert self.defaultImageId != None
+            self._pageCache = {}
+
+            if rootPage != None:
+                rootname = os.path.basename (rootPage.path)
+                rootItem = self.treeCtrl.AddRoot (rootname, 
+                        data = wx.TreeItemData (rootPage),
+                        image = self.defaultImageId)
+
+                self._pageCache[rootPage] = rootItem
+                self.__mountItem (rootItem, rootPage)
+                self.__appendChildren (rootPage)
+
+                self.selectedPage = rootPage.selectedPage
+                self.expand (rootPage)
+        finally:
+            self.treeCtrl.Thaw()
 
         # self.treeCtrl.Bind (wx.EVT_TREE_ITEM_COLLAPSED, self.__onTreeStateChanged)
         # self.treeCtrl.Bind (wx.EVT_TREE_ITEM_EXPANDED, self.__onTreeStateChanged)
     
 
+    def __syncTree (self, rootPage):
+        """
+        Привести дерево в соответствие со страницами после сложного обновления.
+        Пересоздаются только ветви, в которых изменился состав или порядок страниц
+        """
+        if rootPage == None or self.getTreeItem (rootPage) == None:
+            self.__treeUpdate (rootPage)
+            return
+
+        self.treeCtrl.Freeze()
+
+        try:
+            self.__syncChildren (rootPage)
+            self.selectedPage = rootPage.selectedPage
+        finally:
+            self.treeCtrl.Thaw()
+
+
+    def __syncChildren (self, page):
+        """
+        Привести дочерние элементы страницы page в соответствие с ее дочерними страницами
+        """
+        items = self.__getChildItems (self.getTreeItem (page))
+
+        if len (items) == 0 and not self.__loadExpandState (page.parent):
+            # Дочерние страницы еще не добавлялись в дерево (см. __appendChildren)
+            return
+
+        children = page.children
+        childrenSet = set (children)
+
+        for childItem, child in items:
+            if child not in childrenSet:
+                self.__removeItem (childItem)
+
+        items = [(childItem, child) for (childItem, child) in items if child in childrenSet]
+        present = set ([child for (childItem, child) in items])
+
+        if [child for (childItem, child) in items] != [child for child in children if child in present]:
+            # Изменился порядок страниц
+            for childItem, child in items:
+                self.__removeItem (childItem)
+
+            items = []
+            present = set()
+
+        for child in children:
+            if child not in present:
+                oldItem = self.getTreeItem (child)
+                if oldItem != None:
+                    # Страница перемещена из ветки, которая еще не обработана
+                    self.__removeItem (oldItem)
+
+                self.__insertChild (child)
+
+        for childItem, child in items:
+            if self.treeCtrl.GetItemText (childItem) != child.title:
+                self.treeCtrl.SetItemText (childItem, child.title)
+
+            self.__syncChildren (child)
+
+
+    def __getChildItems (self, item):
+        """
+        Возвращает список кортежей (дочерний элемент дерева, страница)
+        """
+        result = []
+        child, cookie = self.treeCtrl.GetFirstChild (item)
+
+        while child.IsOk():
+            result.append ((child, self.treeCtrl.GetItemData (child).GetData()))
+            child = self.treeCtrl.GetNextSibling (child)
+
+        return result
+
+
     def __appendChildren (self, parentPage):
         """
         Добавить детей в дерево
@@ -512,16 +640,7 @@ class WikiTree(wx.Panel):
                 child.title, 
                 data = wx.TreeItemData(child) )
 
-        icon = child.icon
-
-        if icon != None:
-            image = wx.Bitmap (icon)
-            image.SetHeight (self.iconHeight)
-            imageId = self.imagelist.Add (image)
-        else:
-            imageId = self.defaultImageId
-            
-        self.treeCtrl.SetItemImage (item, imageId)
+        self.treeCtrl.SetItemImage (item, self.__getImageId (child))
 
         self._pageCache[child] = item
         self.__mountItem (item, child)
@@ -530,17 +649,50 @@ class WikiTree(wx.Panel):
         return item
 
 
-    def __removePageItem (self, page):
+    def __getImageId (self, page):
         """
-        Удалить элемент, соответствующий странице и все его дочерние страницы
+        Возвращает номер иконки страницы в списке картинок
         """
-        for child in page.children:
-            self.__removePageItem (child)
+        icon = page.icon
+        imageId = self.icons.add (icon) if icon != None else None
+
+        return imageId if imageId != None else self.defaultImageId
 
+
+    def __updateItem (self, page):
+        """
+        Обновить заголовок, иконку и оформление элемента страницы, не пересоздавая его
+        """
         item = self.getTreeItem (page)
-        if item != None:
+        if item == None:
+            return
+
+        if self.treeCtrl.GetItemText (item) != page.title:
+            self.treeCtrl.SetItemText (item, page.title)
+
+        self.treeCtrl.SetItemImage (item, self.__getImageId (page))
+        self.__mountItem (item, page)
+
+
+    def __removeItem (self, item):
+        """
+        Удалить элемент дерева вместе с дочерними элементами
+        """
+        self.__forgetItem (item)
+        self.treeCtrl.Delete (item)
+
+
+    def __forgetItem (self, item):
+        """
+        Удалить из кеша страниц элемент item и все его дочерние элементы.
+        Сами элементы дерева не удаляются
+        """
+        for childItem, child in self.__getChildItems (item):
+            self.__forgetItem (childItem)
+
+        page = self.treeCtrl.GetItemData (item).GetData()
+        if page in self._pageCache and self._pageCache[page] == item:
             del self._pageCache[page]
-            self.treeCtrl.Delete (item)
 
 
     def __updatePage (self, page):
@@ -552,7 +704,12 @@ class WikiTree(wx.Panel):
         self.treeCtrl.Freeze()
 
         try:
-            self.__removePageItem (page)
+            item = self.getTreeItem (page)
+            if item != None:
+                self.__removeItem (item)
+
+            if self.getTreeItem (page.parent) == None:
+                return
 
             item = self.__insertChild (page)
 
@@ -3,6 +3,7 @@
 
 import os
 import datetime
+import cgi
 
 from outwiker.gui.guiconfig import GeneralGuiConfig
 
@@ -11,16 +12,26 @@ class HtmlReport (object):
     """
     Класс для генерации HTML-а, для вывода найденных страниц
     """
-    def __init__ (self, pages, searchPhrase, searchTags, application):
+    def __init__ (self, pages, searchPhrase, searchTags, application, first=0, count=None):
         """
         pages - список найденных страниц
         searchPhrase - искомая фраза
         searchTags - теги, которые участвуют в поиске
+        first - номер первой страницы из pages, которая попадет в отчет
+        count - количество страниц в отчете (None - все страницы, начиная с first)
         """
         self.__pages = pages
         self.__searchPhrase = searchPhrase
         self.__searchTags = searchTags
         self.__application = application
+        self.__first = first
+        self.__count = count
+
+        # Формат даты читается из настроек один раз для всего отчета
+        self.__dateTimeFormat = None
+
+        # Фрагменты текста страниц отчета. Ключ - относительный путь до страницы
+        self.__snippets = {}
 
     def generate (self):
         """
@@ -31,18 +42,19 @@ class HtmlReport (object):
                 <meta http-equiv='Content-Type' content='text/html; charset=UTF-8'/>
                 </head>
                 <body>
-                <ol type='1'>
+                <ol type='1' start='%d'>
                 %s
                 </ol>
                 </body>
                 </html>"""
 
-        items = u""
+        last = (len (self.__pages) if self.__count == None
+                else min (len (self.__pages), self.__first + self.__count))
 
-        for page in self.__pages:
-            items += self.generataPageView (page)
+        self.__snippets = self.__getSnippets (self.__pages[self.__first: last])
+        items = [self.generataPageView (self.__pages[n]) for n in range (self.__first, last)]
 
-        result = shell % items
+        result = shell % (self.__first + 1, u"".join (items))
         return result
     
 
@@ -54,6 +66,7 @@ class HtmlReport (object):
         if page.parent.parent != None:
             item += u" (%s)" % page.parent.subpath
 
+        item += self.generateSnippet (page)
         item += u"<br>" + self.generatePageInfo (page) + "<p></p>"
 
         result = u"<li>%s</li>\n" % item
@@ -69,9 +82,54 @@ class HtmlReport (object):
         return pageinfo
 
 
+    def generateSnippet (self, page):
+        """
+        Создать фрагмент текста страницы с выделенными найденными словами
+        """
+        index = getattr (page.root, "searchIndex", None)
+        if index == None or len (self.__searchPhrase.strip()) == 0:
+            return u""
+
+        if page.subpath in self.__snippets:
+            snippet = self.__snippets[page.subpath]
+        else:
+            snippet = index.getSnippet (page, self.__searchPhrase)
+
+        if snippet == None or len (snippet) == 0:
+            return u""
+
+        style = u"font-weight: bold; background-color: rgb(255,255,36);"
+        items = [u"<span style='{style}'>{text}</span>".format (style=style, text=cgi.escape (text))
+                if highlight else cgi.escape (text)
+                for text, highlight in snippet]
+
+        return u"<br><font size='-1'>{0}</font>".format (u"".join (items))
+
+
+    def __getSnippets (self, pages):
+        """
+        Получить из индекса фрагменты текста сразу для всех страниц отчета
+        """
+        if len (pages) == 0 or len (self.__searchPhrase.strip()) == 0:
+            return {}
+
+        index = getattr (pages[0].root, "searchIndex", None)
+        if index == None:
+            return {}
+
+        snippets = index.getSnippets (pages, self.__searchPhrase)
+        if snippets == None:
+            return {}
+
+        return dict ([(page.subpath, snippet) for page, snippet in zip (pages, snippets)])
+
+
     def generateDate (self, page):
-        config = GeneralGuiConfig (self.__application.config)
-        dateStr = page.datetime.strftime (config.dateTimeFormat.value)
+        if self.__dateTimeFormat == None:
+            config = GeneralGuiConfig (self.__application.config)
+            self.__dateTimeFormat = config.dateTimeFormat.value
+
+        dateStr = page.datetime.strftime (self.__dateTimeFormat)
         result = _(u"Last modified date: {0}").format (dateStr)
 
         return result
@@ -81,14 +139,7 @@ class HtmlReport (object):
         """
         Создать список тегов для страницы
         """
-        result = _(u"Tags: ")
-        for tag in page.tags:
-            result += self.generageTagView (tag) + u", "
-
-        if result.endswith (", "):
-            result = result [: -2]
-
-        return result
+        return _(u"Tags: ") + u", ".join ([self.generageTagView (tag) for tag in page.tags])
 
 
     def generageTagView (self, tag):
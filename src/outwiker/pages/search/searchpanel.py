@@ -20,11 +20,18 @@ from .sortstrategies import getSortStrategies
 
 
 class SearchPanel(BasePagePanel):
+    # Количество найденных страниц, показываемых на одном экране
+    resultsPerScreen = 100
+
     def __init__(self, parent, *args, **kwds):
         BasePagePanel.__init__ (self, parent, *args, **kwds)
 
         self._allTags = None
 
+        # Отсортированные найденные страницы и номер первой показанной страницы
+        self._resultPages = []
+        self._firstResult = 0
+
         # Секция для хранения найденных результатов (кэш)
         self._resultsSection = u"SearchResults"
         self.sortStrategySection = u"Sort"
@@ -67,6 +74,10 @@ class SearchPanel(BasePagePanel):
             self.sortStrategy.Append (sortStrategy.title)
         self.sortStrategy.SetSelection (0)
 
+        self.prevResultsBtn = wx.Button (self, -1, _(u"< Previous"))
+        self.nextResultsBtn = wx.Button (self, -1, _(u"Next >"))
+        self.resultsLabel = wx.StaticText (self, -1, u"")
+
         self.__do_layout()
 
         self.Bind(wx.EVT_BUTTON, self.__onClear, self.clearTagsBtn)
@@ -91,6 +102,14 @@ class SearchPanel(BasePagePanel):
                 self.__onChangeSortStrategy, 
                 self.sortStrategy)
 
+        self.Bind(wx.EVT_BUTTON, 
+                self.__onPrevResults, 
+                self.prevResultsBtn)
+
+        self.Bind(wx.EVT_BUTTON, 
+                self.__onNextResults, 
+                self.nextResultsBtn)
+
         self.tagsList.Bind (EVT_TAG_LEFT_CLICK, 
                 self.__onTagLeftClick)
 
@@ -127,6 +146,21 @@ class SearchPanel(BasePagePanel):
                 wx.ALIGN_CENTER_VERTICAL | wx.ALL | wx. EXPAND, 
                 border=2)
 
+        sortSizer.Add (self.prevResultsBtn, 
+                0, 
+                wx.ALIGN_CENTER_VERTICAL | wx.ALL, 
+                border=2)
+
+        sortSizer.Add (self.resultsLabel, 
+                0, 
+                wx.ALIGN_CENTER_VERTICAL | wx.ALL, 
+                border=2)
+
+        sortSizer.Add (self.nextResultsBtn, 
+                0, 
+                wx.ALIGN_CENTER_VERTICAL | wx.ALL, 
+                border=2)
+
         mainSizer.Add (sortSizer, 1, wx.EXPAND, 0)
 
         mainSizer.Add(self.resultWindow, 1, wx.EXPAND | wx.ALL, border=2)
@@ -144,6 +178,23 @@ class SearchPanel(BasePagePanel):
             self.UpdateView(self.page)
 
 
+    def __onPrevResults (self, event):
+        """
+        Показать предыдущий экран найденных страниц
+        """
+        self._firstResult = max (0, self._firstResult - self.resultsPerScreen)
+        self.__showResults (self._resultPages)
+
+
+    def __onNextResults (self, event):
+        """
+        Показать следующий экран найденных страниц
+        """
+        if self._firstResult + self.resultsPerScreen < len (self._resultPages):
+            self._firstResult += self.resultsPerScreen
+            self.__showResults (self._resultPages)
+
+
     def __getCurrentSortStrategy (self):
         """
         Получить стратегию для выбранного типа сортировки
@@ -256,7 +307,10 @@ class SearchPanel(BasePagePanel):
 
         sortStrategy = self.__getCurrentSortStrategy()
         resultPages = self.__loadResults ()
-        resultPages.sort (sortStrategy.sort)
+        sortStrategy.sortPages (resultPages, self.__getSearchPhrase())
+
+        self._resultPages = resultPages
+        self._firstResult = 0
 
         self.__showResults (resultPages)
         self.__loadSortStrategy ()
@@ -338,10 +392,35 @@ class SearchPanel(BasePagePanel):
         report = HtmlReport (resultPages, 
                 self.__getSearchPhrase(), 
                 self.__getSearchTags(), 
-                Application)
+                Application,
+                self._firstResult,
+                self.resultsPerScreen)
 
         htmltext = report.generate ()
         self.resultWindow.SetPage (htmltext, self.page.path)
+
+        self.__updateResultsNavigation()
+
+
+    def __updateResultsNavigation (self):
+        """
+        Обновить кнопки и надпись для переключения между экранами найденных страниц
+        """
+        count = len (self._resultPages)
+        last = min (count, self._firstResult + self.resultsPerScreen)
+
+        self.prevResultsBtn.Enable (self._firstResult != 0)
+        self.nextResultsBtn.Enable (last < count)
+
+        if count == 0:
+            self.resultsLabel.SetLabel (u"")
+        else:
+            self.resultsLabel.SetLabel (_(u"{first}-{last} of {count}").format (
+                first=self._firstResult + 1,
+                last=last,
+                count=count))
+
+        self.Layout()
     
 
     def __saveResults (self, resultPages):
@@ -16,7 +16,8 @@ def getSortStrategies ():
     return [TitleAlphabeticalSort(),
             TitleAlphabeticalInverseSort(),
             DateDescendingSort(),
-            DateAscendingSort()]
+            DateAscendingSort(),
+            RelevanceSort()]
 
 
 class BaseSortStrategy (object):
@@ -34,6 +35,14 @@ class BaseSortStrategy (object):
         pass
 
 
+    def sortPages (self, pages, phrase):
+        """
+        Отсортировать список страниц pages на месте.
+        phrase - искомая фраза
+        """
+        pages.sort (self.sort)
+
+
     @abstractproperty
     def title (self):
         """
@@ -50,6 +59,10 @@ class TitleAlphabeticalSort (BaseSortStrategy):
         return sortAlphabeticalFunction (page1, page2)
 
 
+    def sortPages (self, pages, phrase):
+        pages.sort (key=lambda page: page.title.lower())
+
+
     @property
     def title (self):
         return _(u"Title")
@@ -63,6 +76,10 @@ class TitleAlphabeticalInverseSort (BaseSortStrategy):
         return sortAlphabeticalFunction (page2, page1)
 
 
+    def sortPages (self, pages, phrase):
+        pages.sort (key=lambda page: page.title.lower(), reverse=True)
+
+
     @property
     def title (self):
         return _(u"Title (inverse)")
@@ -76,6 +93,11 @@ class DateDescendingSort (BaseSortStrategy):
         return sortDateFunction (page2, page1)
 
 
+    def sortPages (self, pages, phrase):
+        # Дата каждой страницы читается один раз, а не при каждом сравнении
+        pages.sort (key=lambda page: page.datetime, reverse=True)
+
+
     @property
     def title (self):
         return _(u"Date (newest first)")
@@ -89,6 +111,38 @@ class DateAscendingSort (BaseSortStrategy):
         return sortDateFunction (page1, page2)
 
 
+    def sortPages (self, pages, phrase):
+        pages.sort (key=lambda page: page.datetime)
+
+
     @property
     def title (self):
         return _(u"Date (oldest first)")
+
+
+class RelevanceSort (BaseSortStrategy):
+    """
+    Стратегия для сортировки страниц по релевантности искомой фразе
+    (сверху - самые подходящие). Оценки берутся из полнотекстового индекса вики
+    """
+    def sort (self, page1, page2):
+        # Без искомой фразы релевантность не определена, сортируем по заголовку
+        return sortAlphabeticalFunction (page1, page2)
+
+
+    def sortPages (self, pages, phrase):
+        pages.sort (key=lambda page: page.title.lower())
+
+        if len (pages) == 0:
+            return
+
+        index = getattr (pages[0].root, "searchIndex", None)
+        scores = index.getScores (phrase) if index != None else None
+
+        if scores != None:
+            pages.sort (key=lambda page: scores.get (page.subpath, 0.0), reverse=True)
+
+
+    @property
+    def title (self):
+        return _(u"Relevance")
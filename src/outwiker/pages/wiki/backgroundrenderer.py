@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import threading
+
+import wx
+import wx.lib.newevent
+
+
+# Событие вызывается с помощью PostEvent после создания HTML в фоновом потоке.
+# Параметры: jobid - номер задания, page - страница,
+# target - произвольные данные, переданные в render(),
+# result - результат функции создания HTML, error - исключение, если при создании HTML произошла ошибка
+RenderFinishedEvent, EVT_RENDER_FINISHED = wx.lib.newevent.NewEvent()
+
+
+class BackgroundRenderer (object):
+    """
+    Класс для создания HTML-представления страниц в отдельном потоке,
+    чтобы не блокировать интерфейс при разборе больших страниц.
+
+    Выполняется только последнее заданное задание: если новое задание
+    поступило до начала выполнения предыдущего, предыдущее отменяется,
+    а результат задания, которое уже выполнялось, отбрасывается.
+    """
+    def __init__ (self, window, renderFunc):
+        """
+        window - окно, которому будет отправлено событие EVT_RENDER_FINISHED
+        renderFunc - функция renderFunc (page, content), создающая HTML.
+            Вызывается в рабочем потоке
+        """
+        self._window = window
+        self._renderFunc = renderFunc
+
+        self._condition = threading.Condition()
+
+        # Номер последнего задания. Результаты остальных заданий отбрасываются
+        self._currentJobId = 0
+
+        # Задание, которое ожидает выполнения: кортеж (номер задания, страница, содержимое, target)
+        self._pendingJob = None
+
+        self._stopped = False
+        self._thread = None
+
+
+    def render (self, page, content, target=None):
+        """
+        Поставить в очередь задание на создание HTML для страницы page.
+        content - снимок текста страницы на момент постановки задания,
+        target - данные, которые будут переданы в событие EVT_RENDER_FINISHED.
+        Возвращает номер задания
+        """
+        with self._condition:
+            self._currentJobId += 1
+            self._pendingJob = (self._currentJobId, page, content, target)
+            self._startThread()
+            self._condition.notify()
+
+            return self._currentJobId
+
+
+    def cancel (self):
+        """
+        Отменить все задания. Результат выполняемого задания будет отброшен
+        """
+        with self._condition:
+            self._currentJobId += 1
+            self._pendingJob = None
+
+
+    def isCurrent (self, jobid):
+        """
+        Возвращает True, если задание с номером jobid не было отменено
+        """
+        return jobid == self._currentJobId
+
+
+    def stop (self):
+        """
+        Остановить рабочий поток (например, при закрытии панели)
+        """
+        with self._condition:
+            self.cancel()
+            self._stopped = True
+            self._condition.notify()
+
+
+    def join (self, timeout=None):
+        """
+        Дождаться окончания рабочего потока после вызова stop()
+        """
+        if self._thread != None:
+            self._thread.join (timeout)
+
+
+    def _startThread (self):
+        if self._thread == None:
+            self._thread = threading.Thread (None, self._threadFunc)
+            self._thread.daemon = True
+            self._thread.start()
+
+
+    def _threadFunc (self):
+        while True:
+            with self._condition:
+                while self._pendingJob == None and not self._stopped:
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+                jobid, page, content, target = self._pendingJob
+                self._pendingJob = None
+
+            result = None
+            error = None
+
+            try:
+                result = self._renderFunc (page, content)
+            except BaseException as e:
+                error = e
+
+            if self.isCurrent (jobid):
+                self._postResult (jobid, page, target, result, error)
+
+
+    def _postResult (self, jobid, page, target, result, error):
+        event = RenderFinishedEvent (jobid=jobid,
+                page=page,
+                target=target,
+                result=result,
+                error=error)
+
+        wx.PostEvent (self._window, event)
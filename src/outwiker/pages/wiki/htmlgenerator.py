@@ -4,11 +4,10 @@
 import os.path
 import hashlib
 
-from outwiker.core.config import Config, StringOption
+from outwiker.core.config import StringOption
 from outwiker.core.htmlimprover import HtmlImprover
 from outwiker.core.htmltemplate import HtmlTemplate
 from outwiker.core.application import Application
-from outwiker.core.tree import RootWikiPage
 from outwiker.core.system import getTemplatesDir
 
 from .parserfactory import ParserFactory
@@ -21,25 +20,87 @@ class HtmlGenerator (object):
     """
     Класс, который создает HTML для вики-страницы с учетом кэширования.
     """
-    def __init__ (self, page):
+    def __init__ (self, page, content=None):
+        """
+        page - страница, для которой создается HTML
+        content - снимок текста страницы. Если None, текст читается из страницы
+        """
         self.page = page
+        self._content = content
         self.config = WikiConfig (Application.config)
 
         self.resultName = u"__content.html"
         self._configSection = u"wiki"
         self._hashKey = u"md5_hash"
 
+        # Кеш HTML в памяти, общий для всех страниц.
+        # Его размер устанавливается в Application из настроек
+        self.htmlCache = Application.htmlCache
+
 
     def makeHtml (self, stylepath):
         path = self.getResultPath()
+        pageContent = self.page.content
+
+        # Снимок текста, который отличается от сохраненного (например, если страницу не удалось сохранить),
+        # не соответствует контрольной сумме, поэтому HTML для него не кешируется,
+        # а файл с HTML не должен считаться соответствующим сохраненному тексту
+        if self._content != None and self._content != pageContent:
+            self._render (path, stylepath, self._content)
+
+            try:
+                self.resetHash()
+            except IOError:
+                pass
+
+            return path
+
+        hash = self.getHash()
+
+        # Версия страницы, для которой создан HTML в кеше
+        version = (hash, stylepath)
 
-        if self.canReadFromCache():
+        html = self.htmlCache.get (self.page.path, version)
+        if html != None:
+            if not os.path.exists (path):
+                # Файл удалили, восстановим его без повторного разбора страницы
+                with open (path, "wb") as fp:
+                    fp.write (html.encode ("utf-8"))
+
+            return path
+
+        if self.canReadFromCache (hash):
+            self._rememberHtml (path, version)
             return path
 
+        result = self._render (path, stylepath, pageContent)
+
+        # При создании HTML могли появиться новые файлы (например, превьюшки),
+        # поэтому контрольную сумму нужно рассчитать заново
+        hash = self.getHash()
+        version = (hash, stylepath)
+
+        try:
+            self._getHashOption().value = hash
+        except IOError:
+            # Не самая страшная потеря, если не сохранится хэш.
+            # Максимум, что грозит пользователю, каждый раз генерить старницу
+            pass
+
+        self.htmlCache.set (self.page.path, version, result)
+
+        return path
+
+
+    def _render (self, path, stylepath, pageContent):
+        """
+        Создать HTML для текста pageContent и записать его в файл path.
+        Возвращает созданный HTML
+        """
         factory = ParserFactory ()
         parser = factory.make(self.page, Application.config)
 
-        content = self.page.content if len (self.page.content) > 0 else self._generateEmptyContent (parser)
+        content = pageContent if len (pageContent) > 0 else self._generateEmptyContent (parser)
 
         text = HtmlImprover.run (parser.toHtml (content) )
         head = parser.head
@@ -52,15 +113,19 @@ class HtmlGenerator (object):
         with open (path, "wb") as fp:
             fp.write (result.encode ("utf-8"))
 
+        return result
+
+
+    def _rememberHtml (self, path, version):
+        """
+        Прочитать в кеш HTML, ранее сохраненный в файл
+        """
         try:
-            self._getHashOption().value = self.getHash()
-        except IOError:
-            # Не самая страшная потеря, если не сохранится хэш.
-            # Максимум, что грозит пользователю, каждый раз генерить старницу
+            with open (path) as fp:
+                self.htmlCache.set (self.page.path, version, unicode (fp.read(), "utf8"))
+        except (IOError, UnicodeDecodeError):
             pass
 
-        return path
-
 
     def _generateEmptyContent (self, parser):
         content = EmptyContent (Application.config)
@@ -76,12 +141,15 @@ class HtmlGenerator (object):
         return os.path.join (self.page.path, self.resultName)
 
 
-    def canReadFromCache (self):
+    def canReadFromCache (self, hash=None):
         """
         Можно ли прочитать готовый HTML из кеша?
+        hash - контрольная сумма страницы, если она уже рассчитана
         """
         path = self.getResultPath()
-        hash = self.getHash()
+        if hash == None:
+            hash = self.getHash()
+
         hashoption = self._getHashOption()
 
         if os.path.exists (path) and (hash == hashoption.value or self.page.readonly):
@@ -92,11 +160,13 @@ class HtmlGenerator (object):
 
     def resetHash (self):
         self._getHashOption().value = u""
+        self.htmlCache.invalidate (self.page.path)
 
 
     def _getHashOption (self):
+        # Параметры страницы уже прочитаны, поэтому не будем заново открывать файл __page.opt
         return StringOption (
-                Config (os.path.join (self.page.path, RootWikiPage.pageConfig)),
+                self.page.params,
                 self._configSection, 
                 self._hashKey, 
                 u"")
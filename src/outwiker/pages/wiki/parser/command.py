@@ -10,6 +10,10 @@ class Command (object):
     """
     __metaclass__ = ABCMeta
 
+    # Секции настроек программы, от которых зависит результат команды.
+    # Учитываются в ключах кеша результатов команд, которые разбирают вики-нотацию (например, include)
+    configSections = []
+
     def __init__ (self, parser):
         """
         parser - экземпляр парсера
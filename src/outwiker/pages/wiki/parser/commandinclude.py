@@ -3,9 +3,14 @@
 
 import os.path
 import cgi
+import hashlib
 
 from command import Command
+from outwiker.core.application import Application
 from outwiker.core.attachment import Attachment
+from ..rendercache import RenderCache
+from ..thumbnails import Thumbnails
+from ..wikiconfig import WikiConfig
 
 class IncludeCommand (Command):
     """
@@ -15,13 +20,21 @@ class IncludeCommand (Command):
         encoding="xxx" - указывает кодировку прикрепленного файла
         htmlescape - заменить символы <, > и т.п. на их HTML-аналоги (&lt;, &gt; и т.п.)
         wikiparse - содержимое прикрепленного файла предварительно нужно пропустить через википарсер
+    Результаты сохраняются в кеше и используются, пока не изменится файл или параметры
     """
+    # Версия реализации команды. Входит в ключи кеша результатов
+    cacheVersion = 1
+
     def __init__ (self, parser):
         """
         parser - экземпляр парсера
         """
         Command.__init__ (self, parser)
 
+        # Хеш настроек, от которых зависит разбор вики-нотации, и счетчик изменений конфига, для которого он посчитан
+        self._configHash = None
+        self._configGeneration = None
+
     
     @property
     def name (self):
@@ -41,6 +54,16 @@ class IncludeCommand (Command):
             return u""
 
         params_dict = Command.parseParams (params_tail)
+
+        cache = RenderCache (self.parser.page)
+        key = self._getCacheKey (path, params_tail, params_dict)
+
+        if key != None:
+            cached = cache.get (key)
+            if cached != None:
+                self._appendHeaders (cached[1])
+                return cached[0]
+
         encoding = self._getEncoding (params_dict)
 
         try:
@@ -54,7 +77,72 @@ class IncludeCommand (Command):
         #except TypeError:
         #    return _(u"<B>Encoding error in file %s</B>" % os.path.basename (path) )
 
-        return self._postprocessText (text, params_dict)
+        headers = self.parser.headers
+        result = self._postprocessText (text, params_dict)
+
+        if key != None:
+            # Заголовки, добавленные при разборе вики-нотации, сохраняются вместе с результатом
+            cache.set (key, [result, self.parser.headers[len (headers):]])
+
+        return result
+
+
+    def _getCacheKey (self, path, params_tail, params_dict):
+        """
+        Возвращает ключ для кеша результатов или None, если результат нельзя кешировать
+        """
+        params = [params_tail]
+
+        if "wikiparse" in params_dict:
+            # Результат разбора может зависеть от других вложений (например, превьюшек) и подстраниц.
+            # Папка с превьюшками изменяется при каждом сохранении кеша, поэтому не учитывается
+            try:
+                params.append (sorted ([[fname, os.path.getmtime (fname), os.path.getsize (fname)]
+                    for fname in Attachment (self.parser.page).attachmentFull
+                    if os.path.basename (fname) != Thumbnails.thumbDir]))
+            except OSError:
+                return None
+
+            params.append ([child.title for child in self.parser.page.children])
+
+            params.append (self._getConfigHash())
+            params.append (sorted ([plugin.name + plugin.version for plugin in Application.plugins]))
+
+        return RenderCache.getKey (self.name, self.cacheVersion, params, path=path)
+
+
+    def _getConfigHash (self):
+        """
+        Возвращает хеш настроек, от которых зависит разбор вики-нотации:
+        секции Wiki и секций, которые указали команды парсера (см. Command.configSections).
+        Ключ хранится в файле, поэтому учитываются сами значения настроек, а не счетчик изменений
+        """
+        config = self.parser.config
+        generation = getattr (config, "generation", None)
+
+        if self._configHash == None or generation == None or generation != self._configGeneration:
+            sections = set ([WikiConfig.WIKI_SECTION])
+            for command in self.parser.commands.values():
+                sections.update (command.configSections)
+
+            values = sorted ([(section, sorted (options)) for section, options in config.getValues()
+                if section in sections])
+
+            self._configHash = hashlib.md5 (repr (values)).hexdigest()
+            self._configGeneration = generation
+
+        return self._configHash
+
+
+    def _appendHeaders (self, headers):
+        """
+        Добавить в заголовок страницы сохраненные в кеше строки, которых там еще нет
+        """
+        existing = self.parser.headers
+
+        for header in headers:
+            if header not in existing:
+                self.parser.appendToHead (header)
 
 
     def _postprocessText (self, text, params_dict):
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import re
+import threading
+
+from outwiker.libs.pyparsing import ParseException, ParseResults, Regex, QuotedString
+
+from wikiparser import Parser
+
+
+class WikiLexer (object):
+    """
+    Однопроходный разборщик вики-нотации.
+
+    Делает то же, что и MatchFirst.transformString() из pyparsing, но не пытается
+    применить все токены в каждой позиции текста. Одно регулярное выражение
+    находит следующую позицию, с которой может начинаться какой-нибудь токен
+    (обычный текст пропускается целыми словами), а таблица по первому символу
+    выбирает токены, которые имеет смысл проверять в этой позиции.
+    Токены проверяются в том же порядке, что и в MatchFirst,
+    поэтому результат разбора совпадает с результатом pyparsing.
+    """
+    def __init__ (self, tokens):
+        """
+        tokens - список пар (токен pyparsing, символы, с которых он может начинаться)
+        в порядке приоритета. Для токена обычного текста вместо символов передается None
+        """
+        # Ключ - первый символ, значение - список пар (токен, функция предварительной проверки)
+        # для токенов, которые могут начинаться с этого символа
+        self._dispatch = {}
+
+        # Токены, стоящие до токена обычного текста.
+        # Только они могут сработать в начале слова
+        textFound = False
+
+        for token, chars in tokens:
+            if chars == None:
+                textFound = True
+                continue
+
+            for char in chars:
+                if textFound and self._isWordChar (char):
+                    continue
+
+                tokenlist = self._dispatch.setdefault (char, [])
+                item = (token, self._getPrematch (token))
+                if item not in tokenlist:
+                    tokenlist.append (item)
+
+        special = [re.escape (char) for char in self._dispatch.keys()
+                if not self._isWordChar (char)]
+
+        regex = u"(?P<word>\\w+)" if textFound else u"(?P<word>(?!))"
+        if len (special) != 0:
+            regex += u"|[" + u"".join (special) + u"]"
+
+        self._regex = re.compile (regex, re.UNICODE)
+        self._hasText = textFound
+
+
+    @staticmethod
+    def _isWordChar (char):
+        return re.match (u"\\w", char, re.UNICODE) != None
+
+
+    @staticmethod
+    def _getPrematch (token):
+        """
+        Возвращает функцию match (text, pos) скомпилированного регулярного выражения токена
+        или None, если у токена его нет. Токены Regex и QuotedString не найдутся,
+        если их регулярное выражение не совпадет, а проверить выражение намного быстрее,
+        чем вызвать разбор через pyparsing
+        """
+        if isinstance (token, (Regex, QuotedString)):
+            return token.re.match
+
+        return None
+
+
+    def transformString (self, text):
+        """
+        Преобразовать текст, заменив найденные токены на результат их разбора
+        """
+        result = []
+        search = self._regex.search
+        dispatch = self._dispatch
+
+        last = 0
+        pos = 0
+
+        while True:
+            match = search (text, pos)
+            if match == None:
+                break
+
+            start = match.start()
+            end = None
+
+            for token, prematch in dispatch.get (text[start], []):
+                if prematch != None and prematch (text, start) == None:
+                    continue
+
+                try:
+                    end, tokens = token._parse (text, start)
+                except (ParseException, IndexError):
+                    continue
+
+                break
+
+            if end != None and end > start:
+                result.append (text[last:start])
+                self._appendTokens (result, tokens)
+                last = pos = end
+            elif match.group ("word") != None:
+                # Слово целиком - обычный текст, он остается без изменений
+                pos = match.end()
+            else:
+                pos = start + 1
+
+        result.append (text[last:])
+        return u"".join (result)
+
+
+    def _appendTokens (self, result, tokens):
+        if isinstance (tokens, ParseResults):
+            tokens = tokens.asList()
+
+        for item in tokens:
+            if isinstance (item, list):
+                self._appendTokens (result, item)
+            elif item:
+                result.append (unicode (item))
+
+
+class FastParser (Parser):
+    """
+    Википарсер, разбирающий текст с помощью WikiLexer.
+    Использует те же токены, что и Parser, но работает значительно быстрее
+    на больших страницах. Разборщики WikiLexer подставляются вместо нотаций pyparsing,
+    поэтому разбор выполняет Parser._parse()
+    """
+    # Символы, с которых могут начинаться токены. Ключ - имя токена (атрибута грамматики).
+    # None - токен обычного текста (\w+)
+    tokenStartChars = {
+            u"attaches": u"A",
+            u"attachImages": u"A",
+            u"urlImage": u"hHfF",
+            u"url": u"0123456789nNtTfFhHwW",
+            u"text": None,
+            u"lineBreak": u"[",
+            u"lineJoin": u"\\",
+            u"link": u"[",
+            u"adhoctokens": u"'",
+            u"subscript": u"'",
+            u"superscript": u"'",
+            u"boldItalicized": u"'",
+            u"bolded": u"'",
+            u"italicized": u"'",
+            u"code": u"@",
+            u"small": u"[",
+            u"big": u"[",
+            u"preformat": u"[",
+            u"noformat": u"[",
+            u"thumb": u"%",
+            u"underlined": u"{",
+            u"strike": u"{",
+            u"horline": u"-",
+            u"align": u"%",
+            u"lists": u"*#",
+            u"table": u"|",
+            u"headings": u"!",
+            u"tex": u"{",
+            u"command": u"(",
+            }
+
+
+    # Разборщики, как и токены грамматики, создаются один раз на процесс.
+    # Ключ - грамматика, значение - кортеж разборщиков для вики-нотации, 
+    # элементов списков, ссылок и заголовков
+    _lexers = {}
+    _lexersLock = threading.Lock()
+
+
+    def __init__ (self, page, config):
+        super (FastParser, self).__init__ (page, config)
+
+        (self.wikiMarkup,
+                self.listItemMarkup,
+                self.linkMarkup,
+                self.headingMarkup) = self._getLexers (self.grammar)
+
+
+    @classmethod
+    def _getLexers (cls, grammar):
+        with cls._lexersLock:
+            if grammar not in cls._lexers:
+                cls._lexers[grammar] = tuple ([cls._makeLexer (grammar, names) 
+                    for names in [grammar.wikiTokens, 
+                        grammar.listItemTokens, 
+                        grammar.linkTokens, 
+                        grammar.headingTokens] ])
+
+            return cls._lexers[grammar]
+
+
+    @classmethod
+    def _makeLexer (cls, grammar, names):
+        return WikiLexer ([(getattr (grammar, name), cls.tokenStartChars[name]) for name in names])
@@ -4,6 +4,8 @@
 import os.path
 
 from outwiker.core.wxthumbmaker import WxThumbmaker
+from outwiker.core.thumbpool import ThumbPool
+from outwiker.core.thumbexception import ThumbException
 from ..thumbnails import Thumbnails
 from outwiker.core.attachment import Attachment
 
@@ -16,8 +18,12 @@ class PageThumbmaker (object):
 
         self.thumbmaker = WxThumbmaker()
 
+        # Задания на создание превьюшек, которых еще не дожидались (см. wait()).
+        # Список кортежей (задание, экземпляр Thumbnails)
+        self._jobs = []
 
-    def __createThumb (self, page, fname, size, file_prefix, func):
+
+    def __createThumb (self, page, fname, size, file_prefix, func, wait):
         """
         Создание превьюшки на все случаи жизни :)
         page - страница, внутри которой создается превьюшка
@@ -25,6 +31,8 @@ class PageThumbmaker (object):
         size - размер превьюшки
         file_prefix - дополнение к имени файла
         func - указатель на функцию, которая будет создавать превьюшку (из self.thumbmaker)
+        wait - ждать ли создания превьюшки. Если False, превьюшка создается в пуле потоков,
+            а дождаться ее можно с помощью метода wait()
         """
         thumb = Thumbnails (page)
         path_thumbdir = thumb.getThumbPath (True)
@@ -43,46 +51,83 @@ class PageThumbmaker (object):
         # Путь, относительный к корню страницы
         relative_path = os.path.join (Thumbnails.getRelativeThumbDir(), fname_res)
 
-        if os.path.exists (path_res):
+        if thumb.isActual (fname_res, path_src):
             return relative_path
 
-        # Возможно исключение ThumbException
-        func (path_src, size, path_res)
+        if not os.path.exists (path_src):
+            raise ThumbException (u"Error: %s not found" % os.path.basename (path_src))
+
+        def create ():
+            # Возможно исключение ThumbException
+            func (path_src, size, path_res)
+            thumb.setSource (fname_res, path_src)
+
+        pool = ThumbPool.get()
+        job = pool.submit (path_res, path_thumbdir, create)
+
+        if wait:
+            try:
+                pool.wait ([job])
+            finally:
+                thumb.saveCache()
+        else:
+            self._jobs.append ((job, thumb))
 
         return relative_path
 
 
-    def createThumbByWidth (self, page, fname, width):
+    def wait (self):
+        """
+        Дождаться создания превьюшек, которые были поставлены в очередь с параметром wait=False.
+        Если превьюшку создать не удалось, бросается исключение (например, ThumbException)
+        """
+        jobs = self._jobs
+        self._jobs = []
+
+        try:
+            ThumbPool.get().wait ([job for job, thumb in jobs])
+        finally:
+            for job, thumb in jobs:
+                thumb.saveCache()
+
+
+    def createThumbByWidth (self, page, fname, width, wait=True):
         """
         Создать превьюшку и вернуть относительный путь до нее
         page - страница, внутри которой создается превьюшка
         fname - имя исходной картинки (без полного пути). Полный путь определяется по пути до страницы
         width - ширина превьюшки
 
+        wait - ждать ли создания превьюшки (иначе она создается в фоновом потоке)
+
         Возвращает путь относительно корня страницы
         """
-        return self.__createThumb (page, fname, width, u"width", self.thumbmaker.thumbByWidth)
+        return self.__createThumb (page, fname, width, u"width", self.thumbmaker.thumbByWidth, wait)
 
 
-    def createThumbByHeight (self, page, fname, height):
+    def createThumbByHeight (self, page, fname, height, wait=True):
         """
         Создать превьюшку и вернуть относительный путь до нее
         page - страница, внутри которой создается превьюшка
         fname - имя исходной картинки (без полного пути). Полный путь определяется по пути до страницы
         height - высота превьюшки
 
+        wait - ждать ли создания превьюшки (иначе она создается в фоновом потоке)
+
         Возвращает путь относительно корня страницы
         """
-        return self.__createThumb (page, fname, height, u"height", self.thumbmaker.thumbByHeight)
+        return self.__createThumb (page, fname, height, u"height", self.thumbmaker.thumbByHeight, wait)
 
 
-    def createThumbByMaxSize (self, page, fname, maxsize):
+    def createThumbByMaxSize (self, page, fname, maxsize, wait=True):
         """
         Создать превьюшку и вернуть относительный путь до нее
         page - страница, внутри которой создается превьюшка
         fname - имя исходной картинки (без полного пути). Полный путь определяется по пути до страницы
         maxsize - максимальный размер превьюшки
 
+        wait - ждать ли создания превьюшки (иначе она создается в фоновом потоке)
+
         Возвращает путь относительно корня страницы
         """
-        return self.__createThumb (page, fname, maxsize, u"maxsize", self.thumbmaker.thumbByMaxSize)
+        return self.__createThumb (page, fname, maxsize, u"maxsize", self.thumbmaker.thumbByMaxSize, wait)
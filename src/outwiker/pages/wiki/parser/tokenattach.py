@@ -1,13 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
-import os.path
 from abc import ABCMeta, abstractmethod
 
-from outwiker.libs.pyparsing import replaceWith, Literal
+from outwiker.libs.pyparsing import Literal, Token, ParseException
 from outwiker.core.attachment import Attachment
 
-from utils import concatenate, isImage
+from utils import isImage
 
 
 class AttachFactory (object):
@@ -32,25 +31,22 @@ class AttachToken (object):
 
     def getToken (self):
         """
-        Создать элементы из прикрепленных файлов.
-        Отдельно картинки, отдельно все файлы
+        Создать токен для прикрепленных файлов.
+        Список файлов берется у парсера во время разбора, поэтому токен не зависит от страницы
         """
-        attachesAll = []
-
-        attaches = Attachment (self.parser.page).attachmentFull
-        attaches.sort (self.sortByLength, reverse=True)
-
-        for attach in attaches:
-            fname = os.path.basename (attach)
-            if self.filterFile (fname):
-                attach = Literal (fname)
-                attachesAll.append (attach)
-
-        finalToken = Literal (self.attachString) + concatenate (attachesAll)
+        finalToken = Literal (self.attachString) + AttachNameToken (self.getFileNames)
         finalToken = finalToken.setParseAction (self.convertToLink)("attach")
         return finalToken
 
 
+    def getFileNames (self):
+        """
+        Возвращает подходящие для токена имена прикрепленных файлов страницы, 
+        которую разбирает парсер. Более длинные имена идут раньше
+        """
+        return [fname for fname in self.parser.attachments if self.filterFile (fname)]
+
+
     def convertToLink (self, s, l, t):
         fname = t[1]
 
@@ -60,19 +56,6 @@ class AttachToken (object):
             return '<A HREF="%s/%s">%s</A>' % (Attachment.attachDir, fname, fname)
     
 
-    # TODO: Вынести в отдельный модуль
-    def sortByLength (self, fname1, fname2):
-        """
-        Функция для сортировки имен по длине имени
-        """
-        if len (fname1) > len (fname2):
-            return 1
-        elif len (fname1) < len (fname2):
-            return -1
-
-        return 0
-
-
     @abstractmethod
     def filterFile (self, fname):
         """
@@ -88,3 +71,27 @@ class AttachAllToken (AttachToken):
 class AttachImagesToken (AttachToken):
     def filterFile (self, fname):
         return isImage (fname)
+
+
+class AttachNameToken (Token):
+    """
+    Токен pyparsing для имени прикрепленного файла.
+    Совпадает с первым именем из списка, с которого начинается текст в текущей позиции
+    """
+    def __init__ (self, getFileNames):
+        """
+        getFileNames - функция, возвращающая список имен файлов
+        """
+        super (AttachNameToken, self).__init__()
+        self.getFileNames = getFileNames
+        self.name = "AttachName"
+        self.errmsg = "Expected attachment name"
+        self.mayReturnEmpty = False
+
+
+    def parseImpl (self, instring, loc, doActions=True):
+        for fname in self.getFileNames():
+            if instring.startswith (fname, loc):
+                return loc + len (fname), fname
+
+        raise ParseException (instring, loc, self.errmsg, self)
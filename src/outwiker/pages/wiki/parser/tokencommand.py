@@ -2,6 +2,7 @@
 # -*- coding: UTF-8 -*-
 
 import re
+import traceback
 
 from outwiker.libs.pyparsing import Regex
 
@@ -52,4 +53,10 @@ class CommandToken (object):
         except KeyError:
             return t[0]
 
-        return command.execute (params, content)
+        try:
+            return command.execute (params, content)
+        except TypeError:
+            # Токен общий для всех парсеров, а pyparsing считает исключение TypeError
+            # в обработчике признаком неправильного числа аргументов обработчика
+            # и после этого больше не сможет его вызвать
+            raise RuntimeError (traceback.format_exc())
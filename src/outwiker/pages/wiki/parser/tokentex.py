@@ -50,6 +50,9 @@ class TexToken (object):
             image_fname = tex.makeImage (eqn)
         except IOError:
             return _(u"<B>Can't create imege file</B>")
+
+        # Картинка будет удалена, когда формулы не останется на странице
+        thumb.addFile (image_fname)
         
         image_path = os.path.join (Thumbnails.getRelativeThumbDir(), image_fname)
         result = u'<IMG SRC="{image}"/>'.format (image=image_path.replace ("\\", "/"))
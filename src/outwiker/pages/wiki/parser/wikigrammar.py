@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import threading
+
+from outwiker.libs.pyparsing import MatchFirst
+
+from tokenfonts import FontsFactory
+from tokennoformat import NoFormatFactory
+from tokenpreformat import PreFormatFactory
+from tokenthumbnail import ThumbnailFactory
+from tokenheading import HeadingFactory
+from tokenadhoc import AdHocFactory
+from tokenhorline import HorLineFactory
+from tokenlink import LinkFactory
+from tokenalign import AlignFactory
+from tokentable import TableFactory
+from tokenurl import UrlFactory
+from tokenurlimage import UrlImageFactory
+from tokenattach import AttachFactory, AttachImagesFactory
+from tokenlist import ListFactory
+from tokenlinebreak import LineBreakFactory
+from tokenlinejoin import LineJoinFactory
+from tokentex import TexFactory
+from tokencommand import CommandFactory
+from tokentext import TextFactory
+
+
+class ParserContext (object):
+    """
+    Заместитель парсера, через который токены общей грамматики
+    обращаются к парсеру, выполняющему разбор в текущем потоке
+    """
+    def __init__ (self):
+        self._local = threading.local()
+
+
+    def push (self, parser):
+        """
+        Сделать парсер текущим для текущего потока
+        """
+        self._getStack().append (parser)
+
+
+    def pop (self):
+        """
+        Вернуть текущим парсер, который был текущим до вызова push()
+        """
+        self._getStack().pop()
+
+
+    @property
+    def current (self):
+        """
+        Парсер, выполняющий разбор в текущем потоке, или None
+        """
+        stack = self._getStack()
+        return stack[-1] if len (stack) != 0 else None
+
+
+    def _getStack (self):
+        stack = getattr (self._local, "stack", None)
+        if stack == None:
+            stack = []
+            self._local.stack = stack
+
+        return stack
+
+
+    def __getattr__ (self, name):
+        parser = self.current
+        if parser == None:
+            raise AttributeError (name)
+
+        return getattr (parser, name)
+
+
+class WikiGrammar (object):
+    """
+    Токены вики-нотации. Токены не зависят от страницы, поэтому создаются
+    один раз на процесс и используются всеми парсерами.
+    Данные страницы (прикрепленные файлы, команды) токены получают
+    у текущего парсера через ParserContext
+    """
+    # Имена токенов (атрибутов грамматики) для вики-нотации в порядке приоритета
+    wikiTokens = [u"attaches",
+            u"urlImage",
+            u"url",
+            u"text",
+            u"lineBreak",
+            u"lineJoin",
+            u"link",
+            u"adhoctokens",
+            u"subscript",
+            u"superscript",
+            u"boldItalicized",
+            u"bolded",
+            u"italicized",
+            u"code",
+            u"small",
+            u"big",
+            u"preformat",
+            u"noformat",
+            u"thumb",
+            u"underlined",
+            u"strike",
+            u"horline",
+            u"align",
+            u"lists",
+            u"table",
+            u"headings",
+            u"tex",
+            u"command"]
+
+    # Имена токенов для нотации элементов списков
+    listItemTokens = [u"attaches",
+            u"urlImage",
+            u"url",
+            u"text",
+            u"lineBreak",
+            u"lineJoin",
+            u"link",
+            u"boldItalicized",
+            u"bolded",
+            u"italicized",
+            u"code",
+            u"small",
+            u"big",
+            u"preformat",
+            u"noformat",
+            u"thumb",
+            u"underlined",
+            u"strike",
+            u"subscript",
+            u"superscript",
+            u"attaches",
+            u"tex",
+            u"command"]
+
+    # Имена токенов для нотации ссылок
+    linkTokens = [u"attachImages",
+            u"urlImage",
+            u"text",
+            u"adhoctokens",
+            u"subscript",
+            u"superscript",
+            u"boldItalicized",
+            u"bolded",
+            u"italicized",
+            u"underlined",
+            u"small",
+            u"big",
+            u"strike",
+            u"tex",
+            u"command",
+            u"lineBreak",
+            u"lineJoin",
+            u"noformat"]
+
+    # Имена токенов для нотации заголовков
+    headingTokens = [u"attaches",
+            u"urlImage",
+            u"url",
+            u"text",
+            u"lineBreak",
+            u"lineJoin",
+            u"link",
+            u"adhoctokens",
+            u"subscript",
+            u"superscript",
+            u"boldItalicized",
+            u"bolded",
+            u"italicized",
+            u"small",
+            u"big",
+            u"noformat",
+            u"thumb",
+            u"underlined",
+            u"strike",
+            u"horline",
+            u"align",
+            u"tex",
+            u"command"]
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+
+    @classmethod
+    def get (cls):
+        """
+        Возвращает общий для всех парсеров экземпляр грамматики
+        """
+        with cls._instanceLock:
+            if cls._instance == None:
+                cls._instance = cls()
+
+            return cls._instance
+
+
+    def __init__ (self):
+        self.context = ParserContext()
+        parser = self.context
+
+        self.italicized = FontsFactory.makeItalic (parser)
+        self.bolded = FontsFactory.makeBold (parser)
+        self.boldItalicized = FontsFactory.makeBoldItalic (parser)
+        self.underlined = FontsFactory.makeUnderline (parser)
+        self.strike = FontsFactory.makeStrike (parser)
+        self.subscript = FontsFactory.makeSubscript (parser)
+        self.superscript = FontsFactory.makeSuperscript (parser)
+        self.code = FontsFactory.makeCode (parser)
+        self.small = FontsFactory.makeSmall(parser)
+        self.big = FontsFactory.makeBig(parser)
+        self.headings = HeadingFactory.make(parser)
+        self.thumb = ThumbnailFactory.make(parser)
+        self.noformat = NoFormatFactory.make(parser)
+        self.preformat = PreFormatFactory.make (parser)
+        self.horline = HorLineFactory.make(parser)
+        self.link = LinkFactory.make (parser)
+        self.align = AlignFactory.make(parser)
+        self.table = TableFactory.make(parser)
+        self.url = UrlFactory.make (parser)
+        self.urlImage = UrlImageFactory.make (parser)
+        self.attaches = AttachFactory.make (parser)
+        self.attachImages = AttachImagesFactory.make (parser)
+        self.adhoctokens = AdHocFactory.make(parser)
+        self.lists = ListFactory.make (parser)
+        self.lineBreak = LineBreakFactory.make (parser)
+        self.lineJoin = LineJoinFactory.make (parser)
+        self.tex = TexFactory.make (parser)
+        self.command = CommandFactory.make (parser)
+        self.text = TextFactory.make(parser)
+
+        self.wikiMarkup = self._makeMarkup (self.wikiTokens)
+        self.listItemMarkup = self._makeMarkup (self.listItemTokens)
+
+        # Нотация для ссылок
+        self.linkMarkup = self._makeMarkup (self.linkTokens)
+
+        # Нотация для заголовков
+        self.headingMarkup = self._makeMarkup (self.headingTokens)
+
+
+    def _makeMarkup (self, names):
+        """
+        Объединить токены с именами names в одну нотацию.
+        Токены проверяются в порядке их следования в списке
+        """
+        markup = MatchFirst ([getattr (self, name) for name in names])
+
+        # pyparsing оптимизирует выражения при первом разборе.
+        # Сделаем это сразу, чтобы грамматику можно было использовать из нескольких потоков
+        markup.streamline()
+        return markup
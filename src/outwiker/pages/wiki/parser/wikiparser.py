@@ -3,27 +3,12 @@
 
 import traceback
 
-from tokenfonts import FontsFactory
-from tokennoformat import NoFormatFactory
-from tokenpreformat import PreFormatFactory
-from tokenthumbnail import ThumbnailFactory
-from tokenheading import HeadingFactory
-from tokenadhoc import AdHocFactory
-from tokenhorline import HorLineFactory
-from tokenlink import LinkFactory
-from tokenalign import AlignFactory
-from tokentable import TableFactory
-from tokenurl import UrlFactory
-from tokenurlimage import UrlImageFactory
-from tokenattach import AttachFactory, AttachImagesFactory
-from tokenlist import ListFactory
-from tokenlinebreak import LineBreakFactory
-from tokenlinejoin import LineJoinFactory
-from tokentex import TexFactory
-from tokencommand import CommandFactory
-from tokentext import TextFactory
+from outwiker.core.attachment import Attachment
+from outwiker.core.thumbpool import ThumbPool
 
+from wikigrammar import WikiGrammar
 from ..thumbnails import Thumbnails
+from ..rendercache import RenderCache
 
 
 class Parser (object):
@@ -40,138 +25,22 @@ class Parser (object):
         # Ключ - имя команды, значение - экземпляр класса команды
         self.commands = {}
 
-        self.italicized = FontsFactory.makeItalic (self)
-        self.bolded = FontsFactory.makeBold (self)
-        self.boldItalicized = FontsFactory.makeBoldItalic (self)
-        self.underlined = FontsFactory.makeUnderline (self)
-        self.strike = FontsFactory.makeStrike (self)
-        self.subscript = FontsFactory.makeSubscript (self)
-        self.superscript = FontsFactory.makeSuperscript (self)
-        self.code = FontsFactory.makeCode (self)
-        self.small = FontsFactory.makeSmall(self)
-        self.big = FontsFactory.makeBig(self)
-        self.headings = HeadingFactory.make(self)
-        self.thumb = ThumbnailFactory.make(self)
-        self.noformat = NoFormatFactory.make(self)
-        self.preformat = PreFormatFactory.make (self)
-        self.horline = HorLineFactory.make(self)
-        self.link = LinkFactory.make (self)
-        self.align = AlignFactory.make(self)
-        self.table = TableFactory.make(self)
-        self.url = UrlFactory.make (self)
-        self.urlImage = UrlImageFactory.make (self)
-        self.attaches = AttachFactory.make (self)
-        self.attachImages = AttachImagesFactory.make (self)
-        self.adhoctokens = AdHocFactory.make(self)
-        self.lists = ListFactory.make (self)
-        self.lineBreak = LineBreakFactory.make (self)
-        self.lineJoin = LineJoinFactory.make (self)
-        self.tex = TexFactory.make (self)
-        self.command = CommandFactory.make (self)
-        self.text = TextFactory.make(self)
-
-        self.listItemMarkup = (self.attaches |
-                self.urlImage |
-                self.url |
-                self.text | 
-                self.lineBreak |
-                self.lineJoin |
-                self.link |
-                self.boldItalicized |
-                self.bolded |
-                self.italicized |
-                self.code |
-                self.small |
-                self.big |
-                self.preformat |
-                self.noformat |
-                self.thumb |
-                self.underlined |
-                self.strike |
-                self.subscript |
-                self.superscript |
-                self.attaches |
-                self.tex |
-                self.command
-                )
-
-
-        self.wikiMarkup = (self.attaches |
-                self.urlImage |
-                self.url |
-                self.text | 
-                self.lineBreak |
-                self.lineJoin |
-                self.link |
-                self.adhoctokens |
-                self.subscript |
-                self.superscript |
-                self.boldItalicized |
-                self.bolded |
-                self.italicized |
-                self.code |
-                self.small |
-                self.big |
-                self.preformat |
-                self.noformat |
-                self.thumb |
-                self.underlined |
-                self.strike |
-                self.horline |
-                self.align |
-                self.lists |
-                self.table |
-                self.headings |
-                self.tex |
-                self.command
-                )
-
-        # Нотация для ссылок
-        self.linkMarkup = (self.attachImages |
-                self.urlImage |
-                self.text | 
-                self.adhoctokens |
-                self.subscript |
-                self.superscript |
-                self.boldItalicized |
-                self.bolded |
-                self.italicized |
-                self.underlined |
-                self.small |
-                self.big |
-                self.strike |
-                self.tex |
-                self.command |
-                self.lineBreak |
-                self.lineJoin |
-                self.noformat
-                )
-
-        # Нотация для заголовков
-        self.headingMarkup = (self.attaches |
-                self.urlImage |
-                self.url |
-                self.text | 
-                self.lineBreak |
-                self.lineJoin |
-                self.link |
-                self.adhoctokens |
-                self.subscript |
-                self.superscript |
-                self.boldItalicized |
-                self.bolded |
-                self.italicized |
-                self.small |
-                self.big |
-                self.noformat |
-                self.thumb |
-                self.underlined |
-                self.strike |
-                self.horline |
-                self.align |
-                self.tex |
-                self.command
-                )
+        # Имена прикрепленных к странице файлов. Более длинные имена идут раньше
+        self.attachments = self._getAttachments()
+
+        # Токены создаются один раз на процесс
+        self.grammar = WikiGrammar.get()
+
+        self.wikiMarkup = self.grammar.wikiMarkup
+        self.listItemMarkup = self.grammar.listItemMarkup
+        self.linkMarkup = self.grammar.linkMarkup
+        self.headingMarkup = self.grammar.headingMarkup
+
+
+    def _getAttachments (self):
+        attaches = Attachment (self.page).getAttachRelative()
+        attaches.sort (key=len, reverse=True)
+        return attaches
 
 
     @property
@@ -182,6 +51,14 @@ class Parser (object):
         return u"\n".join (self.__headers)
 
 
+    @property
+    def headers (self):
+        """
+        Список добавленных заголовочных элементов
+        """
+        return self.__headers[:]
+
+
     def appendToHead (self, header):
         """
         Добавить строку в заголовок
@@ -193,38 +70,50 @@ class Parser (object):
         """
         Сгенерить HTML без заголовков типа <HTML> и т.п.
         """
+        result = self.parseWikiMarkup(text)
+
+        # Превьюшки могут создаваться в фоновых потоках, дождемся их.
+        # Превьюшки используются повторно, пока не изменится исходный файл,
+        # а те, на которые больше нет ссылок, удаляются
         thumb = Thumbnails (self.page)
-        thumb.clearDir()
+        ThumbPool.get().waitGroup (thumb.getThumbPath (create=False))
+        thumb.removeUnused (result + self.head)
+        thumb.saveCache()
 
-        return self.parseWikiMarkup(text)
+        RenderCache (self.page).save()
+
+        return result
 
 
     def parseWikiMarkup (self, text):
-        try:
-            return self.wikiMarkup.transformString (text)
-        except Exception, e:
-            return self.error_template.format (error = traceback.format_exc())
+        return self._parse (self.wikiMarkup, text)
 
 
     def parseListItemMarkup (self, text):
-        try:
-            return self.listItemMarkup.transformString (text)
-        except Exception, e:
-            return self.error_template.format (error = traceback.format_exc())
+        return self._parse (self.listItemMarkup, text)
 
 
     def parseLinkMarkup (self, text):
-        try:
-            return self.linkMarkup.transformString (text)
-        except Exception, e:
-            return self.error_template.format (error = traceback.format_exc())
+        return self._parse (self.linkMarkup, text)
 
 
     def parseHeadingMarkup (self, text):
+        return self._parse (self.headingMarkup, text)
+
+
+    def _parse (self, markup, text):
+        """
+        Разобрать текст с помощью нотации markup.
+        На время разбора парсер становится текущим для токенов грамматики
+        """
+        self.grammar.context.push (self)
+
         try:
-            return self.headingMarkup.transformString (text)
+            return markup.transformString (text)
         except Exception, e:
             return self.error_template.format (error = traceback.format_exc())
+        finally:
+            self.grammar.context.pop()
 
 
     def addCommand (self, command):
@@ -2,10 +2,12 @@
 # -*- coding: UTF-8 -*-
 
 from parser.wikiparser import Parser
+from parser.fastparser import FastParser
 from parser.commandinclude import IncludeCommand
 from parser.commandchildlist import ChildListCommand
 from parser.commandattachlist import AttachListCommand
 from outwiker.core.application import Application
+from wikiconfig import WikiConfig
 
 
 class ParserFactory (object):
@@ -21,9 +23,12 @@ class ParserFactory (object):
         """
         Создать парсер
         page - страница, для которой создается парсер,
-        config - экземпляр класса, хранящий настройки
+        config - экземпляр класса, хранящий настройки.
+        Тип парсера (Parser или FastParser) выбирается в зависимости от настроек
         """
-        parser = Parser (page, config)
+        parserType = FastParser if WikiConfig (config).fastParserOptions.value else Parser
+
+        parser = parserType (page, config)
         self._addCommands (parser)
         Application.onWikiParserPrepare (parser)
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import hashlib
+import json
+import os
+import os.path
+import threading
+from collections import OrderedDict
+
+from outwiker.core.attachment import Attachment
+from .thumbnails import Thumbnails
+
+
+class RenderCache (object):
+    """
+    Кеш результатов выполнения команд вики-нотации (например, (:include:) и (:source:)) для страницы.
+    Хранится в папке с превьюшками страницы. При превышении размера удаляются записи,
+    которые дольше всего не использовались.
+    В памяти хранятся кеши только тех страниц, которые использовались последними
+    """
+    cacheFile = u"__render.json"
+
+    # Максимальный суммарный размер результатов в кеше одной страницы (в символах)
+    maxSize = 4 * 1024 * 1024
+
+    # Максимальный суммарный размер кешей всех страниц, хранящихся в памяти (в символах)
+    maxTotalSize = 16 * 1024 * 1024
+
+    # Прочитанные файлы кеша. Ключ - путь до папки с превьюшками,
+    # значение - список [(время изменения, размер) файла кеша,
+    # упорядоченный по времени использования словарь записей (ключ - [размер, результат]),
+    # суммарный размер, изменен ли словарь].
+    # Упорядочен по времени использования
+    _caches = OrderedDict()
+    _cacheLock = threading.RLock()
+
+    def __init__ (self, page):
+        self.page = page
+
+
+    @staticmethod
+    def getKey (command, version, params, content=u"", path=None):
+        """
+        Возвращает ключ для результата выполнения команды.
+        command - имя команды
+        version - версия реализации команды (при ее изменении старые результаты не используются)
+        params - данные, от которых зависит результат (должны сохраняться в JSON)
+        content - текст внутри команды
+        path - путь до прикрепленного файла, из которого команда берет данные.
+            Если файла не существует, возвращается None
+        """
+        signature = None
+
+        if path != None:
+            try:
+                stat = os.stat (path)
+            except OSError:
+                return None
+
+            signature = [path, stat.st_mtime, stat.st_size]
+
+        data = [command, version, params, hashlib.md5 (content.encode ("utf8")).hexdigest(), signature]
+        return hashlib.md5 (json.dumps (data)).hexdigest()
+
+
+    def get (self, key):
+        """
+        Возвращает сохраненный результат или None, если его нет в кеше
+        """
+        with RenderCache._cacheLock:
+            cache = self._getCache (self._getCacheDir())
+            record = cache[1].pop (key, None)
+
+            if record == None:
+                return None
+
+            # Перенести запись в конец, как последнюю использованную
+            cache[1][key] = record
+            return record[1]
+
+
+    def set (self, key, value):
+        """
+        Сохранить результат value (должен сохраняться в JSON).
+        Изменения записываются в файл кеша методом save()
+        """
+        size = len (json.dumps (value))
+        if size > self.maxSize:
+            return
+
+        with RenderCache._cacheLock:
+            cache = self._getCache (self._getCacheDir())
+
+            old = cache[1].pop (key, None)
+            if old != None:
+                cache[2] -= old[0]
+
+            cache[1][key] = [size, value]
+            cache[2] += size
+            cache[3] = True
+
+            while cache[2] > self.maxSize:
+                oldkey, oldrecord = cache[1].popitem (last=False)
+                cache[2] -= oldrecord[0]
+
+
+    def save (self):
+        """
+        Записать файл кеша, если в нем есть изменения.
+        Папка с превьюшками создается, только если у страницы уже есть папка для вложений
+        """
+        cachedir = self._getCacheDir()
+
+        with RenderCache._cacheLock:
+            cache = RenderCache._caches.get (cachedir)
+            if (cache != None and
+                    cache[3] and
+                    os.path.exists (Attachment (self.page).getAttachPath (create=False))):
+                Thumbnails (self.page).getThumbPath (create=True)
+
+                path = os.path.join (cachedir, RenderCache.cacheFile)
+                with open (path, "w") as fp:
+                    json.dump (cache[1].items(), fp)
+
+                cache[0] = self._getFileStat (path)
+                cache[3] = False
+
+            self._shrinkCaches (cachedir)
+
+
+    def _shrinkCaches (self, keepdir):
+        """
+        Удалить из памяти кеши страниц, которые дольше всего не использовались,
+        пока их суммарный размер превышает maxTotalSize.
+        Кеш из папки keepdir не удаляется.
+        Несохраненные изменения удаленных кешей теряются (результаты будут вычислены заново)
+        """
+        total = sum ([cache[2] for cache in RenderCache._caches.itervalues()])
+
+        for cachedir in RenderCache._caches.keys():
+            if total <= self.maxTotalSize:
+                break
+
+            if cachedir != keepdir:
+                total -= RenderCache._caches.pop (cachedir)[2]
+
+
+    def _getCacheDir (self):
+        return Thumbnails (self.page).getThumbPath (create=False)
+
+
+    def _getCache (self, cachedir):
+        """
+        Возвращает кеш для папки cachedir. Файл кеша перечитывается,
+        если он изменился с момента последнего чтения (например, при синхронизации вики)
+        """
+        path = os.path.join (cachedir, RenderCache.cacheFile)
+        filestat = self._getFileStat (path)
+
+        cache = RenderCache._caches.pop (cachedir, None)
+        if cache != None and (cache[0] == filestat or cache[3]):
+            # Перенести кеш в конец, как последний использованный
+            RenderCache._caches[cachedir] = cache
+            return cache
+
+        items = []
+        if filestat != None:
+            try:
+                with open (path) as fp:
+                    items = json.load (fp)
+            except (IOError, ValueError):
+                pass
+
+        records = OrderedDict()
+        size = 0
+
+        if isinstance (items, list):
+            for item in items:
+                try:
+                    key, (recordsize, value) = item
+                except (TypeError, ValueError):
+                    continue
+
+                records[key] = [recordsize, value]
+                size += recordsize
+
+        cache = [filestat, records, size, False]
+        RenderCache._caches[cachedir] = cache
+        return cache
+
+
+    @staticmethod
+    def _getFileStat (path):
+        try:
+            stat = os.stat (path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime, stat.st_size)
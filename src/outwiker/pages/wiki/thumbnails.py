@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import hashlib
+import json
 import os
 import os.path
+import threading
 
 from outwiker.core.attachment import Attachment
 
@@ -13,6 +16,16 @@ class Thumbnails (object):
     """
     thumbDir = u"__thumb"
 
+    # Файл в папке с превьюшками, в котором для каждой превьюшки
+    # хранятся время изменения, размер и MD5 исходного файла.
+    # Для файлов, созданных не из вложений (например, картинок с формулами), вместо этого хранится None
+    cacheFile = u"__thumbs.json"
+
+    # Прочитанные файлы кеша. Ключ - путь до папки с превьюшками,
+    # значение - список [(время изменения, размер) файла кеша, словарь записей, изменен ли словарь]
+    _caches = {}
+    _cacheLock = threading.RLock()
+
     def __init__ (self, page):
         self.page = page
 
@@ -49,3 +62,163 @@ class Thumbnails (object):
 
             if os.path.isfile (fullpath):
                 os.remove (fullpath)
+
+        with Thumbnails._cacheLock:
+            Thumbnails._caches.pop (path, None)
+
+
+    def isActual (self, thumbname, srcpath):
+        """
+        Проверить, что превьюшка thumbname создана из текущей версии файла srcpath.
+        Сначала сравниваются время изменения и размер исходного файла,
+        а если изменилось только время, то MD5 содержимого
+        """
+        thumbdir = self.getThumbPath (create=False)
+        if not os.path.exists (os.path.join (thumbdir, thumbname)):
+            return False
+
+        try:
+            stat = os.stat (srcpath)
+        except OSError:
+            return False
+
+        with Thumbnails._cacheLock:
+            cache = self._getCache (thumbdir)
+            record = cache[1].get (thumbname)
+
+            if record == None or record[1] != stat.st_size:
+                return False
+
+            if record[0] == stat.st_mtime:
+                return True
+
+        # Файл мог быть перезаписан тем же содержимым
+        md5 = self._getHash (srcpath)
+        if md5 != record[2]:
+            return False
+
+        self._setRecord (thumbdir, thumbname, [stat.st_mtime, stat.st_size, md5])
+        return True
+
+
+    def setSource (self, thumbname, srcpath):
+        """
+        Запомнить, что превьюшка thumbname создана из текущей версии файла srcpath.
+        Изменения записываются в файл кеша методом saveCache()
+        """
+        stat = os.stat (srcpath)
+        self._setRecord (self.getThumbPath (create=False),
+                thumbname,
+                [stat.st_mtime, stat.st_size, self._getHash (srcpath)])
+
+
+    def addFile (self, fname):
+        """
+        Запомнить файл fname из папки с превьюшками, созданный при разборе страницы не из вложения
+        (например, картинку с формулой), чтобы удалить его, когда он перестанет использоваться
+        """
+        thumbdir = self.getThumbPath (create=False)
+
+        with Thumbnails._cacheLock:
+            if fname not in self._getCache (thumbdir)[1]:
+                self._setRecord (thumbdir, fname, None)
+
+
+    def removeUnused (self, html):
+        """
+        Удалить запомненные превьюшки и созданные при разборе файлы, на которые нет ссылок в html.
+        Остальные файлы в папке с превьюшками (например, скопированные скрипты) не удаляются.
+        Изменения записываются в файл кеша методом saveCache()
+        """
+        thumbdir = self.getThumbPath (create=False)
+        if not os.path.exists (thumbdir):
+            return
+
+        with Thumbnails._cacheLock:
+            cache = self._getCache (thumbdir)
+            unused = [fname for fname in cache[1]
+                    if Thumbnails.thumbDir + u"/" + fname not in html]
+
+            for fname in unused:
+                try:
+                    os.remove (os.path.join (thumbdir, fname))
+                except OSError:
+                    pass
+
+                del cache[1][fname]
+                cache[2] = True
+
+
+    def saveCache (self):
+        """
+        Записать файл кеша, если в нем есть изменения
+        """
+        thumbdir = self.getThumbPath (create=False)
+
+        with Thumbnails._cacheLock:
+            cache = Thumbnails._caches.get (thumbdir)
+            if cache == None or not cache[2] or not os.path.exists (thumbdir):
+                return
+
+            path = os.path.join (thumbdir, Thumbnails.cacheFile)
+            with open (path, "w") as fp:
+                json.dump (cache[1], fp)
+
+            cache[0] = self._getFileStat (path)
+            cache[2] = False
+
+
+    def _setRecord (self, thumbdir, thumbname, record):
+        with Thumbnails._cacheLock:
+            cache = self._getCache (thumbdir)
+            cache[1][thumbname] = record
+            cache[2] = True
+
+
+    def _getCache (self, thumbdir):
+        """
+        Возвращает кеш для папки thumbdir. Файл кеша перечитывается,
+        если он изменился с момента последнего чтения (например, при синхронизации вики)
+        """
+        path = os.path.join (thumbdir, Thumbnails.cacheFile)
+        filestat = self._getFileStat (path)
+
+        cache = Thumbnails._caches.get (thumbdir)
+        if cache != None and (cache[0] == filestat or cache[2]):
+            return cache
+
+        records = {}
+        if filestat != None:
+            try:
+                with open (path) as fp:
+                    records = json.load (fp)
+            except (IOError, ValueError):
+                pass
+
+        if not isinstance (records, dict):
+            records = {}
+
+        cache = [filestat, records, False]
+        Thumbnails._caches[thumbdir] = cache
+        return cache
+
+
+    @staticmethod
+    def _getFileStat (path):
+        try:
+            stat = os.stat (path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime, stat.st_size)
+
+
+    @staticmethod
+    def _getHash (path):
+        md5 = hashlib.md5()
+
+        with open (path, "rb") as fp:
+            for block in iter (lambda: fp.read (65536), ""):
+                md5.update (block)
+
+        return md5.hexdigest()
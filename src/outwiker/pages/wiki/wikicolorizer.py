@@ -1,11 +1,14 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
 
+import bisect
+import re
+import threading
+from array import array
+
 import wx
 import wx.stc
 
-import threading
-
 from parser.tokenfonts import FontsFactory
 from parser.tokenheading import HeadingFactory
 from parser.tokencommand import CommandFactory
@@ -19,7 +22,95 @@ from parser.tokentext import TextFactory
 ApplyStyleEvent, EVT_APPLY_STYLE = wx.lib.newevent.NewEvent()
 
 
+class BytePositions (object):
+    """
+    Преобразование позиций в символах в позиции в байтах (в кодировке UTF-8).
+    Хранит таблицу смещений начал строк в символах и в байтах,
+    которая строится по мере обращения к позициям, начиная с позиции start
+    """
+    def __init__ (self, text, start=0):
+        self._text = text
+
+        # Начало первой строки таблицы должно быть началом строки
+        start = text.rfind (u"\n", 0, start) + 1
+
+        self._charStarts = array ("l", [start])
+        self._byteStarts = array ("l", [self._byteLen (text[:start])])
+        self._complete = False
+
+
+    def __call__ (self, pos):
+        if pos > self._charStarts[-1] and not self._complete:
+            self._extend (pos)
+
+        line = bisect.bisect_right (self._charStarts, pos) - 1
+        assert line >= 0
+
+        linestart = self._charStarts[line]
+        return self._byteStarts[line] + self._byteLen (self._text[linestart: pos])
+
+
+    def _extend (self, pos):
+        charpos = self._charStarts[-1]
+        bytepos = self._byteStarts[-1]
+
+        while charpos < pos:
+            lineend = self._text.find (u"\n", charpos)
+            if lineend == -1:
+                self._complete = True
+                break
+
+            bytepos += self._byteLen (self._text[charpos: lineend + 1])
+            charpos = lineend + 1
+
+            self._charStarts.append (charpos)
+            self._byteStarts.append (bytepos)
+
+
+    @staticmethod
+    def _byteLen (text):
+        return len (text.encode ("utf-8"))
+
+
+class ColorizerState (object):
+    """
+    Результат раскраски текста: текст, стили всех байтов (bytearray)
+    и многострочные токены верхнего уровня (отсортированные списки начал и концов в символах).
+    После создания не изменяется
+    """
+    def __init__ (self, text, styles, spanStarts, spanEnds):
+        self.text = text
+        self.styles = styles
+        self.spanStarts = spanStarts
+        self.spanEnds = spanEnds
+
+
+    def getSpan (self, pos):
+        """
+        Возвращает индекс многострочного токена, внутри которого (не на границе) находится позиция pos, или None
+        """
+        index = bisect.bisect_left (self.spanStarts, pos) - 1
+        if index >= 0 and self.spanEnds[index] > pos:
+            return index
+
+        return None
+
+
+
 class WikiColorizer (object):
+    """
+    Раскраска текста в редакторе вики-страниц.
+
+    Запоминается результат последней раскраски, примененной к редактору (ColorizerState).
+    При следующей раскраске заново разбирается только часть текста:
+    от начала строки перед изменением (или от начала многострочного токена, в который попадает эта строка)
+    до первого начала строки после изменения, с которого разбор старого текста шел так же.
+    Если рядом с изменением есть конец многострочного токена,
+    то изменение может закрыть токен, начатый выше по тексту, и текст разбирается целиком.
+
+    Раскраска в фоновом потоке не меняет запомненный результат.
+    Новый результат запоминается методом commit(), когда стили применены к редактору
+    """
     def __init__ (self, editor):
         self._editor = editor
 
@@ -57,93 +148,427 @@ class WikiColorizer (object):
                 self.italic | 
                 self.underline)
 
-        self._thread = None
+        self._lock = threading.Lock()
+
+        # Идет ли раскраска в фоновом потоке и текст, который нужно раскрасить после текущего
+        self._running = False
+        self._pendingText = None
+
+        self._defaultStyle = int (wx.stc.STC_STYLE_DEFAULT)
+
+        # Концы токенов, которые могут начинаться выше по тексту
+        # (многострочные шрифты, подчеркивание, команды, блоки без форматирования)
+        self._unsafeRegex = re.compile (r"''|\+\}|=\]|:\)")
+
+        # Сколько символов вокруг изменения проверять на концы токенов
+        self._unsafeMargin = 3
+
+        # Конец команды (:nameend:) может получиться при изменении любой части имени,
+        # поэтому он ищется в измененных строках целиком
+        self._commandEndRegex = re.compile (r"end\s*:\)", re.IGNORECASE)
+
+        # Таблицы для bytearray.translate, добавляющие стиль к байтам стилей.
+        # Ключ - идентификатор стиля
+        self._addStyleTables = {}
+
+        # Результат последней примененной раскраски (ColorizerState) или None
+        # и номер версии, который увеличивается при каждом его изменении
+        self._state = None
+        self._version = 0
 
 
     def start (self, text):
-        if (self._thread == None or
-                not self._thread.isAlive()):
-            self._thread = threading.Thread (None, self._threadFunc, args=(text,))
-            self._thread.start()
+        """
+        Раскрасить текст text в фоновом потоке.
+        По окончании редактору посылается событие ApplyStyleEvent
+        """
+        with self._lock:
+            self._pendingText = text
+            if self._running:
+                return
+
+            self._running = True
+
+        thread = threading.Thread (None, self._threadFunc)
+        thread.daemon = True
+        thread.start()
+
+
+    def invalidate (self):
+        """
+        Забыть результат последней раскраски (например, если в редактор загружен новый текст).
+        Следующая раскраска будет полной
+        """
+        with self._lock:
+            self._state = None
+            self._version += 1
+
+
+    def commit (self, version, state):
+        """
+        Запомнить результат раскраски state после того, как он применен к редактору.
+        version - версия результата, относительно которого велась раскраска.
+        Возвращает False, если с тех пор запомненный результат изменился
+        и стили state применять нельзя
+        """
+        with self._lock:
+            if version != self._version:
+                return False
+
+            if state is not self._state:
+                self._state = state
+                self._version += 1
+
+            return True
+
+
+    def _threadFunc (self):
+        while True:
+            with self._lock:
+                text = self._pendingText
+                self._pendingText = None
+
+                if text == None:
+                    self._running = False
+                    return
+
+                state = self._state
+                version = self._version
+
+            start, stylebytes, newstate = self._colorize (text, state)
+
+            event = ApplyStyleEvent (text=text, 
+                    start=start, 
+                    stylebytes=stylebytes, 
+                    state=newstate, 
+                    version=version)
+            wx.PostEvent (self._editor, event)
+
+
+    def colorize (self, text):
+        """
+        Раскрасить текст text и сразу запомнить результат.
+        Возвращает кортеж (позиция в байтах, строка стилей), 
+        где строка стилей содержит стили байтов, начиная с этой позиции.
+        Стили остальных байтов не изменились по сравнению с предыдущей раскраской
+        (с учетом сдвига текста после изменения)
+        """
+        with self._lock:
+            state = self._state
+            version = self._version
+
+        start, stylebytes, newstate = self._colorize (text, state)
+        self.commit (version, newstate)
+
+        return (start, stylebytes)
+
+
+    def _colorize (self, text, state):
+        """
+        Раскрасить текст text относительно результата предыдущей раскраски state (может быть None).
+        Возвращает кортеж (позиция в байтах, строка стилей, новый ColorizerState)
+        """
+        if state != None and state.text == text:
+            return (0, "", state)
+
+        result = None
+        if state != None:
+            result = self._colorizeChanges (text, state)
+
+        if result == None:
+            result = self._colorizeAll (text)
+
+        return result
+
+
+    def _colorizeAll (self, text):
+        positions = BytePositions (text)
+        styles = bytearray (chr (self._defaultStyle)) * positions (len (text))
+
+        tokens = list (self.colorParser.scanString (text))
+        self._applyTokens (text, tokens, 0, positions, styles, 0)
+
+        spanStarts, spanEnds = self._getSpans (text, tokens, 0)
 
+        return (0, str (styles), ColorizerState (text, styles, spanStarts, spanEnds))
 
-    def _threadFunc (self, text):
-        stylebytes = self._startColorize (text)
-        event = ApplyStyleEvent (text=text, stylebytes=stylebytes)
-        wx.PostEvent (self._editor, event)
 
+    def _colorizeChanges (self, text, state):
+        """
+        Раскрасить заново только измененную часть текста.
+        Возвращает None, если это невозможно
+        """
+        oldtext = state.text
+
+        prefix = self._commonPrefix (oldtext, text)
+        suffix = self._commonSuffix (oldtext, text, min (len (oldtext), len (text)) - prefix)
+
+        oldEnd = len (oldtext) - suffix
+        newEnd = len (text) - suffix
+        delta = len (text) - len (oldtext)
+
+        # Строки, в которых произошли изменения, и строка перед ними
+        # (заголовок может захватывать следующие за ним пустые строки)
+        linestart = text.rfind (u"\n", 0, prefix) + 1
+        if linestart != 0:
+            linestart = text.rfind (u"\n", 0, linestart - 1) + 1
+
+        # Изменение могло закрыть токен, который начинается выше по тексту
+        if (self._isUnsafeChange (text, prefix, newEnd) or
+                self._isUnsafeChange (oldtext, prefix, oldEnd)):
+            return None
+
+        restart = self._findRestart (state, oldtext, linestart)
+
+        # Разбираем текст, пока не дойдем до места, где разбор совпадет со старым
+        tokens = []
+        resync = None
+        prevEnd = restart
+
+        for token in self.colorParser.scanString (text[restart:]):
+            resync = self._findResync (state, text, prevEnd, token[1] + restart, newEnd, delta)
+            if resync != None:
+                break
+
+            tokens.append (token)
+            prevEnd = token[2] + restart
+
+        if resync == None:
+            resync = self._findResync (state, text, prevEnd, len (text), newEnd, delta)
+
+        if resync == None:
+            resync = len (text)
+
+        positions = BytePositions (text, restart)
+        bytestart = positions (restart)
+        byteend = positions (resync)
+
+        styles = bytearray (chr (self._defaultStyle)) * (byteend - bytestart)
+        self._applyTokens (text, tokens, restart, positions, styles, bytestart)
+
+        # Стили после места совпадения разбора берутся из старых стилей
+        byteDelta = (BytePositions._byteLen (text[prefix: newEnd]) - 
+                BytePositions._byteLen (oldtext[prefix: oldEnd]))
+
+        newstyles = (state.styles[:bytestart] + 
+                styles + 
+                state.styles[byteend - byteDelta:])
+
+        spanStarts, spanEnds = self._updateSpans (state, text, tokens, restart, resync - delta, delta)
+
+        return (bytestart, str (styles), ColorizerState (text, newstyles, spanStarts, spanEnds))
 
-    def _startColorize (self, text):
-        textlength = self._editor.calcByteLen (text)
-        stylelist = [wx.stc.STC_STYLE_DEFAULT] * textlength
 
-        self._colorizeText (text, 0, textlength, self.colorParser, stylelist)
+    def _isUnsafeChange (self, text, start, end):
+        """
+        Проверить, есть ли в измененной части [start, end) текста text или рядом с ней конец токена
+        """
+        margin = self._unsafeMargin
+        if self._unsafeRegex.search (text[max (start - margin, 0): end + margin]) != None:
+            return True
+
+        linestart = text.rfind (u"\n", 0, start) + 1
+        lineend = text.find (u"\n", end)
+        if lineend == -1:
+            lineend = len (text)
+
+        return self._commandEndRegex.search (text, linestart, lineend) != None
+
+
+    @staticmethod
+    def _commonPrefix (text1, text2):
+        """
+        Длина общего начала строк (двоичный поиск со сравнением срезов)
+        """
+        lo = 0
+        hi = min (len (text1), len (text2))
+
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if text1[lo: mid] == text2[lo: mid]:
+                lo = mid
+            else:
+                hi = mid - 1
 
-        stylebytes = "".join ([chr(byte) for byte in stylelist])
-        return stylebytes
+        return lo
 
 
-    def _colorizeText (self, text, start, end, parser, stylelist):
+    @staticmethod
+    def _commonSuffix (text1, text2, maxlen):
+        """
+        Длина общего конца строк, но не больше maxlen
+        """
+        lo = 0
+        hi = maxlen
+        len1 = len (text1)
+        len2 = len (text2)
+
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if text1[len1 - mid: len1 - lo] == text2[len2 - mid: len2 - lo]:
+                lo = mid
+            else:
+                hi = mid - 1
+
+        return lo
+
+
+    def _findRestart (self, state, oldtext, pos):
+        """
+        Возвращает начало строки, не ближе pos, которое не находится внутри многострочного токена
+        """
+        while True:
+            index = state.getSpan (pos)
+            if index == None:
+                return pos
+
+            pos = oldtext.rfind (u"\n", 0, state.spanStarts[index]) + 1
+
+
+    def _findResync (self, state, text, start, end, newEnd, delta):
+        """
+        Найти начало строки в диапазоне [start, end] после изменения (не раньше newEnd),
+        которое и в старом тексте было началом строки, не находящимся внутри многострочного токена.
+        Позиции в диапазоне не находятся внутри новых токенов.
+        Возвращает позицию в новом тексте или None
+        """
+        pos = max (start, newEnd)
+
+        if pos != 0 and text[pos - 1] != u"\n":
+            pos = text.find (u"\n", pos) + 1
+            if pos == 0:
+                return None
+
+        while pos <= end:
+            oldpos = pos - delta
+
+            # Перевод строки мог быть вставлен внутрь однострочного токена
+            if ((oldpos == 0 or state.text[oldpos - 1] == u"\n") and 
+                    state.getSpan (oldpos) == None):
+                return pos
+
+            pos = text.find (u"\n", pos) + 1
+            if pos == 0:
+                return None
+
+        return None
+
+
+    def _getSpans (self, text, tokens, offset):
+        """
+        Возвращает списки начал и концов (в символах) многострочных токенов
+        """
+        starts = []
+        ends = []
+
+        for token in tokens:
+            start = token[1] + offset
+            end = token[2] + offset
+
+            if text.find (u"\n", start, end - 1) != -1:
+                starts.append (start)
+                ends.append (end)
+
+        return (starts, ends)
+
+
+    def _updateSpans (self, state, text, tokens, restart, oldResync, delta):
+        """
+        Возвращает списки начал и концов многострочных токенов после частичного разбора
+        """
+        before = bisect.bisect_right (state.spanEnds, restart)
+        after = bisect.bisect_left (state.spanStarts, oldResync)
+
+        newStarts, newEnds = self._getSpans (text, tokens, restart)
+
+        spanStarts = (state.spanStarts[:before] + 
+                newStarts + 
+                [start + delta for start in state.spanStarts[after:]])
+
+        spanEnds = (state.spanEnds[:before] + 
+                newEnds + 
+                [end + delta for end in state.spanEnds[after:]])
+
+        return (spanStarts, spanEnds)
+
+
+    def _applyTokens (self, text, tokens, offset, positions, styles, bytebase):
+        """
+        Применить стили токенов верхнего уровня к массиву styles.
+        offset - позиция в тексте, с которой начинался разбор
+        bytebase - позиция в байтах, соответствующая началу массива styles
+        """
+        for token in tokens:
+            self._applyToken (text, token, offset, positions, styles, bytebase)
+
+
+    def _colorizeText (self, text, start, end, parser, positions, styles, bytebase):
         tokens = parser.scanString (text[start: end])
 
         for token in tokens:
-            pos_start = token[1] + start
-            pos_end = token[2] + start
+            self._applyToken (text, token, start, positions, styles, bytebase)
+
 
-            tokenname = token[0].getName()
-            # print tokenname
+    def _applyToken (self, text, token, offset, positions, styles, bytebase):
+        pos_start = token[1] + offset
+        pos_end = token[2] + offset
 
-            if (tokenname == "text" or
-                tokenname == "linebreak" or
-                tokenname == "noformat"):
-                continue
+        tokenname = token[0].getName()
 
-            # Нас интересует позиция в байтах, а не в символах
-            bytepos_start = self._editor.calcBytePos (text, pos_start)
-            bytepos_end = self._editor.calcBytePos (text, pos_end)
+        if (tokenname == "text" or
+            tokenname == "linebreak" or
+            tokenname == "noformat"):
+            return
 
-            # Применим стиль
-            if tokenname == "bold":
-                self._addStyle (stylelist, self._editor.STYLE_BOLD_ID, bytepos_start, bytepos_end)
-                self._colorizeText (text, pos_start + 3, pos_end - 3, self.insideBlockParser, stylelist)
+        # Нас интересует позиция в байтах, а не в символах
+        bytepos_start = positions (pos_start) - bytebase
+        bytepos_end = positions (pos_end) - bytebase
 
-            elif tokenname == "italic":
-                self._addStyle (stylelist, self._editor.STYLE_ITALIC_ID, bytepos_start, bytepos_end)
-                self._colorizeText (text, pos_start + 2, pos_end - 2, self.insideBlockParser, stylelist)
+        # Применим стиль
+        if tokenname == "bold":
+            self._addStyle (styles, self._editor.STYLE_BOLD_ID, bytepos_start, bytepos_end)
+            self._colorizeText (text, pos_start + 3, pos_end - 3, self.insideBlockParser, positions, styles, bytebase)
 
-            elif tokenname == "bold_italic":
-                self._addStyle (stylelist, self._editor.STYLE_BOLD_ITALIC_ID, bytepos_start, bytepos_end)
-                self._colorizeText (text, pos_start + 4, pos_end - 4, self.insideBlockParser, stylelist)
+        elif tokenname == "italic":
+            self._addStyle (styles, self._editor.STYLE_ITALIC_ID, bytepos_start, bytepos_end)
+            self._colorizeText (text, pos_start + 2, pos_end - 2, self.insideBlockParser, positions, styles, bytebase)
 
-            elif tokenname == "underline":
-                self._addStyle (stylelist, self._editor.STYLE_UNDERLINE_ID, bytepos_start, bytepos_end)
-                self._colorizeText (text, pos_start + 2, pos_end - 2, self.insideBlockParser, stylelist)
+        elif tokenname == "bold_italic":
+            self._addStyle (styles, self._editor.STYLE_BOLD_ITALIC_ID, bytepos_start, bytepos_end)
+            self._colorizeText (text, pos_start + 4, pos_end - 4, self.insideBlockParser, positions, styles, bytebase)
 
-            elif tokenname == "heading":
-                self._setStyle (stylelist, self._editor.STYLE_HEADING_ID, bytepos_start, bytepos_end)
+        elif tokenname == "underline":
+            self._addStyle (styles, self._editor.STYLE_UNDERLINE_ID, bytepos_start, bytepos_end)
+            self._colorizeText (text, pos_start + 2, pos_end - 2, self.insideBlockParser, positions, styles, bytebase)
 
-            elif tokenname == "command":
-                self._setStyle (stylelist, self._editor.STYLE_COMMAND_ID, bytepos_start, bytepos_end)
+        elif tokenname == "heading":
+            self._setStyle (styles, self._editor.STYLE_HEADING_ID, bytepos_start, bytepos_end)
 
-            elif tokenname == "link":
-                self._addStyle (stylelist, self._editor.STYLE_LINK_ID, bytepos_start, bytepos_end)
+        elif tokenname == "command":
+            self._setStyle (styles, self._editor.STYLE_COMMAND_ID, bytepos_start, bytepos_end)
 
-            elif tokenname == "url":
-                self._addStyle (stylelist, self._editor.STYLE_LINK_ID, bytepos_start, bytepos_end)
+        elif tokenname == "link":
+            self._addStyle (styles, self._editor.STYLE_LINK_ID, bytepos_start, bytepos_end)
 
+        elif tokenname == "url":
+            self._addStyle (styles, self._editor.STYLE_LINK_ID, bytepos_start, bytepos_end)
 
-    def _addStyle (self, stylelist, styleid, bytepos_start, bytepos_end):
+
+    def _addStyle (self, styles, styleid, bytepos_start, bytepos_end):
         """
-        Добавляет стиль с идентификатором styleid к массиву stylelist
+        Добавляет стиль с идентификатором styleid к массиву styles
         """
-        style_src = stylelist[bytepos_start: bytepos_end]
-        style_new = [styleid if style == wx.stc.STC_STYLE_DEFAULT else style | styleid for style in style_src]
-        
-        stylelist[bytepos_start: bytepos_end] = style_new
+        table = self._addStyleTables.get (styleid)
+        if table == None:
+            table = "".join ([chr (styleid if style == self._defaultStyle else (style | styleid) & 0xff) 
+                for style in range (256)])
+            self._addStyleTables[styleid] = table
+
+        styles[bytepos_start: bytepos_end] = styles[bytepos_start: bytepos_end].translate (table)
 
 
-    def _setStyle (self, stylelist, styleid, bytepos_start, bytepos_end):
+    def _setStyle (self, styles, styleid, bytepos_start, bytepos_end):
         """
-        Добавляет стиль с идентификатором styleid к массиву stylelist
+        Устанавливает стиль с идентификатором styleid для байтов массива styles
         """
-        stylelist[bytepos_start: bytepos_end] = [styleid] * (bytepos_end - bytepos_start)
+        styles[bytepos_start: bytepos_end] = bytearray (chr (styleid)) * (bytepos_end - bytepos_start)
@@ -28,6 +28,23 @@ class WikiConfig (object):
     # Стиль ссылок по умолчанию
     LINK_STYLE_DEFAULT = 0
 
+    # Имя параметра для размера кеша HTML-представлений страниц.
+    # Кеш хранит строки Unicode, поэтому размер задается не в байтах, а в символах:
+    # значение параметра - размер в единицах по HTML_CACHE_SIZE_UNIT символов
+    HTML_CACHE_SIZE_PARAM = u"HtmlCacheSize"
+
+    # Количество символов в единице размера кеша HTML-представлений страниц
+    HTML_CACHE_SIZE_UNIT = 1024
+
+    # Размер кеша HTML-представлений страниц по умолчанию (20 * 1024 * 1024 символов)
+    HTML_CACHE_SIZE_DEFAULT = 20 * 1024
+
+    # Имя параметра "Использовать быстрый разборщик вики-нотации?"
+    FAST_PARSER_PARAM = u"FastParser"
+
+    # Быстрый разборщик пока экспериментальный, поэтому по умолчанию не используется
+    FAST_PARSER_DEFAULT = False
+
 
     def __init__ (self, config):
         self.config = config
@@ -55,3 +72,15 @@ class WikiConfig (object):
                 WikiConfig.WIKI_SECTION, 
                 WikiConfig.LINK_STYLE_PARAM, 
                 WikiConfig.LINK_STYLE_DEFAULT)
+
+        # Размер кеша HTML-представлений страниц в памяти (в единицах по HTML_CACHE_SIZE_UNIT символов)
+        self.htmlCacheSizeOptions = IntegerOption (self.config, 
+                WikiConfig.WIKI_SECTION, 
+                WikiConfig.HTML_CACHE_SIZE_PARAM, 
+                WikiConfig.HTML_CACHE_SIZE_DEFAULT)
+
+        # Использовать быстрый разборщик вики-нотации (FastParser)?
+        self.fastParserOptions = BooleanOption (self.config, 
+                WikiConfig.WIKI_SECTION, 
+                WikiConfig.FAST_PARSER_PARAM, 
+                WikiConfig.FAST_PARSER_DEFAULT)
@@ -116,6 +116,12 @@ class WikiEditor (TextEditor):
         self.__styleSet = False
 
 
+    def SetText (self, text):
+        # Новый текст в редакторе не имеет стилей, поэтому следующая раскраска будет полной
+        self._colorizer.invalidate()
+        super (WikiEditor, self).SetText (text)
+
+
     def getTextForParse (self):
         # Табуляция в редакторе считается за несколько символов
         return self.textCtrl.GetText().replace ("\t", " ")
@@ -130,13 +136,26 @@ class WikiEditor (TextEditor):
 
 
     def _onApplyStyle (self, event):
-        if event.text == self.getTextForParse():
-            self._applyStyles (event.stylebytes)
+        text = self.getTextForParse()
+        if event.text != text:
+            # Текст изменился, его раскрасят по следующему запросу стилей
+            return
+
+        if self._colorizer.commit (event.version, event.state):
+            self._applyStyles (event.start, event.stylebytes)
+        else:
+            # Стили рассчитаны относительно раскраски, которая уже заменена другой
+            self._colorizer.start (text)
     
 
-    def _applyStyles (self, stylebytes):
-        self.textCtrl.StartStyling (0, 0xff)
-        self.textCtrl.SetStyleBytes (len (stylebytes), stylebytes)
+    def _applyStyles (self, start, stylebytes):
+        """
+        Применить стили к байтам, начиная с позиции start. Стили остальных байтов не изменились
+        """
+        if len (stylebytes) != 0:
+            self.textCtrl.StartStyling (start, 0xff)
+            self.textCtrl.SetStyleBytes (len (stylebytes), stylebytes)
+
         self.__styleSet = True
 
 
@@ -3,9 +3,11 @@
 
 import os.path
 import hashlib
+import time
 
 from outwiker.core.attachment import Attachment
 from outwiker.core.style import Style
+from outwiker.core.tree import RootWikiPage
 from outwiker.gui.guiconfig import HtmlRenderConfig
 
 from .wikiconfig import WikiConfig
@@ -14,8 +16,24 @@ from .emptycontent import EmptyContent
 
 class WikiHashCalculator (object):
     """
-    Класс для расчета контрольной суммы викистраницы
+    Класс для расчета контрольной суммы викистраницы.
+
+    Рассчитанные суммы запоминаются для каждой страницы вместе с быстрым ключом
+    (заголовок, подстраницы, значения используемых настроек, список плагинов)
+    и временами изменения и размерами всех файлов, которые участвовали в расчете.
+    Пока ключ и файлы не изменились, сумма повторно не рассчитывается.
     """
+
+    # Запомненные контрольные суммы.
+    # Ключ - путь до страницы, значение - кортеж (быстрый ключ, список файлов, контрольная сумма).
+    # Список файлов состоит из кортежей (путь, время изменения, размер)
+    _hashCache = {}
+
+    # Если время изменения файла кратно секунде (файловая система с низкой точностью времени)
+    # и файл изменялся меньше, чем racyInterval секунд назад, то сумма не запоминается,
+    # потому что следующее изменение в ту же секунду не будет замечено
+    racyInterval = 2.0
+
     def __init__ (self, application):
         self._unicodeEncoding = "unicode_escape"
 
@@ -26,16 +44,113 @@ class WikiHashCalculator (object):
 
 
     def getHash (self, page):
-        return hashlib.md5(self.__getFullContent (page) ).hexdigest()
+        quickKey = self.__getQuickKey (page)
+
+        cached = WikiHashCalculator._hashCache.get (page.path)
+        if (cached != None and 
+                cached[0] == quickKey and 
+                not self.__filesChanged (cached[1])):
+            return cached[2]
+
+        files = []
+        hash = hashlib.md5(self.__getFullContent (page, files) ).hexdigest()
+
+        if self.__isRacy (files):
+            WikiHashCalculator._hashCache.pop (page.path, None)
+        else:
+            WikiHashCalculator._hashCache[page.path] = (quickKey, files, hash)
+
+        return hash
+
+
+    @staticmethod
+    def clearCache ():
+        """
+        Забыть все запомненные контрольные суммы
+        """
+        WikiHashCalculator._hashCache.clear()
+
+
+    def __getQuickKey (self, page):
+        """
+        Данные, которые влияют на контрольную сумму, но известны без обращения к диску
+        """
+        return (page.title,
+                tuple ([child.title for child in page.children]),
+                self.__getViewOptions(),
+                self.__getEmptyContent(),
+                self.__getPluginsList())
 
 
-    def __getFullContent (self, page):
+    def __getViewOptions (self):
+        """
+        Значения настроек программы, от которых зависит вид страницы
+        """
+        return (
+                # Настройки, касающиеся вида вики-страницы
+                str (self._wikiConfig.showAttachInsteadBlankOptions.value),
+                str (self._wikiConfig.thumbSizeOptions.value),
+
+                # Настройки отображения HTML-страницы
+                str (self.__htmlConfig.fontSize.value),
+                self.__htmlConfig.fontName.value.encode(self._unicodeEncoding),
+                self.__htmlConfig.userStyle.value.encode(self._unicodeEncoding))
+
+
+    def __getEmptyContent (self):
+        """
+        Шаблон, который показывается вместо пустой страницы
+        """
+        return EmptyContent (self._mainConfig).content.encode (self._unicodeEncoding)
+
+
+    def __addFile (self, files, path):
+        """
+        Запомнить время изменения и размер файла или папки, которые участвуют в расчете суммы
+        """
+        files.append ((path,) + self.__stat (path))
+
+
+    def __stat (self, path):
+        try:
+            stat = os.stat (path)
+        except OSError:
+            return (None, None)
+
+        return (stat.st_mtime, stat.st_size)
+
+
+    def __filesChanged (self, files):
+        for path, mtime, size in files:
+            if self.__stat (path) != (mtime, size):
+                return True
+
+        return False
+
+
+    def __isRacy (self, files):
+        now = time.time()
+
+        for path, mtime, size in files:
+            if mtime != None and mtime == int (mtime) and now - mtime < self.racyInterval:
+                return True
+
+        return False
+
+
+    def __getFullContent (self, page, files):
         """
         Получить контент для расчета контрольной суммы, по которой определяется, нужно ли обновлять страницу
+        files - список, в который добавляются файлы, участвовавшие в расчете
         """
         # Здесь накапливаем список интересующих строк (по которым определяем изменилась страница или нет)
         content = []
 
+        # Папка страницы не учитывается, потому что она изменяется при каждой записи __page.opt.
+        # Появление или удаление собственного стиля страницы отслеживается по файлу стиля
+        self.__addFile (files, Style().getOwnStylePath (page))
+        self.__addFile (files, os.path.join (page.path, RootWikiPage.contentFile))
+
         # Заголовок страницы
         content.append (page.title.encode (self._unicodeEncoding))
 
@@ -43,18 +158,14 @@ class WikiHashCalculator (object):
         pagecontent = page.content.encode (self._unicodeEncoding)
         content.append (pagecontent)
 
-        self.__getDirContent (page, content)
-        content.append (self.__getPluginsList())
-        content.append (self.__getStyleContent (page))
+        attachPath = Attachment (page).getAttachPath()
+        self.__addFile (files, attachPath)
 
-        # Настройки, касающиеся вида вики-страницы
-        content.append (str (self._wikiConfig.showAttachInsteadBlankOptions.value))
-        content.append (str (self._wikiConfig.thumbSizeOptions.value))
+        self.__getDirContent (page, content, files)
+        content.append (self.__getPluginsList())
+        content.append (self.__getStyleContent (page, files))
 
-        # Настройки отображения HTML-страницы
-        content.append (str (self.__htmlConfig.fontSize.value) )
-        content.append (self.__htmlConfig.fontName.value.encode(self._unicodeEncoding) )
-        content.append (self.__htmlConfig.userStyle.value.encode(self._unicodeEncoding))
+        content.extend (self.__getViewOptions())
 
         # Список подстраниц
         for child in page.children:
@@ -62,20 +173,21 @@ class WikiHashCalculator (object):
 
         if len (page.content) == 0:
             # Если страница пустая, то проверим настройку, отвечающую за шаблон пустой страницы
-            emptycontent = EmptyContent (self._mainConfig)
-            content.append (emptycontent.content.encode (self._unicodeEncoding))
+            content.append (self.__getEmptyContent())
 
         return u"".join (content)
 
 
-    def __getStyleContent (self, page):
+    def __getStyleContent (self, page, files):
         """
         Возвращает содержимое шаблона
         """
         style = Style ()
+        stylePath = style.getPageStyle (page)
+        self.__addFile (files, stylePath)
 
         try:
-            with open (style.getPageStyle (page)) as fp:
+            with open (stylePath) as fp:
                 stylecontent = unicode (fp.read(), "utf8")
         except IOError:
             stylecontent = u""
@@ -99,11 +211,12 @@ class WikiHashCalculator (object):
         return result
 
 
-    def __getDirContent (self, page, filescontent, dirname="."):
+    def __getDirContent (self, page, filescontent, files, dirname="."):
         """
         Сформировать строку для расчета хеша по данным вложенной поддиректории dirname (путь относительно __attach)
         page - страница, для которой собираем список вложений
         filescontent - список, содержащий строки, описывающие вложенные файлы
+        files - список, в который добавляются вложенные файлы и папки
         """
         attach = Attachment (page)
         attachroot = attach.getAttachPath()
@@ -117,11 +230,13 @@ class WikiHashCalculator (object):
             # Пропустим директории, которые начинаются с __
             if not os.path.isdir (fname) or not fname.startswith ("__"):
                 try:
+                    stat = os.stat (fullpath)
                     filescontent.append (fname.encode (self._unicodeEncoding))
-                    filescontent.append (unicode (os.stat (fullpath).st_mtime))
+                    filescontent.append (unicode (stat.st_mtime))
+                    files.append ((fullpath, stat.st_mtime, stat.st_size))
 
                     if os.path.isdir (fullpath):
-                        self.__getDirContent (page, filescontent, os.path.join (dirname, fname))
+                        self.__getDirContent (page, filescontent, files, os.path.join (dirname, fname))
                 except OSError:
                     # Если есть проблемы с доступом к файлу, то здесь на это не будем обращать внимания
                     pass
@@ -22,6 +22,7 @@ from outwiker.gui.linkdialogcontroller import LinkDialogContoller
 from outwiker.pages.html.basehtmlpanel import BaseHtmlPanel
 from wikiconfig import WikiConfig
 from htmlgenerator import HtmlGenerator
+from backgroundrenderer import BackgroundRenderer, EVT_RENDER_FINISHED
 
 from actions.bold import WikiBoldAction
 from actions.italic import WikiItalicAction
@@ -109,10 +110,19 @@ class WikiPagePanel (BaseHtmlPanel):
         if self.config.showHtmlCodeOptions.value:
             self.htmlcodePageIndex = self.__createHtmlCodePanel(self.htmlSizer)
 
+        # HTML создается в фоновом потоке, чтобы не блокировать интерфейс
+        self._renderer = BackgroundRenderer (self, self._renderPage)
+
+        # Страница, для которой создается HTML, или None
+        self._renderingPage = None
+
+        self.Bind (EVT_RENDER_FINISHED, self.__onRenderFinished)
+
         self.Layout()
 
 
     def onClose (self, event):
+        self._renderer.stop()
         self._removeActionTools()
 
         if self._wikiPanelName in self.mainWindow.toolbars:
@@ -191,6 +201,9 @@ class WikiPagePanel (BaseHtmlPanel):
         """
         Обработка события при переключении на код страницы
         """
+        # Пользователь будет редактировать текст, создаваемый HTML уже не нужен
+        self.__cancelRendering()
+
         self._enableActions (True)
         super (WikiPagePanel, self)._onSwitchToCode()
 
@@ -209,29 +222,91 @@ class WikiPagePanel (BaseHtmlPanel):
         self._enableActions (False)
 
         self.Save()
-        status_item = 0
-        setStatusText (_(u"Page rendered. Please wait…"), status_item)
+        self.__startRendering (self.htmlcodePageIndex)
+
+
+    def _showHtml (self):
+        """
+        Запустить создание HTML текущей страницы в фоновом потоке.
+        Страница будет показана по окончании создания HTML
+        """
+        self.__startRendering (self.RESULT_PAGE_INDEX)
+
+
+    def __startRendering (self, target):
+        """
+        Начать создание HTML текущей страницы в фоновом потоке.
+        target - номер вкладки, на которой будет показан результат
+        """
+        assert self._currentpage != None
+
+        self.__cancelRendering()
+
+        setStatusText (_(u"Page rendered. Please wait…"), 0)
         Application.onHtmlRenderingBegin (self._currentpage, self.htmlWindow)
 
-        try:
-            self.currentHtmlFile = self.generateHtml (self._currentpage)
-            self._showHtmlCode(self.currentHtmlFile)
-        except IOError as e:
+        self._renderingPage = self._currentpage
+        self._renderer.render (self._currentpage, self.GetContentFromGui(), target)
+
+
+    def __cancelRendering (self):
+        """
+        Отменить создание HTML, если оно еще не закончилось
+        """
+        if self._renderingPage == None:
+            return
+
+        page = self._renderingPage
+        self._renderingPage = None
+        self._renderer.cancel()
+
+        setStatusText (u"", 0)
+        Application.onHtmlRenderingEnd (page, self.htmlWindow)
+
+
+    def __onRenderFinished (self, event):
+        """
+        Обработчик события окончания создания HTML в фоновом потоке
+        """
+        if (not self._renderer.isCurrent (event.jobid) or 
+                event.page != self._renderingPage or
+                event.page != self._currentpage):
+            return
+
+        self._renderingPage = None
+
+        if isinstance (event.error, IOError):
             # TODO: Проверить под Windows
-            MessageBox (_(u"Can't save file %s") % (unicode (e.filename)), 
+            MessageBox (_(u"Can't save file %s") % (unicode (event.error.filename)), 
                     _(u"Error"), 
                     wx.ICON_ERROR | wx.OK)
-        except OSError as e:
-            MessageBox (_(u"Can't save HTML-file\n\n%s") % (unicode (e)), 
+        elif event.error != None:
+            MessageBox (_(u"Can't save HTML-file\n\n%s") % (unicode (event.error)), 
                     _(u"Error"), 
                     wx.ICON_ERROR | wx.OK)
+        else:
+            path, styleError = event.result
+
+            if styleError:
+                MessageBox (_(u"Page style Error. Style by default is used"),  
+                        _(u"Error"),
+                        wx.ICON_ERROR | wx.OK)
+
+            self.currentHtmlFile = path
 
-        setStatusText (u"", status_item)
-        Application.onHtmlRenderingEnd (self._currentpage, self.htmlWindow)
+            if event.target == self.htmlcodePageIndex:
+                self._showHtmlCode (path)
+            else:
+                self.htmlWindow.LoadPage (path)
 
-        self._enableAllTools ()
-        self.htmlCodeWindow.SetFocus()
-        self.htmlCodeWindow.Update()
+        setStatusText (u"", 0)
+        Application.onHtmlRenderingEnd (event.page, self.htmlWindow)
+
+        if (event.target == self.htmlcodePageIndex and
+                self.selectedPageIndex == self.htmlcodePageIndex):
+            self._enableAllTools ()
+            self.htmlCodeWindow.SetFocus()
+            self.htmlCodeWindow.Update()
 
 
     def _showHtmlCode (self, path):
@@ -632,22 +707,33 @@ class WikiPagePanel (BaseHtmlPanel):
 
     
     def generateHtml (self, page):
-        style = Style()
-        stylepath = style.getPageStyle (page)
-        generator = HtmlGenerator (page)
+        html, styleError = self._renderPage (page, None)
 
-        try:
-            html = generator.makeHtml(stylepath)
-        except:
+        if styleError:
             MessageBox (_(u"Page style Error. Style by default is used"),  
                     _(u"Error"),
                     wx.ICON_ERROR | wx.OK)
 
-            html = generator.makeHtml (style.getDefaultStyle())
-
         return html
 
 
+    def _renderPage (self, page, content):
+        """
+        Создать HTML для страницы. Может вызываться не из основного потока,
+        поэтому не должна обращаться к интерфейсу.
+        content - снимок текста страницы или None, если текст нужно прочитать из страницы.
+        Возвращает кортеж (путь до файла HTML, использован ли стиль по умолчанию из-за ошибки)
+        """
+        style = Style()
+        stylepath = style.getPageStyle (page)
+        generator = HtmlGenerator (page, content)
+
+        try:
+            return (generator.makeHtml (stylepath), False)
+        except:
+            return (generator.makeHtml (style.getDefaultStyle()), True)
+
+
     def removeGui (self):
         super (WikiPagePanel, self).removeGui ()
         self.mainWindow.mainMenu.Remove (self.__WIKI_MENU_INDEX - 1)
@@ -22,6 +22,9 @@ class WikiPrefGeneralPanel(wx.Panel):
         # Показывать ли результирующий HTML?
         self.htmlCodeCheckbox = wx.CheckBox(self, -1, _(u"Show HTML Code Tab"))
 
+        # Использовать быстрый разборщик вики-нотации?
+        self.fastParserCheckbox = wx.CheckBox(self, -1, _(u"Use fast wiki parser (experimental)"))
+
         # Размер миниатюр
         self.thumbSizeLabel = wx.StaticText(self, -1, _(u"Thumbnail Size"))
         self.thumbSize = wx.SpinCtrl(self, -1, "250", min=1, max=10000)
@@ -51,6 +54,9 @@ class WikiPrefGeneralPanel(wx.Panel):
         # Показывать ли результирующий HTML?
         mainSizer.Add(self.htmlCodeCheckbox, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 2)
 
+        # Использовать быстрый разборщик вики-нотации?
+        mainSizer.Add(self.fastParserCheckbox, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 2)
+
         # Размер миниатюр
         thumbSizer = wx.FlexGridSizer(1, 2)
         thumbSizer.AddGrowableCol(0)
@@ -81,6 +87,9 @@ class WikiPrefGeneralPanel(wx.Panel):
         # Показывать ли вкладку с кодом HTML
         self.showHtmlCodeOption = BooleanElement (self.config.showHtmlCodeOptions, self.htmlCodeCheckbox)
 
+        # Использовать быстрый разборщик вики-нотации
+        self.fastParserOption = BooleanElement (self.config.fastParserOptions, self.fastParserCheckbox)
+
         # Размер превьюшек по умолчанию
         self.thumbSizeOption = IntegerElement (self.config.thumbSizeOptions, self.thumbSize, 1, 10000)
 
@@ -96,10 +105,12 @@ class WikiPrefGeneralPanel(wx.Panel):
 
     def Save (self):
         changed = (self.showHtmlCodeOption.isValueChanged() or
-            self.thumbSizeOption.isValueChanged() )
+            self.thumbSizeOption.isValueChanged() or
+            self.fastParserOption.isValueChanged() )
 
         self.showHtmlCodeOption.save()
         self.thumbSizeOption.save()
+        self.fastParserOption.save()
         
         emptycontent = EmptyContent (Application.config)
         emptycontent.content = self.emptyTplTextCtrl.GetValue()
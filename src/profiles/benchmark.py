@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import datetime
+import json
+import os.path
+import platform
+import shutil
+import tempfile
+import timeit
+import traceback
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.application import Application
+from outwiker.core.search import Searcher, AllTagsSearchStrategy
+from outwiker.core.tagslist import TagsList
+from outwiker.core.htmlimprover import HtmlImprover
+from outwiker.core.pluginsloader import PluginsLoader
+from outwiker.pages.wiki.parserfactory import ParserFactory
+from outwiker.pages.wiki.wikihashcalculator import WikiHashCalculator
+from outwiker.pages.text.textpage import TextPageFactory
+
+from wikigenerator import tokenSamples
+from legacyhtmlimprover import LegacyHtmlImprover
+
+
+class BenchmarkCase (object):
+    """
+    Один замер производительности
+    """
+    def __init__ (self, name, func, setup=None, number=1):
+        """
+        name - имя замера в результатах
+        func - измеряемая функция без параметров
+        setup - функция, которая вызывается перед каждым повтором замера (ее время не учитывается)
+        number - сколько раз вызывать func в одном повторе
+        """
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.number = number
+
+
+class Benchmark (object):
+    """
+    Набор замеров производительности основных операций на синтетической вики.
+    Результаты возвращаются в виде словаря, который можно сохранить в JSON
+    """
+    def __init__ (self, generator, repeat=3, pluginsDir=u"../plugins", sampleWikiDir=u"../test/samplewiki"):
+        """
+        generator - экземпляр WikiGenerator, создающий вики для замеров
+        repeat - количество повторов каждого замера
+        pluginsDir - папка с плагинами (для замера экспорта в HTML)
+        sampleWikiDir - папка с тестовой вики (для замера HtmlImprover на реальных страницах)
+        """
+        self.generator = generator
+        self.repeat = repeat
+        self.pluginsDir = pluginsDir
+        self.sampleWikiDir = sampleWikiDir
+
+        # Во сколько раз повторить пример вики-нотации при замере разбора токенов
+        self.tokenRepeat = 200
+
+        # Количество страниц, создаваемых у одного родителя при замере создания страниц
+        self.siblingsCount = 300
+
+        self._tempdir = None
+        self._path = None
+        self._root = None
+
+        # HTML для замера HtmlImprover
+        self._html = None
+
+        # HTML страниц тестовой вики для замера HtmlImprover
+        self._sampleHtml = None
+
+        # Загрузчик плагина экспорта и папка для результатов экспорта
+        self._loader = None
+        self._outdir = None
+
+        # Родитель для страниц, создаваемых при замере создания страниц
+        self._siblingsParent = None
+
+
+    def run (self):
+        """
+        Выполнить все замеры. Возвращает словарь с результатами
+        """
+        self._tempdir = tempfile.mkdtemp()
+        self._path = os.path.join (self._tempdir, u"wiki")
+
+        try:
+            self._root = self.generator.create (self._path)
+
+            results = {}
+            for case in self.getCases():
+                results[case.name] = self._measure (case)
+        finally:
+            self._html = None
+            self._sampleHtml = None
+            self._siblingsParent = None
+
+            if self._loader != None:
+                self._loader.clear()
+                self._loader = None
+
+            shutil.rmtree (self._tempdir, ignore_errors=True)
+
+        return {u"date": datetime.datetime.now().isoformat(),
+                u"python": platform.python_version(),
+                u"platform": platform.platform(),
+                u"repeat": self.repeat,
+                u"wiki": self.generator.params,
+                u"results": results}
+
+
+    def getCases (self):
+        """
+        Возвращает список замеров
+        """
+        cases = [BenchmarkCase (u"WikiDocument.load", self._load),
+                BenchmarkCase (u"Searcher.find", self._find),
+                BenchmarkCase (u"RootWikiPage.getitem", self._getItems),
+                BenchmarkCase (u"TagsList", lambda: TagsList (self._root)),
+                BenchmarkCase (u"HtmlImprover.run", self._improve, setup=self._prepareImprove),
+                BenchmarkCase (u"HtmlImprover.run.legacy", self._improveLegacy, setup=self._prepareImprove),
+                BenchmarkCase (u"HtmlImprover.samplewiki",
+                    lambda: self._improveSamples (HtmlImprover),
+                    setup=self._prepareSamples),
+                BenchmarkCase (u"HtmlImprover.samplewiki.legacy",
+                    lambda: self._improveSamples (LegacyHtmlImprover),
+                    setup=self._prepareSamples),
+                BenchmarkCase (u"WikiHashCalculator.getHash", self._getHashes, 
+                    setup=WikiHashCalculator.clearCache),
+                BenchmarkCase (u"WikiHashCalculator.getHash.cached", self._getHashes),
+                BenchmarkCase (u"BranchExporter.export", self._export, setup=self._prepareExport)]
+
+        for name in sorted (tokenSamples.keys()):
+            cases.append (BenchmarkCase (u"Parser.toHtml.%s" % name,
+                self._makeParseFunc (tokenSamples[name])))
+
+        # Замер изменяет дерево, поэтому выполняется последним
+        cases.append (BenchmarkCase (u"WikiPage.create.siblings", self._createSiblings,
+            setup=self._prepareSiblings))
+
+        return cases
+
+
+    def _measure (self, case):
+        """
+        Выполнить замер. Возвращает словарь с минимальным и средним временем
+        одного вызова в секундах или с текстом ошибки
+        """
+        times = []
+
+        try:
+            for _ in range (self.repeat):
+                if case.setup != None:
+                    case.setup()
+
+                timer = timeit.Timer (case.func)
+                times.append (timer.timeit (case.number) / case.number)
+        except Exception:
+            return {u"error": traceback.format_exc()}
+
+        return {u"min": min (times),
+                u"mean": sum (times) / len (times),
+                u"number": case.number}
+
+
+    def _load (self):
+        WikiDocument.load (self._path)
+
+
+    def _find (self):
+        searcher = Searcher (u"вики", [], AllTagsSearchStrategy)
+        searcher.find (self._root)
+
+
+    def _getItems (self):
+        for page in self._getPages (self._root):
+            self._root[page.subpath]
+
+
+    def _prepareSiblings (self):
+        if self._siblingsParent != None:
+            self._siblingsParent.remove()
+
+        self._siblingsParent = TextPageFactory.create (self._root, u"__benchmark_siblings", [])
+
+
+    def _createSiblings (self):
+        for n in range (self.siblingsCount):
+            TextPageFactory.create (self._siblingsParent, u"Страница {0}".format (n), [])
+
+
+    def _getPages (self, page):
+        result = []
+        for child in page.children:
+            result.append (child)
+            result += self._getPages (child)
+
+        return result
+
+
+    def _getFirstPage (self):
+        return self._root.children[0]
+
+
+    def _makeParseFunc (self, sample):
+        text = u" ".join ([sample] * self.tokenRepeat)
+
+        def parse ():
+            page = self._getFirstPage()
+            parser = ParserFactory().make (page, Application.config)
+            parser.toHtml (text)
+
+        return parse
+
+
+    def _prepareImprove (self):
+        page = self._getFirstPage()
+        parser = ParserFactory().make (page, Application.config)
+        self._html = parser.toHtml (page.content)
+
+
+    def _improve (self):
+        HtmlImprover.run (self._html)
+
+
+    def _improveLegacy (self):
+        LegacyHtmlImprover.run (self._html)
+
+
+    def _prepareSamples (self):
+        """
+        Получить HTML всех страниц тестовой вики.
+        Вики копируется, чтобы при разборе страниц не изменилась исходная папка
+        """
+        if self._sampleHtml != None:
+            return
+
+        path = os.path.join (self._tempdir, u"samplewiki")
+        shutil.copytree (self.sampleWikiDir, path)
+        root = WikiDocument.load (path)
+
+        self._sampleHtml = []
+        for page in self._getPages (root):
+            if page.getTypeString() == u"wiki":
+                parser = ParserFactory().make (page, Application.config)
+                self._sampleHtml.append (parser.toHtml (page.content))
+            elif page.getTypeString() == u"html":
+                self._sampleHtml.append (page.content)
+
+
+    def _improveSamples (self, improver):
+        for html in self._sampleHtml:
+            improver.run (html)
+
+
+    def _getHashes (self):
+        calculator = WikiHashCalculator (Application)
+        for page in self._getPages (self._root):
+            calculator.getHash (page)
+
+
+    def _prepareExport (self):
+        if self._loader == None:
+            self._loader = PluginsLoader (Application)
+            self._loader.load ([os.path.join (self.pluginsDir, u"export2html")])
+
+        self._outdir = os.path.join (self._tempdir, u"export")
+        if os.path.exists (self._outdir):
+            shutil.rmtree (self._outdir)
+
+        os.mkdir (self._outdir)
+
+
+    def _export (self):
+        tester = self._loader[u"Export2Html"].tester
+        exporter = tester.branchExporter (self._root, tester.longNameGenerator (self._root))
+        exporter.export (outdir=self._outdir, imagesonly=False, alwaysOverwrite=True)
+
+
+def saveResults (results, fname):
+    """
+    Сохранить результаты замеров в файл в формате JSON
+    """
+    with open (fname, "w") as fp:
+        json.dump (results, fp, indent=4, sort_keys=True)
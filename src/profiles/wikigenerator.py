@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os.path
+import random
+import shutil
+import tempfile
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.attachment import Attachment
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+
+
+# Примеры вики-нотации для каждого типа токенов.
+# Ключ - имя токена, значение - текст с этим токеном
+tokenSamples = {
+        u"text": u"Обычный текст без разметки, со знаками препинания: точками, запятыми (и скобками).",
+        u"bold": u"'''полужирный текст'''",
+        u"italic": u"''курсивный текст''",
+        u"bold_italic": u"''''полужирный курсив''''",
+        u"underline": u"{+подчеркнутый текст+}",
+        u"strike": u"{-зачеркнутый текст-}",
+        u"subscript": u"H'_2_'O",
+        u"superscript": u"x'^2^'",
+        u"code": u"@@print (x)@@",
+        u"small": u"[-мелкий текст-]",
+        u"big": u"[+крупный текст+]",
+        u"noformat": u"[=''без форматирования''=]",
+        u"preformat": u"[@<b>код</b>@]",
+        u"link": u"[[Описание -> http://example.com/page]]",
+        u"url": u"http://example.com/path/page.html?param=1",
+        u"attach": u"Attach:file_0.txt",
+        u"heading": u"\n!! Заголовок ''курсив''\n",
+        u"list": u"\n* Элемент списка\n* Элемент ''списка''\n** Вложенный элемент\n# Нумерованный\n\n",
+        u"table": u"\n|| border=1\n|| Ячейка 1 || Ячейка 2 ||\n|| '''Ячейка 3''' || Ячейка 4 ||\n\n",
+        u"align": u"\n%center%Текст по центру\n\n",
+        u"horline": u"\n----\n",
+        u"linebreak": u"строка[[<<]]строка",
+        u"command": u"(:unknown param=1:)",
+        }
+
+
+class WikiGenerator (object):
+    """
+    Класс для создания синтетической вики заданного размера для тестов производительности.
+    При одинаковых параметрах создается одинаковая вики
+    """
+    def __init__ (self,
+            pages=100,
+            depth=3,
+            tags=3,
+            tagsCount=20,
+            attaches=2,
+            contentSize=4000,
+            seed=0):
+        """
+        pages - количество страниц (без учета корня)
+        depth - максимальная глубина вложенности страниц
+        tags - количество меток у каждой страницы
+        tagsCount - количество различных меток в вики
+        attaches - количество прикрепленных файлов у каждой страницы
+        contentSize - примерный размер текста каждой страницы в символах
+        seed - начальное значение генератора случайных чисел
+        """
+        self.pages = pages
+        self.depth = depth
+        self.tags = tags
+        self.tagsCount = tagsCount
+        self.attaches = attaches
+        self.contentSize = contentSize
+        self.seed = seed
+
+        self._words = [u"вики", u"страница", u"заметка", u"текст", u"ссылка",
+                u"программа", u"outwiker", u"python", u"метка", u"поиск",
+                u"дерево", u"файл", u"картинка", u"список", u"таблица"]
+
+
+    @property
+    def params (self):
+        """
+        Параметры создаваемой вики в виде словаря
+        """
+        return {u"pages": self.pages,
+                u"depth": self.depth,
+                u"tags": self.tags,
+                u"tagsCount": self.tagsCount,
+                u"attaches": self.attaches,
+                u"contentSize": self.contentSize,
+                u"seed": self.seed}
+
+
+    def create (self, path):
+        """
+        Создать вики в папке path. Возвращает корень вики
+        """
+        rnd = random.Random (self.seed)
+        root = WikiDocument.create (path)
+
+        # Файлы, которые будут прикреплены к каждой странице
+        tempdir = tempfile.mkdtemp()
+        files = self._createFiles (tempdir)
+
+        # Страницы, к которым еще можно добавлять подстраницы
+        parents = [root]
+        tagsList = [u"метка %d" % n for n in range (self.tagsCount)]
+
+        for n in range (self.pages):
+            parent = rnd.choice (parents)
+            tags = rnd.sample (tagsList, min (self.tags, len (tagsList)))
+
+            page = WikiPageFactory.create (parent, u"Страница %d" % n, tags)
+            page.content = self.generateContent (rnd, self.contentSize)
+
+            if len (files) != 0:
+                Attachment (page).attach (files)
+
+            if self._getDepth (page) < self.depth:
+                parents.append (page)
+
+        shutil.rmtree (tempdir)
+        return root
+
+
+    def generateContent (self, rnd, size):
+        """
+        Создать текст страницы размером примерно size символов
+        из обычного текста и примеров вики-нотации
+        """
+        samples = [tokenSamples[name] for name in sorted (tokenSamples.keys())]
+        result = []
+        length = 0
+
+        while length < size:
+            if rnd.random() < 0.3:
+                item = rnd.choice (samples)
+            else:
+                item = u" ".join ([rnd.choice (self._words) for _ in range (10)]) + u"."
+
+            result.append (item)
+            length += len (item) + 1
+
+        return u" ".join (result)
+
+
+    def _createFiles (self, dirname):
+        files = []
+        for n in range (self.attaches):
+            fname = os.path.join (dirname, u"file_%d.txt" % n)
+            with open (fname, "w") as fp:
+                fp.write ("file %d" % n)
+
+            files.append (fname)
+
+        return files
+
+
+    def _getDepth (self, page):
+        depth = 0
+        while page.parent != None:
+            depth += 1
+            page = page.parent
+
+        return depth
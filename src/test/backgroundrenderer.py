@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import threading
+import unittest
+
+from outwiker.pages.wiki.backgroundrenderer import BackgroundRenderer
+
+
+class RendererForTest (BackgroundRenderer):
+    """
+    Вместо отправки события окну запоминает результаты
+    """
+    def __init__ (self, renderFunc):
+        super (RendererForTest, self).__init__ (None, renderFunc)
+        self.results = []
+        self.resultReady = threading.Event()
+
+
+    def _postResult (self, jobid, page, target, result, error):
+        self.results.append ((jobid, page, target, result, error))
+        self.resultReady.set()
+
+
+class BackgroundRendererTest (unittest.TestCase):
+    """
+    Тесты создания HTML в фоновом потоке
+    """
+    def setUp (self):
+        # Рабочий поток будет ждать, пока тест не разрешит ему продолжить
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.renderer = None
+
+
+    def tearDown (self):
+        self.proceed.set()
+
+        if self.renderer != None:
+            self.renderer.stop()
+            self.renderer.join (5)
+
+
+    def _blockingRender (self, page, content):
+        self.started.set()
+        self.proceed.wait (5)
+        return content.upper()
+
+
+    def testRender (self):
+        self.renderer = RendererForTest (lambda page, content: content.upper())
+        jobid = self.renderer.render (u"page", u"текст", u"target")
+
+        self.assertTrue (self.renderer.resultReady.wait (5))
+        self.assertEqual (self.renderer.results,
+                [(jobid, u"page", u"target", u"ТЕКСТ", None)])
+
+
+    def testLatestJobWins (self):
+        self.renderer = RendererForTest (self._blockingRender)
+        self.renderer.render (u"page1", u"aaa")
+        self.assertTrue (self.started.wait (5))
+
+        # Первое задание выполняется, второе будет заменено третьим
+        self.renderer.render (u"page2", u"bbb")
+        jobid = self.renderer.render (u"page3", u"ccc")
+
+        self.started.clear()
+        self.proceed.set()
+        self.assertTrue (self.renderer.resultReady.wait (5))
+
+        self.assertEqual (self.renderer.results,
+                [(jobid, u"page3", None, u"CCC", None)])
+
+
+    def testCancel (self):
+        self.renderer = RendererForTest (self._blockingRender)
+        jobid = self.renderer.render (u"page1", u"aaa")
+        self.assertTrue (self.started.wait (5))
+
+        self.renderer.cancel()
+        self.assertFalse (self.renderer.isCurrent (jobid))
+
+        self.proceed.set()
+        self.renderer.stop()
+        self.renderer.join (5)
+
+        self.assertEqual (self.renderer.results, [])
+
+
+    def testError (self):
+        def renderFunc (page, content):
+            raise IOError (u"error")
+
+        self.renderer = RendererForTest (renderFunc)
+        self.renderer.render (u"page", u"текст")
+
+        self.assertTrue (self.renderer.resultReady.wait (5))
+
+        error = self.renderer.results[0][4]
+        self.assertTrue (isinstance (error, IOError))
+        self.assertEqual (self.renderer.results[0][3], None)
+
+
+    def testStop (self):
+        self.renderer = RendererForTest (lambda page, content: content)
+        self.renderer.render (u"page", u"текст")
+        self.assertTrue (self.renderer.resultReady.wait (5))
+
+        self.renderer.stop()
+        self.renderer.join (5)
+
+        self.assertFalse (self.renderer._thread.isAlive())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import json
+import unittest
+
+from outwiker.core.attachment import Attachment
+from outwiker.core.tagslist import TagsList
+
+from profiles.wikigenerator import WikiGenerator, tokenSamples
+from profiles.benchmark import Benchmark
+
+from test.utils import removeWiki
+
+
+class BenchmarkTest (unittest.TestCase):
+    """
+    Тесты генератора синтетической вики и набора замеров производительности
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+
+    def tearDown (self):
+        removeWiki (self.path)
+
+
+    def _getPages (self, page):
+        result = []
+        for child in page.children:
+            result.append (child)
+            result += self._getPages (child)
+
+        return result
+
+
+    def _getDepth (self, page):
+        depth = 0
+        while page.parent != None:
+            depth += 1
+            page = page.parent
+
+        return depth
+
+
+    def testGenerator (self):
+        generator = WikiGenerator (pages=20, depth=2, tags=2, tagsCount=5, attaches=3, contentSize=500)
+        root = generator.create (self.path)
+
+        pages = self._getPages (root)
+
+        self.assertEqual (len (pages), 20)
+        self.assertTrue (max ([self._getDepth (page) for page in pages]) <= 2)
+        self.assertEqual (len (TagsList (root)), 5)
+
+        for page in pages:
+            self.assertEqual (len (page.tags), 2)
+            self.assertEqual (len (Attachment (page).attachmentFull), 3)
+            self.assertTrue (len (page.content) >= 500)
+
+
+    def testGeneratorSeed (self):
+        root1 = WikiGenerator (pages=10, seed=1).create (self.path)
+        pages1 = [(page.subpath, page.tags, page.content) for page in self._getPages (root1)]
+        removeWiki (self.path)
+
+        root2 = WikiGenerator (pages=10, seed=1).create (self.path)
+        pages2 = [(page.subpath, page.tags, page.content) for page in self._getPages (root2)]
+
+        self.assertEqual (pages1, pages2)
+
+
+    def testBenchmark (self):
+        generator = WikiGenerator (pages=3, attaches=1, contentSize=200)
+        benchmark = Benchmark (generator, repeat=1)
+        benchmark.tokenRepeat = 2
+        benchmark.siblingsCount = 3
+
+        results = benchmark.run()
+
+        self.assertEqual (results[u"wiki"][u"pages"], 3)
+        self.assertTrue (u"WikiDocument.load" in results[u"results"])
+        self.assertTrue (u"Searcher.find" in results[u"results"])
+
+        for name in [u"RootWikiPage.getitem", u"WikiPage.create.siblings",
+                u"HtmlImprover.run", u"HtmlImprover.run.legacy",
+                u"HtmlImprover.samplewiki", u"HtmlImprover.samplewiki.legacy"]:
+            self.assertTrue (results[u"results"][name][u"min"] >= 0, results[u"results"][name])
+
+        for name in tokenSamples.keys():
+            result = results[u"results"][u"Parser.toHtml." + name]
+            self.assertTrue (result[u"min"] >= 0)
+
+        # Результаты должны сохраняться в JSON
+        json.dumps (results)
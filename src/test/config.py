@@ -10,8 +10,9 @@ import os.path
 import ConfigParser
 import shutil
 import datetime
+import time
 
-from outwiker.core.config import Config, StringOption, IntegerOption, DateTimeOption, BooleanOption, ListOption, StringListSection
+from outwiker.core.config import Config, ConfigTransaction, StringOption, IntegerOption, DateTimeOption, BooleanOption, ListOption, StringListSection
 from outwiker.core.system import getCurrentDir, getConfigPath
 
 from outwiker.gui.guiconfig import TrayConfig, EditorConfig
@@ -126,6 +127,110 @@ class ConfigTest (unittest.TestCase):
             shutil.rmtree (homeDir)
 
 
+class ConfigTransactionTest (unittest.TestCase):
+    """
+    Тесты отложенной записи конфигов
+    """
+    def setUp (self):
+        self.path = u"../test/testconfig.ini"
+        self.path2 = u"../test/testconfig2.ini"
+
+        self.tearDown()
+
+
+    def tearDown (self):
+        for fname in [self.path, self.path2]:
+            if os.path.exists (fname):
+                os.remove (fname)
+
+
+    def _readFile (self, fname):
+        with open (fname) as fp:
+            return fp.read()
+
+
+    def testTransaction (self):
+        config = Config (self.path)
+        config.set (u"Секция 1", u"Параметр 1", u"Значение 1")
+
+        with ConfigTransaction():
+            self.assertTrue (ConfigTransaction.active())
+
+            config.set (u"Секция 1", u"Параметр 1", u"Значение 2")
+            config.set (u"Секция 1", u"Параметр 2", 111)
+
+            self.assertTrue (config.dirty)
+            self.assertEqual (config.get (u"Секция 1", u"Параметр 1"), u"Значение 2")
+            self.assertEqual (Config (self.path).get (u"Секция 1", u"Параметр 1"), u"Значение 1")
+
+        self.assertFalse (ConfigTransaction.active())
+        self.assertFalse (config.dirty)
+
+        config2 = Config (self.path)
+        self.assertEqual (config2.get (u"Секция 1", u"Параметр 1"), u"Значение 2")
+        self.assertEqual (config2.getint (u"Секция 1", u"Параметр 2"), 111)
+
+
+    def testNestedTransactions (self):
+        config1 = Config (self.path)
+        config2 = Config (self.path2)
+
+        with ConfigTransaction():
+            with ConfigTransaction():
+                config1.set (u"Секция", u"Параметр", u"Значение 1")
+                config2.set (u"Секция", u"Параметр", u"Значение 2")
+
+            # Запись происходит только при выходе из внешней транзакции
+            self.assertFalse (os.path.exists (self.path))
+            self.assertFalse (os.path.exists (self.path2))
+
+        self.assertEqual (Config (self.path).get (u"Секция", u"Параметр"), u"Значение 1")
+        self.assertEqual (Config (self.path2).get (u"Секция", u"Параметр"), u"Значение 2")
+
+
+    def testTransactionException (self):
+        config = Config (self.path)
+
+        try:
+            with ConfigTransaction():
+                config.set (u"Секция", u"Параметр", u"Значение")
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertFalse (ConfigTransaction.active())
+        self.assertEqual (Config (self.path).get (u"Секция", u"Параметр"), u"Значение")
+
+
+    def testAtomicWrite (self):
+        config = Config (self.path)
+        config.set (u"Секция", u"Параметр", u"Значение")
+
+        self.assertTrue (os.path.exists (self.path))
+        self.assertFalse (os.path.exists (self.path + u".tmp"))
+
+
+    def testSetSameValue (self):
+        config = Config (self.path)
+        config.set (u"Секция", u"Параметр", 111)
+        generation = config.generation
+
+        with ConfigTransaction():
+            config.set (u"Секция", u"Параметр", u"111")
+            self.assertFalse (config.dirty)
+
+        self.assertEqual (config.generation, generation)
+
+
+    def testAtomicWriteReplace (self):
+        config = Config (self.path)
+        config.set (u"Секция", u"Параметр", u"Значение 1")
+        config.set (u"Секция", u"Параметр", u"Значение 2")
+
+        self.assertEqual (Config (self.path).get (u"Секция", u"Параметр"), u"Значение 2")
+        self.assertFalse (os.path.exists (self.path + u".tmp"))
+
+
 class ConfigOptionsTest (unittest.TestCase):
     def setUp (self):
         self.path = u"../test/testconfig.ini"
@@ -158,6 +263,31 @@ class ConfigOptionsTest (unittest.TestCase):
         os.remove (self.path)
     
 
+    def testCachedValue (self):
+        opt = IntegerOption (self.config, u"Test", u"intval", 0)
+        self.assertEqual (opt.value, 100)
+
+        # Значение берется из кеша, пока конфиг не изменится
+        opt._loadValue = None
+        self.assertEqual (opt.value, 100)
+        del opt._loadValue
+
+        self.config.set (u"Test", u"intval", 200)
+        self.assertEqual (opt.value, 200)
+
+        self.config.remove_option (u"Test", u"intval")
+        self.assertEqual (opt.value, 0)
+
+
+    def testCachedList (self):
+        opt = ListOption (self.config, u"Test", u"list1", [])
+
+        items = opt.value
+        items.append (u"элемент 4")
+
+        self.assertEqual (opt.value, [u"элемент 1", u"элемент 2", u"элемент 3"])
+
+
     # Строковые опции
     def testStringOpt1 (self):
         opt = StringOption (self.config, u"Test", u"strval", "defaultval")
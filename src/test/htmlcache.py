@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os.path
+import unittest
+
+from outwiker.core.application import Application
+from outwiker.core.htmlcache import HtmlCache
+from outwiker.core.style import Style
+from outwiker.core.tree import WikiDocument
+from outwiker.pages.wiki.htmlgenerator import HtmlGenerator
+from outwiker.pages.wiki.wikiconfig import WikiConfig
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+
+from test.utils import removeWiki
+
+
+class HtmlCacheTest (unittest.TestCase):
+    """
+    Тесты кеша HTML-представлений страниц
+    """
+    def testGet (self):
+        cache = HtmlCache (100)
+        cache.set (u"page1", u"hash1", u"<html>1</html>")
+
+        self.assertEqual (cache.get (u"page1", u"hash1"), u"<html>1</html>")
+        self.assertEqual (cache.get (u"page1", u"hash2"), None)
+        self.assertEqual (cache.get (u"page2", u"hash1"), None)
+
+        self.assertEqual (cache.hits, 1)
+        self.assertEqual (cache.misses, 2)
+
+
+    def testReplace (self):
+        cache = HtmlCache (100)
+        cache.set (u"page1", u"hash1", u"12345")
+        cache.set (u"page1", u"hash2", u"123")
+
+        self.assertEqual (len (cache), 1)
+        self.assertEqual (cache.size, 3)
+        self.assertEqual (cache.get (u"page1", u"hash2"), u"123")
+
+
+    def testEviction (self):
+        cache = HtmlCache (10)
+        cache.set (u"page1", u"hash", u"1234")
+        cache.set (u"page2", u"hash", u"1234")
+
+        # page1 становится самой свежей
+        cache.get (u"page1", u"hash")
+        cache.set (u"page3", u"hash", u"1234")
+
+        self.assertEqual (cache.get (u"page2", u"hash"), None)
+        self.assertEqual (cache.get (u"page1", u"hash"), u"1234")
+        self.assertEqual (cache.get (u"page3", u"hash"), u"1234")
+        self.assertEqual (cache.size, 8)
+
+
+    def testTooLarge (self):
+        cache = HtmlCache (3)
+        cache.set (u"page1", u"hash", u"1234")
+
+        self.assertEqual (len (cache), 0)
+        self.assertEqual (cache.size, 0)
+
+
+    def testMaxSize (self):
+        cache = HtmlCache (100)
+        cache.set (u"page1", u"hash", u"1234")
+        cache.set (u"page2", u"hash", u"1234")
+
+        cache.maxSize = 5
+
+        self.assertEqual (len (cache), 1)
+        self.assertEqual (cache.get (u"page2", u"hash"), u"1234")
+
+
+    def testInvalidate (self):
+        cache = HtmlCache (100)
+        cache.set (u"page1", u"hash", u"1234")
+        cache.invalidate (u"page1")
+        cache.invalidate (u"page2")
+
+        self.assertEqual (cache.get (u"page1", u"hash"), None)
+        self.assertEqual (cache.size, 0)
+
+
+class HtmlGeneratorCacheTest (unittest.TestCase):
+    """
+    Тесты использования кеша HTML при создании вики-страниц
+    """
+    def setUp(self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        WikiPageFactory.create (self.rootwiki, u"Страница 1", [])
+        self.testPage = self.rootwiki[u"Страница 1"]
+        self.testPage.content = u"Бла-бла-бла"
+
+        Application.htmlCache.clear()
+
+
+    def tearDown (self):
+        Application.htmlCache.clear()
+        removeWiki (self.path)
+
+
+    def testMemoryHit (self):
+        stylepath = Style().getPageStyle (self.testPage)
+        HtmlGenerator (self.testPage).makeHtml (stylepath)
+
+        self.assertEqual (len (Application.htmlCache), 1)
+
+        hits = Application.htmlCache.hits
+        HtmlGenerator (self.testPage).makeHtml (stylepath)
+
+        self.assertEqual (Application.htmlCache.hits, hits + 1)
+
+
+    def testRestoreFile (self):
+        stylepath = Style().getPageStyle (self.testPage)
+        path = HtmlGenerator (self.testPage).makeHtml (stylepath)
+        with open (path) as fp:
+            html = fp.read()
+
+        os.remove (path)
+
+        hits = Application.htmlCache.hits
+        HtmlGenerator (self.testPage).makeHtml (stylepath)
+
+        self.assertEqual (Application.htmlCache.hits, hits + 1)
+        with open (path) as fp:
+            self.assertEqual (fp.read(), html)
+
+
+    def testUnsavedContent (self):
+        stylepath = Style().getPageStyle (self.testPage)
+        HtmlGenerator (self.testPage).makeHtml (stylepath)
+
+        path = HtmlGenerator (self.testPage, u"Несохраненный текст").makeHtml (stylepath)
+        with open (path) as fp:
+            self.assertTrue (u"Несохраненный текст" in unicode (fp.read(), "utf8"))
+
+        # HTML для несохраненного текста не должен использоваться для сохраненной страницы
+        self.assertEqual (len (Application.htmlCache), 0)
+        self.assertFalse (HtmlGenerator (self.testPage).canReadFromCache())
+
+        path = HtmlGenerator (self.testPage).makeHtml (stylepath)
+        with open (path) as fp:
+            html = unicode (fp.read(), "utf8")
+
+        self.assertTrue (u"Бла-бла-бла" in html)
+        self.assertFalse (u"Несохраненный текст" in html)
+
+
+    def testSavedContent (self):
+        stylepath = Style().getPageStyle (self.testPage)
+        HtmlGenerator (self.testPage, self.testPage.content).makeHtml (stylepath)
+
+        self.assertEqual (len (Application.htmlCache), 1)
+        self.assertTrue (HtmlGenerator (self.testPage).canReadFromCache())
+
+
+    def testInvalidateOnUpdate (self):
+        HtmlGenerator (self.testPage).makeHtml (Style().getPageStyle (self.testPage))
+        Application.onPageUpdate (self.testPage)
+
+        self.assertEqual (len (Application.htmlCache), 0)
+
+
+    def testResetHash (self):
+        generator = HtmlGenerator (self.testPage)
+        generator.makeHtml (Style().getPageStyle (self.testPage))
+        generator.resetHash()
+
+        self.assertEqual (len (Application.htmlCache), 0)
+
+
+    def testCacheSizeOption (self):
+        """
+        Размер кеша устанавливается после изменения настроек, а не при создании HTML
+        """
+        config = WikiConfig (Application.config)
+        oldSize = config.htmlCacheSizeOptions.value
+        oldMaxSize = Application.htmlCache.maxSize
+
+        try:
+            config.htmlCacheSizeOptions.value = 5
+            HtmlGenerator (self.testPage)
+            self.assertEqual (Application.htmlCache.maxSize, oldMaxSize)
+
+            Application.onPreferencesDialogClose (None)
+            self.assertEqual (Application.htmlCache.maxSize, 5 * WikiConfig.HTML_CACHE_SIZE_UNIT)
+        finally:
+            config.htmlCacheSizeOptions.value = oldSize
+            Application.onPreferencesDialogClose (None)
@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import random
 import unittest
 
 from outwiker.core.htmlimprover import HtmlImprover
+from profiles.legacyhtmlimprover import LegacyHtmlImprover
 
 class HtmlImproverTest (unittest.TestCase):
     def test1 (self):
@@ -81,3 +83,40 @@ class HtmlImproverTest (unittest.TestCase):
 
         result = HtmlImprover.run (src)
         self.assertEqual (expectedResult, result, result)
+
+
+    def testPre (self):
+        src = u"a\n<pre>x\n\ny<br></pre>\nb"
+        expectedResult = u"a\n<BR>\n<PRE>x\n\ny\n<br></PRE>\n<BR>b"
+
+        self.assertEqual (expectedResult, HtmlImprover.run (src))
+
+
+    def testPreMixedCase (self):
+        src = u"<Pre>a\nb</PRE>c\n<Br>d<BR><LI>"
+        expectedResult = u"\n<PRE>a\nb</PRE>c\n<BR><Br>d\n<LI>"
+
+        self.assertEqual (expectedResult, HtmlImprover.run (src))
+
+
+    def testNewlines (self):
+        src = u"a\r\n\r\nb\n<H2>c</H2>\n<LI>d"
+        expectedResult = u"a</P>\n\n<P>b\n<H2>c</H2>\n<LI>d"
+
+        self.assertEqual (expectedResult, HtmlImprover.run (src))
+
+
+    def testLegacy (self):
+        """
+        Результат должен совпадать с результатом прежней реализации, в том числе для некорректного HTML
+        """
+        pieces = [u"a", u"б", u" ", u"\n", u"\r\n", u"\r", u"<P>", u"<p>", u"<BR>", u"<br>", u"<Br>",
+                u"<BR/>", u"<br/>", u"<LI>", u"<li>", u"<UL>", u"</ul>", u"<OL>", u"</OL>",
+                u"<H1>", u"<h3>", u"<H6>", u"<H7>", u"<PRE>", u"<pre>", u"<Pre>", u"</PRE>", u"</pre>",
+                u"<", u">", u"/", u"P"]
+
+        rand = random.Random (0)
+
+        for n in range (1000):
+            src = u"".join ([rand.choice (pieces) for _ in range (rand.randint (0, 40))])
+            self.assertEqual (LegacyHtmlImprover.run (src), HtmlImprover.run (src), repr (src))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import shutil
+import unittest
+
+from outwiker.core.iconscache import IconsCache, IconsImageList
+from outwiker.core.tree import WikiDocument
+from outwiker.pages.text.textpage import TextPageFactory
+from test.utils import removeWiki
+
+
+class FakeIconsCache (IconsCache):
+    """
+    Кеш, который вместо картинок хранит пути до файлов, из которых они загружены
+    """
+    def __init__ (self):
+        IconsCache.__init__ (self)
+        self.loaded = []
+
+
+    def _loadBitmap (self, fname):
+        self.loaded.append (fname)
+        return fname
+
+
+
+class FakeImageList (object):
+    def __init__ (self):
+        self.images = []
+
+
+    def Add (self, bitmap):
+        self.images.append (bitmap)
+        return len (self.images) - 1
+
+
+    def RemoveAll (self):
+        self.images = []
+
+
+
+class IconsCacheTest (unittest.TestCase):
+    """
+    Тесты реестра иконок и кеширования иконок страниц
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 3", [])
+
+
+    def tearDown (self):
+        removeWiki (self.path)
+
+
+    def testSameContent (self):
+        self.rootwiki[u"Страница 1"].icon = u"../test/images/icon.png"
+        self.rootwiki[u"Страница 2"].icon = u"../test/images/icon.png"
+        self.rootwiki[u"Страница 3"].icon = u"../test/images/feed.gif"
+
+        cache = FakeIconsCache()
+        imagelist = FakeImageList()
+        icons = IconsImageList (cache, imagelist)
+
+        id1 = icons.add (self.rootwiki[u"Страница 1"].icon)
+        id2 = icons.add (self.rootwiki[u"Страница 2"].icon)
+        id3 = icons.add (self.rootwiki[u"Страница 3"].icon)
+
+        self.assertEqual (id1, id2)
+        self.assertNotEqual (id1, id3)
+        self.assertEqual (len (imagelist.images), 2)
+        self.assertEqual (len (cache.loaded), 2)
+
+
+    def testFileChanged (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.icon = u"../test/images/icon.png"
+
+        cache = FakeIconsCache()
+        key1 = cache.getKey (page.icon)
+        self.assertNotEqual (key1, None)
+
+        shutil.copyfile (u"../test/images/new.png", page.icon)
+        os.utime (page.icon, (1300000000, 1300000000))
+
+        self.assertNotEqual (cache.getKey (page.icon), key1)
+
+
+    def testFileNotFound (self):
+        cache = FakeIconsCache()
+        icons = IconsImageList (cache, FakeImageList())
+
+        self.assertEqual (cache.getKey (u"../test/images/invalid.png"), None)
+        self.assertEqual (icons.add (u"../test/images/invalid.png"), None)
+
+
+    def testClearImageList (self):
+        cache = FakeIconsCache()
+        imagelist = FakeImageList()
+        icons = IconsImageList (cache, imagelist)
+
+        icons.add (u"../test/images/icon.png")
+        icons.clear()
+
+        self.assertEqual (icons.add (u"../test/images/icon.png"), 0)
+        self.assertEqual (len (imagelist.images), 1)
+        self.assertEqual (len (cache.loaded), 1)
+
+
+    def testPageIconSetter (self):
+        page = self.rootwiki[u"Страница 1"]
+        self.assertEqual (page.icon, None)
+
+        page.icon = u"../test/images/icon.png"
+        self.assertEqual (page.icon, os.path.join (page.path, u"__icon.png"))
+
+        page.icon = u"../test/images/feed.gif"
+        self.assertEqual (page.icon, os.path.join (page.path, u"__icon.gif"))
+        self.assertFalse (os.path.exists (os.path.join (page.path, u"__icon.png")))
+
+
+    def testPageIconCached (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.icon = u"../test/images/icon.png"
+
+        # Иконка не перечитывается из папки страницы
+        shutil.copyfile (u"../test/images/feed.gif", os.path.join (page.path, u"__icon.gif"))
+        os.remove (os.path.join (page.path, u"__icon.png"))
+
+        self.assertEqual (page.icon, os.path.join (page.path, u"__icon.png"))
+
+
+    def testPageIconRename (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.icon = u"../test/images/icon.png"
+        page.title = u"Страница 4"
+
+        self.assertEqual (page.icon, os.path.join (page.path, u"__icon.png"))
+        self.assertTrue (os.path.exists (page.icon))
+
+
+    def testPageIconLoading (self):
+        self.rootwiki[u"Страница 1"].icon = u"../test/images/icon.png"
+
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (wiki[u"Страница 1"].icon,
+                os.path.join (wiki[u"Страница 1"].path, u"__icon.png"))
+        self.assertEqual (wiki[u"Страница 2"].icon, None)
@@ -74,6 +74,24 @@ class MoveTest (unittest.TestCase):
         Application.onTreeUpdate += self.onTreeUpdate
 
 
+    def testMoveEvent (self):
+        Application.wikiroot = self.wiki
+        moves = []
+
+        def onPageMove (page, oldParent):
+            moves.append ((page, oldParent, page.parent))
+
+        Application.onPageMove += onPageMove
+
+        page = self.wiki[u"Страница 1/Страница 5"]
+        oldParent = page.parent
+        page.moveTo (self.wiki[u"Страница 2"])
+
+        Application.onPageMove -= onPageMove
+
+        self.assertEqual (moves, [(page, oldParent, self.wiki[u"Страница 2"])])
+
+
     def testNoEvent (self):
         self.treeUpdateCount = 0
         Application.wikiroot = None
@@ -14,6 +14,7 @@ from outwiker.core.application import Application
 from test.utils import removeWiki
 from outwiker.core.config import PageConfig
 from outwiker.core.config import IntegerOption
+from outwiker.core.sortfunctions import sortPagesByOrder, sortOrderFunction
 
 class PageOrderTest (unittest.TestCase):
     """
@@ -465,6 +466,31 @@ class PageOrderTest (unittest.TestCase):
         self.assertEqual (self.orderUpdateSender, None)
     
 
+    def testSortPagesByOrder (self):
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 3", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 5", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 7", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 4", [])
+
+        self.rootwiki[u"Страница 7"].order = 0
+        self.rootwiki[u"Страница 1"].order = 2
+
+        # У страницы 4 порядок еще не установлен, как у только что созданной страницы
+        page4 = self.rootwiki[u"Страница 4"]
+        IntegerOption (page4.params, PageConfig.sectionName, PageConfig.orderParamName, -1).remove_option()
+
+        pages = [page for page in self.rootwiki.children if page != page4] + [page4]
+        expected = pages[:]
+        expected.sort (sortOrderFunction)
+
+        sortPagesByOrder (pages)
+
+        self.assertEqual ([page.title for page in pages], [page.title for page in expected])
+        self.assertEqual ([page.title for page in pages], 
+                [u"Страница 7", u"Страница 3", u"Страница 1", u"Страница 4", u"Страница 5"])
+
+
     def testLoading1 (self):
         TextPageFactory.create (self.rootwiki, u"Страница 0", [])
         TextPageFactory.create (self.rootwiki, u"Страница 1", [])
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import unittest
+
+from test.utils import removeWiki
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.attachment import Attachment
+from outwiker.core.application import Application
+from outwiker.libs.pyparsing import ParserElement
+
+from outwiker.pages.wiki.parser.wikiparser import Parser
+from outwiker.pages.wiki.parser.wikigrammar import WikiGrammar
+from outwiker.pages.wiki.parser.fastparser import FastParser
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+from outwiker.pages.wiki.parserfactory import ParserFactory
+from outwiker.pages.wiki.wikiconfig import WikiConfig
+
+
+class ParserFastTest (unittest.TestCase):
+    """
+    Тесты быстрого парсера. Результат разбора должен совпадать с результатом Parser
+    """
+    def setUp(self):
+        self.encoding = "utf8"
+
+        self.filesPath = u"../test/samplefiles/"
+        self.__createWiki()
+
+        self.config = WikiConfig (Application.config)
+
+
+    def __createWiki (self):
+        # Здесь будет создаваться вики
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        WikiPageFactory.create (self.rootwiki, u"Страница 2", [])
+        self.testPage = self.rootwiki[u"Страница 2"]
+
+        files = [u"accept.png", u"filename.tmp", u"файл с пробелами.tmp", u"image.jpg"]
+        fullFilesPath = [os.path.join (self.filesPath, fname) for fname in files]
+        Attachment (self.testPage).attach (fullFilesPath)
+
+
+    def tearDown(self):
+        if Application.config.has_section (WikiConfig.WIKI_SECTION):
+            self.config.fastParserOptions.remove_option()
+        removeWiki (self.path)
+
+
+    def __compare (self, text):
+        expected = Parser (self.testPage, Application.config).toHtml (text)
+        result = FastParser (self.testPage, Application.config).toHtml (text)
+
+        self.assertEqual (result, expected, text.encode (self.encoding))
+
+
+    def testFactory (self):
+        factory = ParserFactory()
+        parser = factory.make (self.testPage, Application.config)
+        self.assertFalse (isinstance (parser, FastParser))
+        self.assertTrue (isinstance (parser, Parser))
+
+        self.config.fastParserOptions.value = True
+        self.assertTrue (isinstance (factory.make (self.testPage, Application.config), FastParser))
+
+
+    def testTokenStartChars (self):
+        """
+        Для каждого токена грамматики должны быть указаны символы, с которых он может начинаться
+        """
+        grammar = WikiGrammar.get()
+
+        names = set (WikiGrammar.wikiTokens + 
+                WikiGrammar.listItemTokens + 
+                WikiGrammar.linkTokens + 
+                WikiGrammar.headingTokens)
+
+        names.update ([name for name, value in vars (grammar).iteritems()
+            if isinstance (value, ParserElement) and not name.endswith (u"Markup")])
+
+        self.assertTrue (u"bolded" in names)
+
+        for name in names:
+            self.assertTrue (name in FastParser.tokenStartChars, name)
+
+
+    def testFonts (self):
+        self.__compare (u"бла-бла-бла ''курсив'' '''полужирный''' ''''оба'''' бла-бла-бла")
+        self.__compare (u"x'_нижний_' x'^верхний^' {+подчеркнутый+} {-зачеркнутый-} @@код@@")
+        self.__compare (u"[-мелкий-] [--мельче--] [+крупный+] [++крупнее++]")
+        self.__compare (u"'''полужирный нижний'_ '''полужирный верхний'^ ''курсив _''")
+
+
+    def testLinks (self):
+        self.__compare (u"[[Страница 1]] [[комментарий -> http://jenyay.net]] [[http://jenyay.net | коммент]]")
+        self.__compare (u"[[#якорь]] [[Attach:filename.tmp]] [['''полужирная''' -> Страница]]")
+        self.__compare (u"http://jenyay.net www.jenyay.net ftp://jenyay.net/path?a=1&b=2 192.168.1.1")
+        self.__compare (u"http://jenyay.net/image.png xhttp://jenyay.net [[<<]] [[&lt;&lt;]]")
+
+
+    def testAttach (self):
+        self.__compare (u"Attach:filename.tmp Attach:accept.png Attach:image.jpgбла Attach:файл с пробелами.tmp")
+        self.__compare (u"бла Attach:unknown.tmp бла Attach:filename.tmpAttach:accept.png")
+
+
+    def testBlocks (self):
+        self.__compare (u"!! Заголовок ''курсив''\n!!! Заголовок 2 \\\nпродолжение\n  !! не заголовок")
+        self.__compare (u"* элемент 1\n* элемент 2\n** элемент 3\n# элемент 4\n\nТекст")
+        self.__compare (u"|| border=1\n|| ячейка 1 || ячейка 2 ||\n||  по центру  ||справа || \n\nТекст")
+        self.__compare (u"%center%По центру ''курсив''\n\nТекст %right% справа")
+        self.__compare (u"Текст ---- текст\n----\n[@ <b>код</b> @] [= ''без форматирования'' =]")
+
+
+    def testCommands (self):
+        self.__compare (u"(:childlist:) (:unknown param=1:) (:test:)содержимое(:testend:)")
+        self.__compare (u"(:include Attach:filename.tmp:) {$ $} текст \\\nпродолжение")
+
+
+    def testPlainText (self):
+        self.__compare (u"")
+        self.__compare (u"   \n\t  ")
+        self.__compare (u"Просто текст, без разметки; со знаками: препинания! И числами 3.14 и 2012.")
+        self.__compare (u"'' [[ {+ '^ незакрытые токены [- (: %thumb%")
+
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import unittest
+
+from test.utils import removeWiki
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.attachment import Attachment
+from outwiker.core.application import Application
+
+from outwiker.pages.wiki.parser.wikiparser import Parser
+from outwiker.pages.wiki.parser.command import Command
+from outwiker.pages.wiki.parser.commandtest import TestCommand
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+from outwiker.pages.wiki.parserfactory import ParserFactory
+
+
+class TypeErrorCommand (Command):
+    """
+    Команда, которая бросает исключение TypeError
+    """
+    @property
+    def name (self):
+        return u"typeerror"
+
+
+    def execute (self, params, content):
+        raise TypeError
+
+
+class ParserGrammarTest (unittest.TestCase):
+    """
+    Тесты общей для всех парсеров грамматики
+    """
+    def setUp(self):
+        self.filesPath = u"../test/samplefiles/"
+
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        WikiPageFactory.create (self.rootwiki, u"Страница 1", [])
+        WikiPageFactory.create (self.rootwiki, u"Страница 2", [])
+
+        self.page1 = self.rootwiki[u"Страница 1"]
+        self.page2 = self.rootwiki[u"Страница 2"]
+
+        Attachment (self.page1).attach ([os.path.join (self.filesPath, u"accept.png")])
+        Attachment (self.page2).attach ([os.path.join (self.filesPath, u"filename.tmp")])
+
+        self.factory = ParserFactory()
+
+
+    def tearDown(self):
+        removeWiki (self.path)
+
+
+    def testSharedGrammar (self):
+        parser1 = self.factory.make (self.page1, Application.config)
+        parser2 = self.factory.make (self.page2, Application.config)
+
+        self.assertTrue (parser1.grammar is parser2.grammar)
+        self.assertTrue (parser1.grammar.wikiMarkup is parser2.grammar.wikiMarkup)
+
+
+    def testAttachesPerPage (self):
+        parser1 = self.factory.make (self.page1, Application.config)
+        parser2 = self.factory.make (self.page2, Application.config)
+
+        text = u"Attach:accept.png Attach:filename.tmp"
+
+        self.assertEqual (parser1.toHtml (text),
+                u'<IMG SRC="__attach/accept.png"/> Attach:filename.tmp')
+
+        self.assertEqual (parser2.toHtml (text),
+                u'Attach:accept.png <A HREF="__attach/filename.tmp">filename.tmp</A>')
+
+
+    def testCommandsPerParser (self):
+        parser1 = Parser (self.page1, Application.config)
+        parser2 = Parser (self.page1, Application.config)
+        parser1.addCommand (TestCommand (parser1))
+
+        text = u"(:test:)"
+
+        self.assertEqual (parser1.toHtml (text),
+                u"Command name: test\nparams: \ncontent: ")
+        self.assertEqual (parser2.toHtml (text), text)
+
+
+    def testContext (self):
+        parser = Parser (self.page1, Application.config)
+        parser.toHtml (u"''бла-бла-бла''")
+
+        self.assertEqual (parser.grammar.context.current, None)
+
+
+    def testCommandTypeError (self):
+        parser1 = Parser (self.page1, Application.config)
+        parser1.addCommand (TypeErrorCommand (parser1))
+        parser1.toHtml (u"(:typeerror:)")
+
+        # Ошибка в команде не должна сломать токен для других парсеров
+        parser2 = Parser (self.page1, Application.config)
+        parser2.addCommand (TestCommand (parser2))
+
+        self.assertEqual (parser2.toHtml (u"(:test:)"),
+                u"Command name: test\nparams: \ncontent: ")
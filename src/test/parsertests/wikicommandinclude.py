@@ -12,9 +12,27 @@ from outwiker.pages.wiki.parser.wikiparser import Parser
 from outwiker.pages.wiki.wikipage import WikiPageFactory
 from outwiker.pages.wiki.parser.command import Command
 from outwiker.pages.wiki.parserfactory import ParserFactory
+from outwiker.pages.wiki.rendercache import RenderCache
+from outwiker.pages.wiki.thumbnails import Thumbnails
+from outwiker.pages.wiki.wikiconfig import WikiConfig
 from test.utils import removeWiki
 
 
+class ConfigSectionCommand (Command):
+    """
+    Команда, результат которой зависит от секции настроек RenderCacheTest
+    """
+    configSections = [u"RenderCacheTest"]
+
+    @property
+    def name (self):
+        return u"configsection"
+
+
+    def execute (self, params, content):
+        return u""
+
+
 class WikiIncludeCommandTest (unittest.TestCase):
     def setUp(self):
         self.encoding = "utf8"
@@ -210,3 +228,124 @@ class WikiIncludeCommandTest (unittest.TestCase):
 
         result = self.parser.toHtml (text)
         self.assertEqual (result, result_right, result)
+
+
+    def _setAttachTime (self, fname):
+        path = os.path.join (Attachment (self.testPage).getAttachPath(), fname)
+        os.utime (path, (1300000000, 1300000000))
+
+
+    def _replaceAttach (self, fname):
+        """
+        Заменить содержимое прикрепленного файла, сохранив его размер и время изменения
+        """
+        path = os.path.join (Attachment (self.testPage).getAttachPath(), fname)
+        size = os.path.getsize (path)
+
+        with open (path, "w") as fp:
+            fp.write ("x" * size)
+
+        self._setAttachTime (fname)
+
+
+    def testIncludeCache (self):
+        text = u"""(:include Attach:text_utf8.txt :)"""
+
+        self._setAttachTime (u"text_utf8.txt")
+        self.parser.toHtml (text)
+
+        cachePath = os.path.join (Thumbnails (self.testPage).getThumbPath (False), RenderCache.cacheFile)
+        self.assertTrue (os.path.exists (cachePath))
+
+        # Размер и время изменения файла те же, поэтому используется результат из кеша
+        self._replaceAttach (u"text_utf8.txt")
+
+        result = self.parser.toHtml (text)
+        self.assertEqual (result, u"""Текст в 
+кодировке UTF-8""")
+
+
+    def testIncludeCacheFileChanged (self):
+        text = u"""(:include Attach:text_utf8.txt :)"""
+
+        self.parser.toHtml (text)
+
+        path = os.path.join (Attachment (self.testPage).getAttachPath(), u"text_utf8.txt")
+        with open (path, "w") as fp:
+            fp.write (u"Новый текст".encode ("utf8"))
+
+        result = self.parser.toHtml (text)
+        self.assertEqual (result, u"Новый текст")
+
+
+    def testIncludeCacheParams (self):
+        text1 = u"""(:include Attach:html.txt :)"""
+        text2 = u"""(:include Attach:html.txt htmlescape :)"""
+
+        result1 = self.parser.toHtml (text1)
+        result2 = self.parser.toHtml (text2)
+
+        self.assertNotEqual (result1, result2)
+        self.assertEqual (self.parser.toHtml (text1), result1)
+        self.assertEqual (self.parser.toHtml (text2), result2)
+
+
+    def testIncludeCacheNewParser (self):
+        text = u"""(:include Attach:wiki.txt wikiparse :)"""
+
+        self._setAttachTime (u"wiki.txt")
+        result = self.parser.toHtml (text)
+        self._replaceAttach (u"wiki.txt")
+
+        # Кеш читается из файла
+        RenderCache._caches.clear()
+        parser = ParserFactory().make (self.testPage, Application.config)
+
+        self.assertEqual (parser.toHtml (text), result)
+
+
+    def testIncludeCacheConfigChanged (self):
+        text = u"""(:include Attach:wiki.txt wikiparse :)"""
+
+        self._setAttachTime (u"wiki.txt")
+        result = self.parser.toHtml (text)
+        self._replaceAttach (u"wiki.txt")
+
+        # Результат разбора зависит от настроек вики, поэтому кеш не используется
+        Application.config.set (WikiConfig.WIKI_SECTION, u"RenderCacheTest", u"1")
+        try:
+            self.assertNotEqual (self.parser.toHtml (text), result)
+        finally:
+            Application.config.remove_option (WikiConfig.WIKI_SECTION, u"RenderCacheTest")
+
+
+    def testIncludeCacheOtherConfigChanged (self):
+        text = u"""(:include Attach:wiki.txt wikiparse :)"""
+
+        self._setAttachTime (u"wiki.txt")
+        result = self.parser.toHtml (text)
+        self._replaceAttach (u"wiki.txt")
+
+        # Настройки, которые не влияют на разбор (например, список последних открытых вики), кеш не сбрасывают
+        Application.config.set (u"RenderCacheTest", u"param", u"1")
+        try:
+            self.assertEqual (self.parser.toHtml (text), result)
+        finally:
+            Application.config.remove_section (u"RenderCacheTest")
+
+
+    def testIncludeCacheCommandConfigChanged (self):
+        text = u"""(:include Attach:wiki.txt wikiparse :)"""
+
+        self.parser.addCommand (ConfigSectionCommand (self.parser))
+
+        self._setAttachTime (u"wiki.txt")
+        result = self.parser.toHtml (text)
+        self._replaceAttach (u"wiki.txt")
+
+        # Настройки, от которых зависят команды парсера, учитываются
+        Application.config.set (u"RenderCacheTest", u"param", u"1")
+        try:
+            self.assertNotEqual (self.parser.toHtml (text), result)
+        finally:
+            Application.config.remove_section (u"RenderCacheTest")
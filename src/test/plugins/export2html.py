@@ -5,9 +5,13 @@ import unittest
 import os.path
 import shutil
 
+from outwiker.core.attachment import Attachment
 from outwiker.core.tree import WikiDocument
 from outwiker.core.pluginsloader import PluginsLoader
 from outwiker.core.application import Application
+from outwiker.pages.html.htmlpage import HtmlPageFactory
+
+from test.utils import removeWiki
 
 
 class Export2HtmlTest (unittest.TestCase):
@@ -690,3 +694,228 @@ class Export2HtmlTest (unittest.TestCase):
         self.assertTrue (u'<A HREF="Страница 2 (2).html" title="бла-бла-бла">Ссылка на /Страница 1/Страница 2/Страница 6/Страница 7/Страница 2</A>' in text)
 
         self.assertTrue (u'<A HREF="Страница 7.html" title="бла-бла-бла">Ссылка на Страницу 7</A>' in text)
+
+
+    def testExportBranchProgress (self):
+        """
+        Сообщения о ходе экспорта и статистика
+        """
+        pagename = u"Страница 1"
+        namegenerator = self.__tester.longNameGenerator (self.root[pagename])
+        branchExporter = self.__tester.branchExporter (self.root[pagename], namegenerator)
+
+        progress = []
+        branchExporter.onProgress += lambda done, total: progress.append ((done, total))
+
+        result = branchExporter.export (
+                outdir=self.outputdir,
+                imagesonly=False,
+                alwaysOverwrite=False
+                )
+
+        self.assertEqual (len (result), 0)
+        self.assertEqual (progress, [(n, 7) for n in range (1, 8)])
+        self.assertEqual (branchExporter.statistics[u"pages"], 7)
+        self.assertTrue (branchExporter.statistics[u"pagesPerSecond"] > 0)
+
+
+    def testExportBranchSingleThread (self):
+        """
+        Результат экспорта не должен зависеть от количества потоков
+        """
+        pagename = u"Страница 1"
+        namegenerator = self.__tester.titleNameGenerator (self.outputdir)
+        branchExporter = self.__tester.branchExporter (self.root[pagename], namegenerator, threads=1)
+
+        result = branchExporter.export (
+                outdir=self.outputdir,
+                imagesonly=False,
+                alwaysOverwrite=False
+                )
+
+        self.assertEqual (len (result), 0)
+
+        text =  self.__getFileContent (os.path.join (self.outputdir, u"Страница 6.html"))
+        self.assertTrue (u'<A HREF="Страница 2 (2).html">Еще одна ссылка</A>' in text)
+        self.assertTrue (u'<A HREF="Страница 7.html">Страница 7</A>' in text)
+
+
+    def testExportBranchHardLinks (self):
+        """
+        Экспорт с жесткими ссылками на вложения
+        """
+        pagename = u"Страница 1"
+        namegenerator = self.__tester.longNameGenerator (self.root[pagename])
+        branchExporter = self.__tester.branchExporter (self.root[pagename], 
+                namegenerator, 
+                hardLinks=True)
+
+        result = branchExporter.export (
+                outdir=self.outputdir,
+                imagesonly=False,
+                alwaysOverwrite=False
+                )
+
+        self.assertEqual (len (result), 0)
+
+        src = os.path.join (self.root[u"Страница 1/Страница 2"].path, u"__attach", u"pacman.gif")
+        exported = os.path.join (self.outputdir, pagename + u"_Страница 2", u"pacman.gif")
+
+        self.assertTrue (os.path.exists (exported))
+
+        if hasattr (os.path, "samefile"):
+            self.assertTrue (os.path.samefile (src, exported))
+
+
+    def __exportIncremental (self, root):
+        namegenerator = self.__tester.titleNameGenerator (self.outputdir)
+        branchExporter = self.__tester.branchExporter (root[u"Страница 1"], namegenerator)
+
+        result = branchExporter.export (
+                outdir=self.outputdir,
+                imagesonly=False,
+                alwaysOverwrite=False,
+                incremental=True
+                )
+
+        self.assertEqual (len (result), 0, str (result) )
+        return branchExporter
+
+
+    def __copyWiki (self):
+        """
+        Инкрементальный экспорт проверяется на копии вики, которую можно изменять
+        """
+        wikicopy = u"../test/temp_wiki"
+        if os.path.exists (wikicopy):
+            shutil.rmtree (wikicopy)
+
+        shutil.copytree (self.path, wikicopy)
+        self.addCleanup (shutil.rmtree, wikicopy, True)
+
+        return WikiDocument.load (wikicopy)
+
+
+    def testLinkToAttachNamedAsPage (self):
+        """
+        Ссылка на вложение не заменяется ссылкой на подстраницу с таким же именем,
+        даже если вложение еще не скопировано в папку экспорта
+        """
+        path = u"../test/testwiki"
+        removeWiki (path)
+        self.addCleanup (removeWiki, path)
+
+        root = WikiDocument.create (path)
+        HtmlPageFactory.create (root, u"Страница", [])
+        HtmlPageFactory.create (root[u"Страница"], u"accept.png", [])
+
+        page = root[u"Страница"]
+        Attachment (page).attach ([u"../test/samplefiles/accept.png"])
+
+        with open (os.path.join (page.path, u"__content.html"), "wb") as fp:
+            fp.write (u'<a href="__attach/accept.png">файл</a>'.encode ("utf8"))
+
+        namegenerator = self.__tester.titleNameGenerator (self.outputdir)
+        branchExporter = self.__tester.branchExporter (page, namegenerator)
+
+        result = branchExporter.export (
+                outdir=self.outputdir,
+                imagesonly=False,
+                alwaysOverwrite=False
+                )
+
+        self.assertEqual (len (result), 0, str (result))
+
+        text = self.__getFileContent (os.path.join (self.outputdir, u"Страница.html"))
+        self.assertTrue (u'<a href="Страница/accept.png">файл</a>' in text, text)
+
+
+    def testExportIncremental (self):
+        root = self.__copyWiki()
+
+        exporter = self.__exportIncremental (root)
+        self.assertEqual (exporter.statistics[u"skipped"], 0)
+
+        # Повторный экспорт без изменений ничего не перезаписывает, имена не меняются
+        exporter = self.__exportIncremental (root)
+        self.assertEqual (exporter.statistics[u"skipped"], exporter.statistics[u"pages"])
+        self.assertTrue (os.path.exists (os.path.join (self.outputdir, u"Страница 2 (2).html") ) )
+        self.assertFalse (os.path.exists (os.path.join (self.outputdir, u"Страница 1 (1).html") ) )
+
+
+    def testExportIncrementalChanged (self):
+        root = self.__copyWiki()
+        self.__exportIncremental (root)
+
+        page = root[u"Страница 1/Страница 2/Страница 6/Страница 7"]
+        with open (os.path.join (page.path, u"__content.html"), "a") as fp:
+            fp.write ("<p>Новый абзац</p>")
+
+        exporter = self.__exportIncremental (root)
+        self.assertEqual (exporter.statistics[u"skipped"], exporter.statistics[u"pages"] - 1)
+
+        text = self.__getFileContent (os.path.join (self.outputdir, u"Страница 7.html"))
+        self.assertTrue (u"Новый абзац" in text)
+
+
+    def testExportIncrementalNewPage (self):
+        """
+        Добавление страницы не приводит к повторному экспорту остальных страниц
+        """
+        root = self.__copyWiki()
+        self.__exportIncremental (root)
+
+        HtmlPageFactory.create (root[u"Страница 1"], u"Новая страница", [])
+
+        exporter = self.__exportIncremental (root)
+        self.assertEqual (exporter.statistics[u"pages"], 8)
+        self.assertEqual (exporter.statistics[u"skipped"], 7)
+        self.assertTrue (os.path.exists (os.path.join (self.outputdir, u"Новая страница.html") ) )
+
+
+    def testExportIncrementalLinkTarget (self):
+        """
+        Страница экспортируется заново, если изменилось имя файла страницы, на которую она ссылается
+        """
+        root = self.__copyWiki()
+        self.__exportIncremental (root)
+
+        root[u"Страница 1/Страница 2/Страница 6/Страница 7"].title = u"Страница 8"
+
+        self.__exportIncremental (root)
+
+        # Ссылка "Страница 7" больше никуда не ведет
+        text = self.__getFileContent (os.path.join (self.outputdir, u"Страница 6.html"))
+        self.assertFalse (u'HREF="Страница 7.html"' in text)
+
+
+    def testExportIncrementalAttaches (self):
+        root = self.__copyWiki()
+        self.__exportIncremental (root)
+
+        page = root[u"Страница 1/Страница 2/Страница 6/Страница 7"]
+        os.remove (os.path.join (page.path, u"__attach", u"cut.png"))
+
+        self.assertTrue (os.path.exists (os.path.join (self.outputdir, u"Страница 7", u"cut.png") ) )
+
+        self.__exportIncremental (root)
+
+        self.assertFalse (os.path.exists (os.path.join (self.outputdir, u"Страница 7", u"cut.png") ) )
+        self.assertTrue (os.path.exists (os.path.join (self.outputdir, u"Страница 7", u"css.png") ) )
+
+
+    def testExportIncrementalOrphans (self):
+        root = self.__copyWiki()
+        self.__exportIncremental (root)
+
+        root[u"Страница 1/Страница 2/Страница 6/Страница 7"].remove()
+
+        exporter = self.__exportIncremental (root)
+
+        self.assertFalse (os.path.exists (os.path.join (self.outputdir, u"Страница 7.html") ) )
+        self.assertFalse (os.path.exists (os.path.join (self.outputdir, u"Страница 7") ) )
+        self.assertTrue (os.path.exists (os.path.join (self.outputdir, u"Страница 6.html") ) )
+
+        # Ссылки на удаленные страницы изменились, поэтому страница 6 экспортирована заново
+        text = self.__getFileContent (os.path.join (self.outputdir, u"Страница 6.html"))
+        self.assertFalse (u'HREF="Страница 7.html"' in text)
@@ -208,3 +208,45 @@ class SourceFilePluginTest (unittest.TestCase):
         result = self.__readFile (htmlpath)
 
         self.assertTrue (u'source_utf8111.py' in result, result)
+
+
+    def testHighlightFileCache (self):
+        Attachment(self.testPage).attach ([os.path.join (self.samplefilesPath, u"source_utf8.py")])
+        path = os.path.join (Attachment (self.testPage).getAttachPath(), u"source_utf8.py")
+        os.utime (path, (1300000000, 1300000000))
+
+        content = u'(:source file="source_utf8.py" lang="python" tabwidth=4:)'
+        result1 = self.parser.toHtml (content)
+
+        # Размер и время изменения файла те же, поэтому раскраска берется из кеша
+        size = os.path.getsize (path)
+        with open (path, "w") as fp:
+            fp.write ("x" * size)
+
+        os.utime (path, (1300000000, 1300000000))
+
+        parser = self.factory.make (self.testPage, Application.config)
+        result2 = parser.toHtml (content)
+
+        self.assertEqual (result1, result2)
+        self.assertTrue (u"__correctSysPath" in result2)
+
+        # Стили добавляются в заголовок и при использовании кеша
+        self.assertEqual (self.parser.head, parser.head)
+        self.assertTrue (u".highlight-" in parser.head)
+
+
+    def testHighlightFileCacheChanged (self):
+        Attachment(self.testPage).attach ([os.path.join (self.samplefilesPath, u"source_utf8.py")])
+        path = os.path.join (Attachment (self.testPage).getAttachPath(), u"source_utf8.py")
+
+        content = u'(:source file="source_utf8.py" lang="python":)'
+        self.parser.toHtml (content)
+
+        with open (path, "w") as fp:
+            fp.write ("def newFunction ():\n    pass\n")
+
+        result = self.parser.toHtml (content)
+
+        self.assertTrue (u"newFunction" in result)
+        self.assertFalse (u"__correctSysPath" in result)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.attachment import Attachment
+from outwiker.pages.wiki.rendercache import RenderCache
+from outwiker.pages.wiki.thumbnails import Thumbnails
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+
+from test.utils import removeWiki
+
+
+class RenderCacheTest (unittest.TestCase):
+    """
+    Тесты кеша результатов выполнения команд
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        WikiPageFactory.create (self.rootwiki, u"Страница 1", [])
+        self.page = self.rootwiki[u"Страница 1"]
+
+        Attachment (self.page).attach ([u"../test/samplefiles/accept.png"])
+        self.attachPath = os.path.join (Attachment (self.page).getAttachPath(), u"accept.png")
+
+        self.maxSize = RenderCache.maxSize
+        self.maxTotalSize = RenderCache.maxTotalSize
+        RenderCache._caches.clear()
+
+
+    def tearDown (self):
+        RenderCache.maxSize = self.maxSize
+        RenderCache.maxTotalSize = self.maxTotalSize
+        RenderCache._caches.clear()
+        removeWiki (self.path)
+
+
+    def testKey (self):
+        key1 = RenderCache.getKey (u"include", 1, [u"param"], path=self.attachPath)
+        key2 = RenderCache.getKey (u"include", 1, [u"param"], path=self.attachPath)
+        self.assertEqual (key1, key2)
+
+        self.assertNotEqual (key1, RenderCache.getKey (u"include", 2, [u"param"], path=self.attachPath))
+        self.assertNotEqual (key1, RenderCache.getKey (u"include", 1, [u"param2"], path=self.attachPath))
+        self.assertNotEqual (key1, RenderCache.getKey (u"source", 1, [u"param"], path=self.attachPath))
+
+        self.assertNotEqual (RenderCache.getKey (u"source", 1, [], content=u"Текст 1"),
+                RenderCache.getKey (u"source", 1, [], content=u"Текст 2"))
+
+
+    def testKeyFileChanged (self):
+        key1 = RenderCache.getKey (u"include", 1, [], path=self.attachPath)
+
+        with open (self.attachPath, "ab") as fp:
+            fp.write ("12345")
+
+        self.assertNotEqual (key1, RenderCache.getKey (u"include", 1, [], path=self.attachPath))
+
+
+    def testKeyFileNotFound (self):
+        path = os.path.join (Attachment (self.page).getAttachPath(), u"invalid.txt")
+        self.assertEqual (RenderCache.getKey (u"include", 1, [], path=path), None)
+
+
+    def testGetSet (self):
+        cache = RenderCache (self.page)
+        self.assertEqual (cache.get (u"key"), None)
+
+        cache.set (u"key", u"Результат")
+        self.assertEqual (cache.get (u"key"), u"Результат")
+        self.assertEqual (RenderCache (self.page).get (u"key"), u"Результат")
+
+
+    def testSave (self):
+        cache = RenderCache (self.page)
+        cache.set (u"key", [u"Результат", [u"<style></style>"]])
+        cache.save()
+
+        self.assertTrue (os.path.exists (os.path.join (Thumbnails (self.page).getThumbPath (False),
+            RenderCache.cacheFile)))
+
+        RenderCache._caches.clear()
+        self.assertEqual (RenderCache (self.page).get (u"key"), [u"Результат", [u"<style></style>"]])
+
+
+    def testSaveNoAttach (self):
+        WikiPageFactory.create (self.rootwiki, u"Страница 2", [])
+        page = self.rootwiki[u"Страница 2"]
+
+        cache = RenderCache (page)
+        cache.set (u"key", u"Результат")
+        cache.save()
+
+        # Папка для вложений не создается
+        self.assertFalse (os.path.exists (Attachment (page).getAttachPath()))
+        self.assertEqual (cache.get (u"key"), u"Результат")
+
+
+    def testLru (self):
+        RenderCache.maxSize = 100
+        cache = RenderCache (self.page)
+
+        cache.set (u"key1", u"a" * 30)
+        cache.set (u"key2", u"b" * 30)
+        cache.set (u"key3", u"c" * 30)
+
+        # key1 использовался последним, поэтому удаляется key2
+        cache.get (u"key1")
+        cache.set (u"key4", u"d" * 30)
+
+        self.assertEqual (cache.get (u"key1"), u"a" * 30)
+        self.assertEqual (cache.get (u"key2"), None)
+        self.assertEqual (cache.get (u"key3"), u"c" * 30)
+        self.assertEqual (cache.get (u"key4"), u"d" * 30)
+
+
+    def testLruAfterReload (self):
+        RenderCache.maxSize = 100
+        cache = RenderCache (self.page)
+
+        cache.set (u"key1", u"a" * 30)
+        cache.set (u"key2", u"b" * 30)
+        cache.get (u"key1")
+        cache.save()
+
+        RenderCache._caches.clear()
+        cache = RenderCache (self.page)
+        cache.set (u"key3", u"c" * 30)
+        cache.set (u"key4", u"d" * 30)
+
+        self.assertEqual (cache.get (u"key2"), None)
+        self.assertEqual (cache.get (u"key1"), u"a" * 30)
+
+
+    def testTotalSize (self):
+        RenderCache.maxTotalSize = 100
+
+        WikiPageFactory.create (self.rootwiki, u"Страница 2", [])
+        WikiPageFactory.create (self.rootwiki, u"Страница 3", [])
+        page2 = self.rootwiki[u"Страница 2"]
+        page3 = self.rootwiki[u"Страница 3"]
+        Attachment (page2).attach ([u"../test/samplefiles/accept.png"])
+
+        cache1 = RenderCache (self.page)
+        cache1.set (u"key", u"a" * 40)
+        cache1.save()
+
+        cache2 = RenderCache (page2)
+        cache2.set (u"key", u"b" * 40)
+        cache2.save()
+
+        cache1.get (u"key")
+
+        cache3 = RenderCache (page3)
+        cache3.set (u"key", u"c" * 40)
+        cache3.save()
+
+        # Из памяти удаляется кеш страницы, которая дольше всего не использовалась
+        self.assertEqual (len (RenderCache._caches), 2)
+        self.assertFalse (Thumbnails (page2).getThumbPath (False) in RenderCache._caches)
+
+        # Сохраненные результаты читаются из файла
+        self.assertEqual (cache2.get (u"key"), u"b" * 40)
+        self.assertEqual (cache1.get (u"key"), u"a" * 40)
+
+
+    def testTooLarge (self):
+        RenderCache.maxSize = 100
+        cache = RenderCache (self.page)
+
+        cache.set (u"key1", u"a" * 30)
+        cache.set (u"key2", u"b" * 200)
+
+        self.assertEqual (cache.get (u"key1"), u"a" * 30)
+        self.assertEqual (cache.get (u"key2"), None)
+
+
+    def testClearDir (self):
+        cache = RenderCache (self.page)
+        cache.set (u"key", u"Результат")
+        cache.save()
+
+        Thumbnails (self.page).clearDir()
+        self.assertEqual (RenderCache (self.page).get (u"key"), None)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os.path
+import threading
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.application import Application
+from outwiker.core.search import Searcher, AllTagsSearchStrategy
+from outwiker.core.searchindex import SearchIndex, SearchQuery
+from outwiker.core.attachment import Attachment
+from outwiker.pages.text.textpage import TextPageFactory
+from outwiker.pages.search.sortstrategies import RelevanceSort, DateAscendingSort
+from outwiker.pages.search.htmlreport import HtmlReport
+
+from test.utils import removeWiki
+
+
+class SearchIndexTest (unittest.TestCase):
+    """
+    Тесты полнотекстового индекса для поиска
+    """
+    def setUp(self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [u"Собака", u"опыт"])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [u"опыт"])
+        TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 3", [])
+
+        self.rootwiki[u"Страница 1"].content = u"Пес по-прежнему лежит. Шарик стал человеком."
+        self.rootwiki[u"Страница 2"].content = u"Выпадение шерсти приняло характер общего облысения (50%)."
+        self.rootwiki[u"Страница 2/Страница 3"].content = u"Человек по-прежнему лежит на диване."
+
+        Attachment (self.rootwiki[u"Страница 2"]).attach ([u"../test/samplefiles/accept.png"])
+
+
+    def tearDown (self):
+        self.rootwiki.searchIndex.flush()
+        removeWiki (self.path)
+
+
+    def _find (self, phrase):
+        pages = Searcher (phrase, [], AllTagsSearchStrategy).find (self.rootwiki)
+        return sorted ([page.subpath for page in pages])
+
+
+    def testIndexFile (self):
+        self._find (u"пес")
+        self.assertTrue (os.path.exists (os.path.join (self.path, SearchIndex.fileName)))
+
+
+    def testTokenize (self):
+        self.assertEqual (SearchIndex.tokenize (u"Пес, по-прежнему"),
+                [(u"пес", 0), (u"по", 5), (u"прежнему", 8)])
+
+
+    def testSubstring (self):
+        self.assertEqual (self._find (u"челов"), [u"Страница 1", u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u"ЛЕЖИТ."), [u"Страница 1"])
+        self.assertEqual (self._find (u"ит на див"), [u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u"(50%)"), [u"Страница 2"])
+        self.assertEqual (self._find (u"баба"), [])
+
+
+    def testSubstringFromIndex (self):
+        """
+        Фразы со словами ищутся только по индексу, без чтения текста страниц
+        """
+        index = self.rootwiki.searchIndex
+        index.update()
+
+        contentPath = os.path.join (self.rootwiki[u"Страница 1"].path, u"__page.text")
+        with open (contentPath, "wb") as fp:
+            fp.write (u"Другой текст".encode ("utf8"))
+
+        self.assertEqual (index.find (u"ЛЕЖИТ."), set ([u"Страница 1"]))
+        self.assertEqual (index.find (u"ит на див"), set ([u"Страница 2/Страница 3"]))
+        self.assertEqual (index.find (u"(50%)"), set ([u"Страница 2"]))
+        self.assertEqual (index.find (u"ние ш"), set ([u"Страница 2"]))
+        self.assertEqual (index.find (u"лежит  на"), set())
+        self.assertEqual (index.find (u"лежит-на"), set())
+        self.assertEqual (index.find (u"другой"), set())
+
+        # Фразу без слов по индексу проверить нельзя
+        self.assertEqual (index.find (u"%"), None)
+
+
+    def testTitleTagsAttach (self):
+        self.assertEqual (self._find (u"ница 3"), [u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u"соба"), [u"Страница 1"])
+        self.assertEqual (self._find (u"accept"), [u"Страница 2"])
+
+
+    def testEmptyPhrase (self):
+        self.assertEqual (len (self._find (u"")), 3)
+
+
+    def testEqualToTreeSearch (self):
+        phrases = [u"по-прежнему", u"о", u"ние ш", u"%", u"_", u"опыт", u".png", u"  ",
+                u"ит. ш", u"(50", u"%).", u"ccept.pn", u"а 2", u"прежнему лежит на", u"баба"]
+
+        for phrase in phrases:
+            searcher = Searcher (phrase, [], AllTagsSearchStrategy)
+            expected = searcher._Searcher__findInTree (self.rootwiki)
+
+            self.assertEqual (sorted ([page.subpath for page in searcher.find (self.rootwiki)]),
+                    sorted ([page.subpath for page in expected]),
+                    phrase)
+
+
+    def testIsQuery (self):
+        self.assertTrue (SearchQuery.isQuery (u'"пес лежит"'))
+        self.assertTrue (SearchQuery.isQuery (u"пес OR шарик"))
+        self.assertTrue (SearchQuery.isQuery (u"чело*"))
+        self.assertFalse (SearchQuery.isQuery (u"пес лежит"))
+        self.assertFalse (SearchQuery.isQuery (u"*"))
+
+
+    def testQueryPhrase (self):
+        self.assertEqual (self._find (u'"по-прежнему лежит"'),
+                [u"Страница 1", u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u'"лежит по-прежнему"'), [])
+        self.assertEqual (self._find (u'"лежит на"'), [u"Страница 2/Страница 3"])
+
+
+    def testQueryPrefix (self):
+        self.assertEqual (self._find (u"челов*"), [u"Страница 1", u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u"выпад*"), [u"Страница 2"])
+
+
+    def testQueryAndOr (self):
+        self.assertEqual (self._find (u"шарик OR облысения"), [u"Страница 1", u"Страница 2"])
+        self.assertEqual (self._find (u"лежит AND диване"), [u"Страница 2/Страница 3"])
+        self.assertEqual (self._find (u'"лежит" пес'), [u"Страница 1"])
+        self.assertEqual (self._find (u"опыт AND пес OR диване"),
+                [u"Страница 1", u"Страница 2/Страница 3"])
+
+
+    def testUpdateContent (self):
+        self._find (u"пес")
+        self.rootwiki[u"Страница 2"].content = u"Новый текст про пса"
+
+        self.assertEqual (self._find (u"облысения"), [])
+        self.assertEqual (self._find (u"пса"), [u"Страница 2"])
+
+
+    def testUpdateInBackground (self):
+        """
+        Изменения страниц индексируются не в потоке, который их сделал
+        """
+        index = self.rootwiki.searchIndex
+        index.update()
+
+        connections = []
+        connect = index._connect
+
+        def countConnect ():
+            connections.append (threading.currentThread())
+            return connect()
+
+        index._connect = countConnect
+        index.updateDelay = 0.05
+
+        page = self.rootwiki[u"Страница 2"]
+        page.content = u"Новый текст про пса"
+        page.content = u"Еще более новый текст про пса"
+
+        # Одна и та же страница индексируется один раз
+        self.assertEqual (len (index._queue), 1)
+        self.assertEqual (connections, [])
+
+        index._worker.join (5)
+
+        self.assertEqual (index._queue, [])
+        self.assertEqual (len (connections), 1)
+        self.assertNotEqual (connections[0], threading.currentThread())
+        self.assertEqual (self._find (u"более"), [u"Страница 2"])
+
+
+    def testFindFlushesQueue (self):
+        index = self.rootwiki.searchIndex
+        index.update()
+        index.updateDelay = 60
+
+        self.rootwiki[u"Страница 2"].content = u"Новый текст про пса"
+        self.rootwiki[u"Страница 2"].title = u"Другое имя"
+
+        self.assertEqual (self._find (u"пса"), [u"Другое имя"])
+        self.assertEqual (index._queue, [])
+
+
+    def testCreatePage (self):
+        self._find (u"пес")
+        TextPageFactory.create (self.rootwiki[u"Страница 1"], u"Новая страница", [u"новый тег"])
+
+        self.assertEqual (self._find (u"новый тег"), [u"Страница 1/Новая страница"])
+
+
+    def testRemovePage (self):
+        self._find (u"пес")
+        self.rootwiki[u"Страница 2"].remove()
+
+        self.assertEqual (self._find (u"лежит"), [u"Страница 1"])
+
+
+    def testRenamePage (self):
+        self._find (u"пес")
+        self.rootwiki[u"Страница 2"].title = u"Другое имя"
+
+        self.assertEqual (self._find (u"диване"), [u"Другое имя/Страница 3"])
+        self.assertEqual (self._find (u"другое"), [u"Другое имя"])
+
+
+    def testMovePage (self):
+        self._find (u"пес")
+        self.rootwiki[u"Страница 2/Страница 3"].moveTo (self.rootwiki[u"Страница 1"])
+
+        # Пути в индексе изменяются без повторной сверки с файлами
+        self.assertTrue (self.rootwiki.searchIndex._valid)
+        self.assertEqual (self._find (u"диване"), [u"Страница 1/Страница 3"])
+
+
+    def testAttach (self):
+        self._find (u"пес")
+        Attachment (self.rootwiki[u"Страница 1"]).attach ([u"../test/samplefiles/add.png"])
+
+        self.assertEqual (self._find (u"add.png"), [u"Страница 1"])
+
+
+    def testExternalChange (self):
+        self._find (u"пес")
+
+        page = self.rootwiki[u"Страница 1"]
+        contentPath = os.path.join (page.path, u"__page.text")
+        with open (contentPath, "wb") as fp:
+            fp.write (u"Изменено снаружи, длиннее".encode ("utf8"))
+
+        mtime = os.stat (contentPath).st_mtime
+        os.utime (contentPath, (mtime + 5, mtime + 5))
+
+        wiki = WikiDocument.load (self.path)
+        pages = Searcher (u"снаружи", [], AllTagsSearchStrategy).find (wiki)
+        self.assertEqual ([page.subpath for page in pages], [u"Страница 1"])
+
+
+    def testInvalidIndexFile (self):
+        with open (os.path.join (self.path, SearchIndex.fileName), "wb") as fp:
+            fp.write ("invalid index file")
+
+        wiki = WikiDocument.load (self.path)
+        pages = Searcher (u"шарик", [], AllTagsSearchStrategy).find (wiki)
+        self.assertEqual ([page.subpath for page in pages], [u"Страница 1"])
+        self.assertEqual (wiki.searchIndex.enabled, True)
+
+
+    def testScores (self):
+        TextPageFactory.create (self.rootwiki, u"Человек", [])
+        self.rootwiki[u"Человек"].content = u"Человек человек"
+
+        scores = self.rootwiki.searchIndex.getScores (u"человек")
+
+        self.assertEqual (sorted (scores.keys()),
+                [u"Страница 1", u"Страница 2/Страница 3", u"Человек"])
+        self.assertTrue (scores[u"Человек"] > scores[u"Страница 2/Страница 3"])
+
+
+    def testScoresRareWord (self):
+        scores = self.rootwiki.searchIndex.getScores (u"шарик лежит")
+
+        # Слово "шарик" встречается реже, чем "лежит"
+        self.assertTrue (scores[u"Страница 1"] > scores[u"Страница 2/Страница 3"])
+
+
+    def testRelevanceSort (self):
+        pages = [self.rootwiki[u"Страница 2/Страница 3"], self.rootwiki[u"Страница 1"]]
+        RelevanceSort().sortPages (pages, u"шарик OR лежит")
+
+        self.assertEqual (pages[0], self.rootwiki[u"Страница 1"])
+
+
+    def testDateSort (self):
+        pages = [self.rootwiki[u"Страница 2/Страница 3"], self.rootwiki[u"Страница 1"]]
+        DateAscendingSort().sortPages (pages, u"")
+
+        self.assertEqual (pages[0], self.rootwiki[u"Страница 1"])
+
+
+    def testSnippet (self):
+        snippet = self.rootwiki.searchIndex.getSnippet (self.rootwiki[u"Страница 1"], u"шарик")
+
+        self.assertEqual (snippet, [(u"Пес по-прежнему лежит. ", False),
+            (u"Шарик", True),
+            (u" стал человеком.", False)])
+
+
+    def testSnippetPrefix (self):
+        snippet = self.rootwiki.searchIndex.getSnippet (self.rootwiki[u"Страница 1"], u"челов")
+        self.assertTrue ((u"человеком", True) in snippet)
+
+
+    def testSnippetSubstring (self):
+        snippet = self.rootwiki.searchIndex.getSnippet (self.rootwiki[u"Страница 1"], u"арик")
+        self.assertTrue ((u"арик", True) in snippet)
+
+
+    def testSnippetLongText (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.content = u"начало " * 100 + u"середина" + u" конец" * 100
+
+        snippet = self.rootwiki.searchIndex.getSnippet (page, u"середина", 100)
+
+        self.assertEqual (snippet[0], (u"...", False))
+        self.assertEqual (snippet[-1], (u"...", False))
+        self.assertTrue ((u"середина", True) in snippet)
+        self.assertTrue (len (u"".join ([text for text, highlight in snippet])) < 150)
+
+
+    def testSnippets (self):
+        index = self.rootwiki.searchIndex
+        pages = [self.rootwiki[u"Страница 1"],
+                self.rootwiki[u"Страница 2"],
+                self.rootwiki[u"Страница 2/Страница 3"]]
+
+        snippets = index.getSnippets (pages, u"лежит")
+
+        self.assertEqual (snippets, [index.getSnippet (page, u"лежит") for page in pages])
+        self.assertTrue ((u"лежит", True) in snippets[0])
+        self.assertFalse ((u"лежит", True) in snippets[1])
+        self.assertTrue ((u"лежит", True) in snippets[2])
+
+
+    def testHtmlReportOneConnection (self):
+        """
+        Фрагменты текста для всех страниц отчета читаются из индекса за одно обращение к базе
+        """
+        index = self.rootwiki.searchIndex
+        index.update()
+
+        connections = []
+        connect = index._connect
+
+        def countConnect ():
+            connections.append (None)
+            return connect()
+
+        index._connect = countConnect
+
+        pages = [self.rootwiki[u"Страница 1"],
+                self.rootwiki[u"Страница 2"],
+                self.rootwiki[u"Страница 2/Страница 3"]]
+
+        html = HtmlReport (pages, u"лежит", [], Application).generate()
+
+        self.assertEqual (len (connections), 1)
+        self.assertTrue (u"лежит</span>" in html)
+
+
+    def testHtmlReportScreen (self):
+        pages = [self.rootwiki[u"Страница 1"],
+                self.rootwiki[u"Страница 2"],
+                self.rootwiki[u"Страница 2/Страница 3"]]
+
+        html = HtmlReport (pages, u"лежит", [], Application, 1, 1).generate()
+
+        self.assertTrue (u"start='2'" in html)
+        self.assertFalse (u"/Страница 1'" in html)
+        self.assertTrue (u"/Страница 2'" in html)
+        self.assertFalse (u"/Страница 2/Страница 3'" in html)
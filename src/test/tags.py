@@ -6,7 +6,7 @@ import unittest
 from outwiker.core.tagslist import TagsList
 from outwiker.core.tree import WikiDocument
 from outwiker.pages.text.textpage import TextPageFactory
-from outwiker.core.tagscommands import parseTagsList, appendTag, removeTag, tagBranch, appendTagsList, removeTagsFromBranch, renameTag
+from outwiker.core.tagscommands import parseTagsList, appendTag, removeTag, tagBranch, appendTagsList, removeTagsFromBranch, renameTag, changeTags
 
 from .utils import removeWiki
 
@@ -93,6 +93,17 @@ class TagsListTest (unittest.TestCase):
         self.assertTrue (u"Метка 222".lower() in self.rootwiki[u"Страница 2/Страница 3/Страница 4"].tags)
 
 
+    def testTagBranchSaved (self):
+        tagBranch (self.rootwiki[u"Страница 2"], [u"Метка 111"])
+        renameTag (self.rootwiki, u"Метка 1", u"Черная метка")
+
+        wiki = WikiDocument.load (self.path)
+
+        self.assertEqual (wiki[u"Страница 2"].tags, [u"метка 111", u"метка 3", u"черная метка"])
+        self.assertEqual (wiki[u"Страница 2/Страница 3"].tags, [u"метка 111", u"метка 2"])
+        self.assertEqual (wiki[u"page 1"].tags, [u"метка 2", u"черная метка"])
+
+
     def testTagRoot (self):
         tagBranch (self.rootwiki, [u"Метка 111", u"Метка 222"])
 
@@ -224,3 +235,41 @@ class TagsListTest (unittest.TestCase):
         self.assertTrue (self.rootwiki[u"page 1"] in tags[u"Метка 1"])
         self.assertTrue (self.rootwiki[u"Страница 2"] in tags[u"Метка 1"])
         self.assertTrue (self.rootwiki[u"Страница 2/Страница 3/Страница 4"] in tags[u"Метка 1"])
+
+
+    def testChangeTagsEvents (self):
+        events = []
+
+        self.rootwiki.onStartTreeUpdate += lambda root: events.append (u"start")
+        self.rootwiki.onEndTreeUpdate += lambda root: events.append (u"end")
+        self.rootwiki.onPageUpdate += lambda page: events.append (u"update")
+        self.rootwiki.onTagsChanged += lambda pages: events.append (set (pages))
+
+        tagBranch (self.rootwiki[u"Страница 2"], [u"Метка 3"])
+
+        self.assertEqual (events, [u"start", 
+            set ([self.rootwiki[u"Страница 2/Страница 3"], self.rootwiki[u"Страница 2/Страница 3/Страница 4"]]),
+            u"end"])
+
+
+    def testChangeTags (self):
+        pages = [self.rootwiki[u"page 1"], self.rootwiki[u"page 1/page 5"], self.rootwiki]
+
+        changed = changeTags (pages, lambda tags: [tag.upper() for tag in tags] + [u"Метка 5"])
+
+        self.assertEqual (changed, pages[:2])
+        self.assertEqual (self.rootwiki[u"page 1"].tags, [u"метка 1", u"метка 2", u"метка 5"])
+        self.assertEqual (self.rootwiki[u"page 1/page 5"].tags, [u"метка 4", u"метка 5"])
+
+        self.assertEqual (changeTags (pages, lambda tags: tags), [])
+
+
+    def testTagsIndexBeforeEvent (self):
+        # Обработчики onPageUpdate должны видеть уже обновленный индекс тегов
+        TagsList (self.rootwiki)
+        counts = []
+        self.rootwiki.onPageUpdate += lambda page: counts.append (self.rootwiki.tagsIndex.getCount (u"Метка 5"))
+
+        appendTag (self.rootwiki[u"page 1"], u"Метка 5")
+
+        self.assertEqual (counts, [1])
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.tagslist import TagsList
+from outwiker.core.tagscommands import appendTag, removeTag, renameTag
+from outwiker.pages.text.textpage import TextPageFactory
+
+from .utils import removeWiki
+
+
+class TagsIndexTest (unittest.TestCase):
+    """
+    Тесты индекса тегов вики
+    """
+    def setUp(self):
+        # Здесь будет создаваться вики
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [u"Метка 1", u"Метка 2"])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [u"Метка 1", u"Метка 3"])
+        TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 3", [u"Метка 2"])
+
+        self.index = self.rootwiki.tagsIndex
+
+
+    def tearDown(self):
+        removeWiki (self.path)
+
+
+    def testBuild (self):
+        self.assertEqual (list (self.index), [u"метка 1", u"метка 2", u"метка 3"])
+        self.assertEqual (len (self.index), 3)
+
+        self.assertEqual (self.index.getCount (u"Метка 1"), 2)
+        self.assertEqual (self.index.getCount (u"Метка 3"), 1)
+        self.assertEqual (self.index.getCount (u"Метка 666"), 0)
+
+        self.assertEqual (self.index.getPages (u"метка 2"),
+                set ([self.rootwiki[u"Страница 1"], self.rootwiki[u"Страница 2/Страница 3"]]))
+
+        self.assertTrue (u"МЕТКА 1" in self.index)
+        self.assertFalse (u"Метка 666" in self.index)
+
+
+    def testLoad (self):
+        wiki = WikiDocument.load (self.path)
+
+        self.assertEqual (list (wiki.tagsIndex), [u"метка 1", u"метка 2", u"метка 3"])
+        self.assertEqual (wiki.tagsIndex.getCount (u"метка 2"), 2)
+
+
+    def testChangeTags (self):
+        len (self.index)
+        generation = self.index.generation
+
+        appendTag (self.rootwiki[u"Страница 1"], u"Метка 4")
+        removeTag (self.rootwiki[u"Страница 2"], u"Метка 3")
+
+        self.assertEqual (list (self.index), [u"метка 1", u"метка 2", u"метка 4"])
+        self.assertEqual (self.index.getPages (u"метка 4"), set ([self.rootwiki[u"Страница 1"]]))
+        self.assertTrue (self.index.generation > generation)
+
+
+    def testContentChange (self):
+        len (self.index)
+        generation = self.index.generation
+
+        self.rootwiki[u"Страница 1"].content = u"Новый текст"
+
+        self.assertEqual (self.index.generation, generation)
+
+
+    def testCreatePage (self):
+        len (self.index)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 4", [u"Метка 5", u"Метка 1"])
+
+        self.assertEqual (self.index.getCount (u"метка 1"), 3)
+        self.assertEqual (self.index.getPages (u"метка 5"), set ([self.rootwiki[u"Страница 4"]]))
+
+
+    def testRemovePage (self):
+        len (self.index)
+
+        self.rootwiki[u"Страница 2"].remove()
+
+        self.assertEqual (list (self.index), [u"метка 1", u"метка 2"])
+        self.assertEqual (self.index.getPages (u"метка 1"), set ([self.rootwiki[u"Страница 1"]]))
+        self.assertEqual (self.index.getPages (u"метка 2"), set ([self.rootwiki[u"Страница 1"]]))
+
+
+    def testRenameMovePage (self):
+        len (self.index)
+
+        page = self.rootwiki[u"Страница 2/Страница 3"]
+        page.moveTo (self.rootwiki)
+        page.title = u"Страница 333"
+
+        self.assertEqual (self.index.getPages (u"метка 2"),
+                set ([self.rootwiki[u"Страница 1"], self.rootwiki[u"Страница 333"]]))
+
+
+    def testTagsList (self):
+        len (self.index)
+        renameTag (self.rootwiki, u"Метка 1", u"Метка 10")
+
+        tags = TagsList (self.rootwiki)
+
+        self.assertEqual (list (tags), [u"метка 10", u"метка 2", u"метка 3"])
+        self.assertEqual (len (tags[u"Метка 10"]), 2)
+        self.assertEqual (len (tags[u"Метка 1"]), 0)
+
+        # Для ветки теги ищутся обходом дерева
+        branchTags = TagsList (self.rootwiki[u"Страница 2"])
+        self.assertEqual (list (branchTags), [u"метка 10", u"метка 2", u"метка 3"])
+        self.assertEqual (branchTags[u"метка 2"], [self.rootwiki[u"Страница 2/Страница 3"]])
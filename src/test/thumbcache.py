@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import shutil
+import threading
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.attachment import Attachment
+from outwiker.core.thumbpool import ThumbPool
+from outwiker.core.thumbexception import ThumbException
+from outwiker.pages.wiki.thumbnails import Thumbnails
+from outwiker.pages.wiki.wikipage import WikiPageFactory
+from outwiker.pages.wiki.parser.pagethumbmaker import PageThumbmaker
+
+from test.utils import removeWiki
+
+
+class FakeThumbmaker (object):
+    """
+    Заменитель WxThumbmaker, который вместо уменьшения картинки копирует файл
+    и запоминает, сколько раз его вызывали
+    """
+    def __init__ (self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+
+    def thumbByMaxSize (self, fname_src, maxsize, fname_res):
+        with self._lock:
+            self.count += 1
+
+        shutil.copyfile (fname_src, fname_res)
+
+
+
+class ErrorThumbmaker (object):
+    """
+    Заменитель WxThumbmaker, который не может создать превьюшку
+    """
+    def thumbByMaxSize (self, fname_src, maxsize, fname_res):
+        raise ThumbException (u"Error")
+
+
+class ThumbCacheTest (unittest.TestCase):
+    """
+    Тесты кеша превьюшек и пула потоков для их создания
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+        WikiPageFactory.create (self.rootwiki, u"Страница 1", [])
+        self.page = self.rootwiki[u"Страница 1"]
+
+        Attachment (self.page).attach ([u"../test/samplefiles/accept.png"])
+        self.srcPath = os.path.join (Attachment (self.page).getAttachPath(), u"accept.png")
+
+        self.thumbmaker = FakeThumbmaker()
+        self.pageThumbmaker = PageThumbmaker()
+        self.pageThumbmaker.thumbmaker = self.thumbmaker
+
+
+    def tearDown (self):
+        removeWiki (self.path)
+
+
+    def testCreate (self):
+        path = self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        self.assertEqual (path, os.path.join (Thumbnails.getRelativeThumbDir(), u"th_maxsize_100_accept.png"))
+        self.assertTrue (os.path.exists (os.path.join (self.page.path, path)))
+        self.assertTrue (os.path.exists (os.path.join (Thumbnails (self.page).getThumbPath (False),
+            Thumbnails.cacheFile)))
+        self.assertEqual (self.thumbmaker.count, 1)
+
+
+    def testReuse (self):
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        self.assertEqual (self.thumbmaker.count, 1)
+
+        # Другой размер - другая превьюшка
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 50)
+        self.assertEqual (self.thumbmaker.count, 2)
+
+
+    def testReuseAfterReload (self):
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        # Кеш должен читаться из файла
+        Thumbnails._caches.clear()
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        self.assertEqual (self.thumbmaker.count, 1)
+
+
+    def testSourceChanged (self):
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        with open (self.srcPath, "ab") as fp:
+            fp.write ("12345")
+
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        self.assertEqual (self.thumbmaker.count, 2)
+
+
+    def testSourceTouched (self):
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+
+        # Изменилось только время изменения файла, содержимое то же самое
+        stat = os.stat (self.srcPath)
+        os.utime (self.srcPath, (stat.st_atime, stat.st_mtime + 100))
+
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        self.assertEqual (self.thumbmaker.count, 1)
+
+
+    def testThumbRemoved (self):
+        path = self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        os.remove (os.path.join (self.page.path, path))
+
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        self.assertEqual (self.thumbmaker.count, 2)
+
+
+    def testClearDir (self):
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        Thumbnails (self.page).clearDir()
+
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        self.assertEqual (self.thumbmaker.count, 2)
+
+
+    def testSourceNotFound (self):
+        self.assertRaises (ThumbException,
+                self.pageThumbmaker.createThumbByMaxSize,
+                self.page, u"invalid.png", 100, wait=False)
+
+
+    def testNoWait (self):
+        paths = [self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", size, wait=False)
+                for size in range (10, 30)]
+
+        thumb = Thumbnails (self.page)
+        ThumbPool.get().waitGroup (thumb.getThumbPath (False))
+        thumb.saveCache()
+
+        for path in paths:
+            self.assertTrue (os.path.exists (os.path.join (self.page.path, path)))
+
+        self.assertEqual (self.thumbmaker.count, 20)
+
+
+    def testNoWaitError (self):
+        self.pageThumbmaker.thumbmaker = ErrorThumbmaker()
+        self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100, wait=False)
+
+        self.assertRaises (ThumbException, self.pageThumbmaker.wait)
+
+        # Ошибки сообщаются один раз
+        self.pageThumbmaker.wait()
+
+
+    def testWaitError (self):
+        self.pageThumbmaker.thumbmaker = ErrorThumbmaker()
+
+        self.assertRaises (ThumbException,
+                self.pageThumbmaker.createThumbByMaxSize,
+                self.page, u"accept.png", 100)
+
+
+    def testRemoveUnused (self):
+        path100 = self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 100)
+        path50 = self.pageThumbmaker.createThumbByMaxSize (self.page, u"accept.png", 50)
+
+        thumb = Thumbnails (self.page)
+        thumbdir = thumb.getThumbPath (False)
+
+        # Файлы, которые не создавались как превьюшки, не удаляются
+        scriptPath = os.path.join (thumbdir, u"script.js")
+        with open (scriptPath, "w") as fp:
+            fp.write ("script")
+
+        thumb.removeUnused (u'<IMG SRC="{0}"/>'.format (path100.replace ("\\", "/")))
+        thumb.saveCache()
+
+        self.assertTrue (os.path.exists (os.path.join (self.page.path, path100)))
+        self.assertFalse (os.path.exists (os.path.join (self.page.path, path50)))
+        self.assertTrue (os.path.exists (scriptPath))
+
+        # Запись об удаленной превьюшке удалена и из файла кеша
+        Thumbnails._caches.clear()
+        self.assertEqual (Thumbnails (self.page)._getCache (thumbdir)[1].keys(),
+                [os.path.basename (path100)])
+
+
+    def testRemoveUnusedAddedFile (self):
+        thumb = Thumbnails (self.page)
+        thumbdir = thumb.getThumbPath (True)
+
+        eqnPath = os.path.join (thumbdir, u"eqn_123.gif")
+        shutil.copyfile (self.srcPath, eqnPath)
+        thumb.addFile (u"eqn_123.gif")
+
+        thumb.removeUnused (u'<IMG SRC="__attach/__thumb/eqn_123.gif"/>')
+        self.assertTrue (os.path.exists (eqnPath))
+
+        thumb.removeUnused (u"")
+        self.assertFalse (os.path.exists (eqnPath))
+
+
+    def testPoolDuplicates (self):
+        pool = ThumbPool (workers=2)
+        event = threading.Event()
+        calls = []
+
+        def func ():
+            event.wait()
+            calls.append (1)
+
+        job1 = pool.submit (u"key", u"group", func)
+        job2 = pool.submit (u"key", u"group", func)
+        self.assertTrue (job1 is job2)
+
+        event.set()
+        pool.waitGroup (u"group")
+
+        self.assertTrue (job1.done)
+        self.assertEqual (len (calls), 1)
+
+
+    def testPoolError (self):
+        pool = ThumbPool (workers=2)
+
+        def func ():
+            raise ThumbException (u"Error")
+
+        job = pool.submit (u"key", u"group", func)
+        self.assertRaises (ThumbException, pool.wait, [job])
+
+        # После ошибки задание можно поставить еще раз
+        job2 = pool.submit (u"key", u"group", lambda: None)
+        pool.wait ([job2])
+        self.assertFalse (job is job2)
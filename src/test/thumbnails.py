@@ -98,8 +98,9 @@ class ThumbnailsTest (unittest.TestCase):
         self.parser.toHtml ("{$ %s $}" % (eqn1))
         self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 2 )
 
+        # Папка с превьюшками больше не очищается при каждом разборе
         self.parser.toHtml ("{$ %s $}" % (eqn2))
-        self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 2 )
+        self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 3 )
 
 
     def testThumbnails1_attach (self):
@@ -176,5 +177,6 @@ class ThumbnailsTest (unittest.TestCase):
         self.parser.toHtml ("{$ %s $}" % (eqn1))
         self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 2 )
 
+        # Папка с превьюшками больше не очищается при каждом разборе
         self.parser.toHtml ("{$ %s $}" % (eqn2))
-        self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 2 )
+        self.assertEqual (len (os.listdir (thumb.getThumbPath (False) ) ), 3 )
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.treecache import TreeCache
+from outwiker.pages.text.textpage import TextPageFactory, TextWikiPage
+from outwiker.pages.wiki.wikipage import WikiPageFactory, WikiWikiPage
+
+from test.utils import removeWiki
+
+
+class TreeCacheTest (unittest.TestCase):
+    """
+    Тесты кеша параметров страниц
+    """
+    def setUp(self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        WikiPageFactory.create (self.rootwiki, u"Страница 1", [u"тег 1", u"тег 2"])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [])
+        TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 3", [u"тег 3"])
+        self.rootwiki[u"Страница 1"].icon = u"../test/images/feed.gif"
+
+        # Сдвинем время изменения файлов в прошлое,
+        # чтобы на файловых системах с низкой точностью времени записи в кеше считались действительными
+        self._moveTimeBack (self.path)
+
+
+    def tearDown (self):
+        removeWiki (self.path)
+
+
+    def _moveTimeBack (self, path):
+        for root, dirs, files in os.walk (path):
+            for name in dirs + files:
+                fullpath = os.path.join (root, name)
+                mtime = os.stat (fullpath).st_mtime
+                os.utime (fullpath, (mtime - 10, mtime - 10))
+
+
+    def _loadTwice (self):
+        WikiDocument.load (self.path)._loadAllChildren()
+        wiki = WikiDocument.load (self.path)
+        return wiki
+
+
+    def testCacheFile (self):
+        WikiDocument.load (self.path)
+        self.assertTrue (os.path.exists (os.path.join (self.path, TreeCache.fileName)))
+
+
+    def testCacheFileNotPage (self):
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki), 2)
+
+
+    def testParamsFromCache (self):
+        wiki = self._loadTwice()
+        cache = wiki.treeCache
+        page1 = wiki[u"Страница 1"]
+
+        self.assertNotEqual (cache.getParams (page1.path), None)
+        self.assertNotEqual (cache.getChildrenNames (wiki), None)
+
+
+    def testLoadFromCache (self):
+        wiki = self._loadTwice()
+
+        self.assertEqual (len (wiki), 2)
+        self.assertEqual (type (wiki[u"Страница 1"]), WikiWikiPage)
+        self.assertEqual (type (wiki[u"Страница 2"]), TextWikiPage)
+        self.assertEqual (type (wiki[u"Страница 2/Страница 3"]), TextWikiPage)
+
+        self.assertEqual (wiki[u"Страница 1"].tags, [u"тег 1", u"тег 2"])
+        self.assertEqual (wiki[u"Страница 2/Страница 3"].tags, [u"тег 3"])
+
+        self.assertEqual (wiki[u"Страница 1"].order, 0)
+        self.assertEqual (wiki[u"Страница 2"].order, 1)
+
+
+    def testIconFromCache (self):
+        wiki = self._loadTwice()
+        self.assertEqual (wiki.treeCache.getIconName (wiki[u"Страница 1"]), u"__icon.gif")
+        self.assertEqual (wiki.treeCache.getIconName (wiki[u"Страница 2"]), u"")
+
+
+    def testChangeFromCache (self):
+        wiki = self._loadTwice()
+        wiki[u"Страница 1"].tags = [u"новый тег"]
+
+        wiki2 = WikiDocument.load (self.path)
+        self.assertEqual (wiki2[u"Страница 1"].tags, [u"новый тег"])
+
+
+    def testParamsWrite (self):
+        wiki = self._loadTwice()
+        cache = wiki.treeCache
+        cache.racyInterval = 0
+
+        page2 = wiki[u"Страница 2"]
+        self.assertEqual (len (page2), 1)
+        self.assertNotEqual (cache.getChildrenNames (page2), None)
+
+        mtime = os.stat (page2.path).st_mtime
+        page2.params.set (u"Tree", u"Expand", u"True")
+        self.assertNotEqual (os.stat (page2.path).st_mtime, mtime)
+
+        # Запись __page.opt не делает недействительным список дочерних страниц в кеше
+        self.assertEqual (cache.getChildrenNames (page2), [u"Страница 3"])
+
+        cache.flush()
+        wiki2 = WikiDocument.load (self.path)
+        self.assertNotEqual (wiki2.treeCache.getChildrenNames (wiki2[u"Страница 2"]), None)
+
+
+    def testParamsWriteAfterExternalChange (self):
+        wiki = self._loadTwice()
+        cache = wiki.treeCache
+        cache.racyInterval = 0
+
+        page2 = wiki[u"Страница 2"]
+        self.assertEqual (len (page2), 1)
+
+        os.mkdir (os.path.join (page2.path, u"Папка"))
+        page2.params.set (u"Tree", u"Expand", u"True")
+
+        self.assertEqual (cache.getChildrenNames (page2), None)
+
+
+    def testExternalChange (self):
+        self._loadTwice()
+
+        page = self.rootwiki[u"Страница 2/Страница 3"]
+        configPath = os.path.join (page.path, u"__page.opt")
+        mtime = os.stat (configPath).st_mtime
+        page.params.set (u"General", u"tags", u"внешний тег")
+        os.utime (configPath, (mtime + 5, mtime + 5))
+
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (wiki[u"Страница 2/Страница 3"].tags, [u"внешний тег"])
+
+
+    def testExternalNewPage (self):
+        self._loadTwice()
+
+        TextPageFactory.create (self.rootwiki, u"Страница 4", [])
+
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki), 3)
+        self.assertNotEqual (wiki[u"Страница 4"], None)
+
+
+    def testCreatePage (self):
+        wiki = self._loadTwice()
+        TextPageFactory.create (wiki[u"Страница 2"], u"Страница 4", [u"тег 4"])
+
+        wiki2 = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki2[u"Страница 2"]), 2)
+        self.assertEqual (wiki2[u"Страница 2/Страница 4"].tags, [u"тег 4"])
+
+
+    def testRemovePage (self):
+        wiki = self._loadTwice()
+        wiki[u"Страница 2"].remove()
+
+        wiki2 = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki2), 1)
+        self.assertEqual (wiki2.treeCache.getParams (os.path.join (self.path, u"Страница 2")), None)
+
+
+    def testRenamePage (self):
+        wiki = self._loadTwice()
+        wiki[u"Страница 2"].title = u"Новое имя"
+
+        wiki2 = WikiDocument.load (self.path)
+        self.assertEqual (wiki2[u"Страница 2"], None)
+        self.assertEqual (wiki2[u"Новое имя/Страница 3"].tags, [u"тег 3"])
+
+
+    def testInvalidCacheFile (self):
+        with open (os.path.join (self.path, TreeCache.fileName), "wb") as fp:
+            fp.write ("invalid cache file")
+
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki), 2)
+        self.assertEqual (wiki[u"Страница 1"].tags, [u"тег 1", u"тег 2"])
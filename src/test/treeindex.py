@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import shutil
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.pages.text.textpage import TextPageFactory
+from test.utils import removeWiki
+
+
+class TreeIndexTest (unittest.TestCase):
+    """
+    Тесты индексов страниц (поиск по заголовку и пути, порядковые номера)
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [])
+        TextPageFactory.create (self.rootwiki, u"Страница 3", [])
+        TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 4", [])
+
+
+    def tearDown (self):
+        removeWiki (self.path)
+
+
+    def _checkOrders (self, parent):
+        for n, child in enumerate (parent.children):
+            self.assertEqual (child.order, n)
+            self.assertTrue (parent[child.title.upper()] is child)
+
+
+    def testLookup (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+
+        self.assertTrue (self.rootwiki[u"страница 2/СТРАНИЦА 4"] is page)
+        self.assertEqual (self.rootwiki[u"Страница 5"], None)
+        self.assertEqual (self.rootwiki[u"Страница 5/Страница 4"], None)
+
+        self.assertFalse (WikiDocument.testDublicate (self.rootwiki, u"СТРАНИЦА 1"))
+        self.assertTrue (WikiDocument.testDublicate (self.rootwiki, u"Страница 4"))
+
+
+    def testCreateRemove (self):
+        self._checkOrders (self.rootwiki)
+
+        page = TextPageFactory.create (self.rootwiki, u"Страница 0", [])
+        self.assertTrue (self.rootwiki[u"страница 0"] is page)
+        self.assertEqual (page.order, 0)
+        self._checkOrders (self.rootwiki)
+
+        self.rootwiki[u"Страница 2"].remove()
+        self.assertEqual (self.rootwiki[u"Страница 2"], None)
+        self.assertEqual (len (self.rootwiki), 3)
+        self._checkOrders (self.rootwiki)
+
+
+    def testRename (self):
+        page = self.rootwiki[u"Страница 2"]
+        page.title = u"Новая страница"
+
+        self.assertEqual (self.rootwiki[u"Страница 2"], None)
+        self.assertTrue (self.rootwiki[u"новая страница"] is page)
+        self.assertTrue (self.rootwiki[u"Новая страница/Страница 4"] is page[u"Страница 4"])
+
+        page.title = u"НОВАЯ СТРАНИЦА"
+        self.assertTrue (self.rootwiki[u"Новая страница"] is page)
+        self.assertFalse (page.canRename (u"Страница 1"))
+        self.assertTrue (page.canRename (u"Новая Страница"))
+
+
+    def testOrder (self):
+        page = self.rootwiki[u"Страница 3"]
+        page.order = 0
+
+        self.assertEqual ([child.title for child in self.rootwiki.children],
+                [u"Страница 3", u"Страница 1", u"Страница 2"])
+        self._checkOrders (self.rootwiki)
+
+        self.rootwiki.sortChildrenAlphabetical()
+        self.assertEqual (page.order, 2)
+        self._checkOrders (self.rootwiki)
+
+
+    def testMove (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+        page.moveTo (self.rootwiki)
+
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 4"], None)
+        self.assertTrue (self.rootwiki[u"Страница 4"] is page)
+        self.assertEqual (len (self.rootwiki[u"Страница 2"]), 0)
+        self._checkOrders (self.rootwiki)
+
+
+    def testIsRemoved (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+        self.assertFalse (page.isRemoved)
+
+        page.remove()
+        self.assertTrue (page.isRemoved)
+
+
+    def testIterChildren (self):
+        self.assertEqual (list (self.rootwiki.iterChildren()), self.rootwiki.children)
+        self.assertEqual (list (self.rootwiki[u"Страница 1"].iterChildren()), [])
+
+
+    def testDublicateTitles (self):
+        """
+        Папки страниц, заголовки которых отличаются только регистром, созданы вне программы
+        """
+        shutil.copytree (os.path.join (self.path, u"Страница 1"),
+                os.path.join (self.path, u"СТРАНИЦА 1"))
+
+        wiki = WikiDocument.load (self.path)
+        self.assertEqual (len (wiki), 4)
+
+        last = wiki.children[1]
+        self.assertTrue (wiki[u"страница 1"] is last)
+
+        # После удаления одной из страниц находится другая
+        last.remove()
+        self.assertTrue (wiki[u"страница 1"] is wiki.children[0])
+        self.assertEqual (wiki.children[0].order, 0)
+
+
+    def testSubpath (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+        self.assertEqual (page.subpath, u"Страница 2/Страница 4")
+        self.assertEqual (self.rootwiki[u"Страница 2"].subpath, u"Страница 2")
+        self.assertEqual (self.rootwiki.subpath, u"/")
+
+        self.rootwiki[u"Страница 2"].title = u"Новая страница"
+        self.assertEqual (page.subpath, u"Новая страница/Страница 4")
+
+        page.moveTo (self.rootwiki[u"Страница 1"])
+        self.assertEqual (page.subpath, u"Страница 1/Страница 4")
+
+        page.moveTo (self.rootwiki)
+        self.assertEqual (page.subpath, u"Страница 4")
+
+
+    def testSubpathLookup (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+
+        self.assertTrue (self.rootwiki[u"/страница 2/страница 4"] is page)
+        self.assertTrue (self.rootwiki[u"Страница 2"][u"Страница 4"] is page)
+        self.assertTrue (page[u"/Страница 1"] is self.rootwiki[u"Страница 1"])
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 5"], None)
+
+
+    def testSubpathLookupRename (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+        self.rootwiki[u"Страница 2"].title = u"Новая страница"
+
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 4"], None)
+        self.assertTrue (self.rootwiki[u"Новая страница/Страница 4"] is page)
+
+        page.title = u"Страница 5"
+        self.assertEqual (self.rootwiki[u"Новая страница/Страница 4"], None)
+        self.assertTrue (self.rootwiki[u"Новая страница/Страница 5"] is page)
+
+
+    def testSubpathLookupMove (self):
+        page = self.rootwiki[u"Страница 2/Страница 4"]
+        page.moveTo (self.rootwiki[u"Страница 1"])
+
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 4"], None)
+        self.assertTrue (self.rootwiki[u"Страница 1/Страница 4"] is page)
+
+
+    def testSubpathLookupRemove (self):
+        self.rootwiki[u"Страница 2/Страница 4"].remove()
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 4"], None)
+
+        page = TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 4", [])
+        self.assertTrue (self.rootwiki[u"Страница 2/Страница 4"] is page)
+
+        parent = self.rootwiki[u"Страница 2"]
+        parent.remove()
+        self.assertEqual (self.rootwiki[u"Страница 2/Страница 4"], None)
+
+        # Поиск от удаленной страницы не находит страницу с таким же путем в дереве
+        newparent = TextPageFactory.create (self.rootwiki, u"Страница 2", [])
+        TextPageFactory.create (newparent, u"Страница 4", [])
+        self.assertEqual (parent[u"Страница 4"], None)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import errno
+import os
+import os.path
+import unittest
+
+from outwiker.core.tree import WikiDocument
+from outwiker.core.treeprefetcher import TreePrefetcher
+from outwiker.pages.text.textpage import TextPageFactory
+
+from test.utils import removeWiki
+
+
+class LazyLoadingTest (unittest.TestCase):
+    """
+    Тесты на ленивую загрузку дерева заметок
+    """
+    def setUp(self):
+        self.path = u"../test/samplewiki"
+        self.root = WikiDocument.load (self.path)
+
+
+    def _findPage (self, parent, title):
+        for child in parent.children:
+            if child.title == title:
+                return child
+
+
+    def testFirstLevelLoaded (self):
+        self.assertTrue (self.root.childrenLoaded)
+        self.assertEqual (len (self.root), 5)
+
+
+    def testDeepLevelsNotLoaded (self):
+        page1 = self._findPage (self.root, u"Страница 1")
+
+        self.assertFalse (page1.childrenLoaded)
+
+
+    def testLoadOnAccess (self):
+        page1 = self._findPage (self.root, u"Страница 1")
+        children = page1.children
+
+        self.assertTrue (page1.childrenLoaded)
+        self.assertEqual (len (children), 1)
+        self.assertEqual (children[0].title, u"Страница 2")
+        self.assertFalse (children[0].childrenLoaded)
+
+
+    def testLoadOnLen (self):
+        page2 = self.root[u"Страница 1/Страница 2"]
+        self.assertEqual (len (page2), 2)
+
+
+    def testTags (self):
+        page1 = self._findPage (self.root, u"Страница 1")
+        self.assertEqual (len (page1.tags), 3)
+        self.assertTrue (u"двойной тег" in page1.tags)
+
+
+    def testPrefetcher (self):
+        prefetcher = TreePrefetcher (self.root)
+        prefetcher.start()
+        prefetcher.join (10)
+
+        self.assertFalse (prefetcher.isAlive)
+
+        page2 = self.root[u"Страница 1"]._children[0]
+        self.assertTrue (page2.childrenLoaded)
+        self.assertTrue (page2._children[0].childrenLoaded)
+
+
+class LazyLoadingChangeTest (unittest.TestCase):
+    """
+    Тесты на изменение дерева, которое загружено не полностью
+    """
+    def setUp(self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [])
+        TextPageFactory.create (self.rootwiki[u"Страница 1"], u"Страница 2", [])
+        TextPageFactory.create (self.rootwiki[u"Страница 1/Страница 2"], u"Страница 3", [u"тег"])
+
+        self.wikiroot = WikiDocument.load (self.path)
+        self.removed = []
+        self.wikiroot.onPageRemove += self.onPageRemove
+
+
+    def tearDown (self):
+        self.wikiroot.onPageRemove -= self.onPageRemove
+        removeWiki (self.path)
+
+
+    def onPageRemove (self, page):
+        self.removed.append (page)
+
+
+    def testRemoveNotLoaded (self):
+        page1 = self.wikiroot[u"Страница 1"]
+        self.assertFalse (page1.childrenLoaded)
+
+        page1.remove()
+
+        self.assertEqual (len (self.removed), 3)
+        self.assertEqual (len (self.wikiroot), 0)
+
+
+    def testRenameNotLoaded (self):
+        page1 = self.wikiroot[u"Страница 1"]
+        page1.title = u"Новая страница"
+
+        page3 = self.wikiroot[u"Новая страница/Страница 2/Страница 3"]
+        self.assertNotEqual (page3, None)
+        self.assertEqual (page3.path, os.path.join (self.path,
+            u"Новая страница",
+            u"Страница 2",
+            u"Страница 3"))
+        self.assertEqual (page3.tags, [u"тег"])
+
+
+    def testRenameWhilePrefetching (self):
+        prefetcher = TreePrefetcher (self.wikiroot)
+        prefetcher.start()
+
+        page1 = self.wikiroot[u"Страница 1"]
+        for n in range (10):
+            page1.title = u"Страница 1 - {0}".format (n)
+
+        prefetcher.join (10)
+        self.assertFalse (prefetcher.isAlive)
+
+        page3 = self.wikiroot[u"Страница 1 - 9/Страница 2/Страница 3"]
+        self.assertNotEqual (page3, None)
+        self.assertEqual (page3.path, os.path.join (self.path,
+            u"Страница 1 - 9",
+            u"Страница 2",
+            u"Страница 3"))
+        self.assertEqual (page3.tags, [u"тег"])
+        self.assertEqual (page3.params.get (u"General", u"tags"), u"тег")
+
+
+    def testPrefetcherStop (self):
+        prefetcher = TreePrefetcher (self.wikiroot)
+        prefetcher.stop()
+        prefetcher.start()
+        prefetcher.join (10)
+
+        self.assertFalse (prefetcher.isAlive)
+        self.assertFalse (self.wikiroot[u"Страница 1"].childrenLoaded)
+
+
+    def testListError (self):
+        page1 = self.wikiroot[u"Страница 1"]
+        os.rename (page1.path, page1.path + u"_")
+
+        try:
+            try:
+                page1.children
+                self.fail (u"IOError is not raised")
+            except IOError as e:
+                self.assertEqual (e.errno, errno.ENOENT)
+
+            self.assertFalse (page1.childrenLoaded)
+        finally:
+            os.rename (page1.path + u"_", page1.path)
+
+        # Список дочерних страниц не запомнился пустым, поэтому загружается при следующем обращении
+        self.assertEqual (len (page1.children), 1)
+        self.assertTrue (page1.childrenLoaded)
+
+
+    def testCreateInNotLoaded (self):
+        page2 = self.wikiroot[u"Страница 1/Страница 2"]
+        self.assertFalse (page2.childrenLoaded)
+
+        TextPageFactory.create (page2, u"Страница 4", [])
+
+        self.assertEqual (len (page2), 2)
+        self.assertNotEqual (self.wikiroot[u"Страница 1/Страница 2/Страница 3"], None)
+        self.assertNotEqual (self.wikiroot[u"Страница 1/Страница 2/Страница 4"], None)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import os.path
+import shutil
+import threading
+import time
+import unittest
+
+from outwiker.core.config import PageConfig, BooleanOption
+from outwiker.core.tree import WikiDocument, RootWikiPage
+from outwiker.core.treewatcher import TreeWatcher, PollingBackend, InotifyBackend
+from outwiker.pages.text.textpage import TextPageFactory
+from test.utils import removeWiki
+
+
+class PollingTreeWatcher (TreeWatcher):
+    def _createBackend (self):
+        return PollingBackend()
+
+
+
+class NoInotifyTreeWatcher (TreeWatcher):
+    def _createBackend (self):
+        return self._createPollingBackend()
+
+
+
+class TreeWatcherTest (unittest.TestCase):
+    """
+    Тесты отслеживания изменений, сделанных сторонними программами
+    """
+    def setUp (self):
+        self.path = u"../test/testwiki"
+        removeWiki (self.path)
+
+        self.rootwiki = WikiDocument.create (self.path)
+
+        TextPageFactory.create (self.rootwiki, u"Страница 1", [u"тег 1"])
+        TextPageFactory.create (self.rootwiki, u"Страница 2", [])
+        TextPageFactory.create (self.rootwiki[u"Страница 2"], u"Страница 3", [])
+
+        self.rootwiki[u"Страница 1"].content = u"Текст"
+
+        self.events = []
+        self.rootwiki.onPageUpdate += self.__onPageUpdate
+        self.rootwiki.onTreeUpdate += self.__onTreeUpdate
+        self.rootwiki.onPageCreate += self.__onPageCreate
+        self.rootwiki.onPageRemove += self.__onPageRemove
+        self.rootwiki.onEndTreeUpdate += self.__onEndTreeUpdate
+
+
+    def tearDown (self):
+        self.rootwiki.watcher.stop()
+        removeWiki (self.path)
+
+
+    def __onPageUpdate (self, page):
+        self.events.append ((u"update", page))
+
+
+    def __onTreeUpdate (self, page):
+        self.events.append ((u"tree", page))
+
+
+    def __onPageCreate (self, page):
+        self.events.append ((u"create", page))
+
+
+    def __onPageRemove (self, page):
+        self.events.append ((u"remove", page))
+
+
+    def __onEndTreeUpdate (self, root):
+        self.events.append ((u"end", root))
+
+
+    def _writeContent (self, page, text, mtime=1300000000):
+        """
+        Изменить содержимое страницы в обход программы
+        """
+        path = os.path.join (page.path, RootWikiPage.contentFile)
+        with open (path, "wb") as fp:
+            fp.write (text.encode ("utf8"))
+
+        os.utime (path, (mtime, mtime))
+
+
+    def _process (self, pages):
+        self.rootwiki.watcher.addChanges ([page.path for page in pages])
+        self.rootwiki.watcher.processChanges()
+
+
+    def testContentCache (self):
+        page = self.rootwiki[u"Страница 1"]
+        self._writeContent (page, u"Текст 1")
+        self.assertEqual (page.content, u"Текст 1")
+
+        # Размер файла не изменился, но изменилось время
+        self._writeContent (page, u"Текст 2", 1300000001)
+        self.assertEqual (page.content, u"Текст 2")
+
+
+    def testContentStatRacy (self):
+        page = self.rootwiki[u"Страница 1"]
+        self._writeContent (page, u"Текст 1", int (time.time()))
+
+        self.assertEqual (page.contentStat, None)
+        self.assertEqual (page.content, u"Текст 1")
+
+
+    def testContentChanged (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.content
+
+        self._writeContent (page, u"Новый текст")
+        self._process ([page])
+
+        self.assertEqual (self.events, [(u"update", page)])
+        self.assertEqual (page.content, u"Новый текст")
+
+
+    def testOwnChanges (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.content = u"Новый текст"
+        page.tags = [u"тег 2"]
+        self.events = []
+
+        self._process ([self.rootwiki, page])
+        self.assertEqual (self.events, [])
+
+
+    def testParamsChanged (self):
+        page = self.rootwiki[u"Страница 1"]
+        self.assertEqual (page.tags, [u"тег 1"])
+
+        PageConfig (os.path.join (page.path, RootWikiPage.pageConfig)).set (
+                RootWikiPage.sectionGeneral, u"tags", u"тег 2, тег 3")
+
+        self._process ([page])
+
+        self.assertEqual (self.events, [(u"update", page)])
+        self.assertEqual (page.tags, [u"тег 2", u"тег 3"])
+        self.assertEqual (self.rootwiki.tagsIndex.getPages (u"тег 1"), set())
+        self.assertEqual (self.rootwiki.tagsIndex.getPages (u"тег 2"), set ([page]))
+
+
+    def testOrderChanged (self):
+        page = self.rootwiki[u"Страница 2"]
+
+        PageConfig (os.path.join (page.path, RootWikiPage.pageConfig)).set (
+                RootWikiPage.sectionGeneral, u"order", u"-5")
+
+        self._process ([page])
+
+        self.assertEqual (page.order, 0)
+        self.assertEqual (self.rootwiki.children[1], self.rootwiki[u"Страница 1"])
+
+
+    def testPageCreated (self):
+        shutil.copytree (self.rootwiki[u"Страница 1"].path,
+                os.path.join (self.path, u"Страница 4"))
+
+        self._process ([self.rootwiki])
+
+        page = self.rootwiki[u"Страница 4"]
+        self.assertNotEqual (page, None)
+        self.assertEqual (page.content, u"Текст")
+        self.assertEqual (self.events, [(u"create", page), (u"end", self.rootwiki)])
+
+
+    def testPageCreatedLater (self):
+        path = os.path.join (self.path, u"Страница 4")
+        os.mkdir (path)
+
+        self._process ([self.rootwiki])
+        self.assertEqual (self.rootwiki[u"Страница 4"], None)
+        self.assertEqual (self.events, [])
+
+        shutil.copyfile (os.path.join (self.rootwiki[u"Страница 1"].path, RootWikiPage.pageConfig),
+                os.path.join (path, RootWikiPage.pageConfig))
+
+        self.rootwiki.watcher.addChanges ([path])
+        self.rootwiki.watcher.processChanges()
+
+        self.assertNotEqual (self.rootwiki[u"Страница 4"], None)
+
+
+    def testPageRemoved (self):
+        page = self.rootwiki[u"Страница 2/Страница 3"]
+        self.rootwiki.selectedPage = page
+        self.events = []
+
+        shutil.rmtree (self.rootwiki[u"Страница 2"].path)
+        self._process ([self.rootwiki, self.rootwiki[u"Страница 2"], page])
+
+        self.assertEqual (self.rootwiki[u"Страница 2"], None)
+        self.assertTrue (page.isRemoved)
+        self.assertEqual (self.rootwiki.selectedPage, None)
+        self.assertEqual (len ([event for event in self.events if event[0] == u"remove"]), 2)
+        self.assertEqual (self.events[-1], (u"end", self.rootwiki))
+
+
+    def testIconChanged (self):
+        page = self.rootwiki[u"Страница 1"]
+        self.assertEqual (page.icon, None)
+
+        shutil.copyfile (u"../test/images/icon.png", os.path.join (page.path, u"__icon.png"))
+        self._process ([page])
+
+        self.assertEqual (self.events, [(u"tree", page)])
+        self.assertEqual (page.icon, os.path.join (page.path, u"__icon.png"))
+
+
+    def testStopped (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.content
+
+        self.rootwiki.watcher.addChanges ([page.path])
+        self.rootwiki.watcher.stop()
+        self._writeContent (page, u"Новый текст")
+        self.rootwiki.watcher.processChanges()
+
+        self.assertEqual (self.events, [])
+
+
+    def testPollingBackend (self):
+        page = self.rootwiki[u"Страница 1"]
+        stopEvent = threading.Event()
+        stopEvent.set()
+
+        backend = PollingBackend()
+        self.assertEqual (backend.wait ([page.path], 0, stopEvent), set())
+
+        self._writeContent (page, u"Новый текст")
+        self.assertEqual (backend.wait ([page.path], 0, stopEvent), set ([page.path]))
+        self.assertEqual (backend.wait ([page.path], 0, stopEvent), set())
+
+
+    def testInotifyBackend (self):
+        try:
+            backend = InotifyBackend()
+        except OSError:
+            # inotify недоступен
+            return
+
+        page = self.rootwiki[u"Страница 1"]
+        stopEvent = threading.Event()
+
+        try:
+            self.assertEqual (backend.wait ([page.path], 0, stopEvent), set())
+
+            self._writeContent (page, u"Новый текст")
+            self.assertEqual (backend.wait ([page.path], 1, stopEvent), set ([page.path]))
+        finally:
+            backend.close()
+
+
+    def testPollingDisabled (self):
+        watcher = NoInotifyTreeWatcher (self.rootwiki)
+        self.assertFalse (watcher.pollingEnabled)
+
+        watcher.start()
+        watcher._thread.join (5)
+        self.assertFalse (watcher.isAlive)
+
+        watcher.stop()
+
+
+    def testPollingEnabled (self):
+        watcher = NoInotifyTreeWatcher (self.rootwiki)
+        watcher.pollingEnabled = True
+        watcher.interval = 0.05
+
+        watcher.start()
+        try:
+            time.sleep (0.2)
+            self.assertTrue (watcher.isAlive)
+        finally:
+            watcher.stop()
+
+
+    def testVisiblePages (self):
+        page1 = self.rootwiki[u"Страница 1"]
+        page2 = self.rootwiki[u"Страница 2"]
+        page3 = self.rootwiki[u"Страница 2/Страница 3"]
+        watcher = self.rootwiki.watcher
+
+        self.assertEqual (set (watcher._getVisiblePages().values()),
+                set ([self.rootwiki, page1, page2]))
+
+        BooleanOption (page2.params, TreeWatcher.expandSection, TreeWatcher.expandOption, False).value = True
+        self.assertEqual (set (watcher._getVisiblePages().values()),
+                set ([self.rootwiki, page1, page2, page3]))
+
+        BooleanOption (page2.params, TreeWatcher.expandSection, TreeWatcher.expandOption, False).value = False
+        self.rootwiki.selectedPage = page3
+        self.assertEqual (set (watcher._getVisiblePages().values()),
+                set ([self.rootwiki, page1, page2, page3]))
+
+
+    def testThread (self):
+        page = self.rootwiki[u"Страница 1"]
+        page.content
+
+        notified = threading.Event()
+
+        watcher = PollingTreeWatcher (self.rootwiki, notified.set)
+        watcher.interval = 0.05
+        watcher.start()
+
+        try:
+            time.sleep (0.3)
+            self._writeContent (page, u"Новый текст")
+            notified.wait (5)
+        finally:
+            watcher.stop()
+
+        self.assertTrue (notified.isSet())
+
+        watcher.addChanges ([page.path])
+        watcher.processChanges()
+        self.assertEqual (self.events, [(u"update", page)])
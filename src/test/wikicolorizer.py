@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import random
+import unittest
+
+from outwiker.pages.wiki.wikicolorizer import WikiColorizer, BytePositions
+
+
+class FakeEditor (object):
+    """
+    Заменитель WikiEditor, содержащий только идентификаторы стилей
+    """
+    STYLE_BOLD_ID = 1
+    STYLE_ITALIC_ID = 2
+    STYLE_UNDERLINE_ID = 4
+    STYLE_LINK_ID = 8
+    STYLE_HEADING_ID = 126
+    STYLE_COMMAND_ID = 125
+    STYLE_BOLD_ITALIC_ID = STYLE_BOLD_ID | STYLE_ITALIC_ID
+
+
+class EditorModel (object):
+    """
+    Модель стилей редактора: при вставке и удалении текста стили остальных байтов сдвигаются
+    """
+    def __init__ (self, colorizer, text):
+        self.colorizer = colorizer
+        self.text = text
+        self.styles = bytearray()
+        self.apply()
+
+
+    def edit (self, pos, length, newtext):
+        self.change (pos, length, newtext)
+        return self.apply()
+
+
+    def change (self, pos, length, newtext):
+        """
+        Изменить текст без раскраски
+        """
+        positions = BytePositions (self.text)
+        start = positions (pos)
+        end = positions (pos + length)
+
+        self.styles[start: end] = bytearray (len (newtext.encode ("utf-8")))
+        self.text = self.text[:pos] + newtext + self.text[pos + length:]
+
+
+    def apply (self):
+        start, stylebytes = self.colorizer.colorize (self.text)
+        self.applyStyles (start, stylebytes)
+        return (start, stylebytes)
+
+
+    def applyStyles (self, start, stylebytes):
+        self.styles[start: start + len (stylebytes)] = stylebytes
+
+
+class WikiColorizerTest (unittest.TestCase):
+    def setUp (self):
+        self.text = u"""!! Заголовок
+
+Обычный текст и '''полужирный ''курсив'' текст''' в одной строке.
+Ссылка [[http://example.com | пример]] и адрес http://jenyay.net.
+
+''Курсив
+на нескольких
+строках''
+
+(:source lang="python":)
+def foo ():
+    return 42
+(:sourceend:)
+
+[= Без '''форматирования''' =]
+
+{+Подчеркнутый+} текст.
+
+Первая строка без разметки
+Вторая строка без разметки
+"""
+
+
+    def _getFullStyles (self, text):
+        colorizer = WikiColorizer (FakeEditor())
+        start, stylebytes = colorizer.colorize (text)
+        self.assertEqual (start, 0)
+        return bytearray (stylebytes)
+
+
+    def testFull (self):
+        colorizer = WikiColorizer (FakeEditor())
+        start, stylebytes = colorizer.colorize (self.text)
+
+        self.assertEqual (start, 0)
+        self.assertEqual (len (stylebytes), len (self.text.encode ("utf-8")))
+
+        boldpos = BytePositions (self.text)(self.text.find (u"полужирный"))
+        self.assertEqual (ord (stylebytes[boldpos]), FakeEditor.STYLE_BOLD_ID)
+
+
+    def testSameText (self):
+        colorizer = WikiColorizer (FakeEditor())
+        colorizer.colorize (self.text)
+
+        self.assertEqual (colorizer.colorize (self.text), (0, ""))
+
+
+    def testPlainTyping (self):
+        text = self.text * 20
+        model = EditorModel (WikiColorizer (FakeEditor()), text)
+
+        pos = text.find (u"Вторая строка", len (text) / 2)
+        start, stylebytes = model.edit (pos, 0, u"новые слова ")
+
+        # Раскрашена только небольшая часть текста
+        self.assertTrue (start > 0)
+        self.assertTrue (len (stylebytes) < 500)
+        self.assertEqual (model.styles, self._getFullStyles (model.text))
+
+
+    def testMarkupTyping (self):
+        model = EditorModel (WikiColorizer (FakeEditor()), self.text)
+
+        model.edit (len (self.text), 0, u"'''")
+        self.assertEqual (model.styles, self._getFullStyles (model.text))
+
+        model.edit (self.text.find (u"Обычный"), 0, u"'''")
+        self.assertEqual (model.styles, self._getFullStyles (model.text))
+
+
+    def testInvalidate (self):
+        colorizer = WikiColorizer (FakeEditor())
+        colorizer.colorize (self.text)
+        colorizer.invalidate()
+
+        start, stylebytes = colorizer.colorize (self.text + u"текст")
+        self.assertEqual (start, 0)
+
+
+    def testNotAppliedResult (self):
+        """
+        Результат раскраски, который не был применен к редактору (текст успел измениться),
+        не должен влиять на следующую раскраску
+        """
+        colorizer = WikiColorizer (FakeEditor())
+        model = EditorModel (colorizer, self.text)
+        version = colorizer._version
+
+        pos = self.text.find (u"Вторая строка")
+        model.change (pos, 0, u"'''")
+        colorizer._colorize (model.text, colorizer._state)
+
+        model.change (pos, 3, u"слово")
+        start, stylebytes, state = colorizer._colorize (model.text, colorizer._state)
+
+        self.assertTrue (colorizer.commit (version, state))
+        model.applyStyles (start, stylebytes)
+        self.assertEqual (model.styles, self._getFullStyles (model.text))
+
+
+    def testCommitStale (self):
+        colorizer = WikiColorizer (FakeEditor())
+        colorizer.colorize (self.text)
+
+        version = colorizer._version
+        result1 = colorizer._colorize (self.text + u"1", colorizer._state)
+        result2 = colorizer._colorize (self.text + u"2", colorizer._state)
+
+        self.assertTrue (colorizer.commit (version, result1[2]))
+
+        # Второй результат рассчитан относительно раскраски, которая уже заменена
+        self.assertFalse (colorizer.commit (version, result2[2]))
+        self.assertEqual (colorizer._state.text, self.text + u"1")
+
+
+    def testPlainTypingApostrophe (self):
+        text = self.text * 20
+        model = EditorModel (WikiColorizer (FakeEditor()), text)
+
+        pos = text.find (u"Вторая строка", len (text) / 2)
+        start, stylebytes = model.edit (pos, 0, u"don't (see: [[link]]) ")
+
+        self.assertTrue (start > 0)
+        self.assertTrue (len (stylebytes) < 500)
+        self.assertEqual (model.styles, self._getFullStyles (model.text))
+
+
+    def testRandomEdits (self):
+        rand = random.Random (1)
+        snippets = [u"a", u"бв", u" ", u"\n", u"\n\n", u"слово ", u"'''", u"''", u"[[", u"]]",
+                u"(:source:)", u"(:sourceend:)", u"!! ", u"http://example.com ", u"[=", u"=]", u"{+", u"+}",
+                u"'", u"[", u"]", u"(", u")", u":", u"{", u"}", u"+", u"!"]
+
+        model = EditorModel (WikiColorizer (FakeEditor()), self.text)
+
+        for n in range (300):
+            pos = rand.randint (0, len (model.text))
+
+            if rand.random() < 0.3:
+                length = rand.randint (0, min (10, len (model.text) - pos))
+                model.edit (pos, length, u"")
+            else:
+                model.edit (pos, 0, rand.choice (snippets))
+
+            self.assertEqual (model.styles,
+                    self._getFullStyles (model.text),
+                    u"Edit {0}: {1}".format (n, repr (model.text)))
+
+
+    def testBytePositions (self):
+        text = u"abc\nабв\nгд e"
+        positions = BytePositions (text)
+
+        for pos in range (len (text) + 1):
+            self.assertEqual (positions (pos), len (text[:pos].encode ("utf-8")))
+
+        positions = BytePositions (text, 6)
+        self.assertEqual (positions (9), len (text[:9].encode ("utf-8")))
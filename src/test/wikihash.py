@@ -372,3 +372,103 @@ class WikiHashTest (unittest.TestCase):
                 u"Бла-бла-бла")
 
         hashCalculator.getHash (self.testPage)
+
+
+    def testHashCacheHit (self):
+        """
+        Если страница не изменилась, контрольная сумма берется из памяти
+        """
+        WikiHashCalculator (Application).getHash (self.testPage)
+
+        self.assertTrue (self.testPage.path in WikiHashCalculator._hashCache)
+
+        # Подменим запомненную сумму, чтобы убедиться, что она не рассчитывается заново
+        key, files, hash = WikiHashCalculator._hashCache[self.testPage.path]
+        WikiHashCalculator._hashCache[self.testPage.path] = (key, files, u"cached")
+
+        self.assertEqual (WikiHashCalculator (Application).getHash (self.testPage), u"cached")
+
+        WikiHashCalculator._hashCache[self.testPage.path] = (key, files, hash)
+
+
+    def testHashCacheAttachChanged (self):
+        """
+        Изменение прикрепленного файла без изменения списка файлов
+        """
+        hashCalculator = WikiHashCalculator (Application)
+        hash_src = hashCalculator.getHash (self.testPage)
+
+        fname = os.path.join (Attachment (self.testPage).getAttachPath(), u"image.jpg")
+        mtime = os.stat (fname).st_mtime
+        os.utime (fname, (mtime + 5, mtime + 5))
+
+        hash2 = hashCalculator.getHash (self.testPage)
+        self.assertNotEqual (hash_src, hash2)
+
+
+    def testHashCachePageParams (self):
+        """
+        Запись параметров страницы в __page.opt не сбрасывает запомненную сумму
+        """
+        WikiHashCalculator (Application).getHash (self.testPage)
+
+        key, files, hash = WikiHashCalculator._hashCache[self.testPage.path]
+        WikiHashCalculator._hashCache[self.testPage.path] = (key, files, u"cached")
+
+        self.testPage.tags = [u"метка 1", u"метка 2"]
+        self.testPage.params.set (u"General", u"testparam", u"111")
+
+        self.assertEqual (WikiHashCalculator (Application).getHash (self.testPage), u"cached")
+
+        WikiHashCalculator._hashCache[self.testPage.path] = (key, files, hash)
+
+
+    def testHashCacheOtherConfig (self):
+        """
+        Изменение настроек, не влияющих на вид страницы, не сбрасывает запомненную сумму
+        """
+        WikiHashCalculator (Application).getHash (self.testPage)
+
+        key, files, hash = WikiHashCalculator._hashCache[self.testPage.path]
+        WikiHashCalculator._hashCache[self.testPage.path] = (key, files, u"cached")
+
+        Application.config.set (u"WikiHashTest", u"param", u"111")
+        try:
+            self.assertEqual (WikiHashCalculator (Application).getHash (self.testPage), u"cached")
+        finally:
+            Application.config.remove_section (u"WikiHashTest")
+            WikiHashCalculator._hashCache[self.testPage.path] = (key, files, hash)
+
+
+    def testHashCacheEmptyContent (self):
+        """
+        Изменение шаблона пустой страницы сбрасывает запомненную сумму
+        """
+        self.testPage.content = u""
+        hashCalculator = WikiHashCalculator (Application)
+        hash_src = hashCalculator.getHash (self.testPage)
+
+        emptycontent = EmptyContent (Application.config)
+        oldcontent = emptycontent.content
+        emptycontent.content = u"Бла-бла-бла"
+
+        try:
+            self.assertNotEqual (hashCalculator.getHash (self.testPage), hash_src)
+        finally:
+            emptycontent.content = oldcontent
+
+
+    def testHashCacheConfigGeneration (self):
+        """
+        Изменение настроек программы сбрасывает запомненную сумму
+        """
+        hashCalculator = WikiHashCalculator (Application)
+        hash_src = hashCalculator.getHash (self.testPage)
+
+        generation = Application.config.generation
+        Application.config.set (WikiConfig.WIKI_SECTION, 
+                WikiConfig.THUMB_SIZE_PARAM, 
+                WikiConfig.THUMB_SIZE_DEFAULT + 100)
+
+        self.assertNotEqual (Application.config.generation, generation)
+        self.assertNotEqual (hashCalculator.getHash (self.testPage), hash_src)
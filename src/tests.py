@@ -37,6 +37,14 @@ if __name__ == '__main__':
 
     from test.treeloading import WikiPagesTest, SubWikiTest, TextPageAttachmentTest
     from test.treeloading_readonly import ReadonlyLoadTest, ReadonlyChangeTest
+    from test.treelazyloading import LazyLoadingTest, LazyLoadingChangeTest
+    from test.treecache import TreeCacheTest
+    from test.treeindex import TreeIndexTest
+    from test.treewatcher import TreeWatcherTest
+    from test.searchindex import SearchIndexTest
+    from test.htmlcache import HtmlCacheTest, HtmlGeneratorCacheTest
+    from test.backgroundrenderer import BackgroundRendererTest
+    from test.benchmark import BenchmarkTest
     from test.treecreation import TextPageCreationTest
     from test.treemanualedit import ManualEditTest
     from test.bookmarks import BookmarksTest
@@ -45,6 +53,7 @@ if __name__ == '__main__':
     from test.factory import FactorySelectorTest
     from test.titletester import PageTitleTesterTest
     from test.tags import TagsListTest
+    from test.tagsindex import TagsIndexTest
     from test.pagedatetime import PageDateTimeTest
 
     from test.pagemove import MoveTest
@@ -69,6 +78,8 @@ if __name__ == '__main__':
     from test.parsertests.parserurl import ParserUrlTest
     from test.parsertests.parsertex import ParserTexTest
     from test.parsertests.parserlinebreak import ParserLineBreakTest
+    from test.parsertests.parserfast import ParserFastTest
+    from test.parsertests.parsergrammar import ParserGrammarTest
 
     from test.parsertests.wikicommands import WikiCommandsTest
     from test.parsertests.wikicommandinclude import WikiIncludeCommandTest
@@ -79,16 +90,20 @@ if __name__ == '__main__':
     from test.wxthumbmaker import WxThumbmakerTest
     from test.pagethumbmaker import PageThumbmakerTest
     from test.thumbnails import ThumbnailsTest
+    from test.thumbcache import ThumbCacheTest
+    from test.rendercache import RenderCacheTest
+    from test.iconscache import IconsCacheTest
     from test.htmlimprover import HtmlImproverTest
     from test.wikihtmlgenerator import WikiHtmlGeneratorTest
     from test.wikihash import WikiHashTest
+    from test.wikicolorizer import WikiColorizerTest
     from test.htmltemplate import HtmlTemplateTest
     from test.htmlpages import HtmlPagesTest
     from test.wikilinkcreator import WikiLinkCreatorTest
 
     from test.utils import removeWiki
     from test.event import EventTest, EventsTest
-    from test.config import ConfigTest, ConfigOptionsTest, TrayConfigTest, EditorConfigTest
+    from test.config import ConfigTest, ConfigTransactionTest, ConfigOptionsTest, TrayConfigTest, EditorConfigTest
     from test.recent import RecentWikiTest
     from test.search import SearcherTest, SearchPageTest
     from test.localsearch import LocalSearchTest